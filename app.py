@@ -4,29 +4,64 @@ Flask Web应用，提供病害检测的Web界面
 """
 
 import os
-import json
-import uuid
-import requests
-from datetime import datetime
-from flask import Flask, render_template, request, jsonify, send_from_directory
-from werkzeug.utils import secure_filename
+import threading
+from contextlib import nullcontext
+from flask import Flask, Response, abort, render_template, request, jsonify, send_file
 
 import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from src.config import Config
 from src.detectors import HybridDiseaseDetector
+from src.server import (
+    InFlightTracker, alert_api, field_api, files, http_cache, offline, query_api, report_api, responses, scheduler,
+    supply_api
+)
+from src.storage import OfflineQueue, SQLiteStatsStore
+from src.utils.metadata import extract_metadata, merge_location_hints
+from src.utils.upload import StreamingUpload, UploadError, parse_boundary
 
 
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = Config.MAX_CONTENT_LENGTH
 app.config['UPLOAD_FOLDER'] = Config.UPLOAD_DIR
 
-# 初始化配置
-Config.init_directories()
+# 检测器按进程惰性创建：预派生的每个 worker 持有自己的实例，统计通过 SQLite 跨进程汇总；
+# 目录初始化与后台线程也随之推迟到首次使用，导入本模块不触及文件系统
+_detector = None
+_detector_lock = threading.Lock()
 
-# 创建检测器
-detector = HybridDiseaseDetector(api_key=Config.QWEN_API_KEY)
+# 进行中的检测请求，用于优雅退出时排空
+inflight = InFlightTracker()
+
+
+def get_detector() -> HybridDiseaseDetector:
+    """获取当前进程的检测器实例"""
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                Config.init_directories()
+                # 后台保留策略（多 worker 时通过文件锁保证同一时刻只有一个进程执行）
+                files.start_retention()
+                _detector = HybridDiseaseDetector(
+                    api_key=Config.QWEN_API_KEY,
+                    stats_store=SQLiteStatsStore(Config.STATS_DB_PATH),
+                    offline_queue=OfflineQueue() if Config.OFFLINE_QUEUE_ENABLED else None
+                )
+                offline.start_offline_sync(_detector)
+    return _detector
+
+
+def _reset_detector():
+    """fork 之后丢弃从父进程继承的检测器（及其数据库连接）"""
+    global _detector, _detector_lock
+    _detector = None
+    _detector_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_detector)
 
 
 @app.route('/')
@@ -47,61 +82,64 @@ def detect_disease():
     返回：
     - JSON格式的检测结果
     """
-    # 检查是否有文件
-    if 'file' not in request.files:
+    # 服务正在退出，不再接收新的检测
+    if inflight.draining:
         return jsonify({
             'status': 'error',
-            'message': '没有上传图片'
-        }), 400
+            'message': '服务正在重启，请稍后重试'
+        }), 503
 
-    file = request.files['file']
-
-    # 检查文件名是否为空
-    if file.filename == '':
+    # 流式接收上传：边接收边校验格式、计算哈希并写盘
+    try:
+        upload = _receive_upload()
+    except UploadError as e:
         return jsonify({
             'status': 'error',
-            'message': '未选择文件'
-        }), 400
+            'message': e.message
+        }), e.status_code
 
-    # 检查文件类型
-    if not Config.allowed_file(file.filename):
-        return jsonify({
-            'status': 'error',
-            'message': f'不支持的文件格式，仅支持: {", ".join(Config.ALLOWED_EXTENSIONS)}'
-        }), 400
+    # 位置与拍摄时间在检测前校验，格式错误时不调用API
+    invalid = field_api.validate_form(upload.fields)
+    if invalid is not None:
+        files.discard_upload(upload.filepath)
+        payload, status = invalid
+        return jsonify(payload), status
 
     # 获取作物类型
-    crop_type = request.form.get('crop_type', '水稻')
-
-    # 保存上传的文件
-    filename = secure_filename(file.filename)
-    unique_filename = f"{uuid.uuid4().hex}_{filename}"
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-    file.save(filepath)
+    crop_type = upload.fields.get('crop_type', '水稻')
+    filename = upload.filename
+    filepath = upload.filepath
 
     try:
-        # 进行检测
-        result = detector.detect(filepath, crop_type)
+        # 进行检测：按优先级与租户排队获取检测槽位
+        with inflight, _detect_slot(upload.fields):
+            result = get_detector().detect(filepath, crop_type, content_hash=upload.sha256)
+        result["image"] = upload.image_info()
+
+        # 读取 EXIF/XMP（仅文件头），未显式提交位置时使用照片自带的GPS与拍摄时间
+        result["metadata"] = extract_metadata(filepath)
+        form = merge_location_hints(upload.fields, result["metadata"])
 
         # 保存结果到results目录
-        result_filename = f"result_{uuid.uuid4().hex}.json"
-        result_filepath = os.path.join(Config.RESULTS_DIR, result_filename)
-        with open(result_filepath, 'w', encoding='utf-8') as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
+        result_filename = responses.save_result(result)
+        offline.attach_provisional(get_detector(), result, result_filename, form, crop_type)
+
+        # 携带 field_id 时写入数字孪生农田档案
+        field_api.record_detection(result, form, crop_type, result_filename)
+
+        # 更新区域病害滑动窗口，必要时发出爆发预警
+        alert_api.observe_detection(result, form, crop_type)
+
+        # 后台预渲染标注缩略图
+        report_api.prerender_thumbnail(result, result_filename)
 
         # 返回结果
-        return jsonify({
-            'status': 'success',
-            'data': {
-                'result': result.get('result'),
-                'mode': result.get('mode'),
-                'details': result.get('details'),
-                'crop_type': crop_type,
-                'image_name': filename,
-                'result_file': result_filename,
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
-        })
+        return jsonify(responses.detect_payload(result, crop_type, filename, result_filename))
+
+    except scheduler.SchedulerRejected as e:
+        files.discard_upload(filepath)
+        payload, status, headers = scheduler.rejection_response(e)
+        return jsonify(payload), status, headers
 
     except Exception as e:
         return jsonify({
@@ -110,26 +148,176 @@ def detect_disease():
         }), 500
 
 
+def _detect_slot(form):
+    """按表单确定优先级与租户，返回检测槽位的上下文管理器（调度关闭时不排队）"""
+    if not Config.SCHEDULER_ENABLED:
+        return nullcontext()
+    priority, tenant = scheduler.request_class(form)
+    return scheduler.get_scheduler().slot(priority, tenant)
+
+
+def _receive_upload() -> StreamingUpload:
+    """
+    分块读取请求体并解析上传文件，不经过 Flask 的整体缓冲
+
+    Returns:
+        StreamingUpload: 解析完成的上传
+
+    Raises:
+        UploadError: 上传不合法
+    """
+    upload = StreamingUpload(parse_boundary(request.content_type))
+    stream = request.stream
+    try:
+        while True:
+            chunk = stream.read(Config.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            upload.feed(chunk)
+    except BaseException:
+        # 客户端中途断开或超出大小限制，清理已写入的临时文件
+        upload.abort()
+        raise
+    upload.close()
+    return upload
+
+
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
     """获取检测统计信息"""
-    stats = detector.get_stats()
-    return jsonify({
-        'status': 'success',
-        'data': stats
-    })
+    stats = get_detector().get_stats()
+    return jsonify(responses.stats_payload(stats))
+
+
+@app.route('/api/stats/series', methods=['GET'])
+def get_stats_series():
+    """获取按分钟/小时分桶的统计时间序列"""
+    payload, status = responses.stats_series_payload(get_detector(), request.args)
+    return jsonify(payload), status
+
+
+@app.route('/api/scheduler', methods=['GET'])
+def get_scheduler_metrics():
+    """获取调度器各优先级类别的排队指标"""
+    return jsonify(scheduler.scheduler_payload())
+
+
+@app.route('/api/fields', methods=['POST'])
+def register_field():
+    """登记或更新田块基础信息"""
+    payload, status = field_api.register_field(request.get_json(silent=True))
+    return jsonify(payload), status
+
+
+@app.route('/api/fields/<field_id>', methods=['GET'])
+def get_field_summary(field_id):
+    """获取田块汇总（病害计数、最高严重程度、趋势）"""
+    payload, status = field_api.field_summary(field_id)
+    return jsonify(payload), status
+
+
+@app.route('/api/fields/<field_id>/history', methods=['GET'])
+def get_field_history(field_id):
+    """获取田块整季历史"""
+    payload, status = field_api.field_history(field_id, request.args)
+    return jsonify(payload), status
+
+
+@app.route('/api/flights/<flight_id>', methods=['GET'])
+def get_flight_diagnosis(flight_id):
+    """获取航次整体诊断（跨帧共识）"""
+    payload, status = field_api.flight_diagnosis(flight_id)
+    return jsonify(payload), status
+
+
+@app.route('/api/fields/<field_id>/recommendations', methods=['GET'])
+def get_field_recommendation(field_id):
+    """按田块（或航次）整体诊断推荐药剂、用量与附近供应商"""
+    payload, status = supply_api.field_recommendation(field_id, request.args)
+    return jsonify(payload), status
+
+
+@app.route('/api/recommendations', methods=['GET'])
+def get_recommendation():
+    """按单次诊断推荐药剂、用量与附近供应商"""
+    payload, status = supply_api.recommend(request.args)
+    return jsonify(payload), status
+
+
+@app.route('/api/recommendations', methods=['POST'])
+def batch_recommendations():
+    """批量推荐（如一个航次的全部检测结果）"""
+    payload, status = supply_api.recommend_batch(request.get_json(silent=True))
+    return jsonify(payload), status
+
+
+@app.route('/api/query', methods=['GET'])
+def spatial_query():
+    """空间查询：矩形范围、半径范围与 k 近邻（检测点或田块）"""
+    payload, status = query_api.spatial_query(request.args)
+    return jsonify(payload), status
+
+
+@app.route('/api/alerts', methods=['GET'])
+def get_alerts():
+    """最近的病害爆发预警与预警引擎指标"""
+    payload, status = alert_api.alerts_payload(request.args)
+    return jsonify(payload), status
+
+
+@app.route('/api/alerts/stream', methods=['GET'])
+def stream_alerts():
+    """SSE 实时推送预警（每个订阅者占用一个工作线程）"""
+    return Response(alert_api.event_stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def _send_artefact(artefact, status):
+    """发送渲染产物（带 ETag，支持 Range 与 304）；未就绪或出错时返回 JSON"""
+    if status != 200:
+        headers = {'Retry-After': str(artefact['retry_after'])} if status == 202 else {}
+        return jsonify(artefact), status, headers
+    return send_file(artefact.path, mimetype=artefact.media_type, conditional=True, etag=artefact.etag)
+
+
+@app.route('/api/results/<filename>/thumbnail', methods=['GET'])
+def get_result_thumbnail(filename):
+    """检测结果的标注缩略图"""
+    return _send_artefact(*report_api.thumbnail(filename, request.args))
+
+
+@app.route('/api/fields/<field_id>/heatmap', methods=['GET'])
+def get_field_heatmap(field_id):
+    """田块病害热力图"""
+    return _send_artefact(*report_api.heatmap(field_id, request.args))
+
+
+@app.route('/api/fields/<field_id>/report', methods=['GET'])
+def get_field_report(field_id):
+    """田块 HTML 报告"""
+    return _send_artefact(*report_api.report(field_id, request.args))
 
 
 @app.route('/results/<filename>')
 def get_result(filename):
-    """获取结果文件"""
-    return send_from_directory(Config.RESULTS_DIR, filename)
+    """获取结果文件（带 ETag 与缓存头，支持 304 与 gzip/brotli；已归档的结果从每日压缩包中读取）"""
+    cached = http_cache.result_response(filename, request.headers)
+    if cached is None:
+        abort(404)
+    status, body, headers = cached
+    return Response(body, status=status, headers=headers)
 
 
 @app.route('/uploads/<filename>')
 def get_upload(filename):
-    """获取上传的图片"""
-    return send_from_directory(Config.UPLOAD_FOLDER, filename)
+    """获取上传的图片（按内容哈希命名，声明 immutable；支持 304 与 Range）"""
+    path = files.uploads.locate(filename)
+    if not path:
+        abort(404)
+    etag, headers = http_cache.upload_cache_headers(filename)
+    response = send_file(path, conditional=True, etag=etag if etag else True)
+    response.headers.update(headers)
+    return response
 
 
 @app.errorhandler(413)
@@ -137,7 +325,7 @@ def request_entity_too_large(error):
     """处理文件过大错误"""
     return jsonify({
         'status': 'error',
-        'message': f'文件过大，最大支持 {Config.MAX_CONTENT_LENGTH // (1024*1024)}MB'
+        'message': responses.too_large_message()
     }), 413
 
 
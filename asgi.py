@@ -0,0 +1,347 @@
+"""
+慧眼巡田 - ASGI Web服务入口
+与 app.py 提供相同的路由和 JSON 结构，处理函数以异步方式等待检测器，
+单个进程即可同时承载大量等待API返回的检测请求
+
+启动方式：
+    uvicorn asgi:app --host 127.0.0.1 --port 5000 --workers 2
+"""
+
+import asyncio
+import os
+import sys
+from contextlib import asynccontextmanager, nullcontext
+
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.config import Config  # noqa: E402
+from src.detectors import HybridDiseaseDetector  # noqa: E402
+from src.server import (  # noqa: E402
+    InFlightTracker, alert_api, field_api, files, http_cache, offline, query_api, report_api, responses, scheduler,
+    supply_api, warm_up
+)
+from src.storage import OfflineQueue, SQLiteStatsStore  # noqa: E402
+from src.utils.metadata import extract_metadata, merge_location_hints  # noqa: E402
+from src.utils.upload import StreamingUpload, UploadError, parse_boundary  # noqa: E402
+
+
+# 每个 worker 进程在 lifespan 启动时创建自己的检测器
+detector = None
+
+# 进行中的检测请求，用于优雅退出时排空
+inflight = InFlightTracker()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """启动时初始化检测器并预热，退出时排空进行中的检测"""
+    global detector
+    Config.init_directories()
+    detector = HybridDiseaseDetector(
+        api_key=Config.QWEN_API_KEY,
+        stats_store=SQLiteStatsStore(Config.STATS_DB_PATH),
+        offline_queue=OfflineQueue() if Config.OFFLINE_QUEUE_ENABLED else None
+    )
+    await asyncio.to_thread(warm_up, detector)
+    sync_worker = offline.start_offline_sync(detector)
+    files.start_retention()
+
+    yield
+
+    await asyncio.to_thread(inflight.drain, Config.SERVER_GRACEFUL_TIMEOUT)
+    if sync_worker is not None:
+        sync_worker.stop()
+    await detector.aclose()
+    report_api.shutdown()
+    # 写入本进程尚未写入共享存储的统计计数
+    await asyncio.to_thread(detector.recorder.stop)
+
+
+async def detect_disease(request):
+    """
+    病害检测API接口
+
+    接收参数：
+    - file: 图片文件
+    - crop_type: 作物类型（可选，默认为水稻）
+
+    返回：
+    - JSON格式的检测结果
+    """
+    # 服务正在退出，不再接收新的检测
+    if inflight.draining:
+        return JSONResponse(responses.error_payload('服务正在重启，请稍后重试'), status_code=503)
+
+    try:
+        content_length = int(request.headers.get('content-length') or 0)
+    except ValueError:
+        return JSONResponse(responses.error_payload('Content-Length 无效'), status_code=400)
+    if content_length > Config.MAX_CONTENT_LENGTH:
+        return JSONResponse(responses.error_payload(responses.too_large_message()), status_code=413)
+
+    # 流式接收上传：边接收边校验格式、计算哈希并写盘
+    upload = StreamingUpload(parse_boundary(request.headers.get('content-type', '')))
+    try:
+        async for chunk in request.stream():
+            upload.feed(chunk)
+        upload.close()
+    except UploadError as e:
+        return JSONResponse(responses.error_payload(e.message), status_code=e.status_code)
+    except BaseException:
+        # 客户端中途断开等情况，清理已写入的临时文件
+        upload.abort()
+        raise
+
+    # 位置与拍摄时间在检测前校验，格式错误时不调用API
+    invalid = field_api.validate_form(upload.fields)
+    if invalid is not None:
+        files.discard_upload(upload.filepath)
+        payload, status = invalid
+        return JSONResponse(payload, status_code=status)
+
+    # 获取作物类型
+    crop_type = upload.fields.get('crop_type', '水稻')
+    filename = upload.filename
+    filepath = upload.filepath
+
+    try:
+        # 进行检测：按优先级与租户排队获取检测槽位
+        with inflight:
+            async with _detect_slot(upload.fields):
+                result = await detector.adetect(filepath, crop_type, content_hash=upload.sha256)
+        result["image"] = upload.image_info()
+
+        # 读取 EXIF/XMP（仅文件头），未显式提交位置时使用照片自带的GPS与拍摄时间
+        result["metadata"] = await asyncio.to_thread(extract_metadata, filepath)
+        form = merge_location_hints(upload.fields, result["metadata"])
+
+        # 保存结果到results目录
+        result_filename = await asyncio.to_thread(responses.save_result, result)
+        await asyncio.to_thread(offline.attach_provisional, detector, result, result_filename, form,
+                                crop_type)
+
+        # 携带 field_id 时写入数字孪生农田档案
+        await asyncio.to_thread(field_api.record_detection, result, form, crop_type, result_filename)
+
+        # 更新区域病害滑动窗口，必要时发出爆发预警
+        await asyncio.to_thread(alert_api.observe_detection, result, form, crop_type)
+
+        # 后台预渲染标注缩略图
+        await asyncio.to_thread(report_api.prerender_thumbnail, result, result_filename)
+
+        # 返回结果
+        return JSONResponse(responses.detect_payload(result, crop_type, filename, result_filename))
+
+    except scheduler.SchedulerRejected as e:
+        files.discard_upload(filepath)
+        payload, status, headers = scheduler.rejection_response(e)
+        return JSONResponse(payload, status_code=status, headers=headers)
+
+    except Exception as e:
+        return JSONResponse(responses.error_payload(f'检测失败: {str(e)}'), status_code=500)
+
+
+def _detect_slot(form):
+    """按表单确定优先级与租户，返回检测槽位的异步上下文管理器（调度关闭时不排队）"""
+    if not Config.SCHEDULER_ENABLED:
+        return nullcontext()
+    priority, tenant = scheduler.request_class(form)
+    # 协程排队不占线程，并发上限与到API的连接数一致
+    return scheduler.get_scheduler(Config.ASYNC_MAX_CONNECTIONS).aslot(priority, tenant)
+
+
+async def get_scheduler_metrics(request):
+    """获取调度器各优先级类别的排队指标"""
+    return JSONResponse(scheduler.scheduler_payload())
+
+
+async def get_stats(request):
+    """获取检测统计信息"""
+    stats = await asyncio.to_thread(detector.get_stats)
+    return JSONResponse(responses.stats_payload(stats))
+
+
+async def get_stats_series(request):
+    """获取按分钟/小时分桶的统计时间序列"""
+    payload, status = await asyncio.to_thread(responses.stats_series_payload, detector, request.query_params)
+    return JSONResponse(payload, status_code=status)
+
+
+async def register_field(request):
+    """登记或更新田块基础信息"""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    payload, status = await asyncio.to_thread(field_api.register_field, data)
+    return JSONResponse(payload, status_code=status)
+
+
+async def get_field_summary(request):
+    """获取田块汇总（病害计数、最高严重程度、趋势）"""
+    payload, status = await asyncio.to_thread(field_api.field_summary, request.path_params['field_id'])
+    return JSONResponse(payload, status_code=status)
+
+
+async def get_field_history(request):
+    """获取田块整季历史"""
+    payload, status = await asyncio.to_thread(
+        field_api.field_history, request.path_params['field_id'], request.query_params
+    )
+    return JSONResponse(payload, status_code=status)
+
+
+async def get_flight_diagnosis(request):
+    """获取航次整体诊断（跨帧共识）"""
+    payload, status = await asyncio.to_thread(field_api.flight_diagnosis, request.path_params['flight_id'])
+    return JSONResponse(payload, status_code=status)
+
+
+async def get_field_recommendation(request):
+    """按田块（或航次）整体诊断推荐药剂、用量与附近供应商"""
+    payload, status = await asyncio.to_thread(
+        supply_api.field_recommendation, request.path_params['field_id'], request.query_params
+    )
+    return JSONResponse(payload, status_code=status)
+
+
+async def get_recommendation(request):
+    """按单次诊断推荐药剂、用量与附近供应商"""
+    payload, status = await asyncio.to_thread(supply_api.recommend, request.query_params)
+    return JSONResponse(payload, status_code=status)
+
+
+async def batch_recommendations(request):
+    """批量推荐（如一个航次的全部检测结果）"""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    payload, status = await asyncio.to_thread(supply_api.recommend_batch, data)
+    return JSONResponse(payload, status_code=status)
+
+
+async def spatial_query(request):
+    """空间查询：矩形范围、半径范围与 k 近邻（检测点或田块）"""
+    payload, status = await asyncio.to_thread(query_api.spatial_query, request.query_params)
+    return JSONResponse(payload, status_code=status)
+
+
+async def get_alerts(request):
+    """最近的病害爆发预警与预警引擎指标"""
+    payload, status = alert_api.alerts_payload(request.query_params)
+    return JSONResponse(payload, status_code=status)
+
+
+async def stream_alerts(request):
+    """SSE 实时推送预警"""
+    async def events():
+        # 在事件循环中等待预警，不占用默认线程池（检测的哈希、质量门控与API调用都在其中执行）
+        subscriber = alert_api.sse_channel.subscribe_async(asyncio.get_running_loop())
+        try:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                try:
+                    alert = await asyncio.wait_for(subscriber.get(), alert_api.SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    alert = None
+                yield alert_api.sse_channel.format_event(alert)
+        finally:
+            alert_api.sse_channel.unsubscribe(subscriber)
+
+    return StreamingResponse(events(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def _send_artefact(request, artefact, status):
+    """发送渲染产物（带 ETag，支持 Range 与 304）；未就绪或出错时返回 JSON"""
+    if status != 200:
+        headers = {'Retry-After': str(artefact['retry_after'])} if status == 202 else None
+        return JSONResponse(artefact, status_code=status, headers=headers)
+    headers = {'ETag': f'"{artefact.etag}"', 'Cache-Control': 'no-cache'}
+    if http_cache.etag_matches(request.headers.get('if-none-match'), artefact.etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(artefact.path, media_type=artefact.media_type, headers=headers)
+
+
+async def get_result_thumbnail(request):
+    """检测结果的标注缩略图"""
+    artefact, status = await asyncio.to_thread(
+        report_api.thumbnail, request.path_params['filename'], request.query_params
+    )
+    return _send_artefact(request, artefact, status)
+
+
+async def get_field_heatmap(request):
+    """田块病害热力图"""
+    artefact, status = await asyncio.to_thread(
+        report_api.heatmap, request.path_params['field_id'], request.query_params
+    )
+    return _send_artefact(request, artefact, status)
+
+
+async def get_field_report(request):
+    """田块 HTML 报告"""
+    artefact, status = await asyncio.to_thread(
+        report_api.report, request.path_params['field_id'], request.query_params
+    )
+    return _send_artefact(request, artefact, status)
+
+
+async def get_result(request):
+    """获取结果文件（带 ETag 与缓存头，支持 304 与 gzip/brotli；已归档的结果从每日压缩包中读取）"""
+    cached = await asyncio.to_thread(http_cache.result_response, request.path_params['filename'], request.headers)
+    if cached is None:
+        raise HTTPException(status_code=404)
+    status, body, headers = cached
+    return Response(body, status_code=status, headers=headers)
+
+
+async def get_upload(request):
+    """获取上传的图片（按内容哈希命名，声明 immutable；支持 304 与 Range）"""
+    filename = request.path_params['filename']
+    path = files.uploads.locate(filename)
+    if not path:
+        raise HTTPException(status_code=404)
+    etag, headers = http_cache.upload_cache_headers(filename)
+    if etag is not None:
+        headers['ETag'] = f'"{etag}"'
+        if http_cache.etag_matches(request.headers.get('if-none-match'), etag):
+            return Response(status_code=304, headers=headers)
+    return FileResponse(path, headers=headers)
+
+
+routes = [
+    Route('/api/detect', detect_disease, methods=['POST']),
+    Route('/api/stats', get_stats, methods=['GET']),
+    Route('/api/stats/series', get_stats_series, methods=['GET']),
+    Route('/api/scheduler', get_scheduler_metrics, methods=['GET']),
+    Route('/api/fields', register_field, methods=['POST']),
+    Route('/api/fields/{field_id}', get_field_summary, methods=['GET']),
+    Route('/api/fields/{field_id}/history', get_field_history, methods=['GET']),
+    Route('/api/fields/{field_id}/heatmap', get_field_heatmap, methods=['GET']),
+    Route('/api/fields/{field_id}/report', get_field_report, methods=['GET']),
+    Route('/api/results/{filename}/thumbnail', get_result_thumbnail, methods=['GET']),
+    Route('/api/fields/{field_id}/recommendations', get_field_recommendation, methods=['GET']),
+    Route('/api/flights/{flight_id}', get_flight_diagnosis, methods=['GET']),
+    Route('/api/recommendations', get_recommendation, methods=['GET']),
+    Route('/api/recommendations', batch_recommendations, methods=['POST']),
+    Route('/api/query', spatial_query, methods=['GET']),
+    Route('/api/alerts', get_alerts, methods=['GET']),
+    Route('/api/alerts/stream', stream_alerts, methods=['GET']),
+    Route('/results/{filename}', get_result),
+    Route('/uploads/{filename}', get_upload),
+]
+
+app = Starlette(routes=routes, lifespan=lifespan)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run('asgi:app', host=Config.HOST, port=Config.PORT, workers=Config.SERVER_WORKERS)
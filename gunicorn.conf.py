@@ -0,0 +1,96 @@
+"""
+gunicorn 配置：预派生多进程 + 线程池，每个 worker 独立的检测器实例
+
+启动方式：
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import os
+import signal
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.config import Config  # noqa: E402
+
+bind = f"{Config.HOST}:{Config.PORT}"
+workers = Config.SERVER_WORKERS
+threads = Config.SERVER_THREADS
+worker_class = "gthread"
+
+# 检测请求可能长时间等待API返回
+timeout = Config.QWEN_TIMEOUT * 3
+graceful_timeout = Config.SERVER_GRACEFUL_TIMEOUT
+
+# 不预加载应用：每个 worker 在 fork 后自行导入并创建检测器
+preload_app = False
+
+
+def on_starting(server):
+    """主进程启动：初始化目录"""
+    Config.init_directories()
+    server.log.info(f"🌾 慧眼巡田生产服务: {workers} workers x {threads} threads")
+
+
+def post_worker_init(worker):
+    """worker 就绪前预热检测器，并在收到 SIGTERM 时立即进入排空状态"""
+    from wsgi import get_detector, inflight
+    from src.server import warm_up
+
+    info = warm_up(get_detector())
+    _drain_on_sigterm(inflight)
+    worker.log.info(f"🔥 worker {worker.pid} 预热完成: {info['warm_up_time']}s")
+
+
+def worker_int(worker):
+    """SIGINT/SIGQUIT 快速退出：不再接收新检测"""
+    from wsgi import inflight
+
+    inflight.start_draining()
+
+
+def worker_abort(worker):
+    """超时被 SIGABRT 终止：不再接收新检测"""
+    from wsgi import inflight
+
+    inflight.start_draining()
+
+
+def worker_exit(server, worker):
+    """worker 退出前等待进行中的检测完成，写入尚未写入的统计计数并关闭渲染进程池"""
+    from src.server import report_api
+    from wsgi import get_detector
+
+    _drain(worker)
+    get_detector().recorder.stop()
+    report_api.shutdown()
+
+
+def _drain_on_sigterm(tracker):
+    """
+    SIGTERM（优雅重启/退出）时先进入排空状态，再交给 gunicorn 原有的处理
+
+    gunicorn 没有 SIGTERM 钩子，worker_exit 要等进行中的请求结束后才调用；
+    在此之前到达的检测请求（如 keep-alive 连接上的后续请求）直接返回 503。
+    """
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def handle(signum, frame):
+        tracker.start_draining()
+        if callable(previous):
+            previous(signum, frame)
+        elif previous == signal.SIG_DFL:
+            signal.signal(signum, previous)
+            os.kill(os.getpid(), signum)
+
+    signal.signal(signal.SIGTERM, handle)
+
+
+def _drain(worker):
+    """进入排空状态，拒绝新检测并等待进行中的检测完成"""
+    from wsgi import inflight
+
+    if inflight.count:
+        worker.log.info(f"⏳ 等待 {inflight.count} 个进行中的检测完成...")
+    if not inflight.drain(Config.SERVER_GRACEFUL_TIMEOUT):
+        worker.log.warning(f"⚠️  排空超时，仍有 {inflight.count} 个检测未完成")
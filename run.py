@@ -4,16 +4,17 @@
 
 import os
 import sys
-from typing import List
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+# 检测器与 requests 在各子命令内按需导入，模拟模式无需加载真实API相关模块
 from src.config import Config
-from src.detectors import HybridDiseaseDetector
 
 
 def main():
     """主测试函数"""
+    from src.detectors import HybridDiseaseDetector
+
     print("=" * 60)
     print("🌾 智慧农业病害检测系统")
     print("=" * 60)
@@ -141,6 +142,7 @@ def test_api_only():
 
     try:
         print("发送测试请求...")
+        import requests
         import urllib3
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -162,21 +164,67 @@ def test_api_only():
         print("  3. 服务器SSL证书问题")
 
 
+def test_mock():
+    """仅使用模拟模式测试：只加载模拟检测器，不创建目录、不模拟API延迟，几十毫秒内完成"""
+    from src.detectors.mock_detector import MockDiseaseDetector
+
+    print("🧪 模拟模式测试...")
+    test_image = os.path.join(Config.TEST_IMAGES_DIR, "test_rice.jpg")
+    if os.path.exists(test_image):
+        result = MockDiseaseDetector(simulate_latency=False).detect(test_image, "水稻")
+        print(result["result"])
+    else:
+        print("❌ 测试图片不存在")
+
+
+def process_video(uri: str, crop_type: str = "水稻"):
+    """
+    视频/帧流检测：自适应抽取新内容的关键帧送检，结果汇总保存到结果目录
+
+    Args:
+        uri: 视频文件、图片目录或视频流地址
+        crop_type: 作物类型
+    """
+    import json
+
+    from src.detectors import HybridDiseaseDetector
+    from src.detectors.result import json_default
+    from src.ingest import FramePipeline, open_source, with_metadata
+
+    Config.init_directories()
+    source = open_source(uri)
+    detector = HybridDiseaseDetector(api_key=Config.QWEN_API_KEY)
+    pipeline = FramePipeline(detector, crop_type)
+
+    print(f"🎬 处理 {uri}（作物: {crop_type}）")
+    detections = []
+    for item in pipeline.run(source):
+        details = item.result.get("details") or {}
+        print(f"  [{item.timestamp:8.1f}s] 帧 {item.frame_index}（{item.reason}）: "
+              f"{details.get('disease', item.result.get('error', '未知'))}")
+        detections.append(item)
+
+    summary = pipeline.summary()
+    print(f"\n📈 共 {summary.get('frames', 0)} 帧，检查 {summary.get('checked', 0)} 帧，"
+          f"送检关键帧 {summary.get('keyframes', 0)} 帧，耗时 {summary.get('elapsed_ms', 0) / 1000:.1f} 秒")
+
+    save_file = os.path.join(Config.RESULTS_DIR, f"video_{source.name}.json")
+    # 航拍图片的 GPS 与拍摄时间随关键帧一起保存
+    detections = sorted(with_metadata(detections), key=lambda item: item["frame_index"])
+    with open(save_file, "w", encoding="utf-8") as f:
+        json.dump({"source": uri, "crop_type": crop_type, "summary": summary, "keyframes": detections},
+                  f, ensure_ascii=False, indent=2, default=json_default)
+    print(f"💾 结果已保存到: {save_file}")
+
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         if sys.argv[1] == "test":
             test_api_only()
         elif sys.argv[1] == "mock":
-            # 仅使用模拟模式测试
-            print("🧪 模拟模式测试...")
-            detector = HybridDiseaseDetector(api_key=None)
-            Config.init_directories()
-            test_image = os.path.join(Config.TEST_IMAGES_DIR, "test_rice.jpg")
-            if os.path.exists(test_image):
-                result = detector.detect(test_image, "水稻", force_mock=True)
-                print(result["result"])
-            else:
-                print("❌ 测试图片不存在")
+            test_mock()
+        elif sys.argv[1] == "video" and len(sys.argv) > 2:
+            process_video(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else "水稻")
         else:
             main()
     else:
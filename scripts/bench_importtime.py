@@ -0,0 +1,128 @@
+"""
+启动耗时回归基准：用 python -X importtime 测量各入口的导入耗时
+
+对每个入口在独立子进程中重复导入，取累计耗时的最小值，并检查不应被加载的重量级模块
+（如模拟模式不应加载 requests/asyncio）。任一入口超出预算或加载了禁用模块时退出码为 1，
+可直接用于 CI。依赖未安装的入口（如缺少 Flask 时的 app）会被跳过。
+
+运行方式：
+    python scripts/bench_importtime.py [--repeat N] [--top N]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 入口模块 -> (累计导入耗时预算（毫秒）, 不应加载的模块)
+TARGETS = {
+    "src.config": (25, ("requests", "asyncio", "numpy")),
+    "src.detectors.mock_detector": (30, ("requests", "asyncio", "numpy")),
+    "src.detectors.hybrid_detector": (40, ("requests", "asyncio", "numpy", "sqlite3", "concurrent.futures")),
+    "src.storage.stats_store": (40, ("requests", "asyncio", "numpy")),
+    "app": (400, ("requests", "numpy")),
+}
+
+# run.py mock 整体运行耗时预算（毫秒，含解释器启动）
+RUN_MOCK_BUDGET_MS = 150
+
+
+def import_profile(module: str = ""):
+    """
+    在子进程中导入模块并解析 -X importtime 输出
+
+    Args:
+        module: 模块名，为空时只测量解释器启动
+
+    Returns:
+        Tuple: (各模块累计耗时（微秒）的字典, 错误信息或None)
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}" if module else "pass"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        last = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "未知错误"
+        return {}, last
+
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cumulative_us)
+    return cumulative, None
+
+
+def bench_module(module: str, repeat: int, top: int, startup: set):
+    """测量一个入口，返回是否通过（startup 为解释器启动时已加载的模块，不列入最慢依赖）"""
+    budget_ms, forbidden = TARGETS[module]
+    best = None
+    for _ in range(repeat):
+        profile, error = import_profile(module)
+        if error:
+            if "ModuleNotFoundError" in error:
+                print(f"⏭️  {module}: 跳过（{error}）")
+                return True
+            print(f"❌ {module}: 导入失败（{error}）")
+            return False
+        if best is None or profile[module] < best[module]:
+            best = profile
+
+    total_ms = best[module] / 1000
+    loaded = [name for name in forbidden if name in best]
+    ok = total_ms <= budget_ms and not loaded
+    print(f"{'✅' if ok else '❌'} {module}: {total_ms:.1f} ms（预算 {budget_ms} ms）")
+    if loaded:
+        print(f"   加载了不应加载的模块: {', '.join(loaded)}")
+    slowest = sorted(((us, name) for name, us in best.items() if name != module and name not in startup
+                      and not name.startswith(module + ".")), reverse=True)[:top]
+    for us, name in slowest:
+        print(f"   {us / 1000:8.1f} ms  {name}")
+    return ok
+
+
+def bench_run_mock(repeat: int):
+    """测量 run.py mock 的整体耗时"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "run.py", "mock"], cwd=ROOT, capture_output=True, text=True)
+        elapsed = (time.perf_counter() - start) * 1000
+        if proc.returncode != 0:
+            print(f"❌ run.py mock: 运行失败\n{proc.stderr[-500:]}")
+            return False
+        best = elapsed if best is None else min(best, elapsed)
+
+    ok = best <= RUN_MOCK_BUDGET_MS
+    print(f"{'✅' if ok else '❌'} run.py mock: {best:.1f} ms（预算 {RUN_MOCK_BUDGET_MS} ms）")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时回归基准")
+    parser.add_argument("--repeat", type=int, default=5, help="每个入口的重复次数（取最小值）")
+    parser.add_argument("--top", type=int, default=5, help="列出最慢的依赖模块数量")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("⏱️  导入耗时基准 (python -X importtime)")
+    print("=" * 60)
+
+    startup = set(import_profile()[0])
+    results = [bench_module(module, args.repeat, args.top, startup) for module in TARGETS]
+    results.append(bench_run_mock(args.repeat))
+
+    print("=" * 60)
+    if all(results):
+        print("✅ 全部通过")
+        return 0
+    print("❌ 存在启动耗时回归")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
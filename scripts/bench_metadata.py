@@ -0,0 +1,103 @@
+"""
+元数据提取基准：验证头部解析每张图片的耗时远低于 1 毫秒
+
+生成带 EXIF(GPS) 与 XMP(云台角度) 的无人机样例 JPEG（附带数 MB 图像数据），
+分别测量单张串行提取与线程池批量提取的耗时。
+
+运行方式：
+    python scripts/bench_metadata.py [图片数量]
+"""
+
+import os
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.metadata import extract_batch, extract_metadata  # noqa: E402
+
+
+def _ifd(entries, data_offset):
+    """按大端序构造 IFD，entries 为 (tag, type, count, bytes)"""
+    body = struct.pack(">H", len(entries))
+    extra = b""
+    extra_offset = data_offset + 2 + len(entries) * 12 + 4
+    for tag, kind, count, value in entries:
+        if len(value) <= 4:
+            body += struct.pack(">HHI", tag, kind, count) + value.ljust(4, b"\x00")
+        else:
+            body += struct.pack(">HHII", tag, kind, count, extra_offset + len(extra))
+            extra += value
+    return body + b"\x00\x00\x00\x00" + extra
+
+
+def _rational(*values):
+    return b"".join(struct.pack(">II", int(v * 10000), 10000) for v in values)
+
+
+def build_sample_jpeg(image_bytes: int = 4 * 1024 * 1024) -> bytes:
+    """构造样例无人机照片"""
+    gps_offset = 200
+    ifd0 = _ifd([
+        (0x010F, 2, 4, b"DJI\x00"),
+        (0x0110, 2, 8, b"FC6310\x00\x00"),
+        (0x0132, 2, 20, b"2024:06:18 10:30:00\x00"),
+        (0x8825, 4, 1, struct.pack(">I", gps_offset)),
+    ], 8)
+    gps = _ifd([
+        (1, 2, 2, b"N\x00"),
+        (2, 5, 3, _rational(30, 15, 36.5)),
+        (3, 2, 2, b"E\x00"),
+        (4, 5, 3, _rational(120, 9, 12.25)),
+        (6, 5, 1, _rational(86.4)),
+    ], gps_offset)
+    tiff = b"MM\x00\x2a" + struct.pack(">I", 8) + ifd0
+    tiff = tiff.ljust(gps_offset, b"\x00") + gps
+    exif = b"Exif\x00\x00" + tiff
+
+    xmp = (
+        b"http://ns.adobe.com/xap/1.0/\x00<x:xmpmeta><rdf:Description "
+        b'drone-dji:RelativeAltitude="+30.20" drone-dji:GimbalPitchDegree="-90.00" '
+        b'drone-dji:GimbalYawDegree="+12.50" drone-dji:FlightYawDegree="+11.80"/></x:xmpmeta>'
+    )
+
+    def segment(marker, payload):
+        return b"\xff" + bytes([marker]) + struct.pack(">H", len(payload) + 2) + payload
+
+    return (b"\xff\xd8" + segment(0xE1, exif) + segment(0xE1, xmp)
+            + segment(0xDB, b"\x00" * 64) + segment(0xDA, b"\x00" * 10)
+            + os.urandom(image_bytes) + b"\xff\xd9")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    sample = build_sample_jpeg()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(count):
+            path = os.path.join(tmp, f"drone_{i:04d}.jpg")
+            with open(path, "wb") as f:
+                f.write(sample)
+            paths.append(path)
+
+        print(f"样例元数据: {extract_metadata(paths[0])}")
+
+        start = time.perf_counter()
+        for path in paths:
+            extract_metadata(path)
+        serial = (time.perf_counter() - start) / count * 1000
+
+        start = time.perf_counter()
+        extract_batch(paths)
+        batch = (time.perf_counter() - start) / count * 1000
+
+    print(f"图片数量: {count}（每张约 {len(sample) / 1024 / 1024:.1f} MB）")
+    print(f"串行提取: {serial:.4f} ms/张")
+    print(f"线程池批量提取: {batch:.4f} ms/张")
+
+
+if __name__ == "__main__":
+    main()
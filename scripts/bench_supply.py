@@ -0,0 +1,87 @@
+"""
+农资推荐基准：验证单次推荐耗时远低于 1 毫秒，并测量整航次批量推荐
+
+随机生成一个省份范围内的合作供应商（服务半径 10~50 公里、随机库存），
+分别测量随机位置的单次推荐与一个航次（同一田块的大量检测结果）的批量推荐。
+
+运行方式：
+    python scripts/bench_supply.py [供应商数量] [查询次数]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.supply import SupplyMatcher, load_catalog  # noqa: E402
+
+# 省级范围（纬度、经度）
+LAT_RANGE = (28.0, 32.0)
+LON_RANGE = (117.0, 122.0)
+DISEASES = ["rice_blast", "rice_sheath_blight", "rice_bacterial_blight", "wheat_scab", "healthy"]
+SEVERITIES = ["轻微", "中等", "严重"]
+
+
+def build_catalog(supplier_count: int, rng: random.Random):
+    catalog = load_catalog(None)
+    product_ids = [product["product_id"] for product in catalog["products"]]
+    catalog["suppliers"] = [
+        {
+            "supplier_id": f"s{i:05d}",
+            "name": f"农资店{i}",
+            "lat": rng.uniform(*LAT_RANGE),
+            "lon": rng.uniform(*LON_RANGE),
+            "service_radius_km": rng.uniform(10, 50),
+            "stock": {product_id: round(rng.uniform(5, 40), 1)
+                      for product_id in rng.sample(product_ids, rng.randint(3, len(product_ids)))}
+        }
+        for i in range(supplier_count)
+    ]
+    return catalog
+
+
+def main():
+    supplier_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    rng = random.Random(42)
+
+    start = time.perf_counter()
+    matcher = SupplyMatcher(build_catalog(supplier_count, rng))
+    print(f"🏗️  构建索引: {supplier_count} 家供应商，{len(matcher._cells)} 个网格，"
+          f"{(time.perf_counter() - start) * 1000:.1f} ms")
+
+    requests = [
+        (rng.choice(DISEASES), rng.choice(SEVERITIES), rng.uniform(5, 200),
+         rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE))
+        for _ in range(queries)
+    ]
+    latencies = []
+    matched = 0
+    for request in requests:
+        start = time.perf_counter()
+        plan = matcher.recommend(*request)
+        latencies.append(time.perf_counter() - start)
+        matched += any(product["suppliers"] for product in plan["products"])
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1e6
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+    print(f"🔍 单次推荐: {queries} 次，p50 {p50:.1f} µs，p99 {p99:.1f} µs，"
+          f"{matched / queries:.0%} 有附近供应商")
+
+    lat, lon = rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)
+    flight = [{"details": {"disease_id": rng.choice(DISEASES), "severity": rng.choice(SEVERITIES)}}
+              for _ in range(5000)]
+    start = time.perf_counter()
+    plans = matcher.recommend_batch(flight, area_mu=120, lat=lat, lon=lon, crop_type="水稻")
+    elapsed = time.perf_counter() - start
+    print(f"🛩️  航次批量推荐: {len(plans)} 条结果，{elapsed * 1000:.2f} ms（{elapsed / len(plans) * 1e6:.2f} µs/条）")
+
+    if p99 >= 1000:
+        print("❌ 单次推荐 p99 超过 1 毫秒")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
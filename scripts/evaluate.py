@@ -0,0 +1,89 @@
+"""
+检测器评估：在标注数据集上并发运行多个检测器配置，输出一张对比表
+
+表中包含准确率、各病害宏平均F1、严重程度准确率、失败数、API调用次数（其中实际调用数）、
+按 token 用量估算的费用与 p50/p99 延迟。真实API响应保存在响应缓存中，
+更换解析逻辑后重新评分不会再产生API费用；--offline 只使用缓存，不调用API；
+--replay 从录制档案（QWEN_ARCHIVE_MODE=record 录制）回放响应，按原始耗时乘以 --time-scale 等待。
+
+配置文件为 JSON 数组，每项如 {"name": "plus", "detector": "qwen", "model": "qwen-vl-plus"}，
+字段见 src/evaluation/harness.py。
+
+运行方式：
+    python scripts/evaluate.py manifest.jsonl [--configs configs.json] [--only mock,cascade]
+                               [--concurrency 8] [--offline | --replay archive.jsonl.gz [--time-scale 0.1]]
+                               [--confusion] [--output report.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import Config  # noqa: E402
+from src.evaluation import DEFAULT_CONFIGS, ResponseCache, load_manifest, run_all, summary_table  # noqa: E402
+from src.detectors.replay import ResponseReplayer  # noqa: E402
+from src.evaluation.harness import class_table, confusion_table, find_config  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在标注数据集上评估检测器配置")
+    parser.add_argument("manifest", help="标注清单（.jsonl / .csv）")
+    parser.add_argument("--configs", help="配置文件（JSON 数组），默认使用内置配置")
+    parser.add_argument("--only", help="只评估指定名称的配置（逗号分隔）")
+    parser.add_argument("--concurrency", type=int, default=8, help="每个配置的并发检测数")
+    parser.add_argument("--offline", action="store_true", help="只使用响应缓存，不调用API")
+    parser.add_argument("--replay", help="从录制档案回放API响应（不联网）")
+    parser.add_argument("--time-scale", type=float, default=Config.QWEN_REPLAY_TIME_SCALE,
+                        help="回放耗时倍率（0 为立即返回）")
+    parser.add_argument("--cache-db", default=Config.EVAL_CACHE_DB_PATH, help="响应缓存数据库路径")
+    parser.add_argument("--confusion", action="store_true", help="输出各配置的混淆矩阵与各病害精确率/召回率")
+    parser.add_argument("--output", help="完整报告写入 JSON 文件")
+    args = parser.parse_args()
+
+    items = load_manifest(args.manifest)
+    if args.configs:
+        with open(args.configs, "r", encoding="utf-8") as f:
+            configs = json.load(f)
+    else:
+        configs = DEFAULT_CONFIGS
+    configs = find_config(configs, args.only.split(",") if args.only else None)
+    if not Config.QWEN_API_KEY and not (args.offline or args.replay):
+        # 没有 API key 时只能评估模拟检测器
+        configs = [config for config in configs if config.get("detector") == "mock"]
+    if not items or not configs:
+        print("⚠️  没有可评估的样本或配置")
+        return
+
+    if args.replay:
+        cache = ResponseReplayer(args.replay, time_scale=args.time_scale)
+        print(f"⏯️  回放 {args.replay}（{len(cache)} 条响应）")
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(args.cache_db)), exist_ok=True)
+        cache = ResponseCache(args.cache_db, offline=args.offline)
+    reports = run_all(items, configs, cache=cache, concurrency=args.concurrency)
+    scored = [report for report in reports if "error" not in report]
+
+    print()
+    print(summary_table(scored))
+    if any(report["unpriced_models"] for report in scored):
+        print("* 含未配置单价的模型（见 MODEL_PRICES），费用未计入")
+    if args.confusion:
+        for report in scored:
+            print(f"\n=== {report['name']} ===")
+            print(class_table(report))
+            print()
+            print(confusion_table(report))
+    source = "回放档案" if args.replay else "响应缓存"
+    print(f"\n📦 {source}: 命中 {cache.hits} 次，{'未命中' if cache.offline else '实际调用'} {cache.misses} 次")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+        print(f"💾 报告已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+"""
+病害爆发预警模块
+"""
+
+from .engine import AlertEngine, SlidingWindowCounter
+from .sinks import FileSink, SSEChannel, WebhookSink
+
+__all__ = [
+    'AlertEngine',
+    'SlidingWindowCounter',
+    'FileSink',
+    'SSEChannel',
+    'WebhookSink'
+]
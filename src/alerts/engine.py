@@ -0,0 +1,278 @@
+"""
+病害爆发预警引擎：按 区域 × 作物 × 病害 维护滑动窗口计数，增量评估预警规则
+
+每条检测结果只更新一个窗口计数器（均摊 O(1)），不回扫历史数据。
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ..config import Config
+from ..detectors.result import is_real_diagnosis
+
+
+class SlidingWindowCounter:
+    """
+    分桶环形滑动窗口计数器
+
+    环形数组保存最近 2N 个桶：最新 N 个桶构成当前窗口，之前 N 个桶构成上一窗口，
+    两个窗口的合计随桶推进增量维护，用于阈值与变化率规则。
+    """
+
+    __slots__ = ("bucket_seconds", "size", "counts", "head", "current", "previous")
+
+    def __init__(self, bucket_seconds: int, window_buckets: int):
+        self.bucket_seconds = bucket_seconds
+        self.size = window_buckets
+        self.counts = [0] * (2 * window_buckets)
+        self.head: Optional[int] = None
+        self.current = 0
+        self.previous = 0
+
+    def _advance(self, bucket: int):
+        """推进到指定桶，逐桶把计数从当前窗口移入上一窗口并淘汰过期桶"""
+        if self.head is None or bucket - self.head >= 2 * self.size:
+            self.counts = [0] * (2 * self.size)
+            self.current = self.previous = 0
+            self.head = bucket
+            return
+
+        ring = 2 * self.size
+        for b in range(self.head + 1, bucket + 1):
+            expired = b % ring
+            self.previous -= self.counts[expired]
+            self.counts[expired] = 0
+            moving = self.counts[(b - self.size) % ring]
+            self.current -= moving
+            self.previous += moving
+        self.head = max(self.head, bucket)
+
+    def add(self, ts: float, amount: int = 1):
+        """
+        计入一次事件
+
+        Args:
+            ts: 事件时间戳（迟到事件落入对应历史桶，超出两个窗口的忽略）
+            amount: 计数
+        """
+        bucket = int(ts // self.bucket_seconds)
+        self._advance(bucket)
+        age = self.head - bucket
+        if age < self.size:
+            self.current += amount
+        elif age < 2 * self.size:
+            self.previous += amount
+        else:
+            return
+        self.counts[bucket % (2 * self.size)] += amount
+
+    def idle(self, ts: float) -> bool:
+        """两个窗口都已过期，可回收"""
+        return self.head is None or int(ts // self.bucket_seconds) - self.head >= 2 * self.size
+
+
+class AlertEngine:
+    """增量预警引擎"""
+
+    # 评估延迟样本数（用于 p50/p99）
+    LATENCY_SAMPLES = 1024
+    # 每处理多少条检测回收一次空闲窗口
+    PRUNE_EVERY = 1000
+
+    def __init__(self, sinks: Sequence = (),
+                 cell_deg: float = Config.ALERT_CELL_DEG,
+                 bucket_seconds: int = Config.ALERT_BUCKET_SECONDS,
+                 window_buckets: int = Config.ALERT_WINDOW_BUCKETS,
+                 count_threshold: int = Config.ALERT_COUNT_THRESHOLD,
+                 growth_ratio: float = Config.ALERT_GROWTH_RATIO,
+                 growth_min_count: int = Config.ALERT_GROWTH_MIN_COUNT,
+                 cooldown: int = Config.ALERT_COOLDOWN):
+        """
+        Args:
+            sinks: 预警输出列表（需实现 emit(alert)）
+            cell_deg: 区域网格大小（度）
+            bucket_seconds: 分桶秒数
+            window_buckets: 窗口桶数
+            count_threshold: 阈值规则的计数阈值
+            growth_ratio: 变化率规则的增长倍数
+            growth_min_count: 变化率规则的最小计数
+            cooldown: 同一组合再次预警的最短间隔（秒）
+        """
+        self.sinks = list(sinks)
+        self.cell_deg = cell_deg
+        self.bucket_seconds = bucket_seconds
+        self.window_buckets = window_buckets
+        self.count_threshold = count_threshold
+        self.growth_ratio = growth_ratio
+        self.growth_min_count = growth_min_count
+        self.cooldown = cooldown
+
+        self._lock = threading.Lock()
+        self._windows: Dict[Tuple[str, str, str], SlidingWindowCounter] = {}
+        self._last_fired: Dict[Tuple[str, str, str], float] = {}
+        self._recent = deque(maxlen=100)
+        self._latencies = deque(maxlen=self.LATENCY_SAMPLES)
+        self._next_id = 0
+        self._metrics = {
+            "evaluations": 0,
+            "counted": 0,
+            "unlocated": 0,
+            "alerts_fired": 0,
+            "sink_errors": 0,
+            "latency_total_ms": 0.0,
+            "latency_max_ms": 0.0
+        }
+
+    def region_for(self, field_id: Optional[str], lat: Optional[float], lon: Optional[float]) -> Optional[str]:
+        """
+        检测所属区域：有位置时取网格编号，否则按田块
+
+        Returns:
+            Optional[str]: 区域编号，无法定位时返回None
+        """
+        if lat is not None and lon is not None:
+            return f"{math.floor(lat / self.cell_deg)}:{math.floor(lon / self.cell_deg)}"
+        if field_id:
+            return f"field:{field_id}"
+        return None
+
+    def observe(self, result: Dict, crop_type: str, field_id: Optional[str] = None,
+                lat: Optional[float] = None, lon: Optional[float] = None,
+                ts: Optional[float] = None) -> List[Dict]:
+        """
+        处理一条检测结果，必要时触发预警
+
+        Args:
+            result: 检测结果
+            crop_type: 作物类型
+            field_id: 田块ID
+            lat: 纬度
+            lon: 经度
+            ts: 拍摄时间戳，默认当前时间
+
+        Returns:
+            List[Dict]: 本次触发的预警
+        """
+        start = time.perf_counter()
+        ts = ts or time.time()
+        details = result.get("details") or {}
+        disease = details.get("disease", "未知")
+        fired = []
+
+        with self._lock:
+            self._metrics["evaluations"] += 1
+            region = self.region_for(field_id, lat, lon)
+            # 模拟与待同步的临时结果是随机病害，不计入窗口，避免误报爆发
+            if is_real_diagnosis(result) and disease not in ("健康", "未知"):
+                if region is None:
+                    self._metrics["unlocated"] += 1
+                else:
+                    self._metrics["counted"] += 1
+                    fired = self._update(region, crop_type, disease, ts, field_id, lat, lon)
+
+            if self._metrics["evaluations"] % self.PRUNE_EVERY == 0:
+                self._prune(ts)
+
+            latency = (time.perf_counter() - start) * 1000
+            self._latencies.append(latency)
+            self._metrics["latency_total_ms"] += latency
+            self._metrics["latency_max_ms"] = max(self._metrics["latency_max_ms"], latency)
+
+        for alert in fired:
+            self._dispatch(alert)
+        return fired
+
+    def _update(self, region: str, crop_type: str, disease: str, ts: float,
+                field_id: Optional[str], lat: Optional[float], lon: Optional[float]) -> List[Dict]:
+        """更新窗口计数并评估规则（调用方持有锁）"""
+        key = (region, crop_type, disease)
+        window = self._windows.get(key)
+        if window is None:
+            window = SlidingWindowCounter(self.bucket_seconds, self.window_buckets)
+            self._windows[key] = window
+        window.add(ts)
+        current, previous = window.current, window.previous
+
+        if ts - self._last_fired.get(key, float("-inf")) < self.cooldown:
+            return []
+
+        rule = None
+        if current >= self.count_threshold:
+            rule = "threshold"
+        elif current >= self.growth_min_count and current >= self.growth_ratio * max(previous, 1):
+            rule = "growth"
+        if rule is None:
+            return []
+
+        self._last_fired[key] = ts
+        self._next_id += 1
+        self._metrics["alerts_fired"] += 1
+        window_hours = self.bucket_seconds * self.window_buckets / 3600
+        if rule == "threshold":
+            message = f"{crop_type}{disease}在 {window_hours:g} 小时内发现 {current} 例，达到预警阈值"
+        else:
+            message = f"{crop_type}{disease}在 {window_hours:g} 小时内发现 {current} 例，较上一周期（{previous} 例）快速上升"
+
+        alert = {
+            "id": self._next_id,
+            "rule": rule,
+            "region": region,
+            "crop_type": crop_type,
+            "disease": disease,
+            "count": current,
+            "previous_count": previous,
+            "window_seconds": self.bucket_seconds * self.window_buckets,
+            "ts": ts,
+            "field_id": field_id,
+            "lat": lat,
+            "lon": lon,
+            "message": message
+        }
+        self._recent.append(alert)
+        return [alert]
+
+    def _prune(self, ts: float):
+        """回收两个窗口都已过期的计数器（调用方持有锁）"""
+        for key in [key for key, window in self._windows.items() if window.idle(ts)]:
+            del self._windows[key]
+            self._last_fired.pop(key, None)
+
+    def _dispatch(self, alert: Dict):
+        """发送预警到各输出，单个输出失败不影响其他输出"""
+        print(f"🚨 病害预警: {alert['message']} (区域 {alert['region']})")
+        for sink in self.sinks:
+            try:
+                sink.emit(alert)
+            except Exception as e:
+                # 多个检测线程可能同时分发预警
+                with self._lock:
+                    self._metrics["sink_errors"] += 1
+                print(f"⚠️  预警输出失败 ({type(sink).__name__}): {e}")
+
+    def recent_alerts(self, limit: int = 20) -> List[Dict]:
+        """最近的预警（新的在前）"""
+        with self._lock:
+            return list(self._recent)[-limit:][::-1]
+
+    def metrics(self) -> Dict:
+        """
+        引擎指标，含评估延迟的平均值、p50、p99 与最大值
+
+        Returns:
+            Dict: 指标
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+            samples = sorted(self._latencies)
+            metrics["active_windows"] = len(self._windows)
+
+        evaluations = metrics["evaluations"]
+        metrics["latency_avg_ms"] = round(metrics.pop("latency_total_ms") / evaluations, 4) if evaluations else 0.0
+        metrics["latency_max_ms"] = round(metrics["latency_max_ms"], 4)
+        if samples:
+            metrics["latency_p50_ms"] = round(samples[len(samples) // 2], 4)
+            metrics["latency_p99_ms"] = round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 4)
+        return metrics
@@ -0,0 +1,139 @@
+"""
+预警输出：Webhook、本地文件、SSE 推送通道
+
+每种输出实现 emit(alert)，可自由组合传给 AlertEngine。
+emit 在检测请求线程中调用，不得阻塞：网络发送交给后台线程。
+"""
+
+import json
+import queue
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+class FileSink:
+    """以 JSON Lines 格式追加写入本地文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, alert: Dict):
+        line = json.dumps(alert, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+class WebhookSink:
+    """通过后台线程 POST 到 Webhook 地址，队列满时丢弃并计数"""
+
+    def __init__(self, url: str, timeout: float = 5.0, max_pending: int = 1000):
+        self.url = url
+        self.timeout = timeout
+        self.dropped = 0
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._loop, name="alert-webhook", daemon=True)
+        self._thread.start()
+
+    def emit(self, alert: Dict):
+        try:
+            self._queue.put_nowait(alert)
+        except queue.Full:
+            self.dropped += 1
+
+    def _loop(self):
+        import requests
+
+        while True:
+            alert = self._queue.get()
+            try:
+                requests.post(self.url, json=alert, timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                print(f"⚠️  预警 Webhook 发送失败: {e}")
+
+
+class SSEChannel:
+    """
+    Server-Sent Events 广播通道：每个订阅者一个有界队列，慢订阅者丢弃消息
+
+    同步订阅者（WSGI 线程）使用 queue.Queue；异步订阅者（ASGI）使用所在事件循环的 asyncio.Queue，
+    由 emit 通过 call_soon_threadsafe 投递，等待消息时不占用线程池中的线程。
+    """
+
+    def __init__(self, max_pending: int = 100):
+        self.max_pending = max_pending
+        self._subscribers: List[queue.Queue] = []
+        self._async_subscribers: List[Tuple] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> queue.Queue:
+        """新增订阅者，返回其消息队列"""
+        subscriber = queue.Queue(maxsize=self.max_pending)
+        with self._lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def subscribe_async(self, loop):
+        """
+        新增异步订阅者
+
+        Args:
+            loop: 订阅者所在的事件循环
+
+        Returns:
+            asyncio.Queue: 消息队列（只能在该事件循环中读取）
+        """
+        import asyncio
+
+        subscriber = asyncio.Queue(maxsize=self.max_pending)
+        with self._lock:
+            self._async_subscribers.append((loop, subscriber))
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """移除订阅者（同步或异步）"""
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+            self._async_subscribers = [entry for entry in self._async_subscribers if entry[1] is not subscriber]
+
+    def emit(self, alert: Dict):
+        with self._lock:
+            subscribers = list(self._subscribers)
+            async_subscribers = list(self._async_subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(alert)
+            except queue.Full:
+                pass
+        for loop, subscriber in async_subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put_async, subscriber, alert)
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
+
+    @staticmethod
+    def _put_async(subscriber, alert: Dict):
+        if not subscriber.full():
+            subscriber.put_nowait(alert)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers) + len(self._async_subscribers)
+
+    @staticmethod
+    def format_event(alert: Optional[Dict]) -> str:
+        """
+        编码为 SSE 消息；alert 为 None 时输出保活注释
+
+        Args:
+            alert: 预警
+
+        Returns:
+            str: SSE 文本
+        """
+        if alert is None:
+            return ": keep-alive\n\n"
+        return f"id: {alert['id']}\nevent: alert\ndata: {json.dumps(alert, ensure_ascii=False)}\n\n"
@@ -2,6 +2,7 @@
 项目配置文件
 """
 
+import json
 import os
 from typing import Optional
 
@@ -15,20 +16,183 @@ class Config:
     QWEN_TIMEOUT: int = 30
 
     # 模型配置
-    MODEL_NAME: str = "qwen-vl-plus"
+    MODEL_NAME: str = os.getenv('QWEN_MODEL_NAME', 'qwen-vl-plus')
     MAX_TOKENS: int = 1500
     TEMPERATURE: float = 0.1
 
+    # 在系统提示词上附加显式缓存标记（cache_control），需模型支持显式上下文缓存
+    PROMPT_CACHE_CONTROL: bool = os.getenv('PROMPT_CACHE_CONTROL', 'false').lower() == 'true'
+
+    # 级联配置：低置信度或结论含糊时升级到更强模型
+    CASCADE_ENABLED: bool = os.getenv('CASCADE_ENABLED', 'false').lower() == 'true'
+    CASCADE_MODEL_NAME: str = os.getenv('CASCADE_MODEL_NAME', 'qwen-vl-max')
+    CASCADE_CONFIDENCE_THRESHOLD: float = float(os.getenv('CASCADE_CONFIDENCE_THRESHOLD', '0.7'))
+
+    # 模型单价（元/千 tokens，[输入, 输出]），用于评估成本；MODEL_PRICES 环境变量（JSON）可覆盖
+    MODEL_PRICES: dict = json.loads(os.getenv(
+        'MODEL_PRICES', '{"qwen-vl-plus": [0.0015, 0.0045], "qwen-vl-max": [0.003, 0.009]}'
+    ))
+    # 命中上下文缓存的输入 token 按原价的该比例计费
+    CACHED_TOKEN_PRICE_RATIO: float = float(os.getenv('CACHED_TOKEN_PRICE_RATIO', '0.4'))
+
+    # 请求合并：内容、作物与提示词版本相同的并发检测只调用一次API
+    COALESCE_ENABLED: bool = os.getenv('COALESCE_ENABLED', 'true').lower() == 'true'
+
+    # 本地预筛配置（跳过明显健康的图像，节省API调用）
+    PRESCREEN_ENABLED: bool = os.getenv('PRESCREEN_ENABLED', 'false').lower() == 'true'
+    PRESCREEN_HEALTHY_THRESHOLD: float = float(os.getenv('PRESCREEN_HEALTHY_THRESHOLD', '0.85'))
+    PRESCREEN_MIN_GREEN_RATIO: float = float(os.getenv('PRESCREEN_MIN_GREEN_RATIO', '0.6'))
+    PRESCREEN_MAX_LESION_RATIO: float = float(os.getenv('PRESCREEN_MAX_LESION_RATIO', '0.03'))
+    PRESCREEN_MAX_TEXTURE: float = float(os.getenv('PRESCREEN_MAX_TEXTURE', '25.0'))
+    PRESCREEN_SIZE: int = 128
+    # 被判定为健康的图像中，仍抽样送API复核的比例（用于统计分歧率）
+    PRESCREEN_AUDIT_RATE: float = float(os.getenv('PRESCREEN_AUDIT_RATE', '0.05'))
+
+    # 图像质量门控（拦截模糊、过暗、过曝的帧，不送API）
+    QUALITY_GATE_ENABLED: bool = os.getenv('QUALITY_GATE_ENABLED', 'false').lower() == 'true'
+    QUALITY_SIZE: int = 384
+    # 拉普拉斯方差低于该值判定为模糊
+    QUALITY_MIN_SHARPNESS: float = float(os.getenv('QUALITY_MIN_SHARPNESS', '50.0'))
+    # 接近纯黑/纯白的像素占比超过该值判定为曝光不足/过度
+    QUALITY_MAX_DARK_RATIO: float = float(os.getenv('QUALITY_MAX_DARK_RATIO', '0.4'))
+    QUALITY_MAX_BRIGHT_RATIO: float = float(os.getenv('QUALITY_MAX_BRIGHT_RATIO', '0.25'))
+
     # 路径配置
     BASE_DIR: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     UPLOAD_DIR: str = os.path.join(BASE_DIR, "uploads")
     RESULTS_DIR: str = os.path.join(BASE_DIR, "results")
     TEST_IMAGES_DIR: str = os.path.join(BASE_DIR, "tests")
+    DATA_DIR: str = os.path.join(BASE_DIR, "data")
+    STATS_DB_PATH: str = os.path.join(DATA_DIR, "stats.db")
+    # 统计计数写入共享存储的间隔（秒），读取时本进程未写入的部分会实时叠加
+    STATS_FLUSH_INTERVAL: float = float(os.getenv('STATS_FLUSH_INTERVAL', '5'))
+
+    # 存储保留策略：过期上传清理、冷结果按日压缩归档（后台线程执行）
+    ARCHIVE_DIR: str = os.path.join(DATA_DIR, "archive")
+    RETENTION_DB_PATH: str = os.path.join(DATA_DIR, "retention.db")
+    RETENTION_ENABLED: bool = os.getenv('RETENTION_ENABLED', 'true').lower() == 'true'
+    RETENTION_INTERVAL: int = int(os.getenv('RETENTION_INTERVAL', '3600'))
+    UPLOAD_MAX_AGE_DAYS: int = int(os.getenv('UPLOAD_MAX_AGE_DAYS', '30'))
+    UPLOAD_MAX_BYTES: int = int(os.getenv('UPLOAD_MAX_BYTES', str(5 * 1024 ** 3)))
+    RESULTS_ARCHIVE_AFTER_DAYS: int = int(os.getenv('RESULTS_ARCHIVE_AFTER_DAYS', '7'))
+    ARCHIVE_MAX_AGE_DAYS: int = int(os.getenv('ARCHIVE_MAX_AGE_DAYS', '365'))
+
+    # 离线存储转发：网络不可用时图片进入本地队列，恢复后批量同步并回填结果
+    OFFLINE_QUEUE_ENABLED: bool = os.getenv('OFFLINE_QUEUE_ENABLED', 'false').lower() == 'true'
+    OFFLINE_QUEUE_DB_PATH: str = os.path.join(DATA_DIR, "offline_queue.db")
+    OFFLINE_SYNC_CONCURRENCY: int = int(os.getenv('OFFLINE_SYNC_CONCURRENCY', '4'))
+    OFFLINE_SYNC_INTERVAL: float = float(os.getenv('OFFLINE_SYNC_INTERVAL', '5'))
+    OFFLINE_SYNC_LEASE: float = 120.0
+    OFFLINE_RETRY_BASE: float = 10.0
+    OFFLINE_RETRY_MAX: float = 600.0
+    OFFLINE_MAX_ATTEMPTS: int = 20
+
+    # 数字孪生农田档案
+    FIELD_ARCHIVE_ENABLED: bool = os.getenv('FIELD_ARCHIVE_ENABLED', 'true').lower() == 'true'
+    FIELD_ARCHIVE_DB_PATH: str = os.path.join(DATA_DIR, "field_archive.db")
+    # 田块级诊断共识每帧对历史证据的衰减系数（约等于只参考最近 1/(1-decay) 帧）
+    CONSENSUS_FIELD_DECAY: float = float(os.getenv('CONSENSUS_FIELD_DECAY', '0.99'))
+
+    # 病害爆发预警
+    ALERTS_ENABLED: bool = os.getenv('ALERTS_ENABLED', 'true').lower() == 'true'
+    # 区域网格大小（度），0.02 度约 2 公里；无位置信息时按田块统计
+    ALERT_CELL_DEG: float = float(os.getenv('ALERT_CELL_DEG', '0.02'))
+    # 滑动窗口 = 分桶秒数 × 桶数
+    ALERT_BUCKET_SECONDS: int = int(os.getenv('ALERT_BUCKET_SECONDS', '3600'))
+    ALERT_WINDOW_BUCKETS: int = int(os.getenv('ALERT_WINDOW_BUCKETS', '24'))
+    # 阈值规则：窗口内病害检测数达到该值
+    ALERT_COUNT_THRESHOLD: int = int(os.getenv('ALERT_COUNT_THRESHOLD', '10'))
+    # 变化率规则：本窗口计数达到上一窗口的该倍数（且不少于最小计数）
+    ALERT_GROWTH_RATIO: float = float(os.getenv('ALERT_GROWTH_RATIO', '3.0'))
+    ALERT_GROWTH_MIN_COUNT: int = int(os.getenv('ALERT_GROWTH_MIN_COUNT', '5'))
+    # 同一区域/作物/病害再次预警的最短间隔（秒）
+    ALERT_COOLDOWN: int = int(os.getenv('ALERT_COOLDOWN', '3600'))
+    # 预警输出：Webhook 地址与本地文件（为空则不启用）
+    ALERT_WEBHOOK_URL: str = os.getenv('ALERT_WEBHOOK_URL', '')
+    ALERT_LOG_PATH: str = os.getenv('ALERT_LOG_PATH', os.path.join(DATA_DIR, "alerts.jsonl"))
+
+    # 评估工具的API响应缓存（重新评分、换解析逻辑时不再调用API）
+    EVAL_CACHE_DB_PATH: str = os.path.join(DATA_DIR, "eval_responses.db")
+
+    # 响应录制/回放：record 把每次API调用的请求指纹与响应追加到压缩档案，
+    # replay 只从档案返回响应（不联网、不产生费用），用于开发、CI 与离线压测
+    QWEN_ARCHIVE_MODE: str = os.getenv('QWEN_ARCHIVE_MODE', '').lower()
+    QWEN_ARCHIVE_PATH: str = os.getenv('QWEN_ARCHIVE_PATH', os.path.join(DATA_DIR, "qwen_responses.jsonl.gz"))
+    # 回放耗时倍率：1 按录制时的耗时等待，0.1 加速十倍，0 立即返回
+    QWEN_REPLAY_TIME_SCALE: float = float(os.getenv('QWEN_REPLAY_TIME_SCALE', '1.0'))
+
+    # 可视化报告：标注缩略图、田块热力图与田块报告，在独立进程池中渲染并按内容哈希缓存
+    REPORT_CACHE_DIR: str = os.path.join(DATA_DIR, "reports")
+    REPORT_WORKERS: int = int(os.getenv('REPORT_WORKERS', '2'))
+    # 请求等待渲染完成的最长时间（秒），超时返回 202，客户端稍后重试
+    REPORT_WAIT_TIMEOUT: float = float(os.getenv('REPORT_WAIT_TIMEOUT', '10'))
+    # 检测完成后在后台预渲染标注缩略图
+    REPORT_PRERENDER: bool = os.getenv('REPORT_PRERENDER', 'true').lower() == 'true'
+    REPORT_THUMBNAIL_SIZE: int = int(os.getenv('REPORT_THUMBNAIL_SIZE', '512'))
+    # 渲染缓存保留天数（按最近一次访问计）
+    REPORT_CACHE_DAYS: int = int(os.getenv('REPORT_CACHE_DAYS', '30'))
+    # 中文字体路径，为空时自动查找常见的系统中文字体
+    REPORT_FONT_PATH: str = os.getenv('REPORT_FONT_PATH', '')
+
+    # 农资推荐：目录文件（成分、商品、合作供应商及服务范围，见 src/supply/catalog.py）
+    SUPPLY_CATALOG_PATH: str = os.getenv('SUPPLY_CATALOG_PATH', os.path.join(DATA_DIR, "supply_catalog.json"))
+    # 供应商服务范围网格索引的格子边长（度，0.1 度约 11 公里）
+    SUPPLY_GRID_DEGREES: float = float(os.getenv('SUPPLY_GRID_DEGREES', '0.1'))
+    # 每个商品最多推荐的供应商数与每次推荐的商品数
+    SUPPLY_MAX_SUPPLIERS: int = int(os.getenv('SUPPLY_MAX_SUPPLIERS', '3'))
+    SUPPLY_MAX_PRODUCTS: int = int(os.getenv('SUPPLY_MAX_PRODUCTS', '3'))
+
+    # 视频/帧流接入：按画面变化自适应抽帧，只有新内容的关键帧送检
+    VIDEO_FRAME_DIR: str = os.path.join(DATA_DIR, "frames")
+    # 帧签名（灰度缩略图）的边长，用于计算画面变化
+    VIDEO_SIGNATURE_SIZE: int = 64
+    # 与上一关键帧的平均灰度差（0~1）达到该值视为新内容
+    VIDEO_NOVELTY_THRESHOLD: float = float(os.getenv('VIDEO_NOVELTY_THRESHOLD', '0.12'))
+    # 与上一关键帧的灰度直方图距离（0~1）达到该值视为场景切换
+    VIDEO_SCENE_THRESHOLD: float = float(os.getenv('VIDEO_SCENE_THRESHOLD', '0.35'))
+    # 关键帧最短间隔与最长间隔（秒，画面长时间不变时也定期送检一帧，0 为不限）
+    VIDEO_MIN_INTERVAL: float = float(os.getenv('VIDEO_MIN_INTERVAL', '0.5'))
+    VIDEO_MAX_INTERVAL: float = float(os.getenv('VIDEO_MAX_INTERVAL', '30'))
+    # 画面静止时逐步拉大检查间隔，最多每隔该帧数检查一帧（跳过的帧不解码）
+    VIDEO_MAX_STRIDE: int = int(os.getenv('VIDEO_MAX_STRIDE', '16'))
+    # 待检测关键帧队列长度与检测线程数（队列满时暂停解码）
+    VIDEO_QUEUE_SIZE: int = int(os.getenv('VIDEO_QUEUE_SIZE', '8'))
+    VIDEO_WORKERS: int = int(os.getenv('VIDEO_WORKERS', '4'))
+
+    # HTTP 缓存：热点结果文件的内存缓存容量（字节）与单个文件上限，小于该字节数的响应不压缩
+    HTTP_CACHE_MAX_BYTES: int = int(os.getenv('HTTP_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+    HTTP_CACHE_MAX_ENTRY_BYTES: int = int(os.getenv('HTTP_CACHE_MAX_ENTRY_BYTES', str(1024 * 1024)))
+    HTTP_COMPRESS_MIN_BYTES: int = int(os.getenv('HTTP_COMPRESS_MIN_BYTES', '1024'))
 
     # 服务器配置
-    HOST: str = "127.0.0.1"
-    PORT: int = 5000
-    DEBUG: bool = True
+    HOST: str = os.getenv('FLASK_HOST', '127.0.0.1')
+    PORT: int = int(os.getenv('FLASK_PORT', '5000'))
+    DEBUG: bool = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
+
+    # 生产服务配置（gunicorn 预派生模式）
+    SERVER_WORKERS: int = int(os.getenv('SERVER_WORKERS', '2'))
+    SERVER_THREADS: int = int(os.getenv('SERVER_THREADS', '8'))
+    # 优雅退出等待时间，需大于单次API调用超时
+    SERVER_GRACEFUL_TIMEOUT: int = int(os.getenv('SERVER_GRACEFUL_TIMEOUT', '60'))
+    # ASGI 模式下单个进程到API的最大并发连接数
+    ASYNC_MAX_CONNECTIONS: int = int(os.getenv('ASYNC_MAX_CONNECTIONS', '200'))
+
+    # 检测调度：优先级（urgent/interactive/bulk）+ 租户加权公平排队 + 准入控制
+    SCHEDULER_ENABLED: bool = os.getenv('SCHEDULER_ENABLED', 'true').lower() == 'true'
+    # 每个进程同时执行的检测数；Flask 需小于线程数，排队才能由调度器而非先到先得决定
+    SCHEDULER_CONCURRENCY: int = int(os.getenv('SCHEDULER_CONCURRENCY', str(max(1, SERVER_THREADS // 2))))
+    # 各优先级允许的最长排队时间（秒），预计等待超过该值时返回 429
+    SCHEDULER_DEADLINES: dict = {
+        'urgent': float(os.getenv('SCHEDULER_URGENT_DEADLINE', '30')),
+        'interactive': float(os.getenv('SCHEDULER_INTERACTIVE_DEADLINE', '20')),
+        'bulk': float(os.getenv('SCHEDULER_BULK_DEADLINE', '600'))
+    }
+    # 租户权重，格式 "farm_a:4,farm_b:2"，未列出的租户权重为 1
+    TENANT_WEIGHTS: dict = {
+        name.strip(): float(weight)
+        for name, _, weight in (item.partition(':') for item in os.getenv('TENANT_WEIGHTS', '').split(','))
+        if name.strip() and weight
+    }
 
     # 允许的图片格式
     ALLOWED_EXTENSIONS: set = {'.jpg', '.jpeg', '.png', '.gif'}
@@ -36,10 +200,13 @@ class Config:
     # 最大文件大小 (16MB)
     MAX_CONTENT_LENGTH: int = 16 * 1024 * 1024
 
+    # 流式上传每次读取的数据块大小 (64KB)
+    UPLOAD_CHUNK_SIZE: int = 64 * 1024
+
     @classmethod
     def init_directories(cls):
         """初始化必要的目录"""
-        dirs = [cls.UPLOAD_DIR, cls.RESULTS_DIR, cls.TEST_IMAGES_DIR]
+        dirs = [cls.UPLOAD_DIR, cls.RESULTS_DIR, cls.TEST_IMAGES_DIR, cls.DATA_DIR]
         for dir_path in dirs:
             if not os.path.exists(dir_path):
                 os.makedirs(dir_path)
@@ -1,13 +1,33 @@
 """
 病害检测器模块
+
+检测器按需导入（PEP 562）：真实API检测器依赖 requests，只使用模拟检测器时不加载
 """
 
-from .mock_detector import MockDiseaseDetector
-from .qwen_detector import QwenDiseaseDetector
-from .hybrid_detector import HybridDiseaseDetector
+import importlib
+
+# 导出名称 -> 所在子模块
+_EXPORTS = {
+    'MockDiseaseDetector': '.mock_detector',
+    'QwenDiseaseDetector': '.qwen_detector',
+    'CascadeQwenDetector': '.cascade_detector',
+    'HybridDiseaseDetector': '.hybrid_detector',
+    'ResponseRecorder': '.replay',
+    'ResponseReplayer': '.replay',
+    'DetectionResult': '.result',
+    'DiseaseDetails': '.result'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
 
-__all__ = [
-    'MockDiseaseDetector',
-    'QwenDiseaseDetector',
-    'HybridDiseaseDetector'
-]
\ No newline at end of file
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
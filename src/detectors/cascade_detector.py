@@ -0,0 +1,147 @@
+"""
+级联检测器：先用低成本模型识别，置信度不足时升级到更强模型
+"""
+
+from typing import Dict, List, Optional
+
+from ..config import Config
+from ..utils.taxonomy import mentioned_diseases
+from .qwen_detector import QwenDiseaseDetector
+from .result import DetectionResult
+
+
+class CascadeQwenDetector:
+    """通义千问级联检测器（qwen-vl-plus → qwen-vl-max）"""
+
+    def __init__(self, api_key: str, base_url: str = Config.QWEN_BASE_URL,
+                 models: Optional[List[str]] = None,
+                 confidence_threshold: Optional[float] = None):
+        models = models or [Config.MODEL_NAME, Config.CASCADE_MODEL_NAME]
+        self.tiers = [QwenDiseaseDetector(api_key, base_url, model=model) for model in models]
+        self.confidence_threshold = (
+            confidence_threshold if confidence_threshold is not None
+            else Config.CASCADE_CONFIDENCE_THRESHOLD
+        )
+
+    def needs_escalation(self, result: DetectionResult, crop_type: Optional[str] = None) -> Optional[str]:
+        """
+        判断结果是否需要升级到下一级模型
+
+        Args:
+            result: 当前级别的检测结果
+            crop_type: 作物类型，用于区分歧义别名（如玉米图片中的"锈病"即玉米锈病）
+
+        Returns:
+            Optional[str]: 升级原因，无需升级返回None
+        """
+        details = result.get("details", {})
+        if details.get("disease") == "未知":
+            return "未识别出病害名称"
+
+        # 按标准病害去重：同一病害的不同叫法（如"大斑病"/"玉米大斑病"）不算含糊
+        mentioned = mentioned_diseases(result.get("result", ""), crop_type)
+        if len(mentioned) > 1:
+            return f"结论含糊，同时提及: {'、'.join(mentioned)}"
+
+        if details.get("confidence", 0.0) < self.confidence_threshold:
+            return f"置信度低于阈值 ({details.get('confidence', 0.0):.2f} < {self.confidence_threshold:.2f})"
+
+        return None
+
+    def detect(self, image_path: str, crop_type: str = "水稻") -> DetectionResult:
+        """
+        按级别依次调用模型，直到结果足够可信或已到最高级
+
+        Args:
+            image_path: 图片路径
+            crop_type: 作物类型
+
+        Returns:
+            DetectionResult: 检测结果，附带 tier（回答的级别，从1开始）与升级记录
+        """
+        state = self._new_state()
+        for tier, detector in enumerate(self.tiers, 1):
+            result = detector.detect(image_path, crop_type)
+            if not self._step(state, tier, detector, result, crop_type):
+                break
+        return self._finish(state)
+
+    async def adetect(self, image_path: str, crop_type: str = "水稻") -> DetectionResult:
+        """
+        detect 的异步版本
+
+        Args:
+            image_path: 图片路径
+            crop_type: 作物类型
+
+        Returns:
+            DetectionResult: 检测结果
+        """
+        state = self._new_state()
+        for tier, detector in enumerate(self.tiers, 1):
+            result = await detector.adetect(image_path, crop_type)
+            if not self._step(state, tier, detector, result, crop_type):
+                break
+        return self._finish(state)
+
+    async def aclose(self):
+        """关闭各级检测器的异步连接池"""
+        for detector in self.tiers:
+            await detector.aclose()
+
+    def _new_state(self) -> Dict:
+        """创建一次级联调用的状态"""
+        return {
+            "answered": None,
+            "failed": None,
+            "escalations": [],
+            "usage": {"prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+        }
+
+    def _step(self, state: Dict, tier: int, detector: QwenDiseaseDetector, result: DetectionResult,
+              crop_type: str) -> bool:
+        """
+        处理某一级的结果
+
+        Returns:
+            bool: 是否继续调用下一级
+        """
+        answered = state["answered"]
+
+        if result["status"] != "success":
+            result["tier"] = tier
+            if answered is None:
+                # 第一级即失败，交由上层回退处理
+                state["failed"] = result
+            else:
+                # 升级调用失败，保留低一级的结论
+                answered["escalation_error"] = result.get("error")
+            return False
+
+        for key in state["usage"]:
+            state["usage"][key] += (result.get("usage") or {}).get(key, 0)
+        result["tier"] = tier
+        state["answered"] = result
+
+        if tier == len(self.tiers):
+            return False
+
+        reason = self.needs_escalation(result, crop_type)
+        if reason is None:
+            return False
+
+        print(f"⬆️  升级到 {self.tiers[tier].model}: {reason}")
+        state["escalations"].append({"from": detector.model, "reason": reason})
+        return True
+
+    def _finish(self, state: Dict) -> DetectionResult:
+        """汇总级联结果"""
+        answered = state["answered"]
+        if answered is None:
+            return state["failed"]
+
+        answered["escalated"] = answered["tier"] > 1
+        answered["escalations"] = state["escalations"]
+        # 用量为所有已调用级别之和
+        answered["usage"] = {**answered.get("usage", {}), **state["usage"]}
+        return answered
@@ -0,0 +1,153 @@
+"""
+请求合并（single-flight）：相同的检测同时进行时只调用一次
+
+技术员重传、多台设备上传同一帧时，会同时发起内容相同的检测。以
+"图片内容哈希 + 作物类型 + 提示词版本" 为键，第一个请求实际执行，
+其余并发的重复请求等待它的结果，不再各自调用API。
+"""
+
+import hashlib
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .prompts import PROMPT_VERSION
+
+# 计算文件哈希时每次读取的字节数
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str) -> Optional[str]:
+    """
+    计算文件内容的 SHA-256
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        Optional[str]: 十六进制摘要，文件不可读时返回None
+    """
+    hasher = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                hasher.update(chunk)
+    except OSError:
+        return None
+    return hasher.hexdigest()
+
+
+def flight_key(content_hash: str, crop_type: str) -> str:
+    """
+    构造合并键：内容相同、作物相同、提示词版本相同的检测结果可共享
+
+    Args:
+        content_hash: 图片内容哈希
+        crop_type: 作物类型
+
+    Returns:
+        str: 合并键
+    """
+    return f"{content_hash}:{crop_type}:{PROMPT_VERSION}"
+
+
+class _Call:
+    """进行中的一次同步调用；concurrent.futures 导入较慢，只用 Event 与两个槽位"""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """按键合并进行中的调用（线程与协程各自维护一张表）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        # 异步调用只在所属事件循环内访问，无需加锁
+        self._acalls: Dict[str, Any] = {}
+
+    def do(self, key: str, func: Callable, *args) -> Tuple[Any, bool]:
+        """
+        执行 func(*args)；同键的调用正在进行时等待其结果
+
+        Args:
+            key: 合并键
+            func: 实际执行的函数
+            *args: 函数参数
+
+        Returns:
+            Tuple[Any, bool]: (结果, 是否为实际执行者)；执行者抛出的异常会传给所有等待者
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, False
+
+        try:
+            call.result = func(*args)
+            return call.result, True
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    async def ado(self, key: str, factory: Callable[[], Awaitable]) -> Tuple[Any, bool]:
+        """
+        do 的异步版本
+
+        Args:
+            key: 合并键
+            factory: 返回协程的函数（只有执行者会调用）
+
+        Returns:
+            Tuple[Any, bool]: (结果, 是否为实际执行者)
+        """
+        import asyncio
+
+        while True:
+            future = self._acalls.get(key)
+            if future is None:
+                break
+            try:
+                # shield：等待者被取消时不影响执行者
+                return await asyncio.shield(future), False
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # 执行者被取消（如客户端断开），由等待者重新发起
+
+        future = asyncio.get_running_loop().create_future()
+        self._acalls[key] = future
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 标记异常已读取，没有等待者时不产生 "never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, True
+        finally:
+            self._acalls.pop(key, None)
+
+    def in_flight(self) -> int:
+        """当前进行中的合并键数量"""
+        return len(self._calls) + len(self._acalls)
@@ -2,34 +2,90 @@
 混合病害检测器：优先使用真实API，失败时使用模拟
 """
 
+import copy
 import json
-from typing import Dict, Optional
+import random
+import time
+from typing import Callable, Dict, Optional, Tuple
 
+from ..config import Config
+from ..storage.stats_recorder import StatsRecorder
+from ..utils.taxonomy import HEALTHY_ID, UNKNOWN_ID
+from .coalescing import SingleFlight, file_sha256, flight_key
 from .mock_detector import MockDiseaseDetector
-from .qwen_detector import QwenDiseaseDetector
+from .result import DetectionResult, DiseaseDetails, json_default
 
 
 class HybridDiseaseDetector:
     """混合病害检测器：优先使用真实API，失败时使用模拟"""
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, prescreen=None, stats_store=None, offline_queue=None,
+                 quality_gate=None):
         self.api_key = api_key
         self.use_real_api = bool(api_key)
 
-        # 初始化两个检测器
-        self.qwen_detector = QwenDiseaseDetector(api_key) if api_key else None
+        # 初始化两个检测器（启用级联时，真实API检测器为级联检测器）
+        # 真实API检测器依赖 requests，仅在配置了 API key 时加载，模拟模式启动更快
+        if not api_key:
+            self.qwen_detector = None
+        elif Config.CASCADE_ENABLED:
+            from .cascade_detector import CascadeQwenDetector
+            self.qwen_detector = CascadeQwenDetector(api_key)
+        else:
+            from .qwen_detector import QwenDiseaseDetector
+            self.qwen_detector = QwenDiseaseDetector(api_key)
         self.mock_detector = MockDiseaseDetector()
 
-        # 统计信息
-        self.stats = {
-            "total_calls": 0,
-            "success_calls": 0,
-            "mock_calls": 0,
-            "api_calls": 0,
-            "avg_response_time": 0
-        }
+        # 本地预筛（可选，依赖 numpy/Pillow，仅在启用时加载）
+        if prescreen is None and Config.PRESCREEN_ENABLED:
+            from .prescreen import PreScreenClassifier
+            prescreen = PreScreenClassifier()
+        self.prescreen = prescreen
+
+        # 图像质量门控（可选）：模糊、过暗、过曝的帧不送API
+        if quality_gate is None and Config.QUALITY_GATE_ENABLED:
+            from .quality import QualityGate
+            quality_gate = QualityGate()
+        self.quality_gate = quality_gate
+
+        # 统计计数：线程本地累加，后台定期写入 stats_store 供跨进程汇总
+        self.stats_store = stats_store
+        self.recorder = StatsRecorder(stats_store)
+
+        # 离线存储转发队列（可选）：网络失败的图片入队，恢复后补做真实检测
+        self.offline_queue = offline_queue
+
+        # 相同图片的并发检测只执行一次，其余等待同一结果
+        self.flights = SingleFlight() if Config.COALESCE_ENABLED else None
+
+    # 统计计数名（未发生过的计数显示为0）
+    STAT_KEYS = (
+        "total_calls",
+        "success_calls",
+        "mock_calls",
+        "api_calls",
+        "coalesced_calls",
+        "response_time_ms",
+        "cascade_escalations",
+        "prompt_tokens",
+        "cached_prompt_tokens",
+        "prescreen_checked",
+        "prescreen_skipped",
+        "prescreen_audited",
+        "prescreen_disagreements",
+        "prescreen_missed_healthy",
+        "quality_checked",
+        "quality_rejected",
+        "offline_queued"
+    )
+
+    @property
+    def stats(self) -> Dict:
+        """本进程的统计计数（跨进程汇总见 get_stats）"""
+        return {**dict.fromkeys(self.STAT_KEYS, 0), **self.recorder.local_totals()}
 
-    def detect(self, image_path: str, crop_type: str = "水稻", force_mock: bool = False) -> Dict:
+    def detect(self, image_path: str, crop_type: str = "水稻", force_mock: bool = False,
+               content_hash: Optional[str] = None) -> DetectionResult:
         """
         病害检测主函数
 
@@ -37,42 +93,396 @@ class HybridDiseaseDetector:
             image_path: 图片路径
             crop_type: 作物类型
             force_mock: 强制使用模拟数据（即使有API key）
+            content_hash: 图片内容的 SHA-256（上传时已计算则传入，否则按需计算）
 
         Returns:
-            Dict: 检测结果字典
+            DetectionResult: 检测结果，timings 为各阶段耗时（毫秒）；
+                与进行中的相同检测合并时附带 coalesced=True
         """
-        self.stats["total_calls"] += 1
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        key = self._flight_key(image_path, crop_type, force_mock, content_hash)
+        if key is None:
+            result = self._detect(image_path, crop_type, force_mock, timings)
+        else:
+            (result, snapshot), leader = self.flights.do(
+                key, self._detect_shared, image_path, crop_type, force_mock, timings
+            )
+            if not leader:
+                result = self._coalesced(snapshot)
+        return self._with_timings(result, timings, start)
+
+    def _flight_key(self, image_path: str, crop_type: str, force_mock: bool,
+                    content_hash: Optional[str]) -> Optional[str]:
+        """计算合并键；强制模拟、未启用合并或文件不可读时返回None（不合并）"""
+        if self.flights is None or force_mock:
+            return None
+        content_hash = content_hash or file_sha256(image_path)
+        return flight_key(content_hash, crop_type) if content_hash else None
+
+    def _detect_shared(self, image_path: str, crop_type: str, force_mock: bool,
+                       timings: Dict[str, float]) -> Tuple[DetectionResult, DetectionResult]:
+        """
+        合并检测的执行者：返回 (结果, 快照)
+
+        快照在结果交还执行者之前深复制，之后不再被修改；执行者随后修改自己的结果
+        （计时、归档字段等）时，等待者不会读到修改到一半的对象。
+        """
+        result = self._detect(image_path, crop_type, force_mock, timings)
+        return result, copy.deepcopy(result)
+
+    async def _adetect_shared(self, image_path: str, crop_type: str, force_mock: bool,
+                              timings: Dict[str, float]) -> Tuple[DetectionResult, DetectionResult]:
+        """_detect_shared 的异步版本"""
+        result = await self._adetect(image_path, crop_type, force_mock, timings)
+        return result, copy.deepcopy(result)
+
+    def _coalesced(self, snapshot: DetectionResult) -> DetectionResult:
+        """等待者拿到执行者结果快照的深复制（多个等待者之间、与执行者之间都不共享嵌套对象）"""
+        self._incr("total_calls")
+        self._incr("coalesced_calls")
+        result = copy.deepcopy(snapshot)
+        result["coalesced"] = True
+        return result
+
+    def _detect(self, image_path: str, crop_type: str, force_mock: bool, timings: Dict[str, float]) -> DetectionResult:
+        """detect 的实现，总耗时由 _with_timings 统一记录"""
+        self._incr("total_calls")
 
         # 强制使用模拟数据
         if force_mock:
             print("🔄 强制使用模拟检测模式")
-            self.stats["mock_calls"] += 1
+            self._incr("mock_calls")
             return self.mock_detector.detect(image_path, crop_type)
 
         # 如果有API key，尝试调用真实API
         if self.use_real_api and self.qwen_detector:
-            print(f"🔗 尝试调用通义千问API...")
-            self.stats["api_calls"] += 1
+            rejected, quality = self._timed(timings, "quality_gate", self._run_quality_gate, image_path, crop_type)
+            if rejected is not None:
+                return rejected
 
-            result = self.qwen_detector.detect(image_path, crop_type)
+            early, screen, audit = self._timed(timings, "prescreen", self._run_prescreen, image_path, crop_type)
+            if early is not None:
+                return early
+
+            # 已知离线：直接入队，不再等待超时
+            if self.offline_queue is not None and self.offline_queue.is_offline():
+                result = DetectionResult.failure("qwen", "网络不可用（离线模式）", retryable=True)
+            else:
+                print(f"🔗 尝试调用通义千问API...")
+                self._incr("api_calls")
+                result = self._timed(timings, "api", self.qwen_detector.detect, image_path, crop_type)
 
             if result["status"] == "success":
-                self.stats["success_calls"] += 1
-                print("✅ API调用成功")
-                return result
+                return self._on_api_success(result, screen, audit, quality)
             else:
                 # API调用失败，回退到模拟
                 print(f"⚠️  API调用失败，使用模拟数据: {result.get('error', '未知错误')}")
-                self.stats["mock_calls"] += 1
+                self._incr("mock_calls")
                 mock_result = self.mock_detector.detect(image_path, crop_type)
                 mock_result["api_error"] = result.get("error")  # 记录API错误信息
-                return mock_result
+                return self._queue_for_sync(mock_result, result, image_path, crop_type)
         else:
             # 没有API key，使用模拟数据
             print("🔌 无API key，使用模拟检测模式")
-            self.stats["mock_calls"] += 1
+            self._incr("mock_calls")
             return self.mock_detector.detect(image_path, crop_type)
 
+    async def adetect(self, image_path: str, crop_type: str = "水稻", force_mock: bool = False,
+                      content_hash: Optional[str] = None) -> DetectionResult:
+        """
+        detect 的异步版本：等待API期间不占用线程，供ASGI服务使用
+
+        Args:
+            image_path: 图片路径
+            crop_type: 作物类型
+            force_mock: 强制使用模拟数据（即使有API key）
+            content_hash: 图片内容的 SHA-256（上传时已计算则传入，否则按需计算）
+
+        Returns:
+            DetectionResult: 检测结果，timings 为各阶段耗时（毫秒）
+        """
+        import asyncio
+
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        if content_hash is None and self.flights is not None and not force_mock:
+            content_hash = await asyncio.to_thread(file_sha256, image_path)
+        key = self._flight_key(image_path, crop_type, force_mock, content_hash)
+        if key is None:
+            result = await self._adetect(image_path, crop_type, force_mock, timings)
+        else:
+            (result, snapshot), leader = await self.flights.ado(
+                key, lambda: self._adetect_shared(image_path, crop_type, force_mock, timings)
+            )
+            if not leader:
+                result = self._coalesced(snapshot)
+        return self._with_timings(result, timings, start)
+
+    async def _adetect(self, image_path: str, crop_type: str, force_mock: bool, timings: Dict[str, float]) -> DetectionResult:
+        """adetect 的实现，分支逻辑与 _detect 保持一致"""
+        import asyncio
+
+        self._incr("total_calls")
+
+        if force_mock:
+            self._incr("mock_calls")
+            return await self.mock_detector.adetect(image_path, crop_type)
+
+        if self.use_real_api and self.qwen_detector:
+            # 质量门控与预筛为CPU计算，放到线程池避免阻塞事件循环
+            rejected, quality = await self._atimed(
+                timings, "quality_gate", asyncio.to_thread(self._run_quality_gate, image_path, crop_type)
+            )
+            if rejected is not None:
+                return rejected
+
+            early, screen, audit = await self._atimed(
+                timings, "prescreen", asyncio.to_thread(self._run_prescreen, image_path, crop_type)
+            )
+            if early is not None:
+                return early
+
+            if self.offline_queue is not None and self.offline_queue.is_offline():
+                result = DetectionResult.failure("qwen", "网络不可用（离线模式）", retryable=True)
+            else:
+                self._incr("api_calls")
+                result = await self._atimed(timings, "api", self.qwen_detector.adetect(image_path, crop_type))
+
+            if result["status"] == "success":
+                return self._on_api_success(result, screen, audit, quality)
+
+            print(f"⚠️  API调用失败，使用模拟数据: {result.get('error', '未知错误')}")
+            self._incr("mock_calls")
+            mock_result = await self.mock_detector.adetect(image_path, crop_type)
+            mock_result["api_error"] = result.get("error")
+            return await asyncio.to_thread(self._queue_for_sync, mock_result, result, image_path, crop_type)
+
+        self._incr("mock_calls")
+        return await self.mock_detector.adetect(image_path, crop_type)
+
+    async def aclose(self):
+        """关闭真实API检测器的异步连接池"""
+        if self.qwen_detector is not None:
+            await self.qwen_detector.aclose()
+
+    @staticmethod
+    def _timed(timings: Dict[str, float], stage: str, func: Callable, *args):
+        """执行一个阶段并记录耗时（毫秒）"""
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            timings[f"{stage}_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+    @staticmethod
+    async def _atimed(timings: Dict[str, float], stage: str, awaitable):
+        """等待一个异步阶段并记录耗时（毫秒）"""
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            timings[f"{stage}_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+    def _with_timings(self, result: DetectionResult, timings: Dict[str, float], start: float) -> DetectionResult:
+        """将各阶段耗时与总耗时附加到结果，并计入平均响应时间"""
+        timings["total_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        result["timings"] = timings
+        self._incr("response_time_ms", timings["total_ms"])
+        return result
+
+    def _run_quality_gate(self, image_path: str, crop_type: str) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """
+        质量门控：不合格的帧直接返回拒绝结果，不调用API
+
+        Returns:
+            Tuple: (拒绝结果或None, 质量评估结果或None)
+        """
+        if self.quality_gate is None:
+            return None, None
+
+        quality = self.quality_gate.assess(image_path)
+        self._incr("quality_checked")
+        if quality["passed"]:
+            return None, quality
+
+        self._incr("quality_rejected")
+        print(f"🚫 图像质量不合格，跳过API调用: {quality['message']}")
+        return self._quality_rejected_result(quality, crop_type), quality
+
+    def _run_prescreen(self, image_path: str, crop_type: str) -> Tuple[Optional[Dict], Optional[Dict], bool]:
+        """
+        本地预筛：明显健康的图像直接返回，不调用API
+
+        Returns:
+            Tuple: (可直接返回的结果或None, 预筛结果或None, 是否为抽样复核)
+        """
+        if self.prescreen is None:
+            return None, None, False
+
+        screen = self.prescreen.classify(image_path)
+        self._incr("prescreen_checked")
+        if screen["label"] != self.prescreen.HEALTHY:
+            return None, screen, False
+
+        if random.random() >= Config.PRESCREEN_AUDIT_RATE:
+            self._incr("prescreen_skipped")
+            print("🌿 预筛判定为健康，跳过API调用")
+            return self._prescreen_result(screen, crop_type), screen, False
+
+        self._incr("prescreen_audited")
+        return None, screen, True
+
+    def _queue_for_sync(self, mock_result: Dict, api_result: Dict, image_path: str, crop_type: str) -> Dict:
+        """
+        网络类失败时将图片加入离线队列，模拟结果标记为临时结果，待同步后被真实结果替换
+
+        Args:
+            mock_result: 回退得到的模拟结果
+            api_result: 失败的API结果
+            image_path: 图片路径
+            crop_type: 作物类型
+
+        Returns:
+            Dict: 模拟结果（入队时附带 provisional 与 queue_id）
+        """
+        if self.offline_queue is None or not api_result.get("retryable"):
+            return mock_result
+
+        queue_id = self.offline_queue.enqueue(image_path, crop_type)
+        self._incr("offline_queued")
+        print(f"📥 已加入离线队列 (#{queue_id})，网络恢复后自动同步")
+        mock_result["provisional"] = True
+        mock_result["queue_id"] = queue_id
+        return mock_result
+
+    def _on_api_success(self, result: Dict, screen: Optional[Dict], audit: bool,
+                        quality: Optional[Dict] = None) -> Dict:
+        """记录API成功调用的统计信息"""
+        self._incr("success_calls")
+        if result.get("escalated"):
+            self._incr("cascade_escalations")
+        usage = result.get("usage") or {}
+        self._incr("prompt_tokens", usage.get("prompt_tokens", 0))
+        self._incr("cached_prompt_tokens", usage.get("cached_tokens", 0))
+        print("✅ API调用成功")
+        if screen is not None:
+            self._record_prescreen_agreement(screen, result, audit)
+            result["prescreen"] = screen
+        if quality is not None:
+            result["quality"] = quality
+        return result
+
+    def _incr(self, key: str, amount: float = 1):
+        """累加统计计数（线程本地，无锁）"""
+        self.recorder.incr(key, amount)
+
+    def _prescreen_result(self, screen: Dict, crop_type: str) -> DetectionResult:
+        """
+        根据预筛结果构造健康检测结果
+
+        Args:
+            screen: 预筛结果字典
+            crop_type: 作物类型
+
+        Returns:
+            DetectionResult: 与其他检测器格式一致的结果
+        """
+        confidence = screen["confidence"]
+        result = f"""
+病害识别：健康
+症状描述：{crop_type}冠层颜色均匀，未见明显病斑
+严重程度：无
+置信度：{confidence:.2%}
+建议措施：保持当前管理
+【本地预筛结果，未调用大模型】"""
+
+        return DetectionResult(
+            "success",
+            mode="prescreen",
+            result=result,
+            details=DiseaseDetails(
+                disease="健康",
+                disease_id=HEALTHY_ID,
+                severity="无",
+                confidence=confidence,
+                solution="保持当前管理",
+                symptoms="冠层颜色均匀，未见明显病斑"
+            ),
+            prescreen=screen
+        )
+
+    def _quality_rejected_result(self, quality: Dict, crop_type: str) -> DetectionResult:
+        """
+        构造质量不合格的结果，status 为 rejected，reason 说明原因
+
+        Args:
+            quality: 质量评估结果
+            crop_type: 作物类型
+
+        Returns:
+            DetectionResult: 与其他检测器格式一致的结果
+        """
+        message = quality["message"]
+        result = f"""
+图像质量不合格：{message}
+建议措施：请重新拍摄清晰、曝光正常的{crop_type}图像
+【质量门控结果，未调用大模型】"""
+
+        return DetectionResult(
+            "rejected",
+            mode="quality_gate",
+            result=result,
+            error=message,
+            details=DiseaseDetails(
+                disease="未知",
+                disease_id=UNKNOWN_ID,
+                severity="无",
+                confidence=0.0,
+                solution="重新拍摄",
+                symptoms=""
+            ),
+            quality=quality,
+            reason=quality["reason"]
+        )
+
+    def _record_prescreen_agreement(self, screen: Dict, result: Dict, audit: bool):
+        """
+        对比预筛结论与大模型结论，更新分歧统计
+
+        Args:
+            screen: 预筛结果字典
+            result: 大模型检测结果
+            audit: 是否为抽样复核（预筛判定健康但仍调用了API）
+        """
+        model_healthy = result.get("details", {}).get("disease") == "健康"
+        if audit and not model_healthy:
+            # 预筛认为健康，大模型发现病害：漏检，需要收紧阈值
+            self._incr("prescreen_disagreements")
+        elif not audit and model_healthy:
+            # 预筛送检，大模型认为健康：可跳过而未跳过，可放宽阈值
+            self._incr("prescreen_missed_healthy")
+
+    def _snapshot_stats(self) -> Dict:
+        """获取统计计数快照：配置了共享存储时返回所有进程的汇总值"""
+        return {**dict.fromkeys(self.STAT_KEYS, 0), **self.recorder.totals()}
+
+    def get_stats_series(self, names=None, resolution: str = "minute",
+                         since: Optional[float] = None, until: Optional[float] = None) -> Dict:
+        """
+        获取按分钟/小时分桶的统计时间序列（所有进程汇总），供看板绘图
+
+        Args:
+            names: 计数名列表，默认全部
+            resolution: "minute" 或 "hour"
+            since: 开始时间戳
+            until: 结束时间戳
+
+        Returns:
+            Dict: 计数名到 [[桶起始时间戳, 值], ...] 的映射
+        """
+        return self.recorder.series(names or self.STAT_KEYS, resolution, since, until)
+
     def get_stats(self) -> Dict:
         """
         获取统计信息
@@ -80,14 +490,41 @@ class HybridDiseaseDetector:
         Returns:
             Dict: 统计信息字典
         """
-        if self.stats["total_calls"] > 0:
-            success_rate = (self.stats["success_calls"] / self.stats["total_calls"]) * 100
+        stats = self._snapshot_stats()
+
+        # 成功率只统计真实API调用，强制模拟与无API key的调用不计入分母
+        if stats["api_calls"] > 0:
+            success_rate = (stats["success_calls"] / stats["api_calls"]) * 100
         else:
             success_rate = 0
+        if stats["total_calls"] > 0:
+            avg_response_time = stats["response_time_ms"] / stats["total_calls"] / 1000
+        else:
+            avg_response_time = 0
+
+        checked = stats["prescreen_checked"]
+        audited = stats["prescreen_audited"]
+        skip_rate = (stats["prescreen_skipped"] / checked) * 100 if checked else 0
+        disagreement_rate = (stats["prescreen_disagreements"] / audited) * 100 if audited else 0
+        quality_checked = stats["quality_checked"]
+        reject_rate = (stats["quality_rejected"] / quality_checked) * 100 if quality_checked else 0
+
+        if stats["success_calls"] > 0:
+            avg_prompt_tokens = stats["prompt_tokens"] / stats["success_calls"]
+        else:
+            avg_prompt_tokens = 0
 
         return {
-            **self.stats,
+            **stats,
             "success_rate": round(success_rate, 2),
+            "avg_response_time": round(avg_response_time, 3),
+            "avg_prompt_tokens": round(avg_prompt_tokens, 1),
+            "prescreen_enabled": self.prescreen is not None,
+            "prescreen_skip_rate": round(skip_rate, 2),
+            "prescreen_disagreement_rate": round(disagreement_rate, 2),
+            "quality_gate_enabled": self.quality_gate is not None,
+            "quality_reject_rate": round(reject_rate, 2),
+            "offline_queue": self.offline_queue.counts() if self.offline_queue is not None else {},
             "api_available": self.use_real_api
         }
 
@@ -104,7 +541,7 @@ class HybridDiseaseDetector:
         """
         try:
             with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(result, f, ensure_ascii=False, indent=2)
+                json.dump(result, f, ensure_ascii=False, indent=2, default=json_default)
             print(f"💾 结果已保存到: {filename}")
             return True
         except Exception as e:
@@ -5,13 +5,20 @@
 import random
 import time
 from datetime import datetime
-from typing import Dict
+
+from ..utils.taxonomy import normalize_disease
+from .result import DetectionResult, DiseaseDetails
 
 
 class MockDiseaseDetector:
     """模拟病害检测器，用于离线测试"""
 
-    def __init__(self):
+    def __init__(self, simulate_latency: bool = True):
+        """
+        Args:
+            simulate_latency: 是否添加 1-2 秒随机延迟模拟API调用
+        """
+        self.simulate_latency = simulate_latency
         self.diseases_db = {
             "水稻": [
                 {"name": "稻瘟病", "symptoms": "叶片有梭形病斑", "solution": "使用三环唑防治"},
@@ -31,7 +38,7 @@ class MockDiseaseDetector:
             ]
         }
 
-    def detect(self, image_path: str, crop_type: str = "水稻") -> Dict:
+    def detect(self, image_path: str, crop_type: str = "水稻") -> DetectionResult:
         """
         模拟检测过程
 
@@ -40,7 +47,40 @@ class MockDiseaseDetector:
             crop_type: 作物类型
 
         Returns:
-            Dict: 检测结果字典
+            DetectionResult: 检测结果
+        """
+        # 添加随机延迟模拟API调用
+        if self.simulate_latency:
+            time.sleep(random.uniform(1, 2))
+        return self._simulate(crop_type)
+
+    async def adetect(self, image_path: str, crop_type: str = "水稻") -> DetectionResult:
+        """
+        异步模拟检测过程（不阻塞事件循环）
+
+        Args:
+            image_path: 图片路径（本检测器不实际读取图片）
+            crop_type: 作物类型
+
+        Returns:
+            DetectionResult: 检测结果
+        """
+        # 事件循环运行时 asyncio 必然已加载，此处导入不增加开销
+        import asyncio
+
+        if self.simulate_latency:
+            await asyncio.sleep(random.uniform(1, 2))
+        return self._simulate(crop_type)
+
+    def _simulate(self, crop_type: str) -> DetectionResult:
+        """
+        随机生成一条模拟检测结果
+
+        Args:
+            crop_type: 作物类型
+
+        Returns:
+            DetectionResult: 检测结果
         """
         # 确保作物类型在数据库中
         if crop_type not in self.diseases_db:
@@ -64,11 +104,10 @@ class MockDiseaseDetector:
             severity = random.choice(["轻微", "中等", "严重"])
             confidence = random.uniform(0.6, 0.9)
 
-        # 添加随机延迟模拟API调用
-        time.sleep(random.uniform(1, 2))
+        disease_id, disease_name = normalize_disease(disease['name'], crop_type)
 
         result = f"""
-病害识别：{disease['name']}
+病害识别：{disease_name}
 症状描述：{disease['symptoms']}
 严重程度：{severity}
 置信度：{confidence:.2%}
@@ -76,15 +115,16 @@ class MockDiseaseDetector:
 检测时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 【注意：此为模拟数据，仅供参考】"""
 
-        return {
-            "status": "success",
-            "mode": "mock",
-            "result": result,
-            "details": {
-                "disease": disease['name'],
-                "severity": severity,
-                "confidence": round(confidence, 4),
-                "solution": disease['solution'],
-                "symptoms": disease['symptoms']
-            }
-        }
\ No newline at end of file
+        return DetectionResult(
+            "success",
+            mode="mock",
+            result=result,
+            details=DiseaseDetails(
+                disease=disease_name,
+                disease_id=disease_id,
+                severity=severity,
+                confidence=round(confidence, 4),
+                solution=disease['solution'],
+                symptoms=disease['symptoms']
+            )
+        )
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+本地预筛分类器：在调用大模型前快速识别明显健康的田间图像
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+
+from ..config import Config
+from ..utils.image import load_thumbnail
+
+
+class PreScreenClassifier:
+    """基于颜色直方图与纹理特征的 CPU 预筛分类器"""
+
+    HEALTHY = "健康"
+    NEEDS_MODEL = "needs_model"
+
+    def __init__(self,
+                 healthy_threshold: Optional[float] = None,
+                 min_green_ratio: Optional[float] = None,
+                 max_lesion_ratio: Optional[float] = None,
+                 max_texture: Optional[float] = None,
+                 size: Optional[int] = None):
+        self.healthy_threshold = healthy_threshold if healthy_threshold is not None else Config.PRESCREEN_HEALTHY_THRESHOLD
+        self.min_green_ratio = min_green_ratio if min_green_ratio is not None else Config.PRESCREEN_MIN_GREEN_RATIO
+        self.max_lesion_ratio = max_lesion_ratio if max_lesion_ratio is not None else Config.PRESCREEN_MAX_LESION_RATIO
+        self.max_texture = max_texture if max_texture is not None else Config.PRESCREEN_MAX_TEXTURE
+        self.size = size or Config.PRESCREEN_SIZE
+
+    def extract_features(self, pixels: np.ndarray) -> Dict[str, float]:
+        """
+        从 RGB 像素数组中提取预筛特征
+
+        Args:
+            pixels: (H, W, 3) 的 float32 像素数组
+
+        Returns:
+            Dict[str, float]: 特征字典
+        """
+        r, g, b = pixels[..., 0], pixels[..., 1], pixels[..., 2]
+        total = r + g + b + 1e-6
+
+        # 超绿指数 (2G-R-B) 判定绿色冠层像素
+        exg = (2.0 * g - r - b) / total
+        green_mask = exg > 0.1
+
+        # 黄褐色病斑像素：红色分量不低于绿色且明显高于蓝色
+        lesion_mask = (r >= g * 0.9) & (r > b * 1.3) & (total > 90)
+
+        # 纹理：绿色通道梯度幅值的标准差（病斑、霉层会带来高频纹理）
+        gy, gx = np.gradient(g)
+        texture = float(np.std(np.hypot(gx, gy)))
+
+        return {
+            "green_ratio": float(green_mask.mean()),
+            "lesion_ratio": float(lesion_mask.mean()),
+            "mean_exg": float(exg.mean()),
+            "texture": texture
+        }
+
+    def score(self, features: Dict[str, float]) -> float:
+        """
+        根据特征计算健康置信度
+
+        Args:
+            features: extract_features 返回的特征字典
+
+        Returns:
+            float: 0-1 之间的健康置信度
+        """
+        green_score = min(features["green_ratio"] / self.min_green_ratio, 1.0)
+        lesion_score = max(1.0 - features["lesion_ratio"] / self.max_lesion_ratio, 0.0)
+        texture_score = max(1.0 - features["texture"] / self.max_texture, 0.0)
+        return green_score * 0.5 + lesion_score * 0.35 + texture_score * 0.15
+
+    def classify(self, image_path: str) -> Dict:
+        """
+        对图片进行预筛
+
+        Args:
+            image_path: 图片路径
+
+        Returns:
+            Dict: 预筛结果，label 为 "健康" 或 "needs_model"
+        """
+        try:
+            pixels = load_thumbnail(image_path, self.size, "RGB")
+        except Exception as e:
+            return {
+                "label": self.NEEDS_MODEL,
+                "confidence": 0.0,
+                "features": {},
+                "error": f"预筛解码失败: {str(e)}"
+            }
+
+        features = self.extract_features(pixels)
+        confidence = self.score(features)
+
+        healthy = (
+            confidence >= self.healthy_threshold
+            and features["green_ratio"] >= self.min_green_ratio
+            and features["lesion_ratio"] <= self.max_lesion_ratio
+        )
+
+        return {
+            "label": self.HEALTHY if healthy else self.NEEDS_MODEL,
+            "confidence": round(confidence, 4),
+            "features": {key: round(value, 4) for key, value in features.items()}
+        }
@@ -0,0 +1,98 @@
+"""
+提示词模板：版本化、按作物预编译，供各检测器共享
+
+系统提示词在所有请求中保持字节级一致并放在消息最前，
+以便命中服务端的上下文（前缀）缓存；作物等可变部分放在最后。
+"""
+
+from functools import lru_cache
+from typing import Dict, List
+
+from ..config import Config
+
+
+# 提示词版本：修改模板内容时必须递增（缓存键、评估结果依赖此版本号）
+PROMPT_VERSION = "v2"
+
+SYSTEM_PROMPT = """你是资深农业植保专家，负责分析田间作物图像中的病虫害。
+按以下格式逐行作答：
+病害名称：主要病害/虫害名称，无病害写"健康"
+症状描述：可见症状
+严重程度：轻微/中等/严重
+置信度：0-100%
+防治建议：具体措施与用药
+紧急程度：低/中/高
+用中文回答，专业、简洁。"""
+
+CROP_TEMPLATE = "作物：{crop_type}。请分析这张田间图像。"
+
+# 启动时预编译的作物
+KNOWN_CROPS = ("水稻", "小麦", "玉米")
+
+
+@lru_cache(maxsize=64)
+def get_crop_prompt(crop_type: str) -> str:
+    """
+    获取作物相关的可变提示词（已缓存）
+
+    Args:
+        crop_type: 作物类型
+
+    Returns:
+        str: 作物提示词
+    """
+    return CROP_TEMPLATE.format(crop_type=crop_type)
+
+
+@lru_cache(maxsize=64)
+def get_full_prompt(crop_type: str) -> str:
+    """
+    获取合并后的单段提示词（用于不支持系统消息的场景）
+
+    Args:
+        crop_type: 作物类型
+
+    Returns:
+        str: 完整提示词
+    """
+    return f"{SYSTEM_PROMPT}\n\n{get_crop_prompt(crop_type)}"
+
+
+def _system_message() -> Dict:
+    """构造系统消息，可选附加显式缓存标记"""
+    content = {"type": "text", "text": SYSTEM_PROMPT}
+    if Config.PROMPT_CACHE_CONTROL:
+        content["cache_control"] = {"type": "ephemeral"}
+    return {"role": "system", "content": [content]}
+
+
+_SYSTEM_MESSAGE = _system_message()
+
+
+def build_messages(crop_type: str, image_url: str) -> List[Dict]:
+    """
+    构造请求消息：稳定的系统消息在前，图片与作物信息在后
+
+    Args:
+        crop_type: 作物类型
+        image_url: 图片URL或 data URI
+
+    Returns:
+        List[Dict]: messages 列表
+    """
+    return [
+        _SYSTEM_MESSAGE,
+        {
+            "role": "user",
+            "content": [
+                {"type": "image_url", "image_url": {"url": image_url}},
+                {"type": "text", "text": get_crop_prompt(crop_type)}
+            ]
+        }
+    ]
+
+
+# 启动时预热常用作物模板
+for _crop in KNOWN_CROPS:
+    get_crop_prompt(_crop)
+    get_full_prompt(_crop)
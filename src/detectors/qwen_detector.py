@@ -3,18 +3,47 @@
 """
 
 import base64
+import hashlib
+import json
 import os
+import threading
 import time
-import requests
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional, Tuple
+
+from ..config import Config
+from ..utils.taxonomy import DISEASES, HEALTHY_ID, find_disease, parse_severity
+from .prompts import PROMPT_VERSION, build_messages, get_full_prompt
+from .result import DetectionResult, DiseaseDetails
+
+
+# 一次API调用的原始结果：(HTTP状态码, 响应JSON（非200为None）, 响应原文, 耗时秒数)
+RawResponse = Tuple[int, Optional[Dict], str, float]
+
+
+def request_fingerprint(payload: Dict) -> str:
+    """
+    请求指纹：模型、消息（含图片内容）与生成参数完全相同的请求指纹相同
+
+    Args:
+        payload: 请求体
+
+    Returns:
+        str: 十六进制 SHA-256
+    """
+    data = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
 
 
 class QwenDiseaseDetector:
     """通义千问真实API检测器"""
 
-    def __init__(self, api_key: str, base_url: str = "https://dashscope.aliyuncs.com/compatible-mode/v1"):
+    # 可识别的病害（标准名称，别名见 utils.taxonomy）
+    DISEASE_KEYWORDS = [entry["name"] for disease_id, entry in DISEASES.items() if disease_id != HEALTHY_ID]
+
+    def __init__(self, api_key: str, base_url: str = Config.QWEN_BASE_URL, model: Optional[str] = None):
         self.api_key = api_key
         self.base_url = base_url
+        self.model = model or Config.MODEL_NAME
         self.endpoint = f"{base_url}/chat/completions"
 
         self.headers = {
@@ -23,7 +52,26 @@ class QwenDiseaseDetector:
         }
 
         # 请求超时设置（秒）
-        self.timeout = 30
+        self.timeout = Config.QWEN_TIMEOUT
+
+        # 提示词 token 用量统计
+        self.usage_stats = {
+            "requests": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "completion_tokens": 0
+        }
+        self._usage_lock = threading.Lock()
+
+        # 异步HTTP客户端（首次异步调用时创建）
+        self._async_client = None
+
+        # 可替换的传输层：transport(payload, send) -> RawResponse，
+        # 可在调用 send 前后缓存、录制或回放响应（见 evaluation.ResponseCache、detectors.replay）
+        self.transport: Optional[Callable[[Dict, Callable[[Dict], RawResponse]], RawResponse]] = None
+        if Config.QWEN_ARCHIVE_MODE:
+            from .replay import archive_transport
+            self.transport = archive_transport()
 
     def encode_image_to_base64(self, image_path: str) -> Optional[str]:
         """
@@ -55,74 +103,120 @@ class QwenDiseaseDetector:
         Returns:
             str: 提示词
         """
-        return f"""你是一位资深农业专家，请分析这张{crop_type}的田间图像。
+        return get_full_prompt(crop_type)
 
-请按以下结构化格式返回病虫害识别结果：
-1. **病害名称**：识别出的主要病害或虫害名称
-2. **症状描述**：详细描述病害症状
-3. **严重程度**：评估严重程度（轻微/中等/严重）
-4. **置信度**：你对识别结果的置信度（0-100%）
-5. **防治建议**：提供具体的防治措施和用药建议
-6. **紧急程度**：处理紧急程度（低/中/高）
-
-如果图像中未发现明显病虫害，请返回作物健康状况。
-
-请用中文回答，确保建议专业、实用。"""
-
-    def detect(self, image_path: str, crop_type: str = "水稻") -> Dict:
+    def _prepare_request(self, image_path: str, crop_type: str) -> Tuple[Optional[Dict], Optional[DetectionResult]]:
         """
-        调用通义千问API进行病害识别
+        检查、编码图片并构造请求体
 
         Args:
             image_path: 图片路径
             crop_type: 作物类型
 
         Returns:
-            Dict: 检测结果字典
+            Tuple[Optional[Dict], Optional[DetectionResult]]: (请求体, 错误结果)，二者必有一个为None
         """
         # 1. 检查图片
         if not os.path.exists(image_path):
-            return {
-                "status": "error",
-                "mode": "qwen",
-                "error": f"图片不存在: {image_path}"
-            }
+            return None, DetectionResult.failure("qwen", f"图片不存在: {image_path}")
 
         # 2. 编码图片
         image_base64 = self.encode_image_to_base64(image_path)
         if not image_base64:
-            return {
-                "status": "error",
-                "mode": "qwen",
-                "error": "图片编码失败"
-            }
-
-        # 3. 准备请求
-        prompt = self.create_prompt(crop_type)
+            return None, DetectionResult.failure("qwen", "图片编码失败")
+
+        # 3. 准备请求（系统提示词固定在前，便于命中前缀缓存）
         payload = {
-            "model": "qwen-vl-plus",
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{image_base64}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            "max_tokens": 1500,
-            "temperature": 0.1  # 较低温度使输出更稳定
+            "model": self.model,
+            "messages": build_messages(crop_type, f"data:image/jpeg;base64,{image_base64}"),
+            "max_tokens": Config.MAX_TOKENS,
+            "temperature": Config.TEMPERATURE  # 较低温度使输出更稳定
         }
+        return payload, None
+
+    def _handle_response(self, status_code: int, body: Optional[Dict], text: str,
+                         elapsed_time: float, crop_type: str) -> DetectionResult:
+        """
+        解析API响应为检测结果
+
+        Args:
+            status_code: HTTP状态码
+            body: 响应JSON（非200时可为None）
+            text: 响应原文
+            elapsed_time: 请求耗时（秒）
+            crop_type: 作物类型
+
+        Returns:
+            DetectionResult: 检测结果
+        """
+        if status_code != 200:
+            return DetectionResult.failure(
+                "qwen", f"API调用失败 ({status_code}): {text[:200]}",
+                response_time=round(elapsed_time, 2),
+                # 限流与服务端错误可稍后重试
+                retryable=status_code == 429 or status_code >= 500
+            )
+
+        if "choices" in body and len(body["choices"]) > 0:
+            answer = body["choices"][0]["message"]["content"]
+
+            # 提取结构化信息
+            details = self._extract_details(answer, crop_type)
+            usage = self._record_usage(body.get("usage") or {})
+
+            return DetectionResult(
+                "success",
+                mode="qwen",
+                model=self.model,
+                result=answer,
+                details=details,
+                usage=usage,
+                response_time=round(elapsed_time, 2),
+                raw_response=body
+            )
+
+        return DetectionResult.failure("qwen", "API返回格式异常", raw_response=body)
+
+    def detect(self, image_path: str, crop_type: str = "水稻") -> DetectionResult:
+        """
+        调用通义千问API进行病害识别
+
+        Args:
+            image_path: 图片路径
+            crop_type: 作物类型
+
+        Returns:
+            DetectionResult: 检测结果
+        """
+        payload, error = self._prepare_request(image_path, crop_type)
+        if error:
+            return error
 
         try:
             print(f"🔍 调用通义千问API分析: {os.path.basename(image_path)}")
-            start_time = time.time()
+            if self.transport is not None:
+                status_code, body, text, elapsed_time = self.transport(payload, self._send)
+            else:
+                status_code, body, text, elapsed_time = self._send(payload)
+            return self._handle_response(status_code, body, text, elapsed_time, crop_type)
+
+        except TimeoutError:
+            return DetectionResult.failure("qwen", f"请求超时 ({self.timeout}秒)", retryable=True)
+        except Exception as e:
+            return DetectionResult.failure("qwen", f"请求异常: {str(e)}", retryable=True)
 
+    def _send(self, payload: Dict) -> RawResponse:
+        """
+        同步发送请求
+
+        Raises:
+            TimeoutError: 请求超时
+        """
+        # requests 导入较慢，首次真实调用时才加载
+        import requests
+
+        start_time = time.time()
+        try:
             # 发送请求（添加verify=False绕过SSL验证）
             response = requests.post(
                 self.endpoint,
@@ -131,97 +225,124 @@ class QwenDiseaseDetector:
                 timeout=self.timeout,
                 verify=False
             )
+        except requests.exceptions.Timeout as e:
+            raise TimeoutError(str(e)) from e
+
+        elapsed_time = time.time() - start_time
+        body = response.json() if response.status_code == 200 else None
+        return response.status_code, body, response.text, elapsed_time
+
+    async def adetect(self, image_path: str, crop_type: str = "水稻") -> DetectionResult:
+        """
+        异步调用通义千问API进行病害识别（供ASGI服务使用）
+
+        Args:
+            image_path: 图片路径
+            crop_type: 作物类型
+
+        Returns:
+            DetectionResult: 检测结果
+        """
+        import asyncio
+        import httpx
+
+        payload, error = await asyncio.to_thread(self._prepare_request, image_path, crop_type)
+        if error:
+            return error
+
+        if self.transport is not None:
+            # 自定义传输层（缓存/回放）为同步接口，在线程中执行
+            try:
+                status_code, body, text, elapsed_time = await asyncio.to_thread(self.transport, payload, self._send)
+                return self._handle_response(status_code, body, text, elapsed_time, crop_type)
+            except TimeoutError:
+                return DetectionResult.failure("qwen", f"请求超时 ({self.timeout}秒)", retryable=True)
+            except Exception as e:
+                return DetectionResult.failure("qwen", f"请求异常: {str(e)}", retryable=True)
+
+        if self._async_client is None:
+            # 连接池在同一事件循环内的所有请求间复用
+            self._async_client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=self.timeout,
+                verify=False,
+                limits=httpx.Limits(max_connections=Config.ASYNC_MAX_CONNECTIONS)
+            )
+
+        try:
+            print(f"🔍 调用通义千问API分析: {os.path.basename(image_path)}")
+            start_time = time.time()
+
+            response = await self._async_client.post(self.endpoint, json=payload)
 
             elapsed_time = time.time() - start_time
+            body = response.json() if response.status_code == 200 else None
+            return self._handle_response(response.status_code, body, response.text, elapsed_time, crop_type)
 
-            if response.status_code == 200:
-                result = response.json()
-
-                if "choices" in result and len(result["choices"]) > 0:
-                    answer = result["choices"][0]["message"]["content"]
-
-                    # 提取结构化信息
-                    details = self._extract_details(answer, crop_type)
-
-                    return {
-                        "status": "success",
-                        "mode": "qwen",
-                        "result": answer,
-                        "details": details,
-                        "response_time": round(elapsed_time, 2),
-                        "raw_response": result
-                    }
-                else:
-                    return {
-                        "status": "error",
-                        "mode": "qwen",
-                        "error": "API返回格式异常",
-                        "raw_response": result
-                    }
-            else:
-                return {
-                    "status": "error",
-                    "mode": "qwen",
-                    "error": f"API调用失败 ({response.status_code}): {response.text[:200]}",
-                    "response_time": round(elapsed_time, 2)
-                }
-
-        except requests.exceptions.Timeout:
-            return {
-                "status": "error",
-                "mode": "qwen",
-                "error": f"请求超时 ({self.timeout}秒)"
-            }
+        except httpx.TimeoutException:
+            return DetectionResult.failure("qwen", f"请求超时 ({self.timeout}秒)", retryable=True)
         except Exception as e:
-            return {
-                "status": "error",
-                "mode": "qwen",
-                "error": f"请求异常: {str(e)}"
-            }
+            return DetectionResult.failure("qwen", f"请求异常: {str(e)}", retryable=True)
+
+    async def aclose(self):
+        """关闭异步HTTP连接池"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
 
-    def _extract_details(self, text: str, crop_type: str) -> Dict:
+    def _record_usage(self, usage: Dict) -> Dict:
         """
-        从API返回文本中提取结构化信息
+        记录单次请求的 token 用量
 
         Args:
-            text: API返回的文本
-            crop_type: 作物类型
+            usage: API返回的 usage 字段
 
         Returns:
-            Dict: 结构化的详细信息
-        """
-        details = {
-            "disease": "未知",
-            "severity": "未知",
-            "confidence": 0.0,
-            "solution": "未知",
-            "symptoms": "未知"
+            Dict: 本次请求的用量摘要
+        """
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+        summary = {
+            "prompt_version": PROMPT_VERSION,
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "cached_tokens": cached,
+            "completion_tokens": usage.get("completion_tokens", 0)
         }
 
-        # 简单关键词提取
-        text_lower = text.lower()
+        with self._usage_lock:
+            self.usage_stats["requests"] += 1
+            self.usage_stats["prompt_tokens"] += summary["prompt_tokens"]
+            self.usage_stats["cached_tokens"] += summary["cached_tokens"]
+            self.usage_stats["completion_tokens"] += summary["completion_tokens"]
+        return summary
+
+    def _extract_details(self, text: str, crop_type: str) -> DiseaseDetails:
+        """
+        从API返回文本中提取结构化信息
+
+        Args:
+            text: API返回的文本
+            crop_type: 作物类型
 
-        # 尝试提取病害名称
-        disease_keywords = ["稻瘟病", "纹枯病", "白叶枯病", "锈病", "赤霉病", "大斑病", "霜霉病", "白粉病"]
-        for disease in disease_keywords:
-            if disease in text:
-                details["disease"] = disease
-                break
+        Returns:
+            DiseaseDetails: 结构化的详细信息
+        """
+        # 病害名称归一为标准ID（长别名优先，歧义别名按作物区分）
+        disease_id, disease = find_disease(text, crop_type)
+        details = DiseaseDetails(disease=disease, disease_id=disease_id)
+        if disease_id == HEALTHY_ID:
+            details.severity = "无"
 
-        # 提取严重程度
-        if "严重" in text:
-            details["severity"] = "严重"
-        elif "中等" in text or "中度" in text:
-            details["severity"] = "中等"
-        elif "轻微" in text or "轻度" in text:
-            details["severity"] = "轻微"
+        # 提取严重程度（读取"严重程度："的取值，而非字段名本身）
+        severity = parse_severity(text)
+        if severity is not None:
+            details.severity = severity
 
         # 提取置信度（如果有百分比）
         import re
         confidence_match = re.search(r'(\d+\.?\d*)%', text)
         if confidence_match:
             try:
-                details["confidence"] = float(confidence_match.group(1)) / 100
+                details.confidence = float(confidence_match.group(1)) / 100
             except:
                 pass
 
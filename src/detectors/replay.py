@@ -0,0 +1,364 @@
+"""
+通义千问响应录制与回放
+
+录制：作为 QwenDiseaseDetector 的传输层，把每次API调用的请求指纹、状态码、
+响应与耗时追加到 gzip 压缩的 JSON Lines 档案（不保存图片，每条记录约数百字节）。
+回放：从档案按请求指纹返回录制的响应，并按原始耗时（或按倍率缩放）等待，
+在无网络的机器上也能确定性地运行、压测与分析整条检测流程。
+
+同一请求录制多次时按录制顺序依次返回（如先限流后成功），用完后循环。
+
+一个档案文件只能有一个写入者：各写入者的 gzip 成员交错后档案无法读出。
+多进程服务（gunicorn 预派生 worker）录制时每个进程写各自的分片（档案名加进程号），
+回放时合并主档案与所有分片，按录制时间排序。
+"""
+
+import atexit
+import glob
+import gzip
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from collections import defaultdict
+from typing import Callable, Dict, Iterator, List, Optional
+
+from ..config import Config
+from .qwen_detector import RawResponse, request_fingerprint
+
+# 请求超时记录为状态码 0，回放时同样抛出 TimeoutError
+TIMEOUT_STATUS = 0
+
+
+def _read_lines(path: str, state: Dict) -> Iterator[bytes]:
+    """
+    逐行解压档案（可包含多个 gzip 成员），遇到损坏或不完整的数据时停止
+
+    Args:
+        path: 档案路径
+        state: 读取结束后 state["complete"] 表示档案是否完整结尾
+    """
+    state["complete"] = False
+    decoder = zlib.decompressobj(wbits=31)
+    fed = False
+    pending = b""
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            while chunk:
+                backup = decoder.copy()
+                try:
+                    pending += decoder.decompress(chunk)
+                except zlib.error:
+                    # 损坏位置之前的记录仍然完整，逐字节解出后停止
+                    *lines, _ = (pending + _decompress_prefix(backup, chunk)).split(b"\n")
+                    yield from (line for line in lines if line)
+                    return
+                fed = True
+                *lines, pending = pending.split(b"\n")
+                yield from (line for line in lines if line)
+                chunk = b""
+                if decoder.eof:
+                    # 下一个 gzip 成员（每次录制追加一个）
+                    chunk = decoder.unused_data
+                    decoder = zlib.decompressobj(wbits=31)
+                    fed = False
+    state["complete"] = not fed and not pending
+
+
+def _decompress_prefix(decoder, data: bytes) -> bytes:
+    """逐字节解压到损坏的数据（或当前 gzip 成员结尾）为止，返回此前解出的内容"""
+    output = []
+    for index in range(len(data)):
+        try:
+            output.append(decoder.decompress(data[index:index + 1]))
+        except zlib.error:
+            break
+        if decoder.eof:
+            break
+    return b"".join(output)
+
+
+def read_archive(path: str) -> Iterator[Dict]:
+    """
+    逐条读取档案记录
+
+    录制进程异常退出时档案末尾不完整，读到完整的最后一条为止。
+
+    Args:
+        path: 档案路径
+
+    Yields:
+        Dict: fingerprint、model、status、elapsed、body、text
+    """
+    for line in _read_lines(path, {}):
+        yield json.loads(line)
+
+
+def _split_archive_name(path: str):
+    """把档案路径拆为 (不含扩展名的路径, 扩展名)，扩展名含 .jsonl.gz 这样的多段后缀"""
+    directory, name = os.path.split(path)
+    stem, dot, suffix = name.partition(".")
+    return os.path.join(directory, stem), dot + suffix
+
+
+def process_archive_path(path: str, pid: Optional[int] = None) -> str:
+    """
+    当前进程的档案分片路径：qwen_responses.jsonl.gz -> qwen_responses.<pid>.jsonl.gz
+
+    Args:
+        path: 档案路径
+        pid: 进程号，默认当前进程
+    """
+    stem, suffix = _split_archive_name(path)
+    return f"{stem}.{pid or os.getpid()}{suffix}"
+
+
+def archive_files(path: str) -> List[str]:
+    """
+    档案及其各进程分片中存在的文件
+
+    Args:
+        path: 档案路径
+
+    Returns:
+        List[str]: 主档案在前，分片按文件名排序
+    """
+    stem, suffix = _split_archive_name(path)
+    pattern = re.compile(re.escape(os.path.basename(stem)) + r"\.\d+" + re.escape(suffix) + "$")
+    shards = sorted(
+        shard for shard in glob.glob(glob.escape(stem) + ".*" + glob.escape(suffix))
+        if pattern.match(os.path.basename(shard))
+    )
+    return ([path] if os.path.exists(path) else []) + shards
+
+
+def read_archives(path: str) -> List[Dict]:
+    """
+    读取档案及其各进程分片的全部记录，按录制时间排序（同一分片内保持写入顺序）
+
+    Args:
+        path: 档案路径
+
+    Returns:
+        List[Dict]: 记录列表
+    """
+    records = [record for archive in archive_files(path) for record in read_archive(archive)]
+    # 早期档案的记录没有录制时间，排在最前并保持原顺序
+    records.sort(key=lambda record: record.get("ts", 0))
+    return records
+
+
+def _repair(path: str):
+    """录制前修复上次异常退出留下的不完整档案，否则之后追加的记录无法读出"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    state = {}
+    lines = list(_read_lines(path, state))
+    if state["complete"]:
+        return
+    temp_path = f"{path}.tmp"
+    with gzip.open(temp_path, "wb") as f:
+        f.writelines(line + b"\n" for line in lines)
+    os.replace(temp_path, path)
+    print(f"⚠️  档案末尾不完整，已保留 {len(lines)} 条完整记录: {path}")
+
+
+class ResponseRecorder:
+    """
+    录制传输层：调用API并把结果追加到档案
+
+    同一档案同时只能由一个录制器写入（多进程时使用 process_archive_path 分片）。
+    """
+
+    def __init__(self, path: str = Config.QWEN_ARCHIVE_PATH):
+        """
+        Args:
+            path: 档案路径（已存在时追加）
+        """
+        self.path = path
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        _repair(path)
+        # 每次打开追加一个新的 gzip 成员，本次录制的记录共享压缩字典
+        self._file = gzip.open(path, "ab")
+
+    def _append(self, record: Dict):
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None or os.getpid() != self._pid:
+                return
+            self._file.write(line.encode("utf-8"))
+            # 同步刷新：进程被杀时已写入的记录仍可读出
+            self._file.flush(zlib.Z_SYNC_FLUSH)
+            self.recorded += 1
+
+    def __call__(self, payload: Dict, send: Callable[[Dict], RawResponse]) -> RawResponse:
+        """
+        传输层入口：调用 send 并录制结果（超时同样录制后再抛出）
+
+        Args:
+            payload: 请求体
+            send: 实际发送请求的函数
+
+        Returns:
+            RawResponse: send 的返回值
+        """
+        start = time.time()
+        record = {"fingerprint": request_fingerprint(payload), "model": payload.get("model", ""), "ts": start}
+        try:
+            status_code, body, text, elapsed = send(payload)
+        except TimeoutError:
+            self._append({**record, "status": TIMEOUT_STATUS, "elapsed": time.time() - start,
+                          "body": None, "text": ""})
+            raise
+
+        # 成功响应的原文可由 body 还原，不重复保存
+        self._append({**record, "status": status_code, "elapsed": elapsed, "body": body,
+                      "text": "" if status_code == 200 else text})
+        return status_code, body, text, elapsed
+
+    def close(self):
+        """写入 gzip 结尾并关闭档案（fork 出的子进程中不写入，档案归父进程所有）"""
+        with self._lock:
+            if self._file is not None and os.getpid() == self._pid:
+                self._file.close()
+            self._file = None
+
+    def detach(self):
+        """
+        fork 出的子进程放弃继承的档案句柄：既不写入记录也不写 gzip 结尾
+
+        GzipFile 被回收时会写入结尾，先断开其底层文件，避免子进程退出时破坏父进程正在写的档案。
+        """
+        self._lock = threading.Lock()
+        if self._file is not None:
+            self._file.fileobj = None
+            self._file = None
+
+
+class ResponseReplayer:
+    """回放传输层：只从档案返回响应，从不调用API"""
+
+    # 与 ResponseCache 的离线模式一致：未命中的请求不会发出
+    offline = True
+
+    def __init__(self, path: str = Config.QWEN_ARCHIVE_PATH,
+                 time_scale: float = Config.QWEN_REPLAY_TIME_SCALE):
+        """
+        Args:
+            path: 档案路径（同时读取各进程录制的分片）
+            time_scale: 耗时倍率（1 为原始耗时，0 为立即返回）
+        """
+        self.path = path
+        self.time_scale = time_scale
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._cursors: Dict[str, int] = defaultdict(int)
+
+        # 响应体保持为 JSON 文本，回放时解析，每次返回独立的对象
+        self._records: Dict[str, List[tuple]] = defaultdict(list)
+        for record in read_archives(path):
+            body = record.get("body")
+            self._records[record["fingerprint"]].append((
+                record["status"],
+                json.dumps(body, ensure_ascii=False) if body is not None else None,
+                record.get("text", ""),
+                record["elapsed"]
+            ))
+
+    def __len__(self) -> int:
+        return sum(len(records) for records in self._records.values())
+
+    def lookup(self, fingerprint: str) -> Optional[tuple]:
+        """按录制顺序取出该请求的下一条记录"""
+        with self._lock:
+            records = self._records.get(fingerprint)
+            if not records:
+                self.misses += 1
+                return None
+            self.hits += 1
+            index = self._cursors[fingerprint]
+            self._cursors[fingerprint] = index + 1
+        return records[index % len(records)]
+
+    def __call__(self, payload: Dict, send: Callable[[Dict], RawResponse]) -> RawResponse:
+        """
+        传输层入口：返回录制的响应（send 不会被调用）
+
+        Args:
+            payload: 请求体
+            send: 实际发送请求的函数（忽略）
+
+        Returns:
+            RawResponse: 录制的响应，耗时为按倍率缩放后的耗时；未录制的请求返回 404
+
+        Raises:
+            TimeoutError: 录制时该请求超时
+        """
+        record = self.lookup(request_fingerprint(payload))
+        if record is None:
+            return 404, None, "回放模式：档案中没有该请求", 0.0
+
+        status_code, body_text, text, elapsed = record
+        elapsed *= self.time_scale
+        if elapsed > 0:
+            time.sleep(elapsed)
+        if status_code == TIMEOUT_STATUS:
+            raise TimeoutError(f"回放录制的超时（{elapsed:.1f}秒）")
+        body = json.loads(body_text) if body_text is not None else None
+        return status_code, body, body_text if status_code == 200 else text, elapsed
+
+
+_archive_transport = None
+_archive_lock = threading.Lock()
+
+
+def archive_transport():
+    """
+    按 QWEN_ARCHIVE_MODE 创建进程内共享的录制或回放传输层
+
+    同一进程内所有检测器（含级联的各级）共用一个实例；录制时每个进程写各自的分片
+    （见 process_archive_path），多个 worker 不会交错追加同一文件。
+
+    Returns:
+        ResponseRecorder / ResponseReplayer，未启用时返回 None
+
+    Raises:
+        ValueError: 未知的模式
+    """
+    global _archive_transport
+    mode = Config.QWEN_ARCHIVE_MODE
+    if not mode:
+        return None
+    with _archive_lock:
+        if _archive_transport is None:
+            if mode == "record":
+                _archive_transport = ResponseRecorder(process_archive_path(Config.QWEN_ARCHIVE_PATH))
+                atexit.register(_archive_transport.close)
+                print(f"⏺️  录制API响应到 {_archive_transport.path}")
+            elif mode == "replay":
+                _archive_transport = ResponseReplayer(Config.QWEN_ARCHIVE_PATH)
+                print(f"⏯️  回放API响应: {Config.QWEN_ARCHIVE_PATH}（{len(_archive_transport)} 条，"
+                      f"耗时倍率 {_archive_transport.time_scale}）")
+            else:
+                raise ValueError(f"未知的 QWEN_ARCHIVE_MODE: {mode}（可选 record / replay）")
+        return _archive_transport
+
+
+def _reset_after_fork():
+    """子进程不沿用父进程的录制器（其档案归父进程），首次使用时按自己的进程号重新创建"""
+    global _archive_transport, _archive_lock
+    if isinstance(_archive_transport, ResponseRecorder):
+        _archive_transport.detach()
+    _archive_transport = None
+    _archive_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,209 @@
+"""
+检测结果模型：DetectionResult / DiseaseDetails
+
+所有检测器返回同一种结果对象。声明字段存放在 __slots__ 中（无实例 __dict__），
+比逐次构造的嵌套字典占用更少内存；同时实现 MutableMapping 接口，
+result["status"]、result.get("details")、result["timings"] = ... 等既有写法保持不变。
+值为 None 的声明字段视为不存在（与原先省略该键的字典一致）；
+未声明的键（如 raw_response、tier、queue_id）存放在按需创建的 extra 字典中。
+"""
+
+import json
+from collections.abc import MutableMapping
+from operator import attrgetter
+from typing import Any, Dict, Iterator, Optional
+
+
+# 所有结果记录类型；按 type 精确判断，比对 ABC 子类做 isinstance 快得多
+_RECORD_TYPES = set()
+
+
+class _SlotRecord(MutableMapping):
+    """基于 __slots__ 的记录，提供与字典兼容的访问方式"""
+
+    __slots__ = ("extra",)
+
+    # 声明字段（由 __init_subclass__ 根据子类的 __slots__ 生成），按该顺序输出
+    FIELDS: tuple = ()
+    _field_set: frozenset = frozenset()
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._field_set:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        elif self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key in self._field_set:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __delitem__(self, key: str):
+        if key in self._field_set and getattr(self, key) is not None:
+            setattr(self, key, None)
+        elif self.extra is not None and key in self.extra:
+            del self.extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for name in self.FIELDS:
+            if getattr(self, name) is not None:
+                yield name
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        count = sum(1 for name in self.FIELDS if getattr(self, name) is not None)
+        return count + (len(self.extra) if self.extra else 0)
+
+    def __contains__(self, key: object) -> bool:
+        if key in self._field_set:
+            return getattr(self, key) is not None
+        return self.extra is not None and key in self.extra
+
+    def get(self, key: str, default: Any = None) -> Any:
+        # 热路径：避免 Mapping.get 的异常开销
+        if key in self._field_set:
+            value = getattr(self, key)
+            return default if value is None else value
+        if self.extra is not None:
+            return self.extra.get(key, default)
+        return default
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        转换为普通字典（嵌套的结果对象一并转换）
+
+        Returns:
+            Dict[str, Any]: 可直接序列化为 JSON 的字典
+        """
+        data = {name: value.to_dict() if type(value) in _RECORD_TYPES else value
+                for name, value in zip(self.FIELDS, self._values(self)) if value is not None}
+        if self.extra:
+            for key, value in self.extra.items():
+                data[key] = value.to_dict() if type(value) in _RECORD_TYPES else value
+        return data
+
+    def copy(self):
+        """浅复制（嵌套的结果对象同样复制一层），修改副本不影响原结果"""
+        clone = type(self).__new__(type(self))
+        for name, value in zip(self.FIELDS, self._values(self)):
+            setattr(clone, name, value.copy() if type(value) in _RECORD_TYPES else value)
+        clone.extra = dict(self.extra) if self.extra else None
+        return clone
+
+    def to_json(self, indent: Optional[int] = None) -> str:
+        """
+        序列化为 JSON 字符串（保留中文）
+
+        Args:
+            indent: 缩进空格数，None 为紧凑格式
+
+        Returns:
+            str: JSON 字符串
+        """
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=indent, default=json_default)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.FIELDS = tuple(cls.__slots__)
+        cls._field_set = frozenset(cls.FIELDS)
+        # 一次取出全部声明字段，to_dict 无需逐个 getattr
+        cls._values = staticmethod(attrgetter(*cls.FIELDS))
+        _RECORD_TYPES.add(cls)
+
+
+class DiseaseDetails(_SlotRecord):
+    """结构化的病害信息"""
+
+    __slots__ = ("disease", "disease_id", "severity", "confidence", "solution", "symptoms")
+
+    def __init__(self, disease: str = "未知", disease_id: Optional[str] = None, severity: str = "未知",
+                 confidence: float = 0.0, solution: str = "未知", symptoms: str = "未知", **extra):
+        self.disease = disease
+        self.disease_id = disease_id
+        self.severity = severity
+        self.confidence = confidence
+        self.solution = solution
+        self.symptoms = symptoms
+        self.extra = extra or None
+
+
+class DetectionResult(_SlotRecord):
+    """一次检测的结果；status 为 success / error / rejected"""
+
+    __slots__ = ("status", "mode", "model", "result", "details", "error", "usage",
+                 "response_time", "timings", "image", "metadata", "quality", "prescreen")
+
+    def __init__(self, status: str, mode: Optional[str] = None, model: Optional[str] = None,
+                 result: Optional[str] = None, details: Optional[DiseaseDetails] = None,
+                 error: Optional[str] = None, usage: Optional[Dict] = None,
+                 response_time: Optional[float] = None, timings: Optional[Dict] = None,
+                 image: Optional[Dict] = None, metadata: Optional[Dict] = None,
+                 quality: Optional[Dict] = None, prescreen: Optional[Dict] = None, **extra):
+        self.status = status
+        self.mode = mode
+        self.model = model
+        self.result = result
+        self.details = details
+        self.error = error
+        self.usage = usage
+        self.response_time = response_time
+        self.timings = timings
+        self.image = image
+        self.metadata = metadata
+        self.quality = quality
+        self.prescreen = prescreen
+        self.extra = extra or None
+
+    @classmethod
+    def failure(cls, mode: str, error: str, **extra) -> "DetectionResult":
+        """
+        构造失败结果
+
+        Args:
+            mode: 检测模式
+            error: 错误信息
+            **extra: 其他字段（如 retryable、response_time）
+
+        Returns:
+            DetectionResult: status 为 error 的结果
+        """
+        return cls("error", mode=mode, error=error, **extra)
+
+
+def is_real_diagnosis(result: Any) -> bool:
+    """
+    是否为可信的真实诊断：检测成功，且不是模拟结果或等待离线同步的临时结果
+
+    模拟与临时结果的病害是随机生成的，不能写入农田档案或参与预警统计。
+
+    Args:
+        result: 检测结果
+
+    Returns:
+        bool: 是否为真实诊断
+    """
+    return result.get("status") == "success" and result.get("mode") != "mock" and not result.get("provisional")
+
+
+def as_dict(value: Any) -> Any:
+    """结果对象转换为字典，其他值原样返回（用于构造接口响应）"""
+    return value.to_dict() if type(value) in _RECORD_TYPES else value
+
+
+def json_default(value: Any) -> Any:
+    """json.dump 的 default 钩子：把结果对象转换为字典"""
+    if type(value) in _RECORD_TYPES:
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,19 @@
+"""
+离线评估：在标注数据集上比较检测器配置的准确率、成本与延迟
+"""
+
+from .dataset import LabeledImage, load_manifest
+from .harness import DEFAULT_CONFIGS, build_detector, evaluate, run_all, score, summary_table
+from .response_cache import ResponseCache
+
+__all__ = [
+    'LabeledImage',
+    'load_manifest',
+    'ResponseCache',
+    'DEFAULT_CONFIGS',
+    'build_detector',
+    'evaluate',
+    'run_all',
+    'score',
+    'summary_table'
+]
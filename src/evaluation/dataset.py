@@ -0,0 +1,59 @@
+"""
+评估数据集：带标注的图片清单
+
+清单为 JSON Lines（每行一个对象）或 CSV（首行为表头），字段：
+- image: 图片路径（相对路径以清单所在目录为基准）
+- label: 标注的病害，标准ID（如 rice_blast）或任一名称/别名（如 稻瘟、健康）
+- crop_type: 作物类型，默认水稻
+- severity: 标注的严重程度（可选：无/轻微/中等/严重）
+"""
+
+import csv
+import json
+import os
+from typing import List, NamedTuple, Optional
+
+from ..utils.taxonomy import DISEASES, normalize_disease
+
+
+class LabeledImage(NamedTuple):
+    """一张带标注的图片"""
+
+    image: str
+    disease_id: str
+    crop_type: str
+    severity: Optional[str] = None
+
+
+def _to_item(record: dict, base_dir: str, line: int) -> LabeledImage:
+    image = record.get("image")
+    label = record.get("label")
+    if not image or not label:
+        raise ValueError(f"第 {line} 条记录缺少 image 或 label")
+
+    crop_type = record.get("crop_type") or "水稻"
+    disease_id = label if label in DISEASES else normalize_disease(label, crop_type)[0]
+    path = image if os.path.isabs(image) else os.path.join(base_dir, image)
+    return LabeledImage(path, disease_id, crop_type, record.get("severity") or None)
+
+
+def load_manifest(path: str) -> List[LabeledImage]:
+    """
+    读取标注清单
+
+    Args:
+        path: 清单路径（.jsonl / .csv）
+
+    Returns:
+        List[LabeledImage]: 标注图片列表
+
+    Raises:
+        ValueError: 记录缺少必填字段
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith(".csv"):
+            records = list(csv.DictReader(f))
+        else:
+            records = [json.loads(line) for line in f if line.strip()]
+    return [_to_item(record, base_dir, line) for line, record in enumerate(records, 1)]
@@ -0,0 +1,362 @@
+"""
+评估工具：在标注数据集上并发运行检测器配置，同时比较准确率、成本与延迟
+
+每个配置是一个字典：
+- name: 配置名称
+- detector: mock / qwen / cascade / hybrid
+- model: qwen 使用的模型；models、confidence_threshold: cascade 的各级模型与升级阈值
+- cascade、prescreen、quality_gate: hybrid 是否使用级联、本地预筛、质量门控
+
+真实API请求经过响应缓存（ResponseCache）或录制档案回放（detectors.replay.ResponseReplayer）：
+已请求过的组合不再产生费用，缓存命中的请求按录制时的耗时计入延迟，使延迟统计与真实运行一致。
+"""
+
+import threading
+import time
+import unicodedata
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ..config import Config
+from ..utils.taxonomy import DISEASES, normalize_disease
+from .dataset import LabeledImage
+
+DETECTOR_TYPES = ("mock", "qwen", "cascade", "hybrid")
+
+DEFAULT_CONFIGS = [
+    {"name": "mock", "detector": "mock"},
+    {"name": "qwen-vl-plus", "detector": "qwen", "model": "qwen-vl-plus"},
+    {"name": "qwen-vl-max", "detector": "qwen", "model": "qwen-vl-max"},
+    {"name": "cascade", "detector": "cascade"},
+    {"name": "hybrid+prescreen", "detector": "hybrid", "prescreen": True}
+]
+
+# 检测失败与质量门控拒绝在混淆矩阵中单独成列
+ERROR_LABEL = "error"
+REJECTED_LABEL = "rejected"
+LABEL_NAMES = {ERROR_LABEL: "失败", REJECTED_LABEL: "拒绝"}
+
+
+class UsageMeter:
+    """传输层：统计各模型的调用次数与 token 用量，并累计本线程缓存命中的录制耗时"""
+
+    def __init__(self, inner=None):
+        """
+        Args:
+            inner: 内层传输层（如 ResponseCache），None 表示直接发送
+        """
+        self.inner = inner
+        self.models: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def __call__(self, payload: Dict, send):
+        start = time.perf_counter()
+        status_code, body, text, elapsed = self.inner(payload, send) if self.inner else send(payload)
+        # 缓存命中几乎不耗时，按录制时的耗时补足
+        self._local.replayed = self.replayed() + max(0.0, elapsed - (time.perf_counter() - start))
+
+        usage = (body or {}).get("usage") or {}
+        with self._lock:
+            counter = self.models.setdefault(payload.get("model", ""), Counter())
+            counter["calls"] += 1
+            counter["prompt_tokens"] += usage.get("prompt_tokens", 0)
+            counter["cached_tokens"] += (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+            counter["completion_tokens"] += usage.get("completion_tokens", 0)
+        return status_code, body, text, elapsed
+
+    def replayed(self) -> float:
+        """本线程累计的补足耗时（秒）"""
+        return getattr(self._local, "replayed", 0.0)
+
+    def reset_thread(self):
+        self._local.replayed = 0.0
+
+    def cost(self) -> Tuple[float, List[str]]:
+        """
+        按 Config.MODEL_PRICES 计算费用
+
+        Returns:
+            Tuple[float, List[str]]: (费用（元）, 未配置单价的模型)
+        """
+        total = 0.0
+        unpriced = []
+        for model, counter in self.models.items():
+            price = Config.MODEL_PRICES.get(model)
+            if price is None:
+                unpriced.append(model)
+                continue
+            input_price, output_price = price
+            uncached = counter["prompt_tokens"] - counter["cached_tokens"]
+            total += (uncached + counter["cached_tokens"] * Config.CACHED_TOKEN_PRICE_RATIO) / 1000 * input_price
+            total += counter["completion_tokens"] / 1000 * output_price
+        return total, unpriced
+
+
+def _qwen_detectors(detector) -> List:
+    """找出检测器中所有直接调用API的 QwenDiseaseDetector"""
+    from ..detectors.qwen_detector import QwenDiseaseDetector
+
+    if isinstance(detector, QwenDiseaseDetector):
+        return [detector]
+    if hasattr(detector, "tiers"):
+        return list(detector.tiers)
+    inner = getattr(detector, "qwen_detector", None)
+    return _qwen_detectors(inner) if inner is not None else []
+
+
+def build_detector(config: Dict, api_key: str):
+    """
+    按配置创建检测器
+
+    Args:
+        config: 配置字典
+        api_key: API密钥
+
+    Returns:
+        检测器实例（提供 detect(image_path, crop_type)）
+
+    Raises:
+        ValueError: 未知的检测器类型
+    """
+    kind = config.get("detector")
+    if kind == "mock":
+        from ..detectors.mock_detector import MockDiseaseDetector
+        return MockDiseaseDetector(simulate_latency=config.get("simulate_latency", False))
+
+    if kind == "qwen" or (kind == "hybrid" and not config.get("cascade")):
+        from ..detectors.qwen_detector import QwenDiseaseDetector
+        api_detector = QwenDiseaseDetector(api_key, model=config.get("model"))
+    elif kind == "cascade" or kind == "hybrid":
+        from ..detectors.cascade_detector import CascadeQwenDetector
+        api_detector = CascadeQwenDetector(api_key, models=config.get("models"),
+                                           confidence_threshold=config.get("confidence_threshold"))
+    else:
+        raise ValueError(f"未知的检测器类型: {kind}（可选 {', '.join(DETECTOR_TYPES)}）")
+    if kind != "hybrid":
+        return api_detector
+
+    from ..detectors.hybrid_detector import HybridDiseaseDetector
+    detector = HybridDiseaseDetector(api_key)
+    detector.qwen_detector = api_detector
+    if config.get("prescreen"):
+        from ..detectors.prescreen import PreScreenClassifier
+        detector.prescreen = PreScreenClassifier()
+    else:
+        detector.prescreen = None
+    if config.get("quality_gate"):
+        from ..detectors.quality import QualityGate
+        detector.quality_gate = QualityGate()
+    else:
+        detector.quality_gate = None
+    return detector
+
+
+def predicted_label(result: Dict, crop_type: str) -> str:
+    """检测结果对应的标准病害ID（失败、被拒绝的帧单独标记）"""
+    status = result.get("status")
+    if status == "rejected":
+        return REJECTED_LABEL
+    if status != "success":
+        return ERROR_LABEL
+    details = result.get("details") or {}
+    return details.get("disease_id") or normalize_disease(details.get("disease"), crop_type)[0]
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """已排序序列的分位数（最近秩）"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def score(pairs: Iterable[Tuple[str, str]]) -> Dict:
+    """
+    计算混淆矩阵与各病害的精确率/召回率
+
+    Args:
+        pairs: (标注, 预测) 序列
+
+    Returns:
+        Dict: labels、confusion（标注 -> 预测 -> 数量）、per_class、accuracy、macro_f1
+    """
+    counts = Counter(pairs)
+    truths = sorted({truth for truth, _ in counts})
+    labels = truths + sorted({pred for _, pred in counts} - set(truths))
+    confusion = {truth: {pred: counts.get((truth, pred), 0) for pred in labels} for truth in truths}
+
+    per_class = {}
+    for label in labels:
+        tp = counts.get((label, label), 0)
+        predicted = sum(n for (_, pred), n in counts.items() if pred == label)
+        support = sum(n for (truth, _), n in counts.items() if truth == label)
+        precision = tp / predicted if predicted else 0.0
+        recall = tp / support if support else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        per_class[label] = {"precision": precision, "recall": recall, "f1": f1,
+                            "support": support, "predicted": predicted}
+
+    total = sum(counts.values())
+    correct = sum(n for (truth, pred), n in counts.items() if truth == pred)
+    return {
+        "labels": labels,
+        "confusion": confusion,
+        "per_class": per_class,
+        "accuracy": correct / total if total else 0.0,
+        "macro_f1": sum(per_class[label]["f1"] for label in truths) / len(truths) if truths else 0.0
+    }
+
+
+def evaluate(items: Sequence[LabeledImage], config: Dict, api_key: str = Config.QWEN_API_KEY,
+             cache=None, concurrency: int = 8) -> Dict:
+    """
+    在数据集上运行一个配置
+
+    Args:
+        items: 标注图片
+        config: 检测器配置
+        api_key: API密钥
+        cache: 响应缓存（ResponseCache），None 表示直接调用API
+        concurrency: 并发检测数
+
+    Returns:
+        Dict: 评分、延迟分位数、调用次数与费用
+    """
+    meter = UsageMeter(cache)
+    detector = build_detector(config, api_key)
+    for api_detector in _qwen_detectors(detector):
+        api_detector.transport = meter
+    hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+
+    def run(item: LabeledImage):
+        meter.reset_thread()
+        start = time.perf_counter()
+        result = detector.detect(item.image, item.crop_type)
+        return item, result, time.perf_counter() - start + meter.replayed()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(run, items))
+    wall_time = time.perf_counter() - start
+
+    pairs = [(item.disease_id, predicted_label(result, item.crop_type)) for item, result, _ in outcomes]
+    severity_labeled = [(item.severity, (result.get("details") or {}).get("severity"))
+                        for item, result, _ in outcomes if item.severity and result.get("status") == "success"]
+    latencies = sorted(latency for _, _, latency in outcomes)
+    calls = sum(counter["calls"] for counter in meter.models.values())
+    cost, unpriced = meter.cost()
+
+    report = score(pairs)
+    report.update({
+        "name": config.get("name", config.get("detector")),
+        "config": config,
+        "samples": len(outcomes),
+        "errors": sum(1 for _, pred in pairs if pred == ERROR_LABEL),
+        "severity_accuracy": (sum(1 for truth, pred in severity_labeled if truth == pred) / len(severity_labeled)
+                              if severity_labeled else None),
+        "latency_p50_ms": percentile(latencies, 0.5) * 1000,
+        "latency_p99_ms": percentile(latencies, 0.99) * 1000,
+        "latency_mean_ms": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+        "wall_time": wall_time,
+        "api_calls": calls,
+        # 离线模式下未命中的请求不会发出
+        "live_calls": calls if cache is None else 0 if cache.offline else cache.misses - misses,
+        "cached_calls": (cache.hits - hits) if cache is not None else 0,
+        "usage": {model: dict(counter) for model, counter in meter.models.items()},
+        "cost": cost,
+        "unpriced_models": unpriced
+    })
+    return report
+
+
+def label_name(label: str) -> str:
+    """标准病害ID的显示名称"""
+    if label in LABEL_NAMES:
+        return LABEL_NAMES[label]
+    entry = DISEASES.get(label)
+    return entry["name"] if entry else label
+
+
+def _width(text: str) -> int:
+    """终端显示宽度（中文字符占两列）"""
+    return sum(2 if unicodedata.east_asian_width(ch) in "WF" else 1 for ch in text)
+
+
+def format_table(headers: Sequence[str], rows: Sequence[Sequence]) -> str:
+    """按显示宽度对齐的文本表格"""
+    cells = [[str(cell) for cell in row] for row in [headers, *rows]]
+    widths = [max(_width(row[i]) for row in cells) for i in range(len(headers))]
+    lines = []
+    for index, row in enumerate(cells):
+        lines.append("  ".join(cell + " " * (widths[i] - _width(cell)) for i, cell in enumerate(row)).rstrip())
+        if index == 0:
+            lines.append("  ".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+
+def summary_table(reports: Sequence[Dict]) -> str:
+    """所有配置的汇总表：准确率、宏平均F1、调用次数、费用与延迟"""
+    rows = []
+    for report in reports:
+        severity = report["severity_accuracy"]
+        rows.append((
+            report["name"],
+            report["samples"],
+            f"{report['accuracy']:.1%}",
+            f"{report['macro_f1']:.3f}",
+            f"{severity:.1%}" if severity is not None else "-",
+            report["errors"],
+            f"{report['api_calls']} ({report['live_calls']})",
+            f"{report['cost']:.4f}" + ("*" if report["unpriced_models"] else ""),
+            f"{report['latency_p50_ms']:.0f}",
+            f"{report['latency_p99_ms']:.0f}"
+        ))
+    headers = ("配置", "样本", "准确率", "宏F1", "严重程度", "失败", "调用(实际)", "费用(元)", "p50 ms", "p99 ms")
+    return format_table(headers, rows)
+
+
+def class_table(report: Dict) -> str:
+    """单个配置的各病害精确率/召回率"""
+    rows = [
+        (label_name(label), stats["support"], stats["predicted"],
+         f"{stats['precision']:.1%}", f"{stats['recall']:.1%}", f"{stats['f1']:.3f}")
+        for label, stats in report["per_class"].items()
+    ]
+    return format_table(("病害", "标注数", "预测数", "精确率", "召回率", "F1"), rows)
+
+
+def confusion_table(report: Dict) -> str:
+    """单个配置的混淆矩阵（行为标注，列为预测）"""
+    labels = report["labels"]
+    rows = [(label_name(truth), *(report["confusion"][truth][pred] or "." for pred in labels))
+            for truth in report["confusion"]]
+    return format_table(("标注\\预测", *(label_name(label) for label in labels)), rows)
+
+
+def run_all(items: Sequence[LabeledImage], configs: Sequence[Dict], cache=None, concurrency: int = 8,
+            api_key: str = Config.QWEN_API_KEY) -> List[Dict]:
+    """
+    依次评估多个配置（配置内部并发），单个配置出错不影响其他配置
+
+    Returns:
+        List[Dict]: 各配置的评估报告（出错的配置附带 error）
+    """
+    reports = []
+    for config in configs:
+        name = config.get("name", config.get("detector"))
+        print(f"▶️  评估 {name}（{len(items)} 张）")
+        try:
+            reports.append(evaluate(items, config, api_key=api_key, cache=cache, concurrency=concurrency))
+        except Exception as e:
+            print(f"❌ {name} 评估失败: {e}")
+            reports.append({"name": name, "config": config, "error": str(e)})
+    return reports
+
+
+def find_config(configs: Sequence[Dict], names: Optional[Iterable[str]]) -> List[Dict]:
+    """按名称筛选配置，names 为空时返回全部"""
+    if not names:
+        return list(configs)
+    wanted = set(names)
+    return [config for config in configs if config.get("name") in wanted]
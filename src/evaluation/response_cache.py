@@ -0,0 +1,99 @@
+"""
+API响应缓存：按请求指纹保存成功的原始响应
+
+作为 QwenDiseaseDetector 的传输层使用：相同的请求（同一图片、模型、提示词与参数）
+直接返回已保存的响应与当时的耗时，不再调用API。更换解析逻辑后重新评分、
+对同一数据集比较多种配置时，只有从未请求过的组合才会产生费用。
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from ..config import Config
+from ..detectors.qwen_detector import RawResponse, request_fingerprint
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    fingerprint TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    body TEXT NOT NULL,
+    elapsed REAL NOT NULL,
+    created_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class ResponseCache:
+    """基于 SQLite 的响应缓存（只缓存 HTTP 200 的响应，失败的请求下次重试）"""
+
+    def __init__(self, db_path: str = Config.EVAL_CACHE_DB_PATH, offline: bool = False):
+        """
+        Args:
+            db_path: 数据库路径
+            offline: 只读缓存，未命中时不调用API而是返回错误
+        """
+        self.db_path = db_path
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, fingerprint: str) -> Optional[RawResponse]:
+        """读取缓存的响应"""
+        row = self._connection().execute(
+            "SELECT body, elapsed FROM responses WHERE fingerprint = ?", (fingerprint,)
+        ).fetchone()
+        if row is None:
+            return None
+        return 200, json.loads(row[0]), row[0], row[1]
+
+    def put(self, fingerprint: str, model: str, body: Dict, elapsed: float):
+        """保存响应"""
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (fingerprint, model, body, elapsed, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (fingerprint, model, json.dumps(body, ensure_ascii=False), elapsed, time.time())
+            )
+
+    def __call__(self, payload: Dict, send: Callable[[Dict], RawResponse]) -> RawResponse:
+        """
+        传输层入口：命中缓存时返回缓存的响应，否则调用 send 并保存成功的响应
+
+        Args:
+            payload: 请求体
+            send: 实际发送请求的函数
+
+        Returns:
+            RawResponse: (HTTP状态码, 响应JSON, 响应原文, 耗时秒数)；命中时耗时为录制时的耗时
+        """
+        fingerprint = request_fingerprint(payload)
+        cached = self.get(fingerprint)
+        with self._lock:
+            if cached is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if cached is not None:
+            return cached
+        if self.offline:
+            return 404, None, "离线模式：响应缓存中没有该请求", 0.0
+
+        status_code, body, text, elapsed = send(payload)
+        if status_code == 200 and body is not None:
+            self.put(fingerprint, payload.get("model", ""), body, elapsed)
+        return status_code, body, text, elapsed
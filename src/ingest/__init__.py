@@ -0,0 +1,19 @@
+"""
+视频与帧流接入：按需解码、自适应抽帧，关键帧经有界流水线送检
+"""
+
+from .pipeline import FrameDetection, FramePipeline, with_metadata
+from .sampler import AdaptiveSampler, Decision
+from .sources import Frame, ImageSequenceSource, VideoSource, open_source
+
+__all__ = [
+    'Frame',
+    'VideoSource',
+    'ImageSequenceSource',
+    'open_source',
+    'AdaptiveSampler',
+    'Decision',
+    'FramePipeline',
+    'FrameDetection',
+    'with_metadata'
+]
@@ -0,0 +1,222 @@
+"""
+视频检测流水线：解码抽帧（生产者）与病害检测（消费者）通过有界队列衔接
+
+生产者线程逐帧读取并抽帧，关键帧保存为 JPEG 后放入有界队列；多个检测线程从队列取帧检测。
+检测跟不上时队列写满，生产者暂停解码，内存占用与API调用量取决于新内容的多少而非视频长度。
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+from ..config import Config
+from ..detectors.result import DetectionResult
+from ..utils.metadata import extract_batch
+from .sampler import AdaptiveSampler
+from .sources import Frame
+
+# 检测线程结束标记
+_DONE = object()
+
+
+class FrameDetection(NamedTuple):
+    """一个关键帧的检测结果"""
+
+    frame_index: int
+    timestamp: float
+    image_path: str
+    reason: str
+    novelty: float
+    scene: float
+    result: DetectionResult
+
+
+def save_frame(frame: Frame, path: str):
+    """把帧保存为 JPEG（优先使用 Pillow，未安装时使用 OpenCV）"""
+    image = np.ascontiguousarray(frame.image)
+    try:
+        from PIL import Image
+    except ImportError:
+        import cv2
+        cv2.imwrite(path, image[:, :, ::-1], [cv2.IMWRITE_JPEG_QUALITY, 90])
+        return
+    Image.fromarray(image).save(path, "JPEG", quality=90)
+
+
+def with_metadata(detections: Iterable[FrameDetection], max_workers: int = 8) -> List[Dict]:
+    """
+    关键帧结果附带原图元数据（GPS、拍摄时间、云台角度等）
+
+    航拍图片目录的关键帧直接指向原图；全部检测完成后统一并发读取文件头，不占用检测线程。
+    视频解码保存的帧没有元数据，对应为空字典。
+
+    Args:
+        detections: 关键帧检测结果
+        max_workers: 读取元数据的线程数
+
+    Returns:
+        List[Dict]: 各关键帧的字典形式，metadata 为原图元数据
+    """
+    detections = list(detections)
+    metadata = extract_batch({item.image_path for item in detections}, max_workers)
+    return [{**item._asdict(), "metadata": metadata[item.image_path]} for item in detections]
+
+
+class FramePipeline:
+    """有界的生产者/消费者视频检测流水线"""
+
+    def __init__(self, detector, crop_type: str = "水稻", sampler: Optional[AdaptiveSampler] = None,
+                 workers: Optional[int] = None, queue_size: Optional[int] = None,
+                 frame_dir: str = Config.VIDEO_FRAME_DIR):
+        """
+        Args:
+            detector: 检测器（提供 detect(image_path, crop_type)）
+            crop_type: 作物类型
+            sampler: 抽帧器，None 时按配置创建
+            workers: 检测线程数
+            queue_size: 待检测关键帧队列长度
+            frame_dir: 关键帧保存目录（来自图片文件的帧直接使用原文件）
+        """
+        self.detector = detector
+        self.crop_type = crop_type
+        self.sampler = sampler or AdaptiveSampler()
+        self.workers = max(1, workers or Config.VIDEO_WORKERS)
+        self.queue_size = max(1, queue_size or Config.VIDEO_QUEUE_SIZE)
+        self.frame_dir = frame_dir
+        self.stats: Counter = Counter()
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str, value: int = 1):
+        with self._stats_lock:
+            self.stats[key] += value
+
+    def _record_position(self, source):
+        """总帧数取帧源已经过的帧数：跳过的帧也计入，读到末尾时即帧源长度"""
+        with self._stats_lock:
+            self.stats["frames"] = max(self.stats["frames"], source.position)
+
+    def _save(self, frame: Frame, name: str) -> str:
+        os.makedirs(self.frame_dir, exist_ok=True)
+        path = os.path.join(self.frame_dir, f"{name}_{frame.index:07d}.jpg")
+        save_frame(frame, path)
+        return path
+
+    @staticmethod
+    def _put(target: queue.Queue, item, stop: threading.Event) -> bool:
+        """放入有界队列，等待期间流水线被关闭则放弃"""
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, source, tasks: queue.Queue, results: queue.Queue, stop: threading.Event):
+        """生产者：读取、抽帧并保存关键帧"""
+        try:
+            while not stop.is_set():
+                frame = source.read(skip=self.sampler.stride - 1)
+                self._record_position(source)
+                if frame is None:
+                    break
+                self._count("checked")
+                try:
+                    decision = self.sampler.update(frame)
+                except Exception as e:
+                    # 单个损坏的图片不影响整个序列
+                    print(f"⚠️  跳过无法解码的帧 {frame.path or frame.index}: {e}")
+                    self._count("unreadable")
+                    continue
+                if not decision.keep:
+                    continue
+
+                self._count("keyframes")
+                self._count(f"keyframes_{decision.reason}")
+                path = frame.path or self._save(frame, source.name)
+                # 队列中只保留路径，不持有像素数组
+                if not self._put(tasks, (frame._replace(image=None, path=path), decision), stop):
+                    break
+        except Exception as e:
+            print(f"❌ 读取帧失败: {e}")
+            self._put(results, e, stop)
+        finally:
+            source.close()
+            for _ in range(self.workers):
+                tasks.put(None)
+
+    def _consume(self, tasks: queue.Queue, results: queue.Queue, stop: threading.Event):
+        """消费者：检测关键帧"""
+        while True:
+            item = tasks.get()
+            if item is None:
+                results.put(_DONE)
+                return
+            if stop.is_set():
+                continue
+            frame, decision = item
+            try:
+                result = self.detector.detect(frame.path, self.crop_type)
+            except Exception as e:
+                result = DetectionResult.failure("video", f"关键帧检测异常: {str(e)}")
+            self._count("detected")
+            self._put(results, FrameDetection(
+                frame.index, round(frame.timestamp, 3), frame.path,
+                decision.reason, decision.novelty, decision.scene, result
+            ), stop)
+
+    def run(self, source) -> Iterator[FrameDetection]:
+        """
+        处理一个帧源，按检测完成顺序逐个产出关键帧结果
+
+        提前停止迭代时停止解码，已开始的检测完成后线程退出。
+
+        Args:
+            source: 帧源（见 ingest.sources）
+
+        Yields:
+            FrameDetection: 关键帧检测结果
+
+        Raises:
+            Exception: 读取帧源失败
+        """
+        self.stats = Counter()
+        tasks: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        results: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        start = time.perf_counter()
+
+        threads = [threading.Thread(target=self._produce, args=(source, tasks, results, stop),
+                                    name="frame-producer", daemon=True)]
+        threads += [threading.Thread(target=self._consume, args=(tasks, results, stop),
+                                     name=f"frame-detector-{i}", daemon=True) for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+
+        finished = 0
+        try:
+            while finished < self.workers:
+                item = results.get()
+                if item is _DONE:
+                    finished += 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            stop.set()
+            # 排空结果队列，让阻塞在写入上的检测线程退出
+            while finished < self.workers:
+                if results.get() is _DONE:
+                    finished += 1
+            with self._stats_lock:
+                self.stats["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    def summary(self) -> Dict:
+        """最近一次运行的统计：总帧数、检查帧数、关键帧数（按原因）、检测数与耗时"""
+        return dict(self.stats)
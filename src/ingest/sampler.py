@@ -0,0 +1,133 @@
+"""
+自适应抽帧：按画面变化决定哪些帧送检
+
+每帧计算一个灰度缩略图签名，与上一关键帧比较：
+- 新内容：平均灰度差达到阈值（无人机飞过新的地块）
+- 场景切换：灰度直方图距离达到阈值（镜头切换、转向）
+- 定时：画面长时间不变时按最长间隔补一帧
+画面静止时逐步拉大检查间隔（跳过的帧不解码），画面变化时恢复逐帧检查。
+"""
+
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from ..config import Config
+from ..utils.image import load_thumbnail
+from .sources import Frame
+
+# RGB 转灰度的权重（ITU-R BT.601）
+LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+HISTOGRAM_BINS = 32
+
+
+class Decision(NamedTuple):
+    """一帧的抽帧结果"""
+
+    keep: bool
+    # first / scene / novel / heartbeat；未选中时为 None
+    reason: Optional[str]
+    novelty: float
+    scene: float
+
+
+class AdaptiveSampler:
+    """基于帧签名差异的自适应抽帧器"""
+
+    def __init__(self,
+                 novelty_threshold: Optional[float] = None,
+                 scene_threshold: Optional[float] = None,
+                 min_interval: Optional[float] = None,
+                 max_interval: Optional[float] = None,
+                 max_stride: Optional[int] = None,
+                 size: Optional[int] = None):
+        self.novelty_threshold = novelty_threshold if novelty_threshold is not None else Config.VIDEO_NOVELTY_THRESHOLD
+        self.scene_threshold = scene_threshold if scene_threshold is not None else Config.VIDEO_SCENE_THRESHOLD
+        self.min_interval = min_interval if min_interval is not None else Config.VIDEO_MIN_INTERVAL
+        self.max_interval = max_interval if max_interval is not None else Config.VIDEO_MAX_INTERVAL
+        self.max_stride = max(1, max_stride or Config.VIDEO_MAX_STRIDE)
+        self.size = size or Config.VIDEO_SIGNATURE_SIZE
+
+        # 下一次检查前跳过的帧数 + 1
+        self.stride = 1
+        self._previous: Optional[np.ndarray] = None
+        self._key: Optional[np.ndarray] = None
+        self._key_histogram: Optional[np.ndarray] = None
+        self._key_timestamp = 0.0
+
+    def signature(self, frame: Frame) -> np.ndarray:
+        """
+        计算帧签名：边长约 size 的灰度缩略图
+
+        Args:
+            frame: 帧
+
+        Returns:
+            np.ndarray: (H, W) 的 float32 灰度数组
+        """
+        if frame.image is None:
+            return load_thumbnail(frame.path, self.size, "L")
+        # 等间隔取样代替插值缩放，开销与签名大小而非原图大小相关
+        step = max(1, min(frame.image.shape[:2]) // self.size)
+        return frame.image[::step, ::step].astype(np.float32) @ LUMA
+
+    @staticmethod
+    def _difference(a: np.ndarray, b: Optional[np.ndarray]) -> float:
+        """平均灰度差（0~1），尺寸不同时视为完全不同"""
+        if b is None or a.shape != b.shape:
+            return 1.0
+        return float(np.abs(a - b).mean() / 255.0)
+
+    @staticmethod
+    def _histogram(signature: np.ndarray) -> np.ndarray:
+        counts, _ = np.histogram(signature, bins=HISTOGRAM_BINS, range=(0, 256))
+        return counts / max(1, signature.size)
+
+    def update(self, frame: Frame) -> Decision:
+        """
+        判断一帧是否为关键帧，并调整检查间隔
+
+        Args:
+            frame: 帧（按时间顺序传入）
+
+        Returns:
+            Decision: 是否送检、原因与变化分数
+        """
+        signature = self.signature(frame)
+        histogram = self._histogram(signature)
+
+        # 相邻两次检查之间的变化决定检查间隔
+        motion = self._difference(signature, self._previous)
+        self._previous = signature
+        if motion < self.novelty_threshold / 4:
+            self.stride = min(self.stride * 2, self.max_stride)
+        elif motion > self.novelty_threshold / 2:
+            self.stride = max(1, self.stride // 2)
+
+        if self._key is None:
+            return self._keep(frame, signature, histogram, "first", 1.0, 1.0)
+
+        novelty = self._difference(signature, self._key)
+        scene = float(np.abs(histogram - self._key_histogram).sum() / 2)
+        elapsed = frame.timestamp - self._key_timestamp
+        if elapsed < self.min_interval:
+            reason = None
+        elif scene >= self.scene_threshold:
+            reason = "scene"
+        elif novelty >= self.novelty_threshold:
+            reason = "novel"
+        elif self.max_interval and elapsed >= self.max_interval:
+            reason = "heartbeat"
+        else:
+            reason = None
+
+        if reason is None:
+            return Decision(False, None, round(novelty, 4), round(scene, 4))
+        return self._keep(frame, signature, histogram, reason, novelty, scene)
+
+    def _keep(self, frame: Frame, signature: np.ndarray, histogram: np.ndarray,
+              reason: str, novelty: float, scene: float) -> Decision:
+        self._key = signature
+        self._key_histogram = histogram
+        self._key_timestamp = frame.timestamp
+        return Decision(True, reason, round(novelty, 4), round(scene, 4))
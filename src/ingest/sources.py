@@ -0,0 +1,138 @@
+"""
+帧源：按需逐帧读取视频文件、视频流或图片序列
+
+帧源只在被读取时解码；跳过的帧（skip）对视频只做 grab 不做解码，对图片序列不读文件。
+视频解码依赖 OpenCV（opencv-python，可选依赖），仅在打开视频时导入。
+"""
+
+import glob
+import os
+from typing import Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+from ..config import Config
+
+
+class Frame(NamedTuple):
+    """一帧画面"""
+
+    index: int
+    timestamp: float
+    # RGB 像素数组 (H, W, 3) uint8；来自图片文件的帧为 None，按需从 path 解码
+    image: Optional[np.ndarray] = None
+    path: Optional[str] = None
+
+
+def _import_cv2():
+    try:
+        import cv2
+    except ImportError as e:
+        raise ImportError("读取视频需要 OpenCV：pip install opencv-python") from e
+    return cv2
+
+
+class VideoSource:
+    """视频文件或视频流（如 rtsp://）帧源"""
+
+    def __init__(self, uri: str, fps: Optional[float] = None):
+        """
+        Args:
+            uri: 视频文件路径或流地址
+            fps: 帧率，None 时读取容器中的帧率（读取失败按 25）
+
+        Raises:
+            ImportError: 未安装 OpenCV
+            IOError: 无法打开视频
+        """
+        cv2 = _import_cv2()
+        self.uri = uri
+        self.name = os.path.splitext(os.path.basename(uri.rstrip("/")))[0] or "stream"
+        self._cv2 = cv2
+        self._capture = cv2.VideoCapture(uri)
+        if not self._capture.isOpened():
+            raise IOError(f"无法打开视频: {uri}")
+        self.fps = fps or self._capture.get(cv2.CAP_PROP_FPS) or 25.0
+        self._index = 0
+
+    def read(self, skip: int = 0) -> Optional[Frame]:
+        """
+        跳过 skip 帧后读取并解码一帧
+
+        Returns:
+            Optional[Frame]: 视频结束时返回None
+        """
+        for _ in range(skip):
+            if not self._capture.grab():
+                return None
+            self._index += 1
+        ok, bgr = self._capture.read()
+        if not ok:
+            return None
+        frame = Frame(self._index, self._index / self.fps, bgr[:, :, ::-1])
+        self._index += 1
+        return frame
+
+    @property
+    def position(self) -> int:
+        """已经过的帧数（含跳过未解码的帧）"""
+        return self._index
+
+    def close(self):
+        self._capture.release()
+
+
+class ImageSequenceSource:
+    """图片序列帧源：目录中按文件名排序的图片（如无人机定时拍摄或抽好的帧）"""
+
+    def __init__(self, paths: Iterable[str], fps: float = 1.0, name: str = "images"):
+        """
+        Args:
+            paths: 图片路径，或包含图片的目录
+            fps: 相邻图片的时间间隔折算的帧率
+            name: 帧源名称
+        """
+        if isinstance(paths, str):
+            directory = paths
+            name = os.path.basename(os.path.normpath(directory))
+            paths = sorted(
+                path for path in glob.glob(os.path.join(directory, "*"))
+                if os.path.splitext(path)[1].lower() in Config.ALLOWED_EXTENSIONS
+            )
+        self.paths: List[str] = list(paths)
+        self.fps = fps
+        self.name = name
+        self._index = 0
+
+    def read(self, skip: int = 0) -> Optional[Frame]:
+        """跳过 skip 张后返回下一张（不解码，由使用方按需读取缩略图）"""
+        self._index += skip
+        if self._index >= len(self.paths):
+            return None
+        frame = Frame(self._index, self._index / self.fps, None, self.paths[self._index])
+        self._index += 1
+        return frame
+
+    @property
+    def position(self) -> int:
+        """已经过的图片数（含跳过的图片，跳过末尾时不超过序列长度）"""
+        return min(self._index, len(self.paths))
+
+    def close(self):
+        pass
+
+
+def open_source(uri: str, fps: Optional[float] = None):
+    """
+    按路径类型创建帧源：目录为图片序列，其余按视频文件或视频流打开
+
+    Args:
+        uri: 目录、视频文件路径或流地址
+        fps: 帧率（图片序列默认 1）
+
+    Returns:
+        VideoSource / ImageSequenceSource
+    """
+    if os.path.isdir(uri):
+        return ImageSequenceSource(uri, fps=fps or 1.0)
+    return VideoSource(uri, fps=fps)
@@ -0,0 +1,11 @@
+"""
+可视化报告模块：标注缩略图、田块热力图与田块报告
+"""
+
+from .generator import Artefact, ReportGenerator, artefact_key
+
+__all__ = [
+    'Artefact',
+    'ReportGenerator',
+    'artefact_key'
+]
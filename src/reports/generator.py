@@ -0,0 +1,182 @@
+"""
+报告生成器：进程池渲染 + 按内容哈希缓存
+
+渲染（图片解码、绘制、编码）是 CPU 密集操作，放在独立的进程池中执行，
+不占用 Web 请求线程，也不受 GIL 影响。每个产物的缓存键是
+"产物类型 + 渲染版本 + 输入数据" 的 SHA-256：输入不变时直接返回已渲染的文件，
+田块新增检测后输入变化，自然生成新的产物。缓存键同时用作 HTTP ETag。
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+from ..config import Config
+from ..storage.sharding import ShardedDirectory
+
+# 渲染逻辑变化时递增，使旧缓存失效
+RENDER_VERSION = 1
+
+# 产物类型 -> (render 模块中的渲染函数, 扩展名, MIME 类型)
+KINDS = {
+    "thumbnail": ("render_thumbnail", ".jpg", "image/jpeg"),
+    "heatmap": ("render_heatmap", ".png", "image/png"),
+    "report": ("render_report", ".html", "text/html; charset=utf-8")
+}
+
+# 清理过期缓存的间隔（秒）
+PRUNE_INTERVAL = 3600
+
+Artefact = namedtuple("Artefact", ["path", "etag", "media_type"])
+
+
+def _render_job(kind: str, args: tuple, target: str):
+    """进程池中执行的渲染任务（渲染模块只在子进程中导入）"""
+    from . import render
+
+    getattr(render, KINDS[kind][0])(*args, target)
+
+
+def artefact_key(kind: str, inputs: Dict) -> str:
+    """
+    计算产物的缓存键
+
+    Args:
+        kind: 产物类型
+        inputs: 决定产物内容的全部输入（可 JSON 序列化）
+
+    Returns:
+        str: 十六进制 SHA-256
+    """
+    data = json.dumps([kind, RENDER_VERSION, inputs], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class ReportGenerator:
+    """渲染产物的进程池与缓存"""
+
+    def __init__(self, cache_dir: str = Config.REPORT_CACHE_DIR, workers: int = Config.REPORT_WORKERS,
+                 cache_days: int = Config.REPORT_CACHE_DAYS):
+        """
+        Args:
+            cache_dir: 渲染缓存目录
+            workers: 渲染进程数
+            cache_days: 缓存保留天数（按最近一次访问计）
+        """
+        self.cache = ShardedDirectory(cache_dir)
+        self.workers = max(1, workers)
+        self.cache_days = cache_days
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """按需创建进程池（在锁内调用）"""
+        if self._pool is None:
+            # Web 进程是多线程的，fork 出的子进程可能继承被其他线程持有的锁，改用 forkserver/spawn
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context(method))
+        return self._pool
+
+    def submit(self, kind: str, inputs: Dict, args: tuple) -> Future:
+        """
+        提交渲染任务；已缓存时返回已完成的 Future，相同产物正在渲染时返回同一个 Future
+
+        Args:
+            kind: 产物类型（thumbnail/heatmap/report）
+            inputs: 决定产物内容的输入，用于计算缓存键
+            args: 渲染函数的参数（不含输出路径），可包含不参与缓存键的文件路径等
+
+        Returns:
+            Future: 结果为 Artefact
+        """
+        key = artefact_key(kind, inputs)
+        _, ext, media_type = KINDS[kind]
+        artefact = Artefact(self.cache.path_for(key + ext, create=True), key, media_type)
+
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                return pending
+            if os.path.exists(artefact.path):
+                # 记录访问时间，清理时按最近访问保留
+                os.utime(artefact.path)
+                future = Future()
+                future.set_result(artefact)
+                return future
+
+            try:
+                job = self._get_pool().submit(_render_job, kind, args, artefact.path)
+            except BrokenProcessPool:
+                # 渲染进程异常退出（如内存不足被杀）后重建进程池
+                self._pool = None
+                job = self._get_pool().submit(_render_job, kind, args, artefact.path)
+
+            future = self._pending[key] = Future()
+
+        def done(job_future: Future):
+            with self._lock:
+                self._pending.pop(key, None)
+            if job_future.cancelled():
+                future.cancel()
+                return
+            error = job_future.exception()
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(artefact)
+
+        job.add_done_callback(done)
+        self._prune_if_due()
+        return future
+
+    def render(self, kind: str, inputs: Dict, args: tuple, wait: float = Config.REPORT_WAIT_TIMEOUT
+               ) -> Optional[Artefact]:
+        """
+        获取渲染产物，最多等待 wait 秒
+
+        Returns:
+            Optional[Artefact]: 渲染完成的产物，超时未完成返回None（渲染继续在后台进行）
+
+        Raises:
+            Exception: 渲染失败时抛出渲染进程中的异常
+        """
+        future = self.submit(kind, inputs, args)
+        try:
+            return future.result(timeout=wait)
+        except FutureTimeout:
+            return None
+
+    def pending(self) -> int:
+        """正在渲染的产物数量"""
+        return len(self._pending)
+
+    def _prune_if_due(self):
+        """删除超过保留期未被访问的缓存（每小时最多一次）"""
+        now = time.time()
+        with self._lock:
+            if now - self._last_prune < PRUNE_INTERVAL:
+                return
+            self._last_prune = now
+        cutoff = now - self.cache_days * 86400
+        for entry in self.cache.iter_files():
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                continue
+
+    def shutdown(self, wait: bool = True):
+        """关闭进程池"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
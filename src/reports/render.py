@@ -0,0 +1,294 @@
+"""
+报告渲染：标注缩略图、田块热力图与田块 HTML 报告
+
+本模块只在渲染进程池的子进程中导入（Web 进程不加载 PIL）。
+各函数把结果写入临时文件后原子替换到目标路径，由父进程直接发送文件，
+渲染结果不经过进程间传输。
+"""
+
+import html
+import math
+import os
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+from ..config import Config
+
+# 严重程度 -> 标注颜色
+SEVERITY_COLORS = {
+    "无": (46, 160, 67),
+    "轻微": (230, 190, 30),
+    "中等": (240, 130, 20),
+    "严重": (215, 40, 40)
+}
+UNKNOWN_COLOR = (130, 130, 130)
+# 没有中文字体时标注使用的英文名称
+SEVERITY_ASCII = {"无": "none", "轻微": "mild", "中等": "moderate", "严重": "severe"}
+
+# 常见的系统中文字体
+FONT_CANDIDATES = (
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc",
+    "/System/Library/Fonts/PingFang.ttc",
+    "C:/Windows/Fonts/msyh.ttc"
+)
+
+# 热力图网格边长（格）与每个检测点的扩散半径（格）
+HEATMAP_GRID = 48
+HEATMAP_SPREAD = 2
+# 平均严重程度 0 / 0.5 / 1 对应的颜色
+HEATMAP_COLORS = ((46, 160, 67), (240, 200, 30), (215, 40, 40))
+
+
+@lru_cache(maxsize=8)
+def _font(size: int):
+    """
+    加载指定字号的字体
+
+    Returns:
+        Tuple: (字体, 是否支持中文)
+    """
+    for path in (Config.REPORT_FONT_PATH,) + FONT_CANDIDATES:
+        if path and os.path.exists(path):
+            return ImageFont.truetype(path, size), True
+    return ImageFont.load_default(), False
+
+
+def _atomic_save(image: Image.Image, target: str, **options):
+    """保存到临时文件后原子替换，读取方不会看到写了一半的文件"""
+    temp_path = f"{target}.{os.getpid()}.tmp"
+    image.save(temp_path, **options)
+    os.replace(temp_path, target)
+
+
+def _label_lines(details: Dict, cjk: bool) -> List[str]:
+    """标注文字：病害与严重程度、置信度"""
+    severity = details.get("severity") or "未知"
+    if cjk:
+        first = f"{details.get('disease') or '未知'} · {severity}"
+    else:
+        first = f"{details.get('disease_id') or 'unknown'} / {SEVERITY_ASCII.get(severity, 'unknown')}"
+    lines = [first]
+    confidence = details.get("confidence")
+    if confidence:
+        lines.append(f"{'置信度' if cjk else 'confidence'} {confidence:.0%}")
+    return lines
+
+
+def render_thumbnail(image_path: str, details: Dict, size: int, target: str):
+    """
+    渲染标注缩略图：按严重程度着色的边框 + 底部病害标注
+
+    Args:
+        image_path: 原图路径
+        details: 结构化病害信息（disease、disease_id、severity、confidence）
+        size: 最长边像素
+        target: 输出 JPEG 路径
+    """
+    with Image.open(image_path) as img:
+        # JPEG 在解码阶段直接缩小，不完整解码无人机原图
+        img.draft("RGB", (size, size))
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        img.thumbnail((size, size))
+
+    color = SEVERITY_COLORS.get(details.get("severity"), UNKNOWN_COLOR)
+    width, height = img.size
+    border = max(3, min(width, height) // 60)
+    font, cjk = _font(max(12, min(width, height) // 18))
+    lines = _label_lines(details, cjk)
+
+    overlay = Image.new("RGBA", img.size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    line_height = font.getbbox("Ag")[3] + border
+    banner_top = height - border - line_height * len(lines) - border
+    draw.rectangle((0, banner_top, width, height), fill=(0, 0, 0, 150))
+    for index, line in enumerate(lines):
+        draw.text((border * 3, banner_top + border + index * line_height), line, font=font, fill=(255, 255, 255, 255))
+    draw.rectangle((0, 0, width - 1, height - 1), outline=color + (255,), width=border)
+
+    annotated = Image.alpha_composite(img.convert("RGBA"), overlay).convert("RGB")
+    _atomic_save(annotated, target, format="JPEG", quality=85, optimize=True, progressive=True)
+
+
+def _heat_color(value: float):
+    """0~1 的平均严重程度映射为 绿-黄-红 渐变"""
+    value = min(max(value, 0.0), 1.0) * (len(HEATMAP_COLORS) - 1)
+    index = min(int(value), len(HEATMAP_COLORS) - 2)
+    t = value - index
+    low, high = HEATMAP_COLORS[index], HEATMAP_COLORS[index + 1]
+    return tuple(int(a + (b - a) * t) for a, b in zip(low, high))
+
+
+def render_heatmap(points: Sequence[Sequence[float]], polygon: Optional[Sequence[Sequence[float]]],
+                   size: int, target: str):
+    """
+    渲染田块病害热力图
+
+    每个检测点按高斯核扩散到周围网格，格子颜色为覆盖到该格的检测的加权平均严重程度，
+    透明度随检测密度增加；叠加田块边界与检测点位置。
+
+    Args:
+        points: 检测点 [[lat, lon, severity(0-3), confidence], ...]
+        polygon: 田块边界 [[lat, lon], ...]，未登记时为None
+        size: 最长边像素
+        target: 输出 PNG 路径
+    """
+    coords = [(p[0], p[1]) for p in points] + [(v[0], v[1]) for v in polygon or ()]
+    if not coords:
+        image = Image.new("RGB", (size, size // 2), (245, 245, 245))
+        font, cjk = _font(max(12, size // 24))
+        ImageDraw.Draw(image).text((size // 20, size // 5), "暂无定位数据" if cjk else "no located detections",
+                                   font=font, fill=(120, 120, 120))
+        _atomic_save(image, target, format="PNG", optimize=True)
+        return
+
+    min_lat, max_lat = min(c[0] for c in coords), max(c[0] for c in coords)
+    min_lon, max_lon = min(c[1] for c in coords), max(c[1] for c in coords)
+    # 经度按纬度余弦缩放，保持实际长宽比；范围过小时（单点）给一个最小跨度
+    cos_lat = max(math.cos(math.radians((min_lat + max_lat) / 2)), 1e-6)
+    span_y = max(max_lat - min_lat, 1e-4) * 1.1
+    span_x = max((max_lon - min_lon) * cos_lat, 1e-4) * 1.1
+    center_lat, center_lon = (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+    scale = size / max(span_x, span_y)
+    width, height = max(1, int(span_x * scale)), max(1, int(span_y * scale))
+
+    def project(lat: float, lon: float):
+        x = ((lon - center_lon) * cos_lat + span_x / 2) * scale
+        y = (span_y / 2 - (lat - center_lat)) * scale
+        return x, y
+
+    grid = HEATMAP_GRID
+    cell_w, cell_h = width / grid, height / grid
+    weight_sum = [[0.0] * grid for _ in range(grid)]
+    severity_sum = [[0.0] * grid for _ in range(grid)]
+    for lat, lon, severity, confidence in points:
+        x, y = project(lat, lon)
+        gx, gy = int(x / cell_w), int(y / cell_h)
+        evidence = confidence or 0.5
+        for dy in range(-HEATMAP_SPREAD, HEATMAP_SPREAD + 1):
+            for dx in range(-HEATMAP_SPREAD, HEATMAP_SPREAD + 1):
+                cx, cy = gx + dx, gy + dy
+                if 0 <= cx < grid and 0 <= cy < grid:
+                    w = evidence * math.exp(-(dx * dx + dy * dy) / 2)
+                    weight_sum[cy][cx] += w
+                    severity_sum[cy][cx] += w * (severity or 0) / 3
+
+    densest = max(max(row) for row in weight_sum) or 1.0
+    image = Image.new("RGBA", (width, height), (245, 245, 245, 255))
+    overlay = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    for cy in range(grid):
+        for cx in range(grid):
+            weight = weight_sum[cy][cx]
+            if weight <= 0:
+                continue
+            alpha = int(60 + 160 * min(1.0, weight / densest))
+            box = (cx * cell_w, cy * cell_h, (cx + 1) * cell_w, (cy + 1) * cell_h)
+            draw.rectangle(box, fill=_heat_color(severity_sum[cy][cx] / weight) + (alpha,))
+
+    if polygon:
+        outline = [project(v[0], v[1]) for v in polygon]
+        draw.line(outline + outline[:1], fill=(40, 40, 40, 255), width=max(2, size // 200))
+    radius = max(2, size // 160)
+    for lat, lon, severity, _ in points:
+        x, y = project(lat, lon)
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius),
+                     outline=(30, 30, 30, 200), fill=_heat_color((severity or 0) / 3) + (255,))
+
+    _atomic_save(Image.alpha_composite(image, overlay).convert("RGB"), target, format="PNG", optimize=True)
+
+
+REPORT_STYLE = """
+body { font-family: "Noto Sans CJK SC", "PingFang SC", "Microsoft YaHei", sans-serif; margin: 24px; color: #222; }
+h1 { font-size: 22px; margin-bottom: 4px; }
+.meta { color: #666; font-size: 13px; }
+.cards { display: flex; flex-wrap: wrap; gap: 12px; margin: 16px 0; }
+.card { border: 1px solid #ddd; border-radius: 6px; padding: 10px 14px; min-width: 120px; }
+.card b { display: block; font-size: 20px; }
+table { border-collapse: collapse; width: 100%; margin: 8px 0 20px; font-size: 13px; }
+th, td { border: 1px solid #ddd; padding: 4px 8px; text-align: left; }
+th { background: #f5f5f5; }
+.frames { display: flex; flex-wrap: wrap; gap: 8px; }
+.frames figure { margin: 0; width: 180px; font-size: 12px; }
+.frames img, .heatmap { max-width: 100%; }
+@media print { body { margin: 0; } .frames figure { break-inside: avoid; } }
+"""
+
+
+def _format_ts(ts: Optional[float]) -> str:
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M") if ts else "-"
+
+
+def _table(headers: Sequence[str], rows: Sequence[Sequence]) -> str:
+    head = "".join(f"<th>{html.escape(str(h))}</th>" for h in headers)
+    body = "".join(
+        "<tr>" + "".join(f"<td>{html.escape(str(cell))}</td>" for cell in row) + "</tr>" for row in rows
+    )
+    return f"<table><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>"
+
+
+def render_report(context: Dict, target: str):
+    """
+    渲染田块 HTML 报告（打印样式适配 A4，可直接在浏览器中另存为 PDF）
+
+    Args:
+        context: 报告数据（field_id、summary、history、frames、heatmap_url、thumbnail_url）
+        target: 输出 HTML 路径
+    """
+    esc = html.escape
+    summary = context.get("summary") or {}
+    field = summary.get("field") or {}
+    diagnosis = summary.get("diagnosis") or {}
+    leading = diagnosis.get("leading_disease") or {}
+    title = field.get("name") or context["field_id"]
+
+    cards = [
+        ("检测帧数", summary.get("frames", 0)),
+        ("发病率", f"{summary.get('disease_rate', 0):.1%}"),
+        ("最高严重程度", summary.get("max_severity", "-")),
+        ("趋势", summary.get("trend", "-")),
+        ("主要病害", leading.get("disease", "-"))
+    ]
+    parts = [
+        "<!DOCTYPE html><html lang=\"zh-CN\"><head><meta charset=\"utf-8\">",
+        f"<title>{esc(title)} 田块报告</title><style>{REPORT_STYLE}</style></head><body>",
+        f"<h1>{esc(title)} 田块报告</h1>",
+        f"<div class=\"meta\">田块 {esc(context['field_id'])} · 作物 {esc(str(field.get('crop_type') or '-'))}"
+        f" · 面积 {esc(str(field.get('area_mu') or '-'))} 亩 · 数据截至 {esc(_format_ts(summary.get('last_seen')))}</div>",
+        "<div class=\"cards\">",
+        "".join(f"<div class=\"card\">{esc(label)}<b>{esc(str(value))}</b></div>" for label, value in cards),
+        "</div>",
+        "<h2>病害分布热力图</h2>",
+        f"<img class=\"heatmap\" src=\"{esc(context['heatmap_url'])}\" alt=\"heatmap\">",
+        "<h2>病害统计</h2>",
+        _table(("病害", "帧数"), sorted((summary.get("disease_counts") or {}).items(), key=lambda item: -item[1])),
+        "<h2>按日历史</h2>",
+        _table(("日期", "帧数", "发病帧数", "最高严重程度"),
+               [(d["day"], d["frames"], d["diseased_frames"], d["max_severity"]) for d in context.get("history", [])])
+    ]
+
+    frames = [f for f in context.get("frames", []) if f.get("result_file")]
+    if frames:
+        parts.append("<h2>最近检测</h2><div class=\"frames\">")
+        for frame in frames:
+            src = context["thumbnail_url"].format(result_file=frame["result_file"])
+            caption = f"{_format_ts(frame.get('ts'))} {frame.get('disease') or '-'} {frame.get('severity') or ''}"
+            parts.append(f"<figure><img src=\"{esc(src)}\" loading=\"lazy\" alt=\"\">"
+                         f"<figcaption>{esc(caption)}</figcaption></figure>")
+        parts.append("</div>")
+
+    records = summary.get("service_records") or []
+    if records:
+        parts.append("<h2>服务记录</h2>")
+        parts.append(_table(("时间", "类型", "备注"), [(_format_ts(r["ts"]), r["kind"], r["note"]) for r in records]))
+    parts.append("</body></html>")
+
+    temp_path = f"{target}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write("".join(parts))
+    os.replace(temp_path, target)
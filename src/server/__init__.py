@@ -0,0 +1,13 @@
+"""
+Web 服务支撑模块
+"""
+
+from .lifecycle import InFlightTracker, warm_up
+from . import responses, scheduler
+
+__all__ = [
+    'InFlightTracker',
+    'warm_up',
+    'responses',
+    'scheduler'
+]
@@ -0,0 +1,98 @@
+"""
+预警接口：检测结果接入预警引擎、查询最近预警与 SSE 推送，WSGI 与 ASGI 服务共用
+
+每个 worker 进程维护自己的滑动窗口，多进程部署时各进程独立计数。
+"""
+
+import queue
+import threading
+from typing import Dict, Iterator, Mapping, Optional, Tuple
+
+from ..alerts import AlertEngine, FileSink, SSEChannel, WebhookSink
+from ..config import Config
+from .field_api import parse_captured_at, parse_location
+
+# SSE 保活间隔（秒），防止代理断开空闲连接
+SSE_KEEPALIVE_SECONDS = 15
+
+sse_channel = SSEChannel()
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> AlertEngine:
+    """获取当前进程的预警引擎，输出按配置组装"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                sinks = [sse_channel]
+                if Config.ALERT_LOG_PATH:
+                    sinks.append(FileSink(Config.ALERT_LOG_PATH))
+                if Config.ALERT_WEBHOOK_URL:
+                    sinks.append(WebhookSink(Config.ALERT_WEBHOOK_URL))
+                _engine = AlertEngine(sinks)
+    return _engine
+
+
+def observe_detection(result: Dict, form: Mapping[str, str], crop_type: str):
+    """
+    将检测结果交给预警引擎
+
+    Args:
+        result: 检测结果
+        form: 表单字段（field_id、lat、lon、captured_at 可选）
+        crop_type: 作物类型
+    """
+    if not Config.ALERTS_ENABLED:
+        return
+
+    lat, lon = parse_location(form)
+    get_engine().observe(
+        result,
+        crop_type,
+        field_id=form.get('field_id') or None,
+        lat=lat,
+        lon=lon,
+        ts=parse_captured_at(form)
+    )
+
+
+def alerts_payload(args: Mapping[str, str]) -> Tuple[Dict, int]:
+    """最近的预警与引擎指标（含评估延迟）"""
+    engine = get_engine()
+    try:
+        limit = int(args.get('limit', 20))
+    except ValueError:
+        limit = 20
+    metrics = engine.metrics()
+    metrics['sse_subscribers'] = sse_channel.subscriber_count
+    return {
+        'status': 'success',
+        'data': {
+            'alerts': engine.recent_alerts(limit),
+            'metrics': metrics
+        }
+    }, 200
+
+
+def next_event(subscriber: queue.Queue) -> str:
+    """阻塞等待下一条预警并编码为 SSE 消息，超时返回保活注释"""
+    alert: Optional[Dict]
+    try:
+        alert = subscriber.get(timeout=SSE_KEEPALIVE_SECONDS)
+    except queue.Empty:
+        alert = None
+    return SSEChannel.format_event(alert)
+
+
+def event_stream() -> Iterator[str]:
+    """同步 SSE 生成器（WSGI 使用），客户端断开时自动退订"""
+    subscriber = sse_channel.subscribe()
+    try:
+        yield ": connected\n\n"
+        while True:
+            yield next_event(subscriber)
+    finally:
+        sse_channel.unsubscribe(subscriber)
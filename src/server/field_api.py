@@ -0,0 +1,201 @@
+"""
+农田档案接口：检测结果归档与田块查询，WSGI 与 ASGI 服务共用
+
+各函数返回 (响应体, HTTP状态码)，由具体框架负责序列化。
+"""
+
+import math
+import threading
+import time
+from typing import Dict, Mapping, Optional, Tuple
+
+from ..config import Config
+from ..detectors.result import is_real_diagnosis
+from ..storage.field_archive import FieldArchive
+from ..utils.metadata import MAX_CAPTURED_AT
+from .responses import error_payload
+
+# 历史帧明细单次返回上限
+DEFAULT_FRAMES_LIMIT = 500
+MAX_FRAMES_LIMIT = 5000
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_archive() -> FieldArchive:
+    """获取当前进程的农田档案实例"""
+    global _archive
+    if _archive is None:
+        with _archive_lock:
+            if _archive is None:
+                _archive = FieldArchive()
+    return _archive
+
+
+def parse_location(form: Mapping[str, str]) -> Tuple[Optional[float], Optional[float]]:
+    """
+    解析表单中的拍摄位置 lat/lon，缺失任一项时返回 (None, None)
+
+    Raises:
+        ValueError: 不是数字，或超出纬度 [-90, 90]、经度 [-180, 180] 范围（含 nan/inf）
+    """
+    lat, lon = form.get('lat'), form.get('lon')
+    if not lat or not lon:
+        return None, None
+    lat, lon = float(lat), float(lon)
+    # nan 与任何数比较都为 False，同样被拒绝
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError(f'经纬度超出范围: {lat}, {lon}')
+    return lat, lon
+
+
+def parse_captured_at(form: Mapping[str, str]) -> Optional[float]:
+    """
+    解析表单中的拍摄时间 captured_at（Unix 时间戳），缺失时返回None
+
+    Raises:
+        ValueError: 不是数字或不是有效的时间戳
+    """
+    captured_at = form.get('captured_at')
+    if not captured_at:
+        return None
+    ts = float(captured_at)
+    if not (math.isfinite(ts) and 0 <= ts <= MAX_CAPTURED_AT):
+        raise ValueError(f'拍摄时间无效: {captured_at}')
+    return ts
+
+
+def validate_form(form: Mapping[str, str]) -> Optional[Tuple[Dict, int]]:
+    """
+    检测前校验表单中的位置与拍摄时间，避免付费检测完成后才因格式错误失败
+
+    Args:
+        form: 表单字段
+
+    Returns:
+        Optional[Tuple[Dict, int]]: 不合法时返回 (错误响应体, 400)，合法返回None
+    """
+    try:
+        parse_location(form)
+    except ValueError:
+        return error_payload('lat、lon 必须为有效的纬度（-90~90）与经度（-180~180）'), 400
+    try:
+        parse_captured_at(form)
+    except ValueError:
+        return error_payload('captured_at 必须为 Unix 时间戳（秒）'), 400
+    return None
+
+
+def record_detection(result: Dict, form: Mapping[str, str], crop_type: str,
+                     result_filename: str) -> Optional[int]:
+    """
+    检测请求携带 field_id 时，将结果写入田块档案
+
+    Args:
+        result: 检测结果
+        form: 表单字段（field_id、flight_id、captured_at、lat、lon 可选）
+        crop_type: 作物类型
+        result_filename: 结果文件名
+
+    Returns:
+        Optional[int]: 帧ID，未归档返回None
+    """
+    field_id = form.get('field_id')
+    if not Config.FIELD_ARCHIVE_ENABLED or not field_id:
+        return None
+    # 质量门控拒绝的帧没有可用的诊断；模拟与待同步的临时结果是随机病害，同样不计入田块档案
+    if not is_real_diagnosis(result):
+        return None
+
+    lat, lon = parse_location(form)
+    return get_archive().record_frame(
+        field_id,
+        result,
+        ts=parse_captured_at(form),
+        flight_id=form.get('flight_id') or None,
+        result_file=result_filename,
+        crop_type=crop_type,
+        lat=lat,
+        lon=lon
+    )
+
+
+def _parse_time_range(args: Mapping[str, str]) -> Tuple[Optional[float], Optional[float]]:
+    """解析 start/end 查询参数（Unix 时间戳）"""
+    start = args.get('start')
+    end = args.get('end')
+    return (float(start) if start else None, float(end) if end else None)
+
+
+def field_summary(field_id: str) -> Tuple[Dict, int]:
+    """田块汇总：病害计数、最高严重程度、趋势"""
+    summary = get_archive().get_summary(field_id)
+    if summary is None:
+        return error_payload(f'田块不存在或暂无数据: {field_id}'), 404
+    summary['service_records'] = get_archive().get_service_records(field_id, limit=20)
+    return {'status': 'success', 'data': summary}, 200
+
+
+def field_history(field_id: str, args: Mapping[str, str]) -> Tuple[Dict, int]:
+    """田块整季按日历史；frames=1 时附带帧明细"""
+    try:
+        start, end = _parse_time_range(args)
+    except ValueError:
+        return error_payload('start/end 必须为时间戳'), 400
+    try:
+        limit = int(args.get('limit', DEFAULT_FRAMES_LIMIT))
+    except (TypeError, ValueError):
+        return error_payload('limit 必须为整数'), 400
+    if limit < 1:
+        return error_payload('limit 必须为正整数'), 400
+
+    query_start = time.perf_counter()
+    archive = get_archive()
+    data = {
+        'field_id': field_id,
+        'days': archive.get_season_history(field_id, start, end)
+    }
+    if args.get('frames') == '1':
+        data['frames'] = archive.get_frames(field_id, start, end, limit=min(limit, MAX_FRAMES_LIMIT))
+    data['query_time_ms'] = round((time.perf_counter() - query_start) * 1000, 2)
+    return {'status': 'success', 'data': data}, 200
+
+
+def flight_diagnosis(flight_id: str) -> Tuple[Dict, int]:
+    """航次整体诊断：该航次所有帧的共识结论"""
+    diagnosis = get_archive().get_diagnosis('flight', flight_id)
+    if diagnosis is None:
+        return error_payload(f'航次不存在或暂无可用诊断: {flight_id}'), 404
+    return {'status': 'success', 'data': {'flight_id': flight_id, 'diagnosis': diagnosis}}, 200
+
+
+def register_field(payload: Optional[Dict]) -> Tuple[Dict, int]:
+    """登记或更新田块基础信息"""
+    if not payload or not payload.get('field_id'):
+        return error_payload('缺少 field_id'), 400
+
+    try:
+        area = float(payload['area_mu']) if payload.get('area_mu') is not None else None
+    except (TypeError, ValueError):
+        return error_payload('area_mu 必须为数字'), 400
+
+    polygon = payload.get('polygon')
+    if polygon is not None:
+        try:
+            polygon = [[float(point[0]), float(point[1])] for point in polygon]
+        except (TypeError, ValueError, IndexError):
+            return error_payload('polygon 必须为 [[lat, lon], ...] 格式'), 400
+        if len(polygon) < 3:
+            return error_payload('polygon 至少需要3个顶点'), 400
+
+    field = get_archive().upsert_field(
+        payload['field_id'],
+        name=payload.get('name'),
+        crop_type=payload.get('crop_type'),
+        area_mu=area,
+        owner=payload.get('owner'),
+        contact=payload.get('contact'),
+        polygon=polygon
+    )
+    return {'status': 'success', 'data': field}, 200
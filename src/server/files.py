@@ -0,0 +1,60 @@
+"""
+上传与结果文件的定位：分片目录 + 归档回查，WSGI 与 ASGI 服务共用
+"""
+
+import os
+import threading
+from typing import Optional
+
+from ..config import Config
+from ..storage.retention import RetentionManager
+from ..storage.sharding import ShardedDirectory
+
+
+uploads = ShardedDirectory(Config.UPLOAD_DIR)
+results = ShardedDirectory(Config.RESULTS_DIR)
+
+_retention = None
+_retention_lock = threading.Lock()
+
+
+def get_retention() -> RetentionManager:
+    """获取当前进程的保留策略管理器"""
+    global _retention
+    if _retention is None:
+        with _retention_lock:
+            if _retention is None:
+                offline_queue = None
+                if Config.OFFLINE_QUEUE_ENABLED:
+                    # 与检测器的离线队列共用同一数据库，待同步的上传不会被清理
+                    from ..storage.offline_queue import OfflineQueue
+                    offline_queue = OfflineQueue()
+                _retention = RetentionManager(offline_queue=offline_queue)
+    return _retention
+
+
+def start_retention():
+    """按配置启动后台保留策略线程"""
+    if Config.RETENTION_ENABLED:
+        get_retention().start()
+
+
+def read_archived_result(filename: str) -> Optional[bytes]:
+    """
+    从每日归档中读取已压缩的结果文件
+
+    Args:
+        filename: 结果文件名
+
+    Returns:
+        Optional[bytes]: 文件内容，不存在返回None
+    """
+    return get_retention().read_archived_result(filename)
+
+
+def discard_upload(filepath: str):
+    """删除未进入检测的上传文件（如被调度器拒绝），避免客户端重试时重复堆积"""
+    try:
+        os.remove(filepath)
+    except OSError:
+        pass
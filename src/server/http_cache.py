@@ -0,0 +1,272 @@
+"""
+HTTP 缓存：强 ETag、Cache-Control、条件请求（304）、gzip/brotli 压缩与热点文件内存缓存
+
+- 上传图片按内容哈希命名（见 StreamingUpload），内容永不改变：ETag 取文件名中的哈希，
+  并声明 immutable，小程序再次打开同一张图片时不再发起请求
+- 结果 JSON 的 ETag 为内容的 SHA-256：最终结果同样不会再变，声明 immutable；
+  离线排队期间的临时结果会被真实结果替换，只允许带 ETag 重新验证（no-cache）
+- 结果按 Accept-Encoding 协商 br（需安装 brotli）或 gzip；各编码使用不同的强 ETag
+- 频繁访问的结果缓存在内存中（含压缩后的版本），避免重复读盘、计算哈希与压缩；
+  第二次访问才放入缓存，一次性的批量下载不会挤掉热点
+"""
+
+import gzip
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Mapping, Optional, Tuple
+
+from ..config import Config
+from . import files
+
+# 内容不会改变的文件：缓存一年
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# 内容可能被替换的文件：每次使用前向服务器验证
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+JSON_CONTENT_TYPE = 'application/json; charset=utf-8'
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# 编码 -> ETag 后缀
+ENCODING_SUFFIXES = {'br': '-br', 'gzip': '-gz'}
+
+# 上传文件名以内容哈希前32位开头
+UPLOAD_NAME_PATTERN = re.compile(r'^([0-9a-f]{32})_')
+# 临时结果的标记（结果文件以 indent=2 写入）
+PROVISIONAL_MARKER = b'"provisional": true'
+
+# 只访问过一次的键最多记录多少个
+DOORKEEPER_SIZE = 4096
+
+_brotli = None
+
+
+def _load_brotli():
+    """按需导入可选依赖 brotli，未安装时返回None"""
+    global _brotli
+    if _brotli is None:
+        try:
+            import brotli
+        except ImportError:
+            brotli = False
+        _brotli = brotli
+    return _brotli or None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    判断条件请求的 If-None-Match 是否命中 ETag（忽略编码后缀，同一内容的任一编码都算命中）
+
+    Args:
+        if_none_match: If-None-Match 请求头
+        etag: 内容的 ETag（不含引号与编码后缀）
+
+    Returns:
+        bool: 命中时应返回 304
+    """
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(','):
+        tag = tag.strip().removeprefix('W/').strip('"')
+        if tag == '*' or tag == etag or (tag.startswith(etag) and tag[len(etag):] in ENCODING_SUFFIXES.values()):
+            return True
+    return False
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    根据 Accept-Encoding 选择压缩编码，优先 br，其次 gzip
+
+    Args:
+        accept_encoding: Accept-Encoding 请求头
+
+    Returns:
+        Optional[str]: "br"、"gzip" 或None（不压缩）
+    """
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    if 'br' in accepted and _load_brotli() is not None:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+class CachedFile:
+    """一个文件的内容、ETag 与按需生成的压缩版本"""
+
+    __slots__ = ('body', 'etag', 'final', '_encoded')
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = hashlib.sha256(body).hexdigest()
+        self.final = PROVISIONAL_MARKER not in body
+        self._encoded: Dict[str, bytes] = {}
+
+    def encode(self, encoding: Optional[str]) -> bytes:
+        """获取指定编码的内容（压缩结果随缓存项保留）"""
+        if encoding is None or len(self.body) < Config.HTTP_COMPRESS_MIN_BYTES:
+            return self.body
+        data = self._encoded.get(encoding)
+        if data is None:
+            if encoding == 'br':
+                data = _load_brotli().compress(self.body, quality=BROTLI_QUALITY)
+            else:
+                data = gzip.compress(self.body, compresslevel=GZIP_LEVEL, mtime=0)
+            self._encoded[encoding] = data
+        return data
+
+
+class HotFileCache:
+    """
+    按字节数限制的 LRU 内存缓存，第二次访问时才写入
+
+    容量只计原始内容；压缩版本通常只有原始内容的一小部分，不单独计入。
+    """
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[tuple, CachedFile]' = OrderedDict()
+        self._seen: 'OrderedDict[tuple, None]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple, loader) -> Optional[CachedFile]:
+        """
+        获取缓存项，未命中时调用 loader() 读取内容
+
+        Args:
+            key: 缓存键（文件路径需包含修改时间与大小，文件被替换后自然失效）
+            loader: 返回文件内容的函数，文件不存在时返回None
+
+        Returns:
+            Optional[CachedFile]: 缓存项，文件不存在时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        body = loader()
+        if body is None:
+            return None
+        entry = CachedFile(body)
+        if len(body) > self.max_entry_bytes:
+            return entry
+
+        with self._lock:
+            if key not in self._seen:
+                self._seen[key] = None
+                if len(self._seen) > DOORKEEPER_SIZE:
+                    self._seen.popitem(last=False)
+                return entry
+            del self._seen[key]
+            if key not in self._entries:
+                self._entries[key] = entry
+                self.size += len(body)
+                while self.size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.size -= len(evicted.body)
+        return entry
+
+    def stats(self) -> Dict:
+        """缓存指标"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
+
+
+hot_files = HotFileCache(Config.HTTP_CACHE_MAX_BYTES, Config.HTTP_CACHE_MAX_ENTRY_BYTES)
+
+
+def _read_file(path: str) -> Optional[bytes]:
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def result_response(filename: str, request_headers: Mapping[str, str]) -> Optional[Tuple[int, bytes, Dict]]:
+    """
+    构造结果文件的响应（含已归档的结果）
+
+    Args:
+        filename: 结果文件名
+        request_headers: 请求头（读取 If-None-Match 与 Accept-Encoding）
+
+    Returns:
+        Optional[Tuple[int, bytes, Dict]]: (状态码 200/304, 响应体, 响应头)，文件不存在返回None
+    """
+    path = files.results.locate(filename)
+    if path is not None:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        entry = hot_files.get((path, stat.st_mtime_ns, stat.st_size), lambda: _read_file(path))
+    else:
+        # 归档后的结果不会再改变
+        entry = hot_files.get(('archive', filename), lambda: files.read_archived_result(filename))
+    if entry is None:
+        return None
+
+    headers = {
+        'Cache-Control': IMMUTABLE_CACHE_CONTROL if entry.final else REVALIDATE_CACHE_CONTROL,
+        'Vary': 'Accept-Encoding'
+    }
+    encoding = negotiate_encoding(request_headers.get('Accept-Encoding'))
+    body = entry.encode(encoding)
+    if body is entry.body:
+        encoding = None
+    headers['ETag'] = f'"{entry.etag}{ENCODING_SUFFIXES.get(encoding, "")}"'
+
+    if etag_matches(request_headers.get('If-None-Match'), entry.etag):
+        return 304, b'', headers
+
+    headers['Content-Type'] = JSON_CONTENT_TYPE
+    if encoding is not None:
+        headers['Content-Encoding'] = encoding
+    return 200, body, headers
+
+
+def upload_cache_headers(filename: str) -> Tuple[Optional[str], Dict]:
+    """
+    上传图片的 ETag 与缓存头
+
+    Args:
+        filename: 上传文件名
+
+    Returns:
+        Tuple[Optional[str], Dict]: (ETag（不含引号），响应头)；
+        早期未按内容哈希命名的文件返回 (None, {})，由框架按修改时间生成 ETag
+    """
+    match = UPLOAD_NAME_PATTERN.match(filename)
+    if match is None:
+        return None, {}
+    return match.group(1), {'Cache-Control': IMMUTABLE_CACHE_CONTROL}
@@ -0,0 +1,88 @@
+"""
+服务生命周期：进行中请求跟踪、优雅退出与启动预热
+"""
+
+import threading
+import time
+from typing import Dict
+
+
+class InFlightTracker:
+    """统计进行中的检测请求，退出时等待其完成"""
+
+    def __init__(self):
+        self._count = 0
+        self._draining = False
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            self._count += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        with self._cond:
+            self._count -= 1
+            if self._count == 0:
+                self._cond.notify_all()
+        return False
+
+    @property
+    def count(self) -> int:
+        """当前进行中的请求数"""
+        return self._count
+
+    @property
+    def draining(self) -> bool:
+        """是否处于排空（准备退出）状态"""
+        return self._draining
+
+    def start_draining(self):
+        """
+        进入排空状态（不等待），此后新的检测请求返回 503
+
+        收到退出信号时在信号处理函数中调用，只设置标志、不获取锁。
+        """
+        self._draining = True
+
+    def drain(self, timeout: float) -> bool:
+        """
+        进入排空状态并等待进行中的请求完成
+
+        Args:
+            timeout: 最长等待秒数
+
+        Returns:
+            bool: 是否在超时前全部完成
+        """
+        deadline = time.monotonic() + timeout
+        self.start_draining()
+        with self._cond:
+            while self._count > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+
+def warm_up(detector) -> Dict:
+    """
+    启动预热：提前完成检测器构造、提示词编译和统计存储连接，
+    避免首个请求承担冷启动开销
+
+    Args:
+        detector: HybridDiseaseDetector 实例
+
+    Returns:
+        Dict: 预热耗时信息
+    """
+    start_time = time.time()
+
+    from ..detectors.prompts import KNOWN_CROPS, get_full_prompt
+    for crop_type in KNOWN_CROPS:
+        get_full_prompt(crop_type)
+
+    detector.get_stats()
+
+    return {"warm_up_time": round(time.time() - start_time, 3)}
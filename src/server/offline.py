@@ -0,0 +1,75 @@
+"""
+离线队列与结果存储的衔接：启动同步线程、关联临时结果并回填真实结果
+"""
+
+from typing import Dict, Mapping, Optional
+
+from ..storage.offline_queue import OfflineSyncWorker
+from . import alert_api, field_api, responses
+
+# 同步后写入田块档案与预警所需的表单字段
+HINT_KEYS = ('field_id', 'flight_id', 'lat', 'lon', 'captured_at')
+
+
+def start_offline_sync(detector) -> Optional[OfflineSyncWorker]:
+    """
+    为检测器启动离线队列同步线程
+
+    Args:
+        detector: HybridDiseaseDetector 实例
+
+    Returns:
+        Optional[OfflineSyncWorker]: 同步线程，未启用离线队列或无API时返回None
+    """
+    if detector.offline_queue is None or detector.qwen_detector is None:
+        return None
+
+    worker = OfflineSyncWorker(detector.offline_queue, detector.qwen_detector, on_result=_reconcile)
+    worker.start()
+    return worker
+
+
+def _apply(result_filename: str, result: Dict, hints: Mapping[str, str], crop_type: str):
+    """
+    用真实结果回填结果文件，并补做上传时因结果是临时的而跳过的田块归档与预警
+
+    Args:
+        result_filename: 临时结果文件名
+        result: 真实检测结果
+        hints: 上传时合并后的表单提示
+        crop_type: 作物类型
+    """
+    merged = responses.reconcile_result(result_filename, result)
+    if merged is None:
+        return
+    print(f"🔄 已用真实结果替换临时结果: {result_filename}")
+    field_api.record_detection(merged, hints, crop_type, result_filename)
+    alert_api.observe_detection(merged, hints, crop_type)
+
+
+def _reconcile(item: Dict, result: Dict):
+    """同步成功后回填结果文件；结果文件尚未关联时由 attach_provisional 负责"""
+    if item.get("result_file"):
+        _apply(item["result_file"], result, item.get("hints") or {}, item["crop_type"])
+
+
+def attach_provisional(detector, result: Dict, result_filename: str, form: Mapping[str, str],
+                       crop_type: str):
+    """
+    将临时结果文件与表单提示关联到队列记录；若真实结果已先同步完成，立即回填
+
+    Args:
+        detector: HybridDiseaseDetector 实例
+        result: 检测结果
+        result_filename: 已保存的结果文件名
+        form: 合并 EXIF 后的表单字段
+        crop_type: 作物类型
+    """
+    queue_id = result.get("queue_id")
+    if queue_id is None or detector.offline_queue is None:
+        return
+
+    hints = {key: str(form[key]) for key in HINT_KEYS if form.get(key) is not None}
+    synced = detector.offline_queue.attach_result(queue_id, result_filename, hints)
+    if synced is not None:
+        _apply(result_filename, synced, hints, crop_type)
@@ -0,0 +1,102 @@
+"""
+空间查询接口：矩形范围、半径范围与 k 近邻查询，WSGI 与 ASGI 服务共用
+
+查询参数：
+- target: detections（检测点，默认）或 fields（田块）
+- mode: bbox、radius（默认）或 knn
+- bbox: min_lat,min_lon,max_lat,max_lon（mode=bbox）
+- lat/lon 或 field_id: 查询中心（mode=radius/knn）
+- radius_km: 半径，默认2公里；k: 近邻数量，默认10
+- disease、min_severity（无/轻微/中等/严重）、days: 检测点过滤条件
+"""
+
+import time
+from typing import Dict, Mapping, Tuple
+
+from ..storage.field_archive import SEVERITY_LEVELS, SEVERITY_NAMES
+from .field_api import get_archive, parse_location
+from .responses import error_payload
+
+DEFAULT_RADIUS_KM = 2.0
+DEFAULT_K = 10
+MAX_LIMIT = 5000
+
+
+def _detection_filters(args: Mapping[str, str]) -> Dict:
+    """解析检测点过滤条件"""
+    filters = {}
+    if args.get('disease'):
+        filters['disease'] = args['disease']
+    min_severity = args.get('min_severity')
+    if min_severity:
+        if min_severity in SEVERITY_LEVELS:
+            filters['min_severity'] = SEVERITY_LEVELS[min_severity]
+        else:
+            filters['min_severity'] = int(min_severity)
+    if args.get('days'):
+        filters['since'] = time.time() - float(args['days']) * 86400
+    return filters
+
+
+def spatial_query(args: Mapping[str, str]) -> Tuple[Dict, int]:
+    """执行一次空间查询"""
+    target = args.get('target', 'detections')
+    mode = args.get('mode', 'radius')
+    if target not in ('detections', 'fields'):
+        return error_payload(f'不支持的查询对象: {target}'), 400
+    if mode not in ('bbox', 'radius', 'knn'):
+        return error_payload(f'不支持的查询方式: {mode}'), 400
+
+    spatial = get_archive().spatial
+    try:
+        filters = _detection_filters(args) if target == 'detections' else {}
+        if target == 'detections' and args.get('limit'):
+            filters['limit'] = min(int(args['limit']), MAX_LIMIT)
+
+        if mode == 'bbox':
+            bbox = [float(value) for value in args.get('bbox', '').split(',')]
+            if len(bbox) != 4:
+                return error_payload('bbox 格式应为 min_lat,min_lon,max_lat,max_lon'), 400
+            center = None
+        elif args.get('field_id'):
+            center = spatial.field_center(args['field_id'])
+            if center is None:
+                return error_payload(f'田块未登记边界: {args["field_id"]}'), 404
+        elif args.get('lat') and args.get('lon'):
+            center = parse_location(args)
+        else:
+            return error_payload('缺少查询中心（lat/lon 或 field_id）'), 400
+
+        radius_km = float(args.get('radius_km', DEFAULT_RADIUS_KM))
+        k = int(args.get('k', DEFAULT_K))
+    except ValueError:
+        return error_payload('查询参数格式错误'), 400
+
+    query_start = time.perf_counter()
+    if target == 'detections':
+        if mode == 'bbox':
+            items = spatial.detections_in_bbox(*bbox, **filters)
+        elif mode == 'radius':
+            items = spatial.detections_within(*center, radius_km, **filters)
+        else:
+            items = spatial.nearest_detections(*center, k, **filters)
+        for item in items:
+            item['severity'] = SEVERITY_NAMES.get(item['severity'], '未知')
+    else:
+        if mode == 'bbox':
+            items = spatial.fields_in_bbox(*bbox)
+        elif mode == 'radius':
+            items = spatial.fields_within(*center, radius_km)
+        else:
+            items = spatial.nearest_fields(*center, k)
+
+    data = {
+        'target': target,
+        'mode': mode,
+        'count': len(items),
+        'items': items,
+        'query_time_ms': round((time.perf_counter() - query_start) * 1000, 2)
+    }
+    if center is not None:
+        data['center'] = {'lat': center[0], 'lon': center[1]}
+    return {'status': 'success', 'data': data}, 200
@@ -0,0 +1,175 @@
+"""
+可视化报告接口：标注缩略图、田块热力图与田块报告，WSGI 与 ASGI 服务共用
+
+各函数返回 (产物或响应体, HTTP状态码)：状态码为 200 时第一项是 Artefact，
+由具体框架以文件形式发送（带 ETag，支持 Range 与 304）；否则为 JSON 响应体。
+"""
+
+import json
+import threading
+import time
+from typing import Dict, Mapping, Optional, Tuple, Union
+
+from ..config import Config
+from ..reports import Artefact, ReportGenerator
+from . import files
+from .field_api import get_archive
+from .responses import error_payload
+
+# 缩略图尺寸上下限（像素）
+MIN_THUMBNAIL_SIZE = 64
+MAX_THUMBNAIL_SIZE = 1024
+HEATMAP_SIZE = 800
+# 报告中列出的最近检测帧数
+REPORT_FRAMES = 24
+# 渲染未完成时建议客户端的重试间隔（秒）
+PENDING_RETRY_AFTER = 2
+
+THUMBNAIL_URL = '/api/results/{result_file}/thumbnail'
+HEATMAP_URL = '/api/fields/{field_id}/heatmap'
+
+ReportResult = Tuple[Union[Artefact, Dict], int]
+
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def get_generator() -> ReportGenerator:
+    """获取当前进程的报告生成器"""
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                _generator = ReportGenerator()
+    return _generator
+
+
+def shutdown():
+    """关闭渲染进程池（服务退出时调用）"""
+    if _generator is not None:
+        _generator.shutdown(wait=False)
+
+
+def _load_result(result_filename: str) -> Optional[Dict]:
+    """读取已保存的检测结果（含已归档的结果）"""
+    path = files.results.locate(result_filename)
+    if path is not None:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    data = files.read_archived_result(result_filename)
+    return json.loads(data) if data is not None else None
+
+
+def _thumbnail_job(result: Dict, size: int) -> Optional[Tuple[Dict, tuple]]:
+    """
+    构造缩略图的渲染输入
+
+    Returns:
+        Optional[Tuple[Dict, tuple]]: (缓存键输入, 渲染参数)，原图不可用时返回None
+    """
+    image = result.get('image') or {}
+    image_path = files.uploads.locate(image.get('file') or '')
+    if image_path is None:
+        return None
+    details = result.get('details') or {}
+    label = {key: details.get(key) for key in ('disease', 'disease_id', 'severity', 'confidence')}
+    # 原图以内容哈希标识，路径不参与缓存键
+    return {'image': image.get('sha256'), 'details': label, 'size': size}, (image_path, label, size)
+
+
+def _serve(kind: str, inputs: Dict, args: tuple) -> ReportResult:
+    """提交渲染并等待，超时返回 202"""
+    try:
+        artefact = get_generator().render(kind, inputs, args)
+    except Exception as e:
+        return error_payload(f'渲染失败: {e}'), 500
+    if artefact is None:
+        payload = error_payload('正在生成，请稍后重试')
+        payload['status'] = 'pending'
+        payload['retry_after'] = PENDING_RETRY_AFTER
+        return payload, 202
+    return artefact, 200
+
+
+def prerender_thumbnail(result: Dict, result_filename: str):
+    """
+    检测完成后在后台提交标注缩略图的渲染，不等待结果
+
+    Args:
+        result: 检测结果
+        result_filename: 结果文件名
+    """
+    if not Config.REPORT_PRERENDER or result.get('status') != 'success':
+        return
+    job = _thumbnail_job(result, Config.REPORT_THUMBNAIL_SIZE)
+    if job is not None:
+        get_generator().submit('thumbnail', *job)
+
+
+def thumbnail(result_filename: str, args: Mapping[str, str]) -> ReportResult:
+    """检测结果的标注缩略图；size 为最长边像素"""
+    try:
+        size = int(args.get('size', Config.REPORT_THUMBNAIL_SIZE))
+    except ValueError:
+        return error_payload('size 必须为整数'), 400
+    size = min(max(size, MIN_THUMBNAIL_SIZE), MAX_THUMBNAIL_SIZE)
+
+    result = _load_result(result_filename)
+    if result is None:
+        return error_payload('结果文件不存在'), 404
+    job = _thumbnail_job(result, size)
+    if job is None:
+        return error_payload('原图不可用'), 404
+    return _serve('thumbnail', *job)
+
+
+def _parse_since(args: Mapping[str, str]) -> Optional[float]:
+    """days 查询参数转换为起始时间戳（按天取整，同一天内缓存键稳定）"""
+    days = args.get('days')
+    if not days:
+        return None
+    return (time.time() // 86400 - float(days)) * 86400
+
+
+def heatmap(field_id: str, args: Mapping[str, str]) -> ReportResult:
+    """田块病害热力图；days 为回看天数（默认全部）"""
+    try:
+        since = _parse_since(args)
+    except ValueError:
+        return error_payload('days 必须为数字'), 400
+
+    spatial = get_archive().spatial
+    points = [[d['lat'], d['lon'], d['severity'], d['confidence']]
+              for d in spatial.field_detections(field_id, since=since)]
+    polygon = spatial.field_polygon(field_id)
+    if not points and polygon is None:
+        return error_payload(f'田块不存在或暂无定位数据: {field_id}'), 404
+    inputs = {'points': points, 'polygon': polygon, 'size': HEATMAP_SIZE}
+    return _serve('heatmap', inputs, (points, polygon, HEATMAP_SIZE))
+
+
+def report(field_id: str, args: Mapping[str, str]) -> ReportResult:
+    """田块 HTML 报告：汇总、热力图、按日历史、最近检测缩略图与服务记录"""
+    try:
+        since = _parse_since(args)
+    except ValueError:
+        return error_payload('days 必须为数字'), 400
+
+    archive = get_archive()
+    summary = archive.get_summary(field_id)
+    if summary is None:
+        return error_payload(f'田块不存在或暂无数据: {field_id}'), 404
+    summary['service_records'] = archive.get_service_records(field_id, limit=20)
+
+    heatmap_url = HEATMAP_URL.format(field_id=field_id)
+    if args.get('days'):
+        heatmap_url += f"?days={args['days']}"
+    context = {
+        'field_id': field_id,
+        'summary': summary,
+        'history': archive.get_season_history(field_id, since),
+        'frames': archive.get_frames(field_id, since, limit=REPORT_FRAMES),
+        'heatmap_url': heatmap_url,
+        'thumbnail_url': THUMBNAIL_URL
+    }
+    return _serve('report', context, (context,))
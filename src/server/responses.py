@@ -0,0 +1,179 @@
+"""
+Web 接口响应构造：Flask(WSGI) 与 ASGI 服务共用，保证 JSON 结构一致
+"""
+
+import json
+import os
+import uuid
+from datetime import datetime
+import time
+from typing import Dict, Mapping, Optional, Tuple
+
+from ..config import Config
+from ..detectors.result import as_dict, json_default
+from . import files
+
+
+def error_payload(message: str) -> Dict:
+    """
+    构造错误响应体
+
+    Args:
+        message: 错误信息
+
+    Returns:
+        Dict: 响应体
+    """
+    return {
+        'status': 'error',
+        'message': message
+    }
+
+
+def unsupported_format_message() -> str:
+    """不支持的文件格式提示"""
+    return f'不支持的文件格式，仅支持: {", ".join(Config.ALLOWED_EXTENSIONS)}'
+
+
+def too_large_message() -> str:
+    """文件过大提示"""
+    return f'文件过大，最大支持 {Config.MAX_CONTENT_LENGTH // (1024*1024)}MB'
+
+
+def save_result(result: Dict) -> str:
+    """
+    保存检测结果到results目录
+
+    Args:
+        result: 检测结果字典
+
+    Returns:
+        str: 结果文件名
+    """
+    result_filename = f"result_{uuid.uuid4().hex}.json"
+    result_filepath = files.results.path_for(result_filename, create=True)
+    with open(result_filepath, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2, default=json_default)
+    return result_filename
+
+
+# 临时（模拟）结果特有的字段，回填真实结果时丢弃
+PROVISIONAL_KEYS = {'status', 'mode', 'result', 'details', 'provisional', 'queue_id', 'api_error'}
+
+
+def reconcile_result(result_filename: str, result: Dict) -> Optional[Dict]:
+    """
+    用真实结果原子地替换已保存的临时结果，保留图片信息等上传时附加的字段
+
+    Args:
+        result_filename: 结果文件名
+        result: 真实检测结果
+
+    Returns:
+        Optional[Dict]: 替换后的完整结果，未找到结果文件时返回None
+    """
+    result_filepath = files.results.locate(result_filename)
+    if result_filepath is None:
+        return None
+
+    with open(result_filepath, 'r', encoding='utf-8') as f:
+        previous = json.load(f)
+
+    merged = {key: value for key, value in previous.items() if key not in PROVISIONAL_KEYS}
+    merged.update(result)
+    merged['replaced_provisional'] = previous.get('provisional', False)
+
+    temp_path = f"{result_filepath}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(merged, f, ensure_ascii=False, indent=2, default=json_default)
+    os.replace(temp_path, result_filepath)
+    return merged
+
+
+def detect_payload(result: Dict, crop_type: str, image_name: str, result_filename: str) -> Dict:
+    """
+    构造检测接口的成功响应体
+
+    Args:
+        result: 检测结果字典
+        crop_type: 作物类型
+        image_name: 上传的图片名
+        result_filename: 结果文件名
+
+    Returns:
+        Dict: 响应体
+    """
+    return {
+        'status': 'success',
+        'data': {
+            'result': result.get('result'),
+            'mode': result.get('mode'),
+            'details': as_dict(result.get('details')),
+            'metadata': result.get('metadata'),
+            'quality': result.get('quality'),
+            'timings': result.get('timings'),
+            'crop_type': crop_type,
+            'image_name': image_name,
+            'result_file': result_filename,
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+    }
+
+
+def stats_payload(stats: Dict) -> Dict:
+    """
+    构造统计接口的响应体
+
+    Args:
+        stats: 统计信息字典
+
+    Returns:
+        Dict: 响应体
+    """
+    return {
+        'status': 'success',
+        'data': stats
+    }
+
+
+# 时间序列默认回看时长（小时）
+SERIES_DEFAULT_HOURS = {'minute': 1, 'hour': 7 * 24}
+
+
+def stats_series_payload(detector, args: Mapping[str, str]) -> Tuple[Dict, int]:
+    """
+    构造统计时间序列接口的响应体
+
+    查询参数：names（逗号分隔，默认全部计数）、resolution（minute/hour）、
+    since/until（时间戳）或 hours（回看时长，默认分钟级1小时、小时级7天）
+
+    Args:
+        detector: 检测器实例
+        args: 查询参数
+
+    Returns:
+        Tuple[Dict, int]: (响应体, HTTP状态码)
+    """
+    resolution = args.get('resolution', 'minute')
+    if resolution not in SERIES_DEFAULT_HOURS:
+        return error_payload(f'不支持的分辨率: {resolution}'), 400
+
+    try:
+        now = time.time()
+        hours = float(args.get('hours', SERIES_DEFAULT_HOURS[resolution]))
+        since = float(args['since']) if args.get('since') else now - hours * 3600
+        until = float(args['until']) if args.get('until') else now
+    except ValueError:
+        return error_payload('时间参数无效'), 400
+
+    names = [name for name in args.get('names', '').split(',') if name] or None
+    series = detector.get_stats_series(names, resolution, since, until)
+    return {
+        'status': 'success',
+        'data': {
+            'resolution': resolution,
+            'since': since,
+            'until': until,
+            'series': series
+        }
+    }, 200
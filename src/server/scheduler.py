@@ -0,0 +1,381 @@
+"""
+检测调度：优先级分类 + 租户加权公平排队 + 准入控制
+
+检测器并发槽位有限，超出的请求在调度器中排队，不再按到达顺序先到先得：
+- 优先级类别之间严格优先：urgent > interactive > bulk
+- 同一类别内按租户（农场）做加权公平排队（WFQ）：每个请求的虚拟完成时间
+  = max(类别虚拟时钟, 该租户上一个请求的完成时间) + 1/权重，取最小者先执行，
+  大农场 2000 帧的航次不会饿死小农户的单张图片
+- 准入控制：按当前排队长度与平均处理时长估算等待时间，超过该类别的截止时间
+  直接拒绝（HTTP 429 + Retry-After）；排队中超时的请求同样返回 429
+
+同步（Flask 线程）与异步（ASGI 协程）请求共用同一个调度器。
+"""
+
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional, Tuple
+
+from ..config import Config
+from .responses import error_payload
+
+PRIORITIES = ("urgent", "interactive", "bulk")
+DEFAULT_PRIORITY = "interactive"
+
+# 平均处理时长的指数平滑系数
+SERVICE_TIME_ALPHA = 0.1
+# 每个类别保留最近多少次排队等待时长用于计算分位数
+WAIT_SAMPLES = 512
+
+
+class SchedulerRejected(Exception):
+    """请求未被准入或排队超时"""
+
+    def __init__(self, priority: str, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.priority = priority
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class _Waiter:
+    """排队中的一个请求"""
+
+    __slots__ = ("priority", "tenant", "finish", "enqueued", "granted", "cancelled", "wake")
+
+    def __init__(self, priority: str, tenant: str, finish: float, wake):
+        self.priority = priority
+        self.tenant = tenant
+        self.finish = finish
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.cancelled = False
+        self.wake = wake
+
+
+class _ClassState:
+    """一个优先级类别的队列与指标"""
+
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+        self.heap = []
+        self.size = 0
+        self.virtual_time = 0.0
+        self.tenant_finish: Dict[str, float] = {}
+        self.admitted = 0
+        self.rejected = 0
+        self.expired = 0
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+
+
+class DetectionScheduler:
+    """检测并发槽位调度器"""
+
+    def __init__(self, concurrency: int, deadlines: Optional[Dict[str, float]] = None,
+                 weights: Optional[Dict[str, float]] = None, service_time: float = 2.0):
+        """
+        Args:
+            concurrency: 同时执行的检测数
+            deadlines: 各类别允许的最长排队时间（秒）
+            weights: 租户权重（未列出的租户权重为1）
+            service_time: 平均处理时长的初始估计（秒）
+        """
+        self.concurrency = max(1, concurrency)
+        deadlines = deadlines or Config.SCHEDULER_DEADLINES
+        self.classes = {priority: _ClassState(deadlines[priority]) for priority in PRIORITIES}
+        self.weights = weights if weights is not None else Config.TENANT_WEIGHTS
+        self.service_time = service_time
+        self.running = 0
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+
+    # ---- 准入与排队 ----
+
+    def _admit(self, priority: str, tenant: str, wake) -> Optional[_Waiter]:
+        """
+        在锁内尝试获取槽位或入队
+
+        Returns:
+            Optional[_Waiter]: 需要等待时返回排队项，直接获得槽位时返回None
+
+        Raises:
+            SchedulerRejected: 预计等待时间超过截止时间
+        """
+        state = self.classes[priority]
+        if self.running < self.concurrency and not self._queued_at_or_above(priority):
+            self.running += 1
+            state.admitted += 1
+            state.waits.append(0.0)
+            return None
+
+        estimate = self._estimated_wait(priority)
+        if estimate > state.deadline:
+            state.rejected += 1
+            raise SchedulerRejected(priority, f"排队预计 {estimate:.0f} 秒，超过 {state.deadline:.0f} 秒上限",
+                                    estimate - state.deadline)
+
+        weight = self.weights.get(tenant, 1.0)
+        start = max(state.virtual_time, state.tenant_finish.get(tenant, 0.0))
+        finish = start + 1.0 / weight
+        state.tenant_finish[tenant] = finish
+        waiter = _Waiter(priority, tenant, finish, wake)
+        heapq.heappush(state.heap, (finish, next(self._seq), waiter))
+        state.size += 1
+        return waiter
+
+    def _queued_at_or_above(self, priority: str) -> int:
+        """同级及更高优先级的排队数"""
+        total = 0
+        for name in PRIORITIES:
+            total += self.classes[name].size
+            if name == priority:
+                break
+        return total
+
+    def _estimated_wait(self, priority: str) -> float:
+        """估算新请求的等待时间：(排在前面的请求数 + 1) × 平均处理时长 / 并发数"""
+        ahead = self._queued_at_or_above(priority)
+        if self.running < self.concurrency and not ahead:
+            return 0.0
+        return (ahead + 1) * self.service_time / self.concurrency
+
+    def _grant_next(self):
+        """在锁内把空出的槽位交给下一个排队请求"""
+        while self.running < self.concurrency:
+            waiter = self._pop_next()
+            if waiter is None:
+                return
+            waiter.granted = True
+            self.running += 1
+            state = self.classes[waiter.priority]
+            state.admitted += 1
+            state.waits.append(time.monotonic() - waiter.enqueued)
+            waiter.wake()
+
+    def _pop_next(self) -> Optional[_Waiter]:
+        """取出最高优先级类别中虚拟完成时间最小的请求（跳过已取消项）"""
+        for priority in PRIORITIES:
+            state = self.classes[priority]
+            while state.heap:
+                finish, _, waiter = heapq.heappop(state.heap)
+                if waiter.cancelled:
+                    continue
+                state.size -= 1
+                state.virtual_time = max(state.virtual_time, finish)
+                if state.size == 0:
+                    # 队列清空后重置虚拟时钟，避免租户完成时间无限增长
+                    state.virtual_time = 0.0
+                    state.tenant_finish.clear()
+                return waiter
+        return None
+
+    def _expire(self, waiter: _Waiter) -> bool:
+        """
+        在锁内处理等待超时
+
+        Returns:
+            bool: True 表示已撤销排队；False 表示超时前已获得槽位
+        """
+        if waiter.granted:
+            return False
+        waiter.cancelled = True
+        state = self.classes[waiter.priority]
+        state.size -= 1
+        state.expired += 1
+        return True
+
+    def release(self, service_seconds: Optional[float] = None):
+        """
+        归还槽位
+
+        Args:
+            service_seconds: 本次占用槽位的时长，用于更新平均处理时长（None 表示未实际使用）
+        """
+        with self._lock:
+            self.running -= 1
+            if service_seconds is not None:
+                self.service_time += SERVICE_TIME_ALPHA * (service_seconds - self.service_time)
+            self._grant_next()
+
+    # ---- 同步接口 ----
+
+    def acquire(self, priority: str = DEFAULT_PRIORITY, tenant: str = ""):
+        """
+        获取检测槽位（阻塞）
+
+        Args:
+            priority: 优先级类别
+            tenant: 租户（农场）标识
+
+        Raises:
+            SchedulerRejected: 未被准入或排队超时
+        """
+        event = threading.Event()
+        with self._lock:
+            waiter = self._admit(priority, tenant, event.set)
+        if waiter is None:
+            return
+
+        deadline = self.classes[priority].deadline
+        if event.wait(deadline):
+            return
+        with self._lock:
+            if not self._expire(waiter):
+                return
+        raise SchedulerRejected(priority, f"排队超过 {deadline:.0f} 秒", self._retry_after(priority))
+
+    @contextmanager
+    def slot(self, priority: str = DEFAULT_PRIORITY, tenant: str = ""):
+        """占用一个检测槽位的上下文管理器"""
+        self.acquire(priority, tenant)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    # ---- 异步接口 ----
+
+    async def aacquire(self, priority: str = DEFAULT_PRIORITY, tenant: str = ""):
+        """acquire 的异步版本：排队期间不占用线程"""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        with self._lock:
+            waiter = self._admit(priority, tenant, wake)
+        if waiter is None:
+            return
+
+        deadline = self.classes[priority].deadline
+        try:
+            await asyncio.wait_for(asyncio.shield(future), deadline)
+            return
+        except asyncio.TimeoutError:
+            with self._lock:
+                if not self._expire(waiter):
+                    return
+            raise SchedulerRejected(priority, f"排队超过 {deadline:.0f} 秒", self._retry_after(priority))
+        except asyncio.CancelledError:
+            # 客户端断开：撤销排队；若已获得槽位则立即归还
+            with self._lock:
+                expired = self._expire(waiter)
+            if not expired:
+                self.release()
+            raise
+
+    @asynccontextmanager
+    async def aslot(self, priority: str = DEFAULT_PRIORITY, tenant: str = ""):
+        """slot 的异步版本"""
+        await self.aacquire(priority, tenant)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    # ---- 指标 ----
+
+    def _retry_after(self, priority: str) -> float:
+        with self._lock:
+            return self._estimated_wait(priority)
+
+    def metrics(self) -> Dict:
+        """
+        各类别的排队指标
+
+        Returns:
+            Dict: 并发、平均处理时长与各类别的排队数、准入/拒绝/超时计数和等待时长
+        """
+        with self._lock:
+            classes = {}
+            for priority, state in self.classes.items():
+                waits = sorted(state.waits)
+                classes[priority] = {
+                    "queued": state.size,
+                    "deadline": state.deadline,
+                    "admitted": state.admitted,
+                    "rejected": state.rejected,
+                    "expired": state.expired,
+                    "estimated_wait": round(self._estimated_wait(priority), 3),
+                    "wait_p50_ms": round(_percentile(waits, 0.5) * 1000, 1),
+                    "wait_p99_ms": round(_percentile(waits, 0.99) * 1000, 1)
+                }
+            return {
+                "concurrency": self.concurrency,
+                "running": self.running,
+                "service_time": round(self.service_time, 3),
+                "classes": classes
+            }
+
+
+def _percentile(values, q: float) -> float:
+    """已排序序列的分位数"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def request_class(form) -> Tuple[str, str]:
+    """
+    根据上传表单确定优先级类别与租户
+
+    未指定 priority 时，携带 flight_id 的航次批量帧视为 bulk，其余为 interactive；
+    租户依次取 tenant、farm_id、field_id。
+
+    Args:
+        form: 上传的表单字段
+
+    Returns:
+        Tuple[str, str]: (优先级类别, 租户)
+    """
+    priority = (form.get('priority') or '').strip().lower()
+    if priority not in PRIORITIES:
+        priority = 'bulk' if form.get('flight_id') else DEFAULT_PRIORITY
+    tenant = form.get('tenant') or form.get('farm_id') or form.get('field_id') or ''
+    return priority, tenant
+
+
+def rejection_response(error: SchedulerRejected) -> Tuple[Dict, int, Dict]:
+    """
+    构造被拒绝请求的响应
+
+    Returns:
+        Tuple[Dict, int, Dict]: (响应体, HTTP状态码 429, 响应头)
+    """
+    payload = error_payload(f'服务繁忙（{error.priority}）：{error.reason}，请稍后重试')
+    payload['retry_after'] = error.retry_after
+    return payload, 429, {'Retry-After': str(error.retry_after)}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(concurrency: Optional[int] = None) -> DetectionScheduler:
+    """
+    获取当前进程的调度器
+
+    Args:
+        concurrency: 首次创建时的并发数，默认 Config.SCHEDULER_CONCURRENCY
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = DetectionScheduler(concurrency or Config.SCHEDULER_CONCURRENCY)
+    return _scheduler
+
+
+def scheduler_payload() -> Dict:
+    """调度指标接口的响应体"""
+    return {'status': 'success', 'data': get_scheduler().metrics()}
@@ -0,0 +1,151 @@
+"""
+农资推荐接口：按诊断匹配药剂、用量与附近供应商，WSGI 与 ASGI 服务共用
+
+各函数返回 (响应体, HTTP状态码)，由具体框架负责序列化。
+"""
+
+import math
+import threading
+import time
+from typing import Dict, Mapping, Optional, Tuple
+
+from ..supply import SupplyMatcher
+from .field_api import get_archive, parse_location
+from .responses import error_payload
+
+# 单次批量推荐的最大条数
+MAX_BATCH = 10000
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def get_matcher() -> SupplyMatcher:
+    """获取当前进程的推荐引擎（首次调用时读取目录并构建索引）"""
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                _matcher = SupplyMatcher()
+    return _matcher
+
+
+def _parse_area(value) -> Optional[float]:
+    """
+    解析面积（亩），缺失时返回None
+
+    Raises:
+        TypeError / ValueError: 不是数字，或为负数、nan/inf
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        raise TypeError(value)
+    area = float(value)
+    if not math.isfinite(area) or area < 0:
+        raise ValueError(area)
+    return area
+
+
+def _parse_point(payload: Mapping) -> Tuple[Optional[float], Optional[float]]:
+    """
+    解析 JSON 请求体中的 lat/lon，缺失任一项时返回 (None, None)
+
+    Raises:
+        TypeError / ValueError: 不是数字，或超出纬度 [-90, 90]、经度 [-180, 180] 范围（含 nan/inf）
+    """
+    lat, lon = payload.get('lat'), payload.get('lon')
+    if lat is None or lon is None:
+        return None, None
+    if isinstance(lat, bool) or isinstance(lon, bool):
+        raise TypeError((lat, lon))
+    lat, lon = float(lat), float(lon)
+    # nan 与任何数比较都为 False，同样被拒绝
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError((lat, lon))
+    return lat, lon
+
+
+def recommend(args: Mapping[str, str]) -> Tuple[Dict, int]:
+    """
+    单次推荐
+
+    查询参数：disease（标准ID或名称）、severity、area_mu、lat/lon、crop_type
+    """
+    if not args.get('disease'):
+        return error_payload('缺少 disease'), 400
+    try:
+        area = _parse_area(args.get('area_mu'))
+        lat, lon = parse_location(args)
+    except (TypeError, ValueError):
+        return error_payload('area_mu 必须为非负数，lat、lon 必须为有效经纬度'), 400
+
+    start = time.perf_counter()
+    plan = get_matcher().recommend(args['disease'], args.get('severity'), area, lat, lon, args.get('crop_type'))
+    plan['query_time_ms'] = round((time.perf_counter() - start) * 1000, 3)
+    return {'status': 'success', 'data': plan}, 200
+
+
+def recommend_batch(payload: Optional[Dict]) -> Tuple[Dict, int]:
+    """
+    批量推荐（如一个航次的全部检测结果）
+
+    请求体：{"diagnoses": [...], "area_mu": ..., "lat": ..., "lon": ..., "crop_type": ...}，
+    diagnoses 每项为检测结果或 {disease_id/disease, severity, area_mu, lat, lon}，未给出的字段使用外层默认值
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get('diagnoses'), list):
+        return error_payload('缺少 diagnoses 列表'), 400
+    diagnoses = payload['diagnoses']
+    if len(diagnoses) > MAX_BATCH:
+        return error_payload(f'单次最多 {MAX_BATCH} 条'), 400
+    if not all(isinstance(item, dict) for item in diagnoses):
+        return error_payload('diagnoses 的每一项必须为对象'), 400
+    crop_type = payload.get('crop_type')
+    if crop_type is not None and not isinstance(crop_type, str):
+        return error_payload('crop_type 必须为字符串'), 400
+    try:
+        area = _parse_area(payload.get('area_mu'))
+        lat, lon = _parse_point(payload)
+    except (TypeError, ValueError):
+        return error_payload('area_mu 必须为非负数，lat、lon 必须为有效经纬度'), 400
+
+    start = time.perf_counter()
+    try:
+        # 各项的字段在推荐引擎计算去重键时校验
+        plans = get_matcher().recommend_batch(diagnoses, area, lat, lon, crop_type)
+    except ValueError as e:
+        return error_payload(str(e)), 400
+    return {'status': 'success', 'data': {
+        'recommendations': plans,
+        'query_time_ms': round((time.perf_counter() - start) * 1000, 3)
+    }}, 200
+
+
+def field_recommendation(field_id: str, args: Mapping[str, str]) -> Tuple[Dict, int]:
+    """
+    田块推荐：按田块（或指定航次 flight_id）的整体诊断、登记面积与田块中心匹配
+
+    诊断取概率最高的非健康病害及其最高严重程度；未登记面积或边界时可用 area_mu、lat/lon 参数补充。
+    """
+    archive = get_archive()
+    field = archive.get_field(field_id)
+    if field is None:
+        return error_payload(f'田块不存在: {field_id}'), 404
+
+    flight_id = args.get('flight_id')
+    diagnosis = archive.get_diagnosis('flight', flight_id) if flight_id else archive.get_diagnosis('field', field_id)
+    if diagnosis is None:
+        return error_payload('暂无可用诊断'), 404
+
+    try:
+        area = field.get('area_mu') or _parse_area(args.get('area_mu'))
+        location = archive.spatial.field_center(field_id) or parse_location(args)
+    except (TypeError, ValueError):
+        return error_payload('area_mu 必须为非负数，lat、lon 必须为有效经纬度'), 400
+
+    leading = diagnosis.get('leading_disease') or diagnosis
+    plan = get_matcher().recommend(
+        leading['disease_id'], leading.get('max_severity'), area, *location, crop_type=field.get('crop_type')
+    )
+    plan.update({'field_id': field_id, 'flight_id': flight_id, 'probability': leading.get('probability')})
+    return {'status': 'success', 'data': plan}, 200
@@ -0,0 +1,34 @@
+"""
+数据存储模块
+
+各存储类按需导入（PEP 562），只用到统计计数时不加载离线队列、归档等模块
+"""
+
+import importlib
+
+# 导出名称 -> 所在子模块
+_EXPORTS = {
+    'SQLiteStatsStore': '.stats_store',
+    'StatsRecorder': '.stats_recorder',
+    'ShardedDirectory': '.sharding',
+    'RetentionManager': '.retention',
+    'OfflineQueue': '.offline_queue',
+    'OfflineSyncWorker': '.offline_queue',
+    'FieldArchive': '.field_archive',
+    'SpatialIndex': '.spatial_index',
+    'DiagnosisConsensus': '.consensus'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,119 @@
+"""
+跨帧诊断共识：按田块/航次增量合并每帧结论，得到一条整体诊断
+
+每帧视为一次带置信度的观测，按朴素贝叶斯更新各标准病害的对数后验；
+状态可序列化为 JSON，随帧写入同一事务增量更新，读取时无需重新聚合。
+"""
+
+import json
+import math
+from typing import Dict, Optional
+
+from ..utils.taxonomy import DISEASES, HEALTHY_ID, UNKNOWN_ID
+
+# 置信度缺失时使用的默认值，以及参与更新的置信度上下限（防止单帧一票定论）
+DEFAULT_CONFIDENCE = 0.6
+MIN_CONFIDENCE = 0.05
+MAX_CONFIDENCE = 0.95
+# 单帧证据权重（幂似然）：同一田块相邻帧高度相关，完全独立的假设会使后验迅速趋于 0/1
+EVIDENCE_WEIGHT = 0.1
+
+
+class DiagnosisConsensus:
+    """增量贝叶斯共识"""
+
+    def __init__(self, state: Optional[Dict] = None, decay: float = 1.0):
+        """
+        Args:
+            state: 之前保存的状态（to_json 的结果经解析后的字典）
+            decay: 每帧对历史证据的衰减系数（1.0 表示不遗忘）
+        """
+        self.decay = decay
+        self.num_classes = len(DISEASES)
+        state = state or {}
+        self.frames = state.get("frames", 0)
+        # 未出现过的病害共享的对数得分
+        self.base = state.get("base", 0.0)
+        self.classes: Dict[str, Dict] = state.get("classes", {})
+
+    @classmethod
+    def from_json(cls, text: Optional[str], decay: float = 1.0) -> "DiagnosisConsensus":
+        return cls(json.loads(text) if text else None, decay)
+
+    def to_json(self) -> str:
+        return json.dumps({"frames": self.frames, "base": self.base, "classes": self.classes})
+
+    def update(self, disease_id: str, confidence: Optional[float], severity: int = 0):
+        """
+        合并一帧观测
+
+        Args:
+            disease_id: 该帧的标准病害ID
+            confidence: 该帧置信度（0-1）
+            severity: 严重程度等级（0-3）
+        """
+        if disease_id == UNKNOWN_ID:
+            return
+
+        c = confidence if confidence else DEFAULT_CONFIDENCE
+        c = min(max(c, MIN_CONFIDENCE), MAX_CONFIDENCE)
+        hit = EVIDENCE_WEIGHT * math.log(c)
+        miss = EVIDENCE_WEIGHT * math.log((1 - c) / (self.num_classes - 1))
+
+        if disease_id not in self.classes:
+            self.classes[disease_id] = {"log": self.base, "votes": 0, "max_severity": 0}
+
+        self.base = self.base * self.decay + miss
+        for class_id, entry in self.classes.items():
+            entry["log"] = entry["log"] * self.decay + (hit if class_id == disease_id else miss)
+
+        entry = self.classes[disease_id]
+        entry["votes"] += 1
+        entry["max_severity"] = max(entry["max_severity"], severity)
+        self.frames += 1
+
+        # 平移对数得分，避免长期累积后数值过大
+        top = max(max(e["log"] for e in self.classes.values()), self.base)
+        self.base -= top
+        for e in self.classes.values():
+            e["log"] -= top
+
+    def posterior(self) -> Dict[str, float]:
+        """各已出现病害的后验概率（未出现的病害合计为剩余部分）"""
+        unseen = self.num_classes - len(self.classes)
+        weights = {class_id: math.exp(entry["log"]) for class_id, entry in self.classes.items()}
+        total = sum(weights.values()) + unseen * math.exp(self.base)
+        return {class_id: weight / total for class_id, weight in weights.items()}
+
+    def diagnosis(self) -> Optional[Dict]:
+        """
+        当前的整体诊断
+
+        Returns:
+            Optional[Dict]: 最可能的病害及概率；另给出概率最高的非健康病害，
+                便于大部分区域健康但局部发病时仍能看到病害。无观测时返回None
+        """
+        if not self.classes:
+            return None
+
+        posterior = self.posterior()
+        ranked = sorted(posterior.items(), key=lambda item: item[1], reverse=True)
+
+        def describe(class_id: str, probability: float) -> Dict:
+            entry = self.classes[class_id]
+            return {
+                "disease_id": class_id,
+                "disease": DISEASES[class_id]["name"],
+                "probability": round(probability, 4),
+                "votes": entry["votes"],
+                "max_severity": entry["max_severity"]
+            }
+
+        top_id, top_p = ranked[0]
+        leading = next(((cid, p) for cid, p in ranked if cid != HEALTHY_ID), None)
+        return {
+            **describe(top_id, top_p),
+            "frames": self.frames,
+            "leading_disease": describe(*leading) if leading else None,
+            "distribution": {DISEASES[cid]["name"]: round(p, 4) for cid, p in ranked}
+        }
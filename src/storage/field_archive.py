@@ -0,0 +1,442 @@
+"""
+数字孪生农田档案：田块/航次/帧数据模型与按 (field_id, 时间) 索引的时序存储
+
+每写入一帧，同一事务内增量更新田块汇总与按日汇总，
+查询整季历史只需读取按日汇总，不随帧数增长而变慢。
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from ..config import Config
+from ..utils.taxonomy import HEALTHY_ID, UNKNOWN_ID, normalize_disease
+from .consensus import DiagnosisConsensus
+from .spatial_index import SpatialIndex
+
+
+# 严重程度等级
+SEVERITY_LEVELS = {"无": 0, "轻微": 1, "中等": 2, "严重": 3}
+SEVERITY_NAMES = {level: name for name, level in SEVERITY_LEVELS.items()}
+
+# 趋势指数的平滑系数：短期反映最近几帧，长期反映整体水平
+TREND_ALPHA_SHORT = 0.3
+TREND_ALPHA_LONG = 0.05
+# 短期与长期指数差超过该值判定为上升/下降
+TREND_THRESHOLD = 0.1
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fields (
+    field_id TEXT PRIMARY KEY,
+    name TEXT,
+    crop_type TEXT,
+    area_mu REAL,
+    owner TEXT,
+    contact TEXT,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS flights (
+    flight_id TEXT PRIMARY KEY,
+    field_id TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    operator TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_flights_field ON flights (field_id, started_at);
+CREATE TABLE IF NOT EXISTS frames (
+    field_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    frame_id INTEGER NOT NULL,
+    flight_id TEXT,
+    image_sha256 TEXT,
+    result_file TEXT,
+    disease TEXT,
+    severity INTEGER,
+    confidence REAL,
+    PRIMARY KEY (field_id, ts, frame_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS field_daily (
+    field_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    frames INTEGER NOT NULL,
+    diseased_frames INTEGER NOT NULL,
+    max_severity INTEGER NOT NULL,
+    disease_counts TEXT NOT NULL,
+    PRIMARY KEY (field_id, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS field_rollups (
+    field_id TEXT PRIMARY KEY,
+    frames INTEGER NOT NULL,
+    diseased_frames INTEGER NOT NULL,
+    max_severity INTEGER NOT NULL,
+    disease_counts TEXT NOT NULL,
+    trend_short REAL NOT NULL,
+    trend_long REAL NOT NULL,
+    first_ts REAL NOT NULL,
+    last_ts REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS service_records (
+    field_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    note TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_service_field ON service_records (field_id, ts);
+CREATE TABLE IF NOT EXISTS consensus (
+    scope TEXT NOT NULL,
+    scope_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (scope, scope_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class FieldArchive:
+    """农田档案存储"""
+
+    def __init__(self, db_path: str = Config.FIELD_ARCHIVE_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+        self.spatial = SpatialIndex(self._connection)
+
+    def _connection(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def upsert_field(self, field_id: str, name: Optional[str] = None, crop_type: Optional[str] = None,
+                     area_mu: Optional[float] = None, owner: Optional[str] = None,
+                     contact: Optional[str] = None,
+                     polygon: Optional[Sequence[Sequence[float]]] = None) -> Dict:
+        """
+        登记或更新田块基础信息（面积、作物类型、农户联系方式）
+
+        Args:
+            field_id: 田块ID
+            name: 田块名称
+            crop_type: 作物类型
+            area_mu: 面积（亩）
+            owner: 农户
+            contact: 联系方式
+            polygon: 田块边界 [[lat, lon], ...]，写入空间索引
+
+        Returns:
+            Dict: 田块信息
+        """
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO fields (field_id, name, crop_type, area_mu, owner, contact, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(field_id) DO UPDATE SET "
+                "name = COALESCE(excluded.name, name), crop_type = COALESCE(excluded.crop_type, crop_type), "
+                "area_mu = COALESCE(excluded.area_mu, area_mu), owner = COALESCE(excluded.owner, owner), "
+                "contact = COALESCE(excluded.contact, contact)",
+                (field_id, name, crop_type, area_mu, owner, contact, time.time())
+            )
+        if polygon:
+            self.spatial.index_field(field_id, polygon)
+        return self.get_field(field_id)
+
+    def get_field(self, field_id: str) -> Optional[Dict]:
+        """获取田块基础信息"""
+        row = self._connection().execute(
+            "SELECT field_id, name, crop_type, area_mu, owner, contact, created_at FROM fields WHERE field_id = ?",
+            (field_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ("field_id", "name", "crop_type", "area_mu", "owner", "contact", "created_at")
+        return dict(zip(keys, row))
+
+    def record_frame(self, field_id: str, result: Dict, ts: Optional[float] = None,
+                     flight_id: Optional[str] = None, result_file: Optional[str] = None,
+                     crop_type: Optional[str] = None, lat: Optional[float] = None,
+                     lon: Optional[float] = None) -> int:
+        """
+        写入一帧检测结果，并在同一事务内增量更新田块汇总
+
+        Args:
+            field_id: 田块ID
+            result: 检测结果字典
+            ts: 拍摄时间戳，默认当前时间
+            flight_id: 航次ID
+            result_file: 结果文件名
+            crop_type: 作物类型（田块未登记时用于自动建档）
+            lat: 拍摄位置纬度（与经度同时提供时写入空间索引）
+            lon: 拍摄位置经度
+
+        Returns:
+            int: 帧ID
+        """
+        ts = ts or time.time()
+        details = result.get("details") or {}
+        # 同一病害的不同叫法归一为标准名称后再计数
+        disease_id, disease = normalize_disease(details.get("disease"), crop_type)
+        confidence = details.get("confidence", 0.0)
+        severity = SEVERITY_LEVELS.get(details.get("severity"), 0)
+        diseased = disease_id not in (HEALTHY_ID, UNKNOWN_ID) and severity > 0
+        image_sha256 = (result.get("image") or {}).get("sha256")
+        day = datetime.fromtimestamp(ts).strftime("%Y-%m-%d")
+
+        conn = self._connection()
+        with conn:
+            frame_id = self._next_id(conn, "frame_id")
+
+            if flight_id:
+                conn.execute(
+                    "INSERT OR IGNORE INTO flights (flight_id, field_id, started_at) VALUES (?, ?, ?)",
+                    (flight_id, field_id, ts)
+                )
+            conn.execute(
+                "INSERT OR IGNORE INTO fields (field_id, crop_type, created_at) VALUES (?, ?, ?)",
+                (field_id, crop_type, ts)
+            )
+            conn.execute(
+                "INSERT INTO frames (field_id, ts, frame_id, flight_id, image_sha256, result_file, "
+                "disease, severity, confidence) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (field_id, ts, frame_id, flight_id, image_sha256, result_file,
+                 disease, severity, confidence)
+            )
+            if lat is not None and lon is not None:
+                self.spatial.index_frame(conn, frame_id, field_id, ts, disease, severity, confidence, lat, lon)
+            self._update_daily(conn, field_id, day, disease, severity, diseased)
+            self._update_rollup(conn, field_id, ts, disease, severity, diseased)
+            if disease_id != UNKNOWN_ID:
+                self._update_consensus(conn, "field", field_id, ts, disease_id, confidence, severity)
+                if flight_id:
+                    self._update_consensus(conn, "flight", flight_id, ts, disease_id, confidence, severity)
+        return frame_id
+
+    def _next_id(self, conn: sqlite3.Connection, name: str) -> int:
+        """自增计数器（frames 为 WITHOUT ROWID 表，帧ID单独分配）"""
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+        return conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+
+    def _update_daily(self, conn: sqlite3.Connection, field_id: str, day: str,
+                      disease: str, severity: int, diseased: bool):
+        """增量更新按日汇总"""
+        row = conn.execute(
+            "SELECT frames, diseased_frames, max_severity, disease_counts FROM field_daily "
+            "WHERE field_id = ? AND day = ?",
+            (field_id, day)
+        ).fetchone()
+        frames, diseased_frames, max_severity, counts = row if row else (0, 0, 0, "{}")
+        counts = json.loads(counts)
+        if diseased:
+            counts[disease] = counts.get(disease, 0) + 1
+
+        conn.execute(
+            "INSERT OR REPLACE INTO field_daily (field_id, day, frames, diseased_frames, max_severity, disease_counts) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (field_id, day, frames + 1, diseased_frames + int(diseased),
+             max(max_severity, severity if diseased else 0), json.dumps(counts, ensure_ascii=False))
+        )
+
+    def _update_rollup(self, conn: sqlite3.Connection, field_id: str, ts: float,
+                       disease: str, severity: int, diseased: bool):
+        """增量更新田块总汇总与趋势指数"""
+        row = conn.execute(
+            "SELECT frames, diseased_frames, max_severity, disease_counts, trend_short, trend_long, "
+            "first_ts, last_ts FROM field_rollups WHERE field_id = ?",
+            (field_id,)
+        ).fetchone()
+        if row:
+            frames, diseased_frames, max_severity, counts, short, long_, first_ts, last_ts = row
+            counts = json.loads(counts)
+        else:
+            frames, diseased_frames, max_severity, counts, short, long_, first_ts, last_ts = 0, 0, 0, {}, 0.0, 0.0, ts, ts
+
+        if diseased:
+            counts[disease] = counts.get(disease, 0) + 1
+
+        # 以严重程度加权的病害指标 (0~1) 更新短期/长期指数
+        signal = severity / 3 if diseased else 0.0
+        short += TREND_ALPHA_SHORT * (signal - short)
+        long_ += TREND_ALPHA_LONG * (signal - long_)
+
+        conn.execute(
+            "INSERT OR REPLACE INTO field_rollups (field_id, frames, diseased_frames, max_severity, "
+            "disease_counts, trend_short, trend_long, first_ts, last_ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (field_id, frames + 1, diseased_frames + int(diseased),
+             max(max_severity, severity if diseased else 0), json.dumps(counts, ensure_ascii=False),
+             short, long_, min(first_ts, ts), max(last_ts, ts))
+        )
+
+    def _update_consensus(self, conn: sqlite3.Connection, scope: str, scope_id: str, ts: float,
+                          disease_id: str, confidence: float, severity: int):
+        """增量更新田块/航次的诊断共识（田块级逐步遗忘旧证据，航次级不遗忘）"""
+        row = conn.execute(
+            "SELECT state FROM consensus WHERE scope = ? AND scope_id = ?", (scope, scope_id)
+        ).fetchone()
+        decay = Config.CONSENSUS_FIELD_DECAY if scope == "field" else 1.0
+        consensus = DiagnosisConsensus.from_json(row[0] if row else None, decay)
+        consensus.update(disease_id, confidence, severity)
+        conn.execute(
+            "INSERT OR REPLACE INTO consensus (scope, scope_id, state, updated_at) VALUES (?, ?, ?, ?)",
+            (scope, scope_id, consensus.to_json(), ts)
+        )
+
+    def get_diagnosis(self, scope: str, scope_id: str) -> Optional[Dict]:
+        """
+        读取田块或航次的整体诊断（一条记录，无需重新聚合帧）
+
+        Args:
+            scope: "field" 或 "flight"
+            scope_id: 田块ID或航次ID
+
+        Returns:
+            Optional[Dict]: 整体诊断，无数据返回None
+        """
+        row = self._connection().execute(
+            "SELECT state, updated_at FROM consensus WHERE scope = ? AND scope_id = ?", (scope, scope_id)
+        ).fetchone()
+        if row is None:
+            return None
+
+        diagnosis = DiagnosisConsensus.from_json(row[0]).diagnosis()
+        if diagnosis is None:
+            return None
+        for entry in (diagnosis, diagnosis["leading_disease"]):
+            if entry is not None:
+                entry["max_severity"] = SEVERITY_NAMES.get(entry["max_severity"], "未知")
+        diagnosis["updated_at"] = row[1]
+        return diagnosis
+
+    def get_summary(self, field_id: str) -> Optional[Dict]:
+        """
+        获取田块汇总（直接读取增量汇总，不扫描帧）
+
+        Args:
+            field_id: 田块ID
+
+        Returns:
+            Optional[Dict]: 汇总信息，田块无数据返回None
+        """
+        row = self._connection().execute(
+            "SELECT frames, diseased_frames, max_severity, disease_counts, trend_short, trend_long, "
+            "first_ts, last_ts FROM field_rollups WHERE field_id = ?",
+            (field_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        frames, diseased_frames, max_severity, counts, short, long_, first_ts, last_ts = row
+        delta = short - long_
+        if delta > TREND_THRESHOLD:
+            trend = "上升"
+        elif delta < -TREND_THRESHOLD:
+            trend = "下降"
+        else:
+            trend = "平稳"
+
+        return {
+            "field": self.get_field(field_id),
+            "frames": frames,
+            "diseased_frames": diseased_frames,
+            "disease_rate": round(diseased_frames / frames, 4) if frames else 0.0,
+            "max_severity": SEVERITY_NAMES[max_severity],
+            "disease_counts": json.loads(counts),
+            "trend": trend,
+            "trend_index": round(delta, 4),
+            "first_seen": first_ts,
+            "last_seen": last_ts,
+            "diagnosis": self.get_diagnosis("field", field_id)
+        }
+
+    def get_season_history(self, field_id: str, start_ts: Optional[float] = None,
+                           end_ts: Optional[float] = None) -> List[Dict]:
+        """
+        获取田块一段时间内的按日历史（读取按日汇总，一季约百余行）
+
+        Args:
+            field_id: 田块ID
+            start_ts: 开始时间戳
+            end_ts: 结束时间戳
+
+        Returns:
+            List[Dict]: 按日期升序的每日汇总
+        """
+        start_day = datetime.fromtimestamp(start_ts).strftime("%Y-%m-%d") if start_ts else "0000-00-00"
+        end_day = datetime.fromtimestamp(end_ts).strftime("%Y-%m-%d") if end_ts else "9999-99-99"
+        rows = self._connection().execute(
+            "SELECT day, frames, diseased_frames, max_severity, disease_counts FROM field_daily "
+            "WHERE field_id = ? AND day BETWEEN ? AND ? ORDER BY day",
+            (field_id, start_day, end_day)
+        ).fetchall()
+        return [
+            {
+                "day": day,
+                "frames": frames,
+                "diseased_frames": diseased_frames,
+                "max_severity": SEVERITY_NAMES[max_severity],
+                "disease_counts": json.loads(counts)
+            }
+            for day, frames, diseased_frames, max_severity, counts in rows
+        ]
+
+    def get_frames(self, field_id: str, start_ts: Optional[float] = None,
+                   end_ts: Optional[float] = None, limit: int = 500) -> List[Dict]:
+        """
+        按时间范围读取帧记录（主键 (field_id, ts) 上的范围扫描）
+
+        Args:
+            field_id: 田块ID
+            start_ts: 开始时间戳
+            end_ts: 结束时间戳
+            limit: 最多返回条数（按时间倒序）
+
+        Returns:
+            List[Dict]: 帧记录
+        """
+        rows = self._connection().execute(
+            "SELECT ts, frame_id, flight_id, image_sha256, result_file, disease, severity, confidence "
+            "FROM frames WHERE field_id = ? AND ts BETWEEN ? AND ? ORDER BY ts DESC LIMIT ?",
+            (field_id, start_ts or 0, end_ts or float("inf"), limit)
+        ).fetchall()
+        keys = ("ts", "frame_id", "flight_id", "image_sha256", "result_file", "disease", "severity", "confidence")
+        frames = [dict(zip(keys, row)) for row in rows]
+        for frame in frames:
+            frame["severity"] = SEVERITY_NAMES.get(frame["severity"], "未知")
+        return frames
+
+    def add_service_record(self, field_id: str, kind: str, note: str = "", ts: Optional[float] = None):
+        """
+        记录一次服务（施药、配送、回访等）
+
+        Args:
+            field_id: 田块ID
+            kind: 服务类型
+            note: 备注
+            ts: 时间戳
+        """
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO service_records (field_id, ts, kind, note) VALUES (?, ?, ?, ?)",
+                (field_id, ts or time.time(), kind, note)
+            )
+
+    def get_service_records(self, field_id: str, limit: int = 100) -> List[Dict]:
+        """获取田块最近的服务记录"""
+        rows = self._connection().execute(
+            "SELECT ts, kind, note FROM service_records WHERE field_id = ? ORDER BY ts DESC LIMIT ?",
+            (field_id, limit)
+        ).fetchall()
+        return [{"ts": ts, "kind": kind, "note": note} for ts, kind, note in rows]
@@ -0,0 +1,360 @@
+"""
+离线存储转发队列：网络不可用时将待检测图片持久化到本地，恢复后批量同步
+"""
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set
+
+from ..config import Config
+from ..detectors.result import json_default
+
+
+class OfflineQueue:
+    """基于 SQLite 的持久化检测队列，入队采用分组提交以减少 fsync 次数"""
+
+    PENDING = "pending"
+    INFLIGHT = "inflight"
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self, db_path: str = Config.OFFLINE_QUEUE_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+
+        # 分组提交状态
+        self._cond = threading.Condition()
+        self._buffer: List[tuple] = []
+        self._committed: Dict[int, int] = {}
+        self._next_ticket = 0
+        self._flushing = False
+
+        # 连通性状态：离线期间直接入队，不再尝试调用API
+        self._offline_until = 0.0
+
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS queue ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "image_path TEXT NOT NULL, "
+                "crop_type TEXT NOT NULL, "
+                "status TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, "
+                "next_attempt_at REAL NOT NULL, "
+                "claimed_at REAL, "
+                "created_at REAL NOT NULL, "
+                "result_file TEXT, "
+                "result_json TEXT, "
+                "hints_json TEXT, "
+                "last_error TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_queue_ready ON queue (status, next_attempt_at)")
+            # 旧版本创建的队列没有 hints_json 列
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(queue)")}
+            if "hints_json" not in columns:
+                conn.execute("ALTER TABLE queue ADD COLUMN hints_json TEXT")
+
+    def _connection(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # 每次提交都落盘，设备断电也不丢失已确认入队的图片
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, image_path: str, crop_type: str) -> int:
+        """
+        将图片加入队列，返回前保证已持久化
+
+        并发入队时，先到者负责把缓冲区中的所有记录在一个事务中提交，
+        其余调用者等待该次提交，多条记录只需一次 fsync。
+
+        Args:
+            image_path: 图片路径
+            crop_type: 作物类型
+
+        Returns:
+            int: 队列记录ID
+        """
+        now = time.time()
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._buffer.append((ticket, image_path, crop_type, now))
+
+            while ticket not in self._committed:
+                if self._flushing:
+                    self._cond.wait()
+                    continue
+
+                self._flushing = True
+                batch, self._buffer = self._buffer, []
+                self._cond.release()
+                try:
+                    ids = self._commit_batch(batch)
+                finally:
+                    self._cond.acquire()
+                    self._flushing = False
+                self._committed.update(ids)
+                self._cond.notify_all()
+
+            return self._committed.pop(ticket)
+
+    def _commit_batch(self, batch: List[tuple]) -> Dict[int, int]:
+        """在一个事务中写入一批记录，返回 ticket 到记录ID的映射"""
+        ids = {}
+        with self._connection() as conn:
+            for ticket, image_path, crop_type, created_at in batch:
+                cursor = conn.execute(
+                    "INSERT INTO queue (image_path, crop_type, status, next_attempt_at, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (image_path, crop_type, self.PENDING, created_at, created_at)
+                )
+                ids[ticket] = cursor.lastrowid
+        return ids
+
+    def claim(self, limit: int, lease: float = Config.OFFLINE_SYNC_LEASE) -> List[Dict]:
+        """
+        领取一批到期的待同步记录（多进程安全）
+
+        Args:
+            limit: 最多领取数量
+            lease: 领取租约秒数，超时未完成的记录可被重新领取
+
+        Returns:
+            List[Dict]: 记录列表
+        """
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT id, image_path, crop_type, attempts, result_file FROM queue "
+                "WHERE (status = ? AND next_attempt_at <= ?) OR (status = ? AND claimed_at <= ?) "
+                "ORDER BY id LIMIT ?",
+                (self.PENDING, now, self.INFLIGHT, now - lease, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE queue SET status = ?, claimed_at = ? WHERE id = ?",
+                [(self.INFLIGHT, now, row[0]) for row in rows]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        return [
+            {"id": row[0], "image_path": row[1], "crop_type": row[2], "attempts": row[3], "result_file": row[4]}
+            for row in rows
+        ]
+
+    def complete(self, item_id: int, result: Dict) -> Optional[Dict]:
+        """
+        标记记录同步成功并保存真实结果
+
+        Args:
+            item_id: 记录ID
+            result: 真实检测结果
+
+        Returns:
+            Optional[Dict]: 关联信息 {"result_file": 结果文件名, "hints": 表单提示}，尚未关联时为None
+        """
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE queue SET status = ?, result_json = ?, last_error = NULL WHERE id = ?",
+                (self.DONE, json.dumps(result, ensure_ascii=False, default=json_default), item_id)
+            )
+            row = conn.execute("SELECT result_file, hints_json FROM queue WHERE id = ?", (item_id,)).fetchone()
+        if not row or not row[0]:
+            return None
+        return {"result_file": row[0], "hints": json.loads(row[1]) if row[1] else {}}
+
+    def fail(self, item_id: int, attempts: int, error: str, retryable: bool = True):
+        """
+        记录同步失败，按指数退避安排下次重试
+
+        Args:
+            item_id: 记录ID
+            attempts: 本次失败前已尝试次数
+            error: 错误信息
+            retryable: 是否值得重试
+        """
+        attempts += 1
+        delay = min(Config.OFFLINE_RETRY_BASE * (2 ** (attempts - 1)), Config.OFFLINE_RETRY_MAX)
+        delay *= random.uniform(0.8, 1.2)
+        give_up = not retryable or attempts >= Config.OFFLINE_MAX_ATTEMPTS
+
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE queue SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (self.FAILED if give_up else self.PENDING, attempts, time.time() + delay, error, item_id)
+            )
+
+    def attach_result(self, item_id: int, result_file: str, hints: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        关联临时结果文件与表单提示；若真实结果已先到达，返回该结果供立即回填
+
+        记录在检测时入队，此时表单中的位置提示尚未与照片 EXIF 合并，因此与结果文件一起在这里保存。
+
+        Args:
+            item_id: 记录ID
+            result_file: 临时（模拟）结果文件名
+            hints: 合并后的表单提示（field_id、flight_id、lat、lon、captured_at），同步后用于写入田块档案与预警
+
+        Returns:
+            Optional[Dict]: 已同步的真实结果，尚未同步返回None
+        """
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE queue SET result_file = ?, hints_json = ? WHERE id = ?",
+                (result_file, json.dumps(hints or {}, ensure_ascii=False), item_id)
+            )
+            row = conn.execute(
+                "SELECT status, result_json FROM queue WHERE id = ?", (item_id,)
+            ).fetchone()
+        if row and row[0] == self.DONE and row[1]:
+            return json.loads(row[1])
+        return None
+
+    def counts(self) -> Dict[str, int]:
+        """
+        各状态的记录数
+
+        Returns:
+            Dict[str, int]: 状态到数量的映射
+        """
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM queue GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def pending_paths(self) -> Set[str]:
+        """
+        尚未同步完成（待同步或同步中）的图片路径，这些图片不能被清理
+
+        Returns:
+            Set[str]: 规范化后的绝对路径集合
+        """
+        rows = self._connection().execute(
+            "SELECT DISTINCT image_path FROM queue WHERE status IN (?, ?)", (self.PENDING, self.INFLIGHT)
+        ).fetchall()
+        return {os.path.abspath(row[0]) for row in rows}
+
+    def mark_offline(self, seconds: float):
+        """标记接下来一段时间网络不可用"""
+        self._offline_until = max(self._offline_until, time.time() + seconds)
+
+    def mark_online(self):
+        """标记网络已恢复"""
+        self._offline_until = 0.0
+
+    def is_offline(self) -> bool:
+        """当前是否处于离线状态"""
+        return time.time() < self._offline_until
+
+
+class OfflineSyncWorker:
+    """后台同步线程：网络恢复后并发地批量调用真实API，并回填结果"""
+
+    def __init__(self, queue: OfflineQueue, detector,
+                 on_result: Callable[[Dict, Dict], None],
+                 concurrency: int = Config.OFFLINE_SYNC_CONCURRENCY,
+                 interval: float = Config.OFFLINE_SYNC_INTERVAL):
+        """
+        Args:
+            queue: 离线队列
+            detector: 真实API检测器（QwenDiseaseDetector 或 CascadeQwenDetector）
+            on_result: 回填回调，参数为 (队列记录, 真实结果)
+            concurrency: 并发调用数
+            interval: 空闲轮询间隔（秒）
+        """
+        self.queue = queue
+        self.detector = detector
+        self.on_result = on_result
+        self.concurrency = concurrency
+        self.interval = interval
+
+        self._backoff = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"synced": 0, "retried": 0, "failed": 0}
+
+    def start(self):
+        """启动同步线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="offline-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止同步线程"""
+        self._stop.set()
+
+    def _loop(self):
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="offline-sync") as pool:
+            while not self._stop.is_set():
+                wait = self.interval
+                try:
+                    processed = self.drain_once(pool)
+                    if processed:
+                        wait = 0
+                except Exception as e:
+                    print(f"⚠️  离线队列同步异常: {e}")
+                self._stop.wait(max(wait, self._backoff))
+
+    def drain_once(self, pool: ThreadPoolExecutor) -> int:
+        """
+        领取并处理一批记录
+
+        Args:
+            pool: 执行API调用的线程池
+
+        Returns:
+            int: 本批处理的记录数
+        """
+        items = self.queue.claim(self.concurrency * 2)
+        if not items:
+            return 0
+
+        outcomes = list(pool.map(self._sync_item, items))
+
+        if outcomes and not any(outcomes):
+            # 整批都因网络失败：整体退避，避免在断网时空转
+            self._backoff = min(max(self._backoff * 2, Config.OFFLINE_RETRY_BASE), Config.OFFLINE_RETRY_MAX)
+            self.queue.mark_offline(self._backoff)
+            print(f"📴 网络不可用，{self._backoff:.0f} 秒后重试同步")
+        elif any(outcomes):
+            self._backoff = 0.0
+            self.queue.mark_online()
+        return len(items)
+
+    def _sync_item(self, item: Dict) -> bool:
+        """同步单条记录，返回网络是否可用"""
+        if not os.path.exists(item["image_path"]):
+            self.queue.fail(item["id"], item["attempts"], "图片已不存在", retryable=False)
+            self.stats["failed"] += 1
+            return True
+
+        result = self.detector.detect(item["image_path"], item["crop_type"])
+        if result["status"] == "success":
+            result["synced_from_queue"] = item["id"]
+            # 以完成时刻的关联文件与表单提示为准（领取后才关联的情况）
+            attachment = self.queue.complete(item["id"], result) or {"result_file": None, "hints": {}}
+            try:
+                self.on_result({**item, **attachment}, result)
+            except Exception as e:
+                print(f"⚠️  回填结果失败 (队列 {item['id']}): {e}")
+            self.stats["synced"] += 1
+            return True
+
+        retryable = result.get("retryable", False)
+        self.queue.fail(item["id"], item["attempts"], result.get("error", "未知错误"), retryable)
+        self.stats["retried" if retryable else "failed"] += 1
+        return not retryable
@@ -0,0 +1,233 @@
+"""
+上传与结果文件的保留策略：按时间/容量清理，冷结果压缩归档，后台执行
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import zipfile
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from ..config import Config
+from .sharding import ShardedDirectory
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class RetentionManager:
+    """上传/结果目录的保留与压缩管理器"""
+
+    def __init__(self,
+                 upload_dir: str = Config.UPLOAD_DIR,
+                 results_dir: str = Config.RESULTS_DIR,
+                 archive_dir: str = Config.ARCHIVE_DIR,
+                 index_path: str = Config.RETENTION_DB_PATH,
+                 offline_queue=None):
+        """
+        Args:
+            upload_dir: 上传目录
+            results_dir: 结果目录
+            archive_dir: 每日归档目录
+            index_path: 归档索引数据库路径
+            offline_queue: 离线队列（OfflineQueue），其中尚未同步的图片不会被清理
+        """
+        self.uploads = ShardedDirectory(upload_dir)
+        self.results = ShardedDirectory(results_dir)
+        self.archive_dir = archive_dir
+        self.index_path = index_path
+        self.offline_queue = offline_queue
+
+        self.upload_max_age = Config.UPLOAD_MAX_AGE_DAYS * 86400
+        self.upload_max_bytes = Config.UPLOAD_MAX_BYTES
+        self.results_archive_after = Config.RESULTS_ARCHIVE_AFTER_DAYS * 86400
+        self.archive_max_age = Config.ARCHIVE_MAX_AGE_DAYS * 86400
+        self.interval = Config.RETENTION_INTERVAL
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._local = threading.local()
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS archived ("
+                "filename TEXT PRIMARY KEY, archive TEXT NOT NULL)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        """获取当前线程的归档索引连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.index_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def start(self):
+        """启动后台压缩线程（守护线程，不阻塞请求处理）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台线程"""
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"⚠️  保留策略执行失败: {e}")
+
+    def run_once(self, now: Optional[float] = None) -> Dict:
+        """
+        执行一轮保留策略；多个 worker 同时运行时只有持有锁的进程执行
+
+        Args:
+            now: 当前时间戳（便于测试），默认取系统时间
+
+        Returns:
+            Dict: 本轮处理统计
+        """
+        now = now or time.time()
+        lock_file = open(self.index_path + ".lock", "w")
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return {"skipped": True}
+
+            summary = {
+                "results_archived": self._archive_cold_results(now),
+                "uploads_expired": self._expire_uploads(now),
+                "archives_expired": self._expire_archives(now)
+            }
+        finally:
+            lock_file.close()
+
+        if any(summary.values()):
+            print(f"🧹 保留策略: {summary}")
+        return summary
+
+    def _archive_cold_results(self, now: float) -> int:
+        """将超过期限的结果文件按日期压缩进每日归档"""
+        by_day: Dict[str, List[os.DirEntry]] = {}
+        for entry in self.results.iter_files():
+            mtime = entry.stat().st_mtime
+            if now - mtime >= self.results_archive_after:
+                day = datetime.fromtimestamp(mtime).strftime("%Y-%m-%d")
+                by_day.setdefault(day, []).append(entry)
+
+        archived = 0
+        for day, entries in by_day.items():
+            archive_name = f"results-{day}.zip"
+            self._write_archive(os.path.join(self.archive_dir, archive_name), entries)
+
+            # 先写索引再删除原文件，保证任何时刻都能找到结果
+            with self._connection() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO archived (filename, archive) VALUES (?, ?)",
+                    [(entry.name, archive_name) for entry in entries]
+                )
+            for entry in entries:
+                os.remove(entry.path)
+            archived += len(entries)
+
+            # 让出CPU，避免长时间占用磁盘IO
+            time.sleep(0)
+        return archived
+
+    @staticmethod
+    def _write_archive(archive_path: str, entries: List[os.DirEntry]):
+        """
+        把结果文件并入每日归档
+
+        不在原归档上追加（追加期间中央目录被改写，并发读取会失败，中途崩溃会毁掉当天已归档的结果），
+        而是把已有条目与新文件写入临时文件后原子替换；已打开旧归档的读取者不受影响。
+        """
+        temp_path = archive_path + ".tmp"
+        try:
+            with zipfile.ZipFile(temp_path, "w", compression=zipfile.ZIP_DEFLATED) as out:
+                existing = set()
+                if os.path.exists(archive_path):
+                    with zipfile.ZipFile(archive_path) as previous:
+                        for info in previous.infolist():
+                            out.writestr(info, previous.read(info))
+                            existing.add(info.filename)
+                for entry in entries:
+                    if entry.name not in existing:
+                        out.write(entry.path, arcname=entry.name)
+            os.replace(temp_path, archive_path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def _expire_uploads(self, now: float) -> int:
+        """删除过期上传，并在总量超限时从最旧的开始删除；离线队列中待同步的图片保留"""
+        pinned = self.offline_queue.pending_paths() if self.offline_queue is not None else set()
+        files = []
+        for entry in self.uploads.iter_files():
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        removed = 0
+        total_bytes = sum(size for _, size, _ in files)
+        files.sort()
+        for mtime, size, path in files:
+            if now - mtime < self.upload_max_age and total_bytes <= self.upload_max_bytes:
+                break
+            if os.path.abspath(path) in pinned:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+            removed += 1
+        return removed
+
+    def _expire_archives(self, now: float) -> int:
+        """删除超过保存期限的每日归档"""
+        removed = 0
+        for entry in os.scandir(self.archive_dir):
+            if entry.name.endswith(".zip") and now - entry.stat().st_mtime >= self.archive_max_age:
+                with self._connection() as conn:
+                    conn.execute("DELETE FROM archived WHERE archive = ?", (entry.name,))
+                os.remove(entry.path)
+                removed += 1
+        return removed
+
+    def read_archived_result(self, filename: str) -> Optional[bytes]:
+        """
+        从归档中读取结果文件
+
+        Args:
+            filename: 结果文件名
+
+        Returns:
+            Optional[bytes]: 文件内容，不存在返回None
+        """
+        row = self._connection().execute(
+            "SELECT archive FROM archived WHERE filename = ?", (filename,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        archive_path = os.path.join(self.archive_dir, row[0])
+        try:
+            with zipfile.ZipFile(archive_path) as zf:
+                return zf.read(filename)
+        except (FileNotFoundError, KeyError, zipfile.BadZipFile):
+            return None
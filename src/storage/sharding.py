@@ -0,0 +1,82 @@
+"""
+分片目录布局：按文件名哈希前缀分散到两级子目录，避免单目录文件过多
+"""
+
+import hashlib
+import os
+from typing import Iterator, Optional
+
+
+class ShardedDirectory:
+    """哈希前缀分片目录，例如 results/3f/a2/result_xxx.json"""
+
+    def __init__(self, base_dir: str, depth: int = 2):
+        self.base_dir = base_dir
+        self.depth = depth
+
+    def shard_of(self, filename: str) -> str:
+        """
+        计算文件所在的分片相对路径
+
+        Args:
+            filename: 文件名
+
+        Returns:
+            str: 分片相对路径，如 "3f/a2"
+        """
+        digest = hashlib.md5(filename.encode("utf-8")).hexdigest()
+        return os.path.join(*(digest[i * 2:i * 2 + 2] for i in range(self.depth)))
+
+    def path_for(self, filename: str, create: bool = False) -> str:
+        """
+        获取文件在分片布局下的完整路径
+
+        Args:
+            filename: 文件名
+            create: 是否创建分片目录
+
+        Returns:
+            str: 完整路径
+        """
+        shard_dir = os.path.join(self.base_dir, self.shard_of(filename))
+        if create:
+            os.makedirs(shard_dir, exist_ok=True)
+        return os.path.join(shard_dir, filename)
+
+    def locate(self, filename: str) -> Optional[str]:
+        """
+        查找文件：优先分片路径，兼容分片前的平铺路径
+
+        Args:
+            filename: 文件名（不含目录）
+
+        Returns:
+            Optional[str]: 存在时返回完整路径，否则None
+        """
+        if not filename or os.path.basename(filename) != filename or filename.startswith("."):
+            return None
+
+        path = self.path_for(filename)
+        if os.path.isfile(path):
+            return path
+
+        legacy_path = os.path.join(self.base_dir, filename)
+        if os.path.isfile(legacy_path):
+            return legacy_path
+        return None
+
+    def iter_files(self) -> Iterator[os.DirEntry]:
+        """遍历目录下的所有文件（含分片与平铺文件，跳过隐藏的临时文件）"""
+        stack = [self.base_dir]
+        while stack:
+            try:
+                entries = list(os.scandir(stack.pop()))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
@@ -0,0 +1,288 @@
+"""
+空间索引：基于 SQLite R-tree 的检测点与田块范围查询
+
+支持矩形范围、半径范围与 k 近邻查询。R-tree 先按外包矩形快速筛选，
+再用球面距离精确过滤，避免线性扫描所有检测结果。
+"""
+
+import json
+import math
+import sqlite3
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+# k 近邻搜索的初始半径与最大半径（公里）
+KNN_START_RADIUS_KM = 1.0
+KNN_MAX_RADIUS_KM = 1000.0
+
+SPATIAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS frame_geo (
+    frame_id INTEGER PRIMARY KEY,
+    field_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    disease TEXT,
+    severity INTEGER,
+    confidence REAL,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_frame_geo_field ON frame_geo (field_id, ts);
+CREATE VIRTUAL TABLE IF NOT EXISTS frame_rtree USING rtree (id, min_lat, max_lat, min_lon, max_lon);
+CREATE TABLE IF NOT EXISTS field_geo (
+    id INTEGER PRIMARY KEY,
+    field_id TEXT NOT NULL UNIQUE,
+    polygon TEXT NOT NULL,
+    center_lat REAL NOT NULL,
+    center_lon REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS field_rtree USING rtree (id, min_lat, max_lat, min_lon, max_lon);
+"""
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    计算两点间的球面距离
+
+    Returns:
+        float: 距离（公里）
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def bbox_around(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """
+    计算以某点为中心、给定半径的外包矩形
+
+    Returns:
+        Tuple: (min_lat, min_lon, max_lat, max_lon)
+    """
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    dlon = math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat))
+    return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+
+
+class SpatialIndex:
+    """检测点与田块的空间索引"""
+
+    def __init__(self, connection: Callable[[], sqlite3.Connection]):
+        """
+        Args:
+            connection: 返回当前线程数据库连接的函数（与农田档案共用数据库）
+        """
+        self._connection = connection
+        self._connection().executescript(SPATIAL_SCHEMA)
+
+    def index_frame(self, conn: sqlite3.Connection, frame_id: int, field_id: str, ts: float,
+                    disease: str, severity: int, confidence: float, lat: float, lon: float):
+        """
+        在调用方的事务内写入一个检测点
+
+        Args:
+            conn: 当前事务所在的连接
+        """
+        conn.execute(
+            "INSERT OR REPLACE INTO frame_geo (frame_id, field_id, ts, disease, severity, confidence, lat, lon) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (frame_id, field_id, ts, disease, severity, confidence, lat, lon)
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO frame_rtree (id, min_lat, max_lat, min_lon, max_lon) VALUES (?, ?, ?, ?, ?)",
+            (frame_id, lat, lat, lon, lon)
+        )
+
+    def index_field(self, field_id: str, polygon: Sequence[Sequence[float]]):
+        """
+        写入或更新田块边界
+
+        Args:
+            field_id: 田块ID
+            polygon: 边界点列表 [[lat, lon], ...]
+        """
+        lats = [float(point[0]) for point in polygon]
+        lons = [float(point[1]) for point in polygon]
+        center_lat, center_lon = sum(lats) / len(lats), sum(lons) / len(lons)
+
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO field_geo (field_id, polygon, center_lat, center_lon) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(field_id) DO UPDATE SET polygon = excluded.polygon, "
+                "center_lat = excluded.center_lat, center_lon = excluded.center_lon",
+                (field_id, json.dumps(polygon), center_lat, center_lon)
+            )
+            row_id = conn.execute("SELECT id FROM field_geo WHERE field_id = ?", (field_id,)).fetchone()[0]
+            conn.execute(
+                "INSERT OR REPLACE INTO field_rtree (id, min_lat, max_lat, min_lon, max_lon) VALUES (?, ?, ?, ?, ?)",
+                (row_id, min(lats), max(lats), min(lons), max(lons))
+            )
+
+    def field_center(self, field_id: str) -> Optional[Tuple[float, float]]:
+        """
+        获取田块中心点
+
+        Returns:
+            Optional[Tuple[float, float]]: (lat, lon)，田块未登记边界时返回None
+        """
+        row = self._connection().execute(
+            "SELECT center_lat, center_lon FROM field_geo WHERE field_id = ?", (field_id,)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def field_polygon(self, field_id: str) -> Optional[List[List[float]]]:
+        """
+        获取田块边界
+
+        Returns:
+            Optional[List[List[float]]]: [[lat, lon], ...]，田块未登记边界时返回None
+        """
+        row = self._connection().execute(
+            "SELECT polygon FROM field_geo WHERE field_id = ?", (field_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def field_detections(self, field_id: str, since: Optional[float] = None,
+                         limit: Optional[int] = None) -> List[Dict]:
+        """
+        田块内带定位的检测点（(field_id, ts) 索引上的范围扫描）
+
+        Args:
+            field_id: 田块ID
+            since: 只返回该时间戳之后的检测
+            limit: 最多返回条数（按时间倒序，None 表示不限）
+
+        Returns:
+            List[Dict]: 检测点列表（按时间倒序）
+        """
+        sql = ("SELECT frame_id, field_id, ts, disease, severity, confidence, lat, lon "
+               "FROM frame_geo WHERE field_id = ? AND ts >= ? ORDER BY ts DESC")
+        params: list = [field_id, since or 0]
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        keys = ("frame_id", "field_id", "ts", "disease", "severity", "confidence", "lat", "lon")
+        return [dict(zip(keys, row)) for row in self._connection().execute(sql, params).fetchall()]
+
+    def detections_in_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float,
+                           since: Optional[float] = None, disease: Optional[str] = None,
+                           min_severity: Optional[int] = None, limit: Optional[int] = 1000) -> List[Dict]:
+        """
+        矩形范围内的检测点
+
+        Args:
+            min_lat, min_lon, max_lat, max_lon: 矩形范围
+            since: 只返回该时间戳之后的检测
+            disease: 病害名称过滤
+            min_severity: 最低严重程度等级（0-3）
+            limit: 最多返回条数（None 表示不限）
+
+        Returns:
+            List[Dict]: 检测点列表（按时间倒序）
+        """
+        sql = (
+            "SELECT g.frame_id, g.field_id, g.ts, g.disease, g.severity, g.confidence, g.lat, g.lon "
+            "FROM frame_rtree r JOIN frame_geo g ON g.frame_id = r.id "
+            "WHERE r.min_lat >= ? AND r.max_lat <= ? AND r.min_lon >= ? AND r.max_lon <= ?"
+        )
+        params: list = [min_lat, max_lat, min_lon, max_lon]
+        if since is not None:
+            sql += " AND g.ts >= ?"
+            params.append(since)
+        if disease:
+            sql += " AND g.disease = ?"
+            params.append(disease)
+        if min_severity is not None:
+            sql += " AND g.severity >= ?"
+            params.append(min_severity)
+        sql += " ORDER BY g.ts DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        keys = ("frame_id", "field_id", "ts", "disease", "severity", "confidence", "lat", "lon")
+        return [dict(zip(keys, row)) for row in self._connection().execute(sql, params).fetchall()]
+
+    def detections_within(self, lat: float, lon: float, radius_km: float,
+                          limit: Optional[int] = 1000, **filters) -> List[Dict]:
+        """
+        半径范围内的检测点（R-tree 外包矩形筛选 + 球面距离精确过滤）
+
+        Args:
+            lat, lon: 中心点
+            radius_km: 半径（公里）
+            limit: 最多返回条数（取距离最近的）
+            **filters: 同 detections_in_bbox 的过滤条件
+
+        Returns:
+            List[Dict]: 检测点列表，附带 distance_km，按距离升序
+        """
+        candidates = self.detections_in_bbox(*bbox_around(lat, lon, radius_km), limit=None, **filters)
+        results = []
+        for item in candidates:
+            distance = haversine_km(lat, lon, item["lat"], item["lon"])
+            if distance <= radius_km:
+                item["distance_km"] = round(distance, 4)
+                results.append(item)
+        results.sort(key=lambda item: item["distance_km"])
+        return results[:limit] if limit is not None else results
+
+    def nearest_detections(self, lat: float, lon: float, k: int, limit: Optional[int] = None,
+                           **filters) -> List[Dict]:
+        """
+        k 近邻检测点：半径逐步加倍，直到找到 k 个或达到最大半径
+
+        Args:
+            lat, lon: 中心点
+            k: 数量
+            limit: 忽略（近邻数量由 k 决定）
+            **filters: 同 detections_in_bbox 的过滤条件
+
+        Returns:
+            List[Dict]: 最近的 k 个检测点
+        """
+        radius = KNN_START_RADIUS_KM
+        while True:
+            results = self.detections_within(lat, lon, radius, limit=k, **filters)
+            if len(results) >= k or radius >= KNN_MAX_RADIUS_KM:
+                return results[:k]
+            radius *= 2
+
+    def fields_in_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[Dict]:
+        """与矩形范围相交的田块"""
+        rows = self._connection().execute(
+            "SELECT g.field_id, g.center_lat, g.center_lon, g.polygon "
+            "FROM field_rtree r JOIN field_geo g ON g.id = r.id "
+            "WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?",
+            (min_lat, max_lat, min_lon, max_lon)
+        ).fetchall()
+        return [
+            {"field_id": field_id, "lat": center_lat, "lon": center_lon, "polygon": json.loads(polygon)}
+            for field_id, center_lat, center_lon, polygon in rows
+        ]
+
+    def fields_within(self, lat: float, lon: float, radius_km: float) -> List[Dict]:
+        """中心点在半径范围内的田块，按距离升序"""
+        results = []
+        for item in self.fields_in_bbox(*bbox_around(lat, lon, radius_km)):
+            distance = haversine_km(lat, lon, item["lat"], item["lon"])
+            if distance <= radius_km:
+                item["distance_km"] = round(distance, 4)
+                results.append(item)
+        results.sort(key=lambda item: item["distance_km"])
+        return results
+
+    def nearest_fields(self, lat: float, lon: float, k: int) -> List[Dict]:
+        """k 近邻田块"""
+        radius = KNN_START_RADIUS_KM
+        while True:
+            results = self.fields_within(lat, lon, radius)
+            if len(results) >= k or radius >= KNN_MAX_RADIUS_KM:
+                return results[:k]
+            radius *= 2
+
@@ -0,0 +1,210 @@
+"""
+统计计数记录器：线程本地计数 + 后台定期写入共享存储
+
+热路径上每个线程只修改自己的计数字典，不加锁；后台线程定期汇总各线程计数，
+把与上次写入之间的增量批量写入 SQLiteStatsStore，多个 worker 进程在存储中累加。
+读取时返回存储中的全局汇总加上本进程尚未写入的增量。
+"""
+
+import atexit
+import os
+import threading
+import weakref
+from typing import Dict, Iterable, List, Optional
+
+from ..config import Config
+
+# 本进程的全部记录器：退出与 fork 钩子在模块级只注册一次，记录器被回收后自动移出
+_recorders: "weakref.WeakSet[StatsRecorder]" = weakref.WeakSet()
+
+
+class StatsRecorder:
+    """线程本地计数器，定期批量写入共享统计存储"""
+
+    def __init__(self, store=None, flush_interval: Optional[float] = None):
+        """
+        Args:
+            store: 共享统计存储（SQLiteStatsStore），为None时只在本进程内汇总
+            flush_interval: 后台写入间隔（秒）
+        """
+        self.store = store
+        self.flush_interval = flush_interval if flush_interval is not None else Config.STATS_FLUSH_INTERVAL
+
+        self._local = threading.local()
+        # 各线程的 (线程, 计数字典)；锁只在线程首次计数、汇总与写入时使用
+        self._slots: List = []
+        self._retired: Dict[str, float] = {}
+        self._flushed: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        self._started = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        _recorders.add(self)
+
+    def incr(self, key: str, amount: float = 1):
+        """
+        累加一个计数（只修改当前线程的字典，无锁）
+
+        Args:
+            key: 计数名
+            amount: 增量
+        """
+        counts = getattr(self._local, "counts", None)
+        if counts is None:
+            counts = self._register()
+        counts[key] = counts.get(key, 0) + amount
+
+    def _register(self) -> Dict[str, float]:
+        """为当前线程登记计数字典，首次计数时启动后台写入线程"""
+        with self._lock:
+            if not self._started:
+                self._start()
+            counts: Dict[str, float] = {}
+            self._slots.append((threading.current_thread(), counts))
+            self._local.counts = counts
+        return counts
+
+    def _reset(self):
+        """fork 后的子进程不继承父进程的线程与计数（父进程会自行写入）"""
+        self._local = threading.local()
+        self._slots, self._retired, self._flushed = [], {}, {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._started = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _start(self):
+        """启动后台写入线程（未配置共享存储时无需写入）"""
+        self._started = True
+        if self.store is None or self.flush_interval <= 0:
+            return
+        self._thread = threading.Thread(target=self._run, name="stats-flusher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """后台循环：每隔 flush_interval 秒写入一次"""
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self):
+        """停止后台线程并写入剩余计数"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def local_totals(self) -> Dict[str, float]:
+        """
+        本进程自启动以来的累计计数
+
+        Returns:
+            Dict[str, float]: 计数名到累计值的映射
+        """
+        with self._lock:
+            alive = []
+            for thread, counts in self._slots:
+                if thread.is_alive():
+                    alive.append((thread, counts))
+                else:
+                    # 已退出线程的计数并入 retired，避免短生命周期线程不断累积
+                    _merge(self._retired, counts)
+            self._slots = alive
+            totals = dict(self._retired)
+            for _, counts in alive:
+                # dict() 复制在持有 GIL 时完成，不会读到修改到一半的字典
+                _merge(totals, dict(counts))
+        return totals
+
+    def flush(self) -> Dict[str, float]:
+        """
+        将自上次写入以来的增量写入共享存储
+
+        Returns:
+            Dict[str, float]: 本次写入的增量（写入失败时为空，下次重试）
+        """
+        if self.store is None:
+            return {}
+        with self._flush_lock:
+            totals = self.local_totals()
+            deltas = _diff(totals, self._flushed)
+            if not deltas:
+                return {}
+            try:
+                self.store.increment(deltas)
+            except Exception as e:
+                print(f"⚠️  统计写入失败: {e}")
+                return {}
+            self._flushed = totals
+            return deltas
+
+    def totals(self) -> Dict[str, float]:
+        """
+        读取统计计数：配置了共享存储时为所有进程的汇总（含本进程尚未写入的部分）
+
+        Returns:
+            Dict[str, float]: 计数名到总值的映射
+        """
+        local = self.local_totals()
+        if self.store is None:
+            return local
+        try:
+            shared = self.store.totals()
+        except Exception as e:
+            print(f"⚠️  统计读取失败: {e}")
+            return local
+        with self._flush_lock:
+            pending = _diff(local, self._flushed)
+        return _merge(shared, pending)
+
+    def series(self, names: Iterable[str], resolution: str = "minute",
+               since: Optional[float] = None, until: Optional[float] = None) -> Dict[str, List[List[float]]]:
+        """
+        读取按分钟/小时分桶的时间序列（先写入本进程的增量）
+
+        Args:
+            names: 计数名列表
+            resolution: "minute" 或 "hour"
+            since: 开始时间戳
+            until: 结束时间戳
+
+        Returns:
+            Dict[str, List[List[float]]]: 计数名到 [[桶起始时间戳, 值], ...] 的映射
+        """
+        if self.store is None:
+            return {name: [] for name in names}
+        self.flush()
+        return self.store.series(names, resolution, since, until)
+
+
+def _flush_all():
+    """进程退出前写入各记录器尚未写入的计数"""
+    for recorder in list(_recorders):
+        recorder.flush()
+
+
+def _reset_all_after_fork():
+    """fork 后的子进程重置各记录器"""
+    for recorder in list(_recorders):
+        recorder._reset()
+
+
+atexit.register(_flush_all)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_all_after_fork)
+
+
+def _merge(target: Dict[str, float], source: Dict[str, float]) -> Dict[str, float]:
+    """将 source 的计数累加到 target"""
+    for key, value in source.items():
+        target[key] = target.get(key, 0) + value
+    return target
+
+
+def _diff(current: Dict[str, float], previous: Dict[str, float]) -> Dict[str, float]:
+    """计算两次汇总之间的非零增量"""
+    return {key: value - previous.get(key, 0) for key, value in current.items()
+            if value != previous.get(key, 0)}
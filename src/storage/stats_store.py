@@ -0,0 +1,126 @@
+"""
+跨进程共享的统计存储（SQLite）：累计计数与按分钟/小时分桶的时间序列
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+# 时间序列分辨率（秒）与保留时长（秒）
+RESOLUTIONS = {"minute": 60, "hour": 3600}
+SERIES_RETENTION = {"minute": 2 * 86400, "hour": 90 * 86400}
+
+
+class SQLiteStatsStore:
+    """基于 SQLite 的累加计数器，供多个 worker 进程共享统计信息"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._last_prune_hour: Optional[int] = None
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters ("
+                "name TEXT PRIMARY KEY, value REAL NOT NULL DEFAULT 0)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS series ("
+                "resolution TEXT NOT NULL, bucket INTEGER NOT NULL, name TEXT NOT NULL, "
+                "value REAL NOT NULL DEFAULT 0, PRIMARY KEY (resolution, bucket, name)) WITHOUT ROWID"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接（SQLite 连接不可跨线程共享）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def increment(self, deltas: Dict[str, float], ts: Optional[float] = None):
+        """
+        原子地累加一组计数，并计入所在分钟/小时的时间桶
+
+        Args:
+            deltas: 计数名到增量的映射
+            ts: 增量发生的时间戳，默认当前时间
+        """
+        ts = ts or time.time()
+        rows = list(deltas.items())
+        series_rows = [
+            (resolution, int(ts // seconds) * seconds, name, value)
+            for resolution, seconds in RESOLUTIONS.items()
+            for name, value in rows
+        ]
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                rows
+            )
+            conn.executemany(
+                "INSERT INTO series (resolution, bucket, name, value) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(resolution, bucket, name) DO UPDATE SET value = value + excluded.value",
+                series_rows
+            )
+            self._prune(conn, ts)
+
+    def _prune(self, conn: sqlite3.Connection, ts: float):
+        """每小时清理一次超过保留时长的时间桶"""
+        hour = int(ts // 3600)
+        if hour == self._last_prune_hour:
+            return
+        self._last_prune_hour = hour
+        for resolution, retention in SERIES_RETENTION.items():
+            conn.execute(
+                "DELETE FROM series WHERE resolution = ? AND bucket < ?",
+                (resolution, ts - retention)
+            )
+
+    def totals(self) -> Dict[str, float]:
+        """
+        读取所有进程累加后的计数
+
+        Returns:
+            Dict[str, float]: 计数名到总值的映射
+        """
+        rows = self._connection().execute("SELECT name, value FROM counters").fetchall()
+        return {name: int(value) if float(value).is_integer() else value for name, value in rows}
+
+    def series(self, names: Iterable[str], resolution: str = "minute",
+               since: Optional[float] = None, until: Optional[float] = None) -> Dict[str, List[List[float]]]:
+        """
+        读取时间序列（所有进程汇总）
+
+        Args:
+            names: 计数名列表
+            resolution: "minute" 或 "hour"
+            since: 开始时间戳（含）
+            until: 结束时间戳（含）
+
+        Returns:
+            Dict[str, List[List[float]]]: 计数名到 [[桶起始时间戳, 值], ...] 的映射（只含有数据的桶）
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"不支持的分辨率: {resolution}")
+        names = list(names)
+        placeholders = ",".join("?" * len(names))
+        rows = self._connection().execute(
+            f"SELECT name, bucket, value FROM series WHERE resolution = ? AND bucket BETWEEN ? AND ? "
+            f"AND name IN ({placeholders}) ORDER BY bucket",
+            (resolution, since or 0, until or float("inf"), *names)
+        ).fetchall()
+
+        series: Dict[str, List[List[float]]] = {name: [] for name in names}
+        for name, bucket, value in rows:
+            series[name].append([bucket, int(value) if float(value).is_integer() else value])
+        return series
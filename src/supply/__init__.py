@@ -0,0 +1,11 @@
+"""
+农资推荐模块：按诊断结果匹配药剂、用量与附近的合作供应商
+"""
+
+from .catalog import load_catalog
+from .matcher import SupplyMatcher
+
+__all__ = [
+    'load_catalog',
+    'SupplyMatcher'
+]
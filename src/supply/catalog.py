@@ -0,0 +1,97 @@
+"""
+农资目录：有效成分、商品（剂型、亩用量、包装、价格）与合作供应商
+
+内置目录收录各病害常用药剂的参考用量（以产品标签为准），不含供应商；
+合作供应商及其服务范围、库存与价格由 SUPPLY_CATALOG_PATH 指向的 JSON 文件提供：
+
+{
+  "ingredients": {"tricyclazole": {"name": "三环唑", "diseases": ["rice_blast"]}},
+  "products": [{"product_id": "tricyclazole-75wp", "name": "75%三环唑可湿性粉剂",
+                "ingredient": "tricyclazole", "dose_per_mu": [20, 30], "unit": "g",
+                "package_size": 100, "price": 9.0, "interval_days": 7}],
+  "suppliers": [{"supplier_id": "s001", "name": "某某农资店", "lat": 30.27, "lon": 120.15,
+                 "service_radius_km": 30, "phone": "...", "stock": {"tricyclazole-75wp": 8.5}}]
+}
+
+文件中的 ingredients 与内置成分合并（同名覆盖），products 按 product_id 合并，
+suppliers 的 stock 可为商品ID列表（按目录价）或 商品ID -> 供应商报价。
+"""
+
+import json
+import os
+from typing import Dict, Optional
+
+from ..config import Config
+
+# 有效成分 -> 名称与防治对象（标准病害ID，按推荐优先级排列的成分顺序即轮换用药顺序）
+DEFAULT_INGREDIENTS: Dict[str, Dict] = {
+    "tricyclazole": {"name": "三环唑", "diseases": ["rice_blast"]},
+    "isoprothiolane": {"name": "稻瘟灵", "diseases": ["rice_blast"]},
+    "kasugamycin": {"name": "春雷霉素", "diseases": ["rice_blast"]},
+    "thifluzamide": {"name": "噻呋酰胺", "diseases": ["rice_sheath_blight"]},
+    "validamycin": {"name": "井冈霉素", "diseases": ["rice_sheath_blight"]},
+    "zinc_thiazole": {"name": "噻唑锌", "diseases": ["rice_bacterial_blight"]},
+    "thiodiazole_copper": {"name": "噻菌铜", "diseases": ["rice_bacterial_blight"]},
+    "tebuconazole": {"name": "戊唑醇",
+                     "diseases": ["wheat_rust", "wheat_scab", "corn_rust", "powdery_mildew"]},
+    "phenamacril": {"name": "氰烯菌酯", "diseases": ["wheat_scab"]},
+    "triadimefon": {"name": "三唑酮", "diseases": ["wheat_rust", "powdery_mildew"]},
+    "pyraclostrobin": {"name": "吡唑醚菌酯", "diseases": ["corn_northern_leaf_blight", "corn_rust"]},
+    "difenoconazole": {"name": "苯醚甲环唑", "diseases": ["corn_northern_leaf_blight"]},
+    "dimethomorph": {"name": "烯酰吗啉", "diseases": ["downy_mildew"]},
+    "kresoxim_methyl": {"name": "醚菌酯", "diseases": ["powdery_mildew"]}
+}
+
+# 商品：亩用量为 [下限, 上限]（单位 g 或 ml），interval_days 为施药间隔天数
+DEFAULT_PRODUCTS = [
+    {"product_id": "tricyclazole-75wp", "name": "75%三环唑可湿性粉剂", "ingredient": "tricyclazole",
+     "dose_per_mu": [20, 30], "unit": "g", "package_size": 100, "price": 9.0, "interval_days": 7},
+    {"product_id": "isoprothiolane-40ec", "name": "40%稻瘟灵乳油", "ingredient": "isoprothiolane",
+     "dose_per_mu": [80, 100], "unit": "ml", "package_size": 200, "price": 16.0, "interval_days": 7},
+    {"product_id": "kasugamycin-2sl", "name": "2%春雷霉素水剂", "ingredient": "kasugamycin",
+     "dose_per_mu": [80, 100], "unit": "ml", "package_size": 200, "price": 12.0, "interval_days": 7},
+    {"product_id": "thifluzamide-24sc", "name": "24%噻呋酰胺悬浮剂", "ingredient": "thifluzamide",
+     "dose_per_mu": [15, 25], "unit": "ml", "package_size": 100, "price": 18.0, "interval_days": 10},
+    {"product_id": "validamycin-5sl", "name": "5%井冈霉素水剂", "ingredient": "validamycin",
+     "dose_per_mu": [100, 150], "unit": "ml", "package_size": 500, "price": 10.0, "interval_days": 7},
+    {"product_id": "zinc-thiazole-20sc", "name": "20%噻唑锌悬浮剂", "ingredient": "zinc_thiazole",
+     "dose_per_mu": [100, 125], "unit": "ml", "package_size": 250, "price": 22.0, "interval_days": 7},
+    {"product_id": "thiodiazole-copper-20sc", "name": "20%噻菌铜悬浮剂", "ingredient": "thiodiazole_copper",
+     "dose_per_mu": [100, 130], "unit": "ml", "package_size": 250, "price": 20.0, "interval_days": 7},
+    {"product_id": "tebuconazole-43sc", "name": "43%戊唑醇悬浮剂", "ingredient": "tebuconazole",
+     "dose_per_mu": [15, 25], "unit": "ml", "package_size": 100, "price": 15.0, "interval_days": 10},
+    {"product_id": "phenamacril-25sc", "name": "25%氰烯菌酯悬浮剂", "ingredient": "phenamacril",
+     "dose_per_mu": [100, 200], "unit": "ml", "package_size": 500, "price": 38.0, "interval_days": 7},
+    {"product_id": "triadimefon-15wp", "name": "15%三唑酮可湿性粉剂", "ingredient": "triadimefon",
+     "dose_per_mu": [60, 80], "unit": "g", "package_size": 200, "price": 8.0, "interval_days": 10},
+    {"product_id": "pyraclostrobin-25ec", "name": "25%吡唑醚菌酯乳油", "ingredient": "pyraclostrobin",
+     "dose_per_mu": [30, 40], "unit": "ml", "package_size": 100, "price": 25.0, "interval_days": 10},
+    {"product_id": "difenoconazole-10wg", "name": "10%苯醚甲环唑水分散粒剂", "ingredient": "difenoconazole",
+     "dose_per_mu": [40, 60], "unit": "g", "package_size": 100, "price": 14.0, "interval_days": 10},
+    {"product_id": "dimethomorph-50wp", "name": "50%烯酰吗啉可湿性粉剂", "ingredient": "dimethomorph",
+     "dose_per_mu": [30, 40], "unit": "g", "package_size": 100, "price": 16.0, "interval_days": 7},
+    {"product_id": "kresoxim-methyl-50wg", "name": "50%醚菌酯水分散粒剂", "ingredient": "kresoxim_methyl",
+     "dose_per_mu": [15, 20], "unit": "g", "package_size": 100, "price": 28.0, "interval_days": 10}
+]
+
+
+def load_catalog(path: Optional[str] = Config.SUPPLY_CATALOG_PATH) -> Dict:
+    """
+    读取农资目录：内置成分与商品，合并目录文件中的成分、商品与供应商
+
+    Args:
+        path: 目录文件路径，不存在时只使用内置目录
+
+    Returns:
+        Dict: ingredients、products、suppliers
+    """
+    ingredients = dict(DEFAULT_INGREDIENTS)
+    products = {product["product_id"]: product for product in DEFAULT_PRODUCTS}
+    suppliers = []
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        ingredients.update(data.get("ingredients") or {})
+        products.update({product["product_id"]: product for product in data.get("products") or []})
+        suppliers = data.get("suppliers") or []
+    return {"ingredients": ingredients, "products": list(products.values()), "suppliers": suppliers}
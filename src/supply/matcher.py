@@ -0,0 +1,302 @@
+"""
+农资推荐匹配：标准病害 + 严重程度 + 田块面积 + 位置 -> 药剂、用量与附近供应商
+
+所有索引在创建时一次性构建，查询只做字典查找与少量距离计算：
+- 病害 -> 有效成分（按推荐优先级）、有效成分 -> 商品：倒排索引
+- 有效成分/病害 -> 有库存的供应商：倒排索引，先排除不经营对应药剂的供应商
+- 供应商服务范围：按经纬度网格预先登记到覆盖的所有格子，查询点所在格子即候选供应商，
+  再按局部平面距离（服务半径几十公里内与球面距离的误差可忽略）判断是否在服务半径内
+"""
+
+import math
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from ..config import Config
+from ..storage.spatial_index import EARTH_RADIUS_KM, bbox_around
+from ..utils.taxonomy import DISEASES, HEALTHY_ID, UNKNOWN_ID, UNKNOWN_NAME, normalize_disease
+from .catalog import load_catalog
+
+# 严重程度 -> 亩用量在 [下限, 上限] 中的位置，未知按中等
+DOSE_POSITION = {"轻微": 0.0, "中等": 0.5, "严重": 1.0}
+DEFAULT_SEVERITY = "中等"
+# 严重发生时按施药间隔连续施用的次数
+APPLICATIONS = {"轻微": 1, "中等": 1, "严重": 2}
+# 每度纬度对应的公里数
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def _number(value, name: str, low: float, high: float) -> Optional[float]:
+    """
+    把数字或数字字符串转为 float，None 保持为 None
+
+    Raises:
+        ValueError: 不是数字（含布尔值），或不在 [low, high] 内（含 nan/inf）
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"{name} 必须为数字")
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"{name} 必须为数字") from None
+    if not math.isfinite(number) or not low <= number <= high:
+        raise ValueError(f"{name} 超出范围: {value}")
+    return number
+
+
+def _text(value, name: str) -> Optional[str]:
+    """
+    校验可选的文本字段
+
+    Raises:
+        ValueError: 不是字符串
+    """
+    if value is not None and not isinstance(value, str):
+        raise ValueError(f"{name} 必须为字符串")
+    return value
+
+
+class SupplyMatcher:
+    """基于预计算索引的农资推荐"""
+
+    def __init__(self, catalog: Optional[Dict] = None, grid_degrees: Optional[float] = None,
+                 max_suppliers: Optional[int] = None, max_products: Optional[int] = None):
+        """
+        Args:
+            catalog: 农资目录（见 catalog.load_catalog），None 时按配置读取
+            grid_degrees: 服务范围网格的格子边长（度）
+            max_suppliers: 每个商品最多推荐的供应商数
+            max_products: 每次最多推荐的商品数
+        """
+        catalog = catalog if catalog is not None else load_catalog()
+        self.grid_degrees = grid_degrees or Config.SUPPLY_GRID_DEGREES
+        self.max_suppliers = max_suppliers or Config.SUPPLY_MAX_SUPPLIERS
+        self.max_products = max_products or Config.SUPPLY_MAX_PRODUCTS
+
+        self.ingredients: Dict[str, Dict] = catalog["ingredients"]
+        self.products: Dict[str, Dict] = {product["product_id"]: product for product in catalog["products"]}
+
+        # 倒排索引：病害 -> 成分、成分 -> 商品
+        self.ingredients_by_disease: Dict[str, List[str]] = {}
+        for ingredient, entry in self.ingredients.items():
+            for disease_id in entry.get("diseases", ()):
+                self.ingredients_by_disease.setdefault(disease_id, []).append(ingredient)
+        self.products_by_ingredient: Dict[str, List[str]] = {}
+        for product_id, product in self.products.items():
+            self.products_by_ingredient.setdefault(product["ingredient"], []).append(product_id)
+
+        # 供应商：库存统一为 商品ID -> 报价（列表形式的库存按目录价）
+        self.suppliers: List[Dict] = []
+        for supplier in catalog["suppliers"]:
+            stock = supplier.get("stock") or {}
+            if not isinstance(stock, dict):
+                stock = dict.fromkeys(stock)
+            stock = {
+                product_id: price if price is not None else self.products[product_id].get("price")
+                for product_id, price in stock.items() if product_id in self.products
+            }
+            self.suppliers.append({**supplier, "stock": stock})
+
+        # 倒排索引：成分 -> 有库存的供应商，病害 -> 经营其任一药剂的供应商
+        self.suppliers_by_ingredient: Dict[str, Set[int]] = {}
+        for index, supplier in enumerate(self.suppliers):
+            for product_id in supplier["stock"]:
+                self.suppliers_by_ingredient.setdefault(self.products[product_id]["ingredient"], set()).add(index)
+        self.suppliers_by_disease: Dict[str, frozenset] = {
+            disease_id: frozenset().union(*(self.suppliers_by_ingredient.get(i, ()) for i in ingredients))
+            for disease_id, ingredients in self.ingredients_by_disease.items()
+        }
+
+        # 网格索引：格子 -> 服务范围覆盖该格子的供应商 (序号, 纬度, 经度, 服务半径的平方)
+        self._cells: Dict[Tuple[int, int], List[Tuple[int, float, float, float]]] = {}
+        for index, supplier in enumerate(self.suppliers):
+            radius = supplier.get("service_radius_km", 0)
+            entry = (index, supplier["lat"], supplier["lon"], radius * radius)
+            min_lat, min_lon, max_lat, max_lon = bbox_around(supplier["lat"], supplier["lon"], radius)
+            for row in range(self._cell(min_lat), self._cell(max_lat) + 1):
+                for col in range(self._cell(min_lon), self._cell(max_lon) + 1):
+                    self._cells.setdefault((row, col), []).append(entry)
+
+    def _cell(self, degrees: float) -> int:
+        return math.floor(degrees / self.grid_degrees)
+
+    def suppliers_near(self, lat: Optional[float], lon: Optional[float],
+                       disease_id: Optional[str] = None) -> List[Tuple[float, int]]:
+        """
+        服务范围覆盖该位置的供应商
+
+        Args:
+            lat: 纬度
+            lon: 经度
+            disease_id: 只保留经营该病害药剂的供应商，None 表示不限
+
+        Returns:
+            List[Tuple[float, int]]: 按距离排序的 (距离公里, 供应商序号)
+        """
+        if lat is None or lon is None or not (math.isfinite(lat) and math.isfinite(lon)):
+            return []
+        candidates = self._cells.get((self._cell(lat), self._cell(lon)), ())
+        relevant = self.suppliers_by_disease.get(disease_id, frozenset()) if disease_id else None
+        km_per_lon = KM_PER_DEGREE * math.cos(math.radians(lat))
+        nearby = []
+        for index, supplier_lat, supplier_lon, radius_squared in candidates:
+            if relevant is not None and index not in relevant:
+                continue
+            dy = (lat - supplier_lat) * KM_PER_DEGREE
+            dx = (lon - supplier_lon) * km_per_lon
+            distance_squared = dx * dx + dy * dy
+            if distance_squared <= radius_squared:
+                nearby.append((distance_squared, index))
+        nearby.sort()
+        return [(math.sqrt(distance_squared), index) for distance_squared, index in nearby]
+
+    def _product_plan(self, product_id: str, severity: str, area_mu: Optional[float],
+                      nearby: List[Tuple[float, int]]) -> Dict:
+        """单个商品的用量、包装数与附近有货的供应商"""
+        product = self.products[product_id]
+        low, high = product["dose_per_mu"]
+        dose = low + (high - low) * DOSE_POSITION[severity]
+        applications = APPLICATIONS[severity]
+        total = dose * area_mu * applications if area_mu else None
+        package_size = product.get("package_size")
+        packages = math.ceil(total / package_size) if total and package_size else None
+        price = product.get("price")
+
+        suppliers = []
+        for distance, index in nearby:
+            supplier = self.suppliers[index]
+            if product_id not in supplier["stock"]:
+                continue
+            supplier_price = supplier["stock"][product_id]
+            suppliers.append({
+                "supplier_id": supplier["supplier_id"],
+                "name": supplier.get("name"),
+                "phone": supplier.get("phone"),
+                "distance_km": round(distance, 1),
+                "price": supplier_price,
+                "cost": round(packages * supplier_price, 2) if packages and supplier_price is not None else None
+            })
+            if len(suppliers) >= self.max_suppliers:
+                break
+
+        return {
+            "product_id": product_id,
+            "name": product["name"],
+            "ingredient": self.ingredients.get(product["ingredient"], {}).get("name", product["ingredient"]),
+            "dose_per_mu": round(dose, 1),
+            "unit": product["unit"],
+            "applications": applications,
+            "interval_days": product.get("interval_days"),
+            "total_amount": round(total, 1) if total is not None else None,
+            "package_size": package_size,
+            "packages": packages,
+            "price": price,
+            "cost": round(packages * price, 2) if packages and price is not None else None,
+            "suppliers": suppliers
+        }
+
+    def recommend(self, disease: str, severity: Optional[str] = None, area_mu: Optional[float] = None,
+                  lat: Optional[float] = None, lon: Optional[float] = None,
+                  crop_type: Optional[str] = None) -> Dict:
+        """
+        推荐一次诊断的药剂、用量与附近供应商
+
+        Args:
+            disease: 标准病害ID或任一名称/别名
+            severity: 严重程度（轻微/中等/严重/无），未知按中等
+            area_mu: 施药面积（亩），None 时只给出亩用量
+            lat: 田块纬度，None 时不匹配供应商
+            lon: 田块经度
+            crop_type: 作物类型，用于区分歧义别名
+
+        Returns:
+            Dict: 病害、严重程度、面积与推荐商品（用量、包装数、费用、附近有货的供应商）；
+                附近有货的商品排在前面，其余按成分优先级排列
+        """
+        disease_id = disease if disease in DISEASES else normalize_disease(disease, crop_type)[0]
+        plan = {
+            "disease_id": disease_id,
+            "disease": DISEASES[disease_id]["name"] if disease_id in DISEASES else UNKNOWN_NAME,
+            "severity": severity if severity in DOSE_POSITION or severity == "无" else DEFAULT_SEVERITY,
+            "area_mu": area_mu,
+            "products": []
+        }
+        if disease_id == HEALTHY_ID or plan["severity"] == "无":
+            plan["severity"] = "无"
+            plan["note"] = "未发现病害，无需用药"
+            return plan
+        if disease_id == UNKNOWN_ID:
+            plan["note"] = "病害未识别，建议人工复核后再用药"
+            return plan
+        ingredients = self.ingredients_by_disease.get(disease_id)
+        if not ingredients:
+            plan["note"] = "农资目录中暂无该病害的药剂"
+            return plan
+
+        nearby = self.suppliers_near(lat, lon, disease_id)
+        products = [
+            self._product_plan(product_id, plan["severity"], area_mu, nearby)
+            for ingredient in ingredients
+            for product_id in self.products_by_ingredient.get(ingredient, ())
+        ]
+        # 稳定排序：附近有货的在前，同组内保持成分优先级
+        products.sort(key=lambda product: not product["suppliers"])
+        plan["products"] = products[:self.max_products]
+        plan["suppliers_nearby"] = len(nearby)
+        return plan
+
+    def recommend_batch(self, diagnoses: Iterable[Mapping], area_mu: Optional[float] = None,
+                        lat: Optional[float] = None, lon: Optional[float] = None,
+                        crop_type: Optional[str] = None) -> List[Dict]:
+        """
+        批量推荐（如一个航次的全部检测结果），相同的诊断只计算一次并共用同一结果对象
+
+        Args:
+            diagnoses: 每项为检测结果（含 details）或 {disease_id/disease, severity, area_mu, lat, lon, crop_type}
+            area_mu: 各项未给出时使用的面积
+            lat: 各项未给出时使用的纬度
+            lon: 各项未给出时使用的经度
+            crop_type: 各项未给出时使用的作物类型
+
+        Returns:
+            List[Dict]: 与输入顺序一致的推荐结果
+
+        Raises:
+            ValueError: 某项字段类型错误或数值无效（消息中含该项序号）
+        """
+        plans: Dict[Tuple, Dict] = {}
+        results = []
+        for index, item in enumerate(diagnoses):
+            try:
+                key = self._batch_key(item, area_mu, lat, lon, crop_type)
+            except ValueError as e:
+                raise ValueError(f"diagnoses[{index}]: {e}") from None
+            plan = plans.get(key)
+            if plan is None:
+                plan = plans[key] = self.recommend(*key)
+            results.append(plan)
+        return results
+
+    @staticmethod
+    def _batch_key(item: Mapping, area_mu: Optional[float], lat: Optional[float], lon: Optional[float],
+                   crop_type: Optional[str]) -> Tuple:
+        """
+        一项诊断的 recommend 参数，同时作为批内去重的键：数值统一为 float，文本必须为字符串
+
+        Raises:
+            ValueError: 字段类型错误，或面积、经纬度不是有限的有效数值
+        """
+        if not isinstance(item, Mapping):
+            raise ValueError("必须为对象")
+        details = item.get("details") or item
+        if not isinstance(details, Mapping):
+            raise ValueError("details 必须为对象")
+        return (
+            _text(details.get("disease_id") or details.get("disease"), "disease") or UNKNOWN_ID,
+            _text(details.get("severity"), "severity"),
+            _number(item.get("area_mu", area_mu), "area_mu", 0, math.inf),
+            _number(item.get("lat", lat), "lat", -90, 90),
+            _number(item.get("lon", lon), "lon", -180, 180),
+            _text(item.get("crop_type", crop_type), "crop_type")
+        )
@@ -0,0 +1,28 @@
+"""
+图像处理工具：缩略图解码与像素数组转换
+"""
+
+import numpy as np
+from PIL import Image
+
+
+def load_thumbnail(image_path: str, size: int = 128, mode: str = "RGB") -> np.ndarray:
+    """
+    以低分辨率解码图片，返回像素数组
+
+    JPEG 使用 draft 模式在解码阶段直接缩小（DCT 缩放），
+    避免完整解码大尺寸无人机原图。
+
+    Args:
+        image_path: 图片路径
+        size: 缩略图最长边像素
+        mode: 颜色模式（"RGB" 或 "L"）
+
+    Returns:
+        np.ndarray: 像素数组，RGB 为 (H, W, 3)，灰度为 (H, W)，dtype 为 float32
+    """
+    with Image.open(image_path) as img:
+        img.draft(mode, (size, size))
+        img = img.convert(mode)
+        img.thumbnail((size, size))
+        return np.asarray(img, dtype=np.float32)
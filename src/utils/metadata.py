@@ -0,0 +1,291 @@
+"""
+图片元数据提取：只读取文件头部的 EXIF/XMP（不解码像素）
+
+JPEG 逐段读取到图像数据（SOS）为止，PNG 逐块读取到 IDAT 为止，
+提取无人机照片中的 GPS、高度、拍摄时间、相机型号与云台角度。
+"""
+
+import math
+import os
+import re
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterable, Mapping
+
+# 头部读取上限：元数据段通常只有几十KB，超出即停止
+MAX_HEADER_BYTES = 512 * 1024
+
+# 拍摄时间上限（2100-01-01），超出视为无效时间戳
+MAX_CAPTURED_AT = 4102444800
+
+# TIFF 字段类型 -> (单个值字节数, struct 格式)
+_TIFF_TYPES = {
+    1: (1, "B"), 2: (1, "s"), 3: (2, "H"), 4: (4, "L"),
+    5: (8, "LL"), 7: (1, "B"), 9: (4, "l"), 10: (8, "ll")
+}
+
+# IFD0 / Exif 子IFD 中关心的标签
+_IFD0_TAGS = {0x010F: "make", 0x0110: "model", 0x0112: "orientation", 0x0132: "datetime"}
+_EXIF_TAGS = {0x9003: "datetime_original", 0x9010: "offset_time", 0x9011: "offset_time_original"}
+_EXIF_POINTER = 0x8769
+_GPS_POINTER = 0x8825
+
+# 大疆等无人机写入 XMP 的飞行与云台参数
+_XMP_FIELDS = {
+    "GimbalPitchDegree": "gimbal_pitch",
+    "GimbalYawDegree": "gimbal_yaw",
+    "GimbalRollDegree": "gimbal_roll",
+    "FlightYawDegree": "flight_yaw",
+    "RelativeAltitude": "relative_altitude",
+    "AbsoluteAltitude": "absolute_altitude"
+}
+_XMP_PATTERN = re.compile(
+    rb"drone-dji:(" + b"|".join(name.encode() for name in _XMP_FIELDS) + rb")"
+    rb"(?:=\"([^\"]*)\"|>([^<]*)<)"
+)
+
+_EXIF_HEADER = b"Exif\x00\x00"
+_XMP_HEADER = b"http://ns.adobe.com/xap/1.0/\x00"
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def extract_metadata(path: str) -> Dict:
+    """
+    提取图片元数据
+
+    Args:
+        path: 图片路径
+
+    Returns:
+        Dict: 元数据（只包含能解析出的字段），无法识别或损坏时返回空字典
+    """
+    try:
+        with open(path, "rb") as f:
+            signature = f.read(8)
+            if signature[:2] == b"\xff\xd8":
+                f.seek(2)
+                return _read_jpeg(f)
+            if signature == _PNG_SIGNATURE:
+                return _read_png(f)
+    except (OSError, struct.error, ValueError, IndexError):
+        pass
+    return {}
+
+
+def extract_batch(paths: Iterable[str], max_workers: int = 8) -> Dict[str, Dict]:
+    """
+    批量导入时并发提取元数据（以文件读取为主，线程池即可重叠IO等待）
+
+    Args:
+        paths: 图片路径列表
+        max_workers: 线程数
+
+    Returns:
+        Dict[str, Dict]: 路径到元数据的映射
+    """
+    paths = list(paths)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="metadata") as pool:
+        return dict(zip(paths, pool.map(extract_metadata, paths)))
+
+
+def merge_location_hints(form: Mapping[str, str], metadata: Dict) -> Dict[str, str]:
+    """
+    用元数据中的位置与拍摄时间补全表单字段（lat、lon、captured_at），
+    请求显式提供的值优先，供田块档案与预警使用；元数据中无效的坐标或时间被忽略
+
+    Args:
+        form: 请求表单字段
+        metadata: extract_metadata 的返回值
+
+    Returns:
+        Dict[str, str]: 补全后的表单字段
+    """
+    merged = dict(form)
+    has_location = merged.get("lat") and merged.get("lon")
+    if not has_location and _valid_location(metadata.get("lat"), metadata.get("lon")):
+        merged["lat"] = str(metadata["lat"])
+        merged["lon"] = str(metadata["lon"])
+    if _valid_timestamp(metadata.get("captured_at")) and not merged.get("captured_at"):
+        merged["captured_at"] = str(metadata["captured_at"])
+    return merged
+
+
+def _valid_location(lat, lon) -> bool:
+    """照片自带的 GPS 是否可用（损坏或伪造的 EXIF 可能给出 nan 或越界的坐标，直接忽略）"""
+    if not isinstance(lat, (int, float)) or not isinstance(lon, (int, float)):
+        return False
+    # nan 与任何数比较都为 False
+    return -90 <= lat <= 90 and -180 <= lon <= 180
+
+
+def _valid_timestamp(ts) -> bool:
+    """照片自带的拍摄时间是否可用"""
+    return isinstance(ts, (int, float)) and math.isfinite(ts) and 0 <= ts <= MAX_CAPTURED_AT
+
+
+def _read_jpeg(f: BinaryIO) -> Dict:
+    """逐段读取 JPEG 头部的 APP1 段，遇到图像数据即停止"""
+    metadata: Dict = {}
+    consumed = 0
+    while consumed < MAX_HEADER_BYTES:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            break
+        kind = marker[1]
+        if kind == 0xFF:
+            # 填充字节
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        if kind in (0xD9, 0xDA):
+            break
+        if kind == 0x01 or 0xD0 <= kind <= 0xD7:
+            continue
+
+        length = struct.unpack(">H", f.read(2))[0] - 2
+        consumed += length + 4
+        if kind != 0xE1:
+            f.seek(length, os.SEEK_CUR)
+            continue
+
+        segment = f.read(length)
+        if segment.startswith(_EXIF_HEADER):
+            metadata.update(_parse_tiff(segment[len(_EXIF_HEADER):]))
+        elif segment.startswith(_XMP_HEADER):
+            metadata.update(_parse_xmp(segment[len(_XMP_HEADER):]))
+    return _finalize(metadata)
+
+
+def _read_png(f: BinaryIO) -> Dict:
+    """逐块读取 PNG 头部的 eXIf 与 XMP 文本块，遇到 IDAT 即停止"""
+    metadata: Dict = {}
+    consumed = 0
+    while consumed < MAX_HEADER_BYTES:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        length, kind = struct.unpack(">I4s", header)
+        consumed += length + 12
+        if kind in (b"IDAT", b"IEND"):
+            break
+        if kind == b"eXIf":
+            metadata.update(_parse_tiff(f.read(length)))
+            f.seek(4, os.SEEK_CUR)
+        elif kind == b"iTXt":
+            chunk = f.read(length)
+            f.seek(4, os.SEEK_CUR)
+            if chunk.startswith(b"XML:com.adobe.xmp\x00"):
+                metadata.update(_parse_xmp(chunk))
+        else:
+            f.seek(length + 4, os.SEEK_CUR)
+    return _finalize(metadata)
+
+
+def _parse_tiff(data: bytes) -> Dict:
+    """解析 TIFF 结构的 EXIF 数据（IFD0、Exif 子IFD 与 GPS 子IFD）"""
+    order = "<" if data[:2] == b"II" else ">"
+    ifd0 = _read_ifd(data, order, struct.unpack(order + "I", data[4:8])[0])
+
+    metadata = {name: ifd0[tag] for tag, name in _IFD0_TAGS.items() if tag in ifd0}
+    if _EXIF_POINTER in ifd0:
+        exif = _read_ifd(data, order, ifd0[_EXIF_POINTER])
+        metadata.update({name: exif[tag] for tag, name in _EXIF_TAGS.items() if tag in exif})
+    if _GPS_POINTER in ifd0:
+        metadata.update(_parse_gps(_read_ifd(data, order, ifd0[_GPS_POINTER])))
+    return metadata
+
+
+def _read_ifd(data: bytes, order: str, offset: int) -> Dict[int, object]:
+    """读取一个 IFD 的全部条目"""
+    entries = {}
+    count = struct.unpack(order + "H", data[offset:offset + 2])[0]
+    for i in range(count):
+        entry = offset + 2 + i * 12
+        tag, kind, n = struct.unpack(order + "HHI", data[entry:entry + 8])
+        if kind not in _TIFF_TYPES:
+            continue
+        size, fmt = _TIFF_TYPES[kind]
+        total = size * n
+        if total <= 4:
+            raw = data[entry + 8:entry + 8 + total]
+        else:
+            value_offset = struct.unpack(order + "I", data[entry + 8:entry + 12])[0]
+            raw = data[value_offset:value_offset + total]
+
+        if kind == 2:
+            entries[tag] = raw.split(b"\x00", 1)[0].decode("ascii", "replace").strip()
+        elif kind in (5, 10):
+            values = struct.unpack(order + fmt * n, raw)
+            entries[tag] = [values[j] / values[j + 1] if values[j + 1] else 0.0 for j in range(0, len(values), 2)]
+        else:
+            values = struct.unpack(order + fmt * n, raw)
+            entries[tag] = values[0] if n == 1 else list(values)
+    return entries
+
+
+def _parse_gps(gps: Dict[int, object]) -> Dict:
+    """将 GPS 子IFD 转换为十进制经纬度与海拔"""
+    metadata = {}
+    if 2 in gps and 4 in gps:
+        lat = _dms_to_degrees(gps[2])
+        lon = _dms_to_degrees(gps[4])
+        if gps.get(1) == "S":
+            lat = -lat
+        if gps.get(3) == "W":
+            lon = -lon
+        metadata["lat"] = round(lat, 7)
+        metadata["lon"] = round(lon, 7)
+    if 6 in gps:
+        altitude = gps[6][0] if isinstance(gps[6], list) else gps[6]
+        metadata["altitude"] = round(-altitude if gps.get(5) == 1 else altitude, 2)
+    return metadata
+
+
+def _dms_to_degrees(dms) -> float:
+    """度分秒转十进制度"""
+    degrees, minutes, seconds = (list(dms) + [0.0, 0.0, 0.0])[:3]
+    return degrees + minutes / 60 + seconds / 3600
+
+
+def _parse_xmp(data: bytes) -> Dict:
+    """从 XMP 中提取无人机飞行与云台参数（属性或元素两种写法）"""
+    metadata = {}
+    for match in _XMP_PATTERN.finditer(data):
+        value = match.group(2) if match.group(2) is not None else match.group(3)
+        try:
+            metadata[_XMP_FIELDS[match.group(1).decode()]] = float(value)
+        except ValueError:
+            continue
+    return metadata
+
+
+def _finalize(metadata: Dict) -> Dict:
+    """
+    整理拍摄时间：优先原始拍摄时间，并换算为时间戳
+
+    EXIF 时间不带时区，按对应的 OffsetTime 标签（如 "+08:00"）换算；
+    相机未写入时区偏移时按服务器本地时区解释（即假定服务器与作业地同一时区）。
+    """
+    original = metadata.pop("datetime_original", None)
+    offset = metadata.pop("offset_time", None)
+    offset_original = metadata.pop("offset_time_original", None)
+    if original:
+        metadata["datetime"] = original
+        offset = offset_original
+    if metadata.get("datetime"):
+        metadata.update(_timestamp(metadata["datetime"], offset))
+    return metadata
+
+
+def _timestamp(value: str, offset) -> Dict:
+    """EXIF 时间字符串换算为时间戳；时区偏移无效时忽略偏移"""
+    if offset:
+        try:
+            parsed = datetime.strptime(f"{value} {offset}", "%Y:%m:%d %H:%M:%S %z")
+            return {"captured_at": parsed.timestamp(), "utc_offset": offset}
+        except (TypeError, ValueError):
+            pass
+    try:
+        return {"captured_at": datetime.strptime(value, "%Y:%m:%d %H:%M:%S").timestamp()}
+    except ValueError:
+        return {}
@@ -0,0 +1,153 @@
+"""
+病害分类表：将模型返回的各种病害叫法归一为标准病害ID
+
+同一病害在不同帧中可能以不同名称出现（如"锈病"/"玉米锈病"、"大斑病"/"玉米大斑病"），
+归一后才能跨帧计数与共识判定。
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+HEALTHY_ID = "healthy"
+UNKNOWN_ID = "unknown"
+
+# 标准病害ID -> 标准名称、适用作物（空表示通用）与别名
+DISEASES: Dict[str, Dict] = {
+    HEALTHY_ID: {"name": "健康", "crops": (), "aliases": ("健康", "无病害", "未见病害", "未发现病害")},
+    "rice_blast": {"name": "稻瘟病", "crops": ("水稻",), "aliases": ("稻瘟病", "稻瘟", "稻热病", "叶瘟", "穗颈瘟")},
+    "rice_sheath_blight": {"name": "纹枯病", "crops": ("水稻",), "aliases": ("纹枯病", "水稻纹枯病", "稻纹枯病")},
+    "rice_bacterial_blight": {"name": "白叶枯病", "crops": ("水稻",), "aliases": ("白叶枯病", "水稻白叶枯病", "稻白叶枯病")},
+    "wheat_rust": {"name": "小麦锈病", "crops": ("小麦",), "aliases": ("小麦锈病", "条锈病", "叶锈病", "秆锈病", "锈病")},
+    "wheat_scab": {"name": "赤霉病", "crops": ("小麦",), "aliases": ("赤霉病", "小麦赤霉病", "麦穗赤霉")},
+    "corn_northern_leaf_blight": {"name": "玉米大斑病", "crops": ("玉米",), "aliases": ("玉米大斑病", "大斑病")},
+    "corn_rust": {"name": "玉米锈病", "crops": ("玉米",), "aliases": ("玉米锈病", "南方锈病", "锈病")},
+    "downy_mildew": {"name": "霜霉病", "crops": (), "aliases": ("霜霉病",)},
+    "powdery_mildew": {"name": "白粉病", "crops": (), "aliases": ("白粉病", "小麦白粉病")},
+}
+
+UNKNOWN_NAME = "未知"
+
+# 标准名称 -> ID
+NAME_TO_ID = {entry["name"]: disease_id for disease_id, entry in DISEASES.items()}
+
+
+@lru_cache(maxsize=16)
+def _alias_pattern(crop_type: Optional[str]) -> Tuple[re.Pattern, Dict[str, str]]:
+    """
+    构造作物相关的别名匹配表达式：长别名优先，歧义别名（如"锈病"）按作物归属
+
+    Returns:
+        Tuple: (正则表达式, 别名到ID的映射)
+    """
+    alias_map: Dict[str, str] = {}
+    for disease_id, entry in DISEASES.items():
+        crops = entry["crops"]
+        for alias in entry["aliases"]:
+            if alias in alias_map and crop_type not in crops:
+                # 别名已被其他病害占用，只有当前作物匹配时才覆盖
+                continue
+            alias_map[alias] = disease_id
+    aliases = sorted(alias_map, key=len, reverse=True)
+    return re.compile("|".join(re.escape(alias) for alias in aliases)), alias_map
+
+
+def normalize_disease(name: Optional[str], crop_type: Optional[str] = None) -> Tuple[str, str]:
+    """
+    将病害名称归一为 (标准ID, 标准名称)
+
+    Args:
+        name: 模型或模拟器给出的病害名称
+        crop_type: 作物类型，用于区分歧义别名
+
+    Returns:
+        Tuple[str, str]: 无法识别时返回 ("unknown", "未知")
+    """
+    if not name:
+        return UNKNOWN_ID, UNKNOWN_NAME
+    if name in NAME_TO_ID:
+        return NAME_TO_ID[name], name
+    return find_disease(name, crop_type)
+
+
+def find_disease(text: str, crop_type: Optional[str] = None) -> Tuple[str, str]:
+    """
+    在一段文本中查找病害：优先"病害名称/病害识别"一行，取最早出现的最长别名
+
+    Args:
+        text: 模型返回的文本
+        crop_type: 作物类型
+
+    Returns:
+        Tuple[str, str]: (标准ID, 标准名称)
+    """
+    line = re.search(r"病害(?:名称|识别)\s*[：:]\s*([^\n]*)", text)
+    pattern, alias_map = _alias_pattern(crop_type)
+    for candidate in ((line.group(1),) if line else ()) + (text,):
+        match = pattern.search(candidate)
+        if match:
+            disease_id = alias_map[match.group(0)]
+            return disease_id, DISEASES[disease_id]["name"]
+    return UNKNOWN_ID, UNKNOWN_NAME
+
+
+def mentioned_diseases(text: str, crop_type: Optional[str] = None) -> List[str]:
+    """
+    文本中提及的全部病害（按标准名称去重，不含"健康"）
+
+    Args:
+        text: 模型返回的文本
+        crop_type: 作物类型
+
+    Returns:
+        List[str]: 按首次出现顺序排列的标准名称
+    """
+    pattern, alias_map = _alias_pattern(crop_type)
+    names: List[str] = []
+    for match in pattern.finditer(text):
+        disease_id = alias_map[match.group(0)]
+        name = DISEASES[disease_id]["name"]
+        if disease_id != HEALTHY_ID and name not in names:
+            names.append(name)
+    return names
+
+
+def parse_severity(text: str) -> Optional[str]:
+    """
+    解析严重程度：优先读取"严重程度："一行的取值，避免把字段名本身误判为"严重"
+
+    Args:
+        text: 模型返回的文本
+
+    Returns:
+        Optional[str]: 轻微/中等/严重/无，无法判断返回None
+    """
+    line = re.search(r"严重程度\s*[：:]\s*([^\n]*)", text)
+    candidate = line.group(1) if line else text.replace("严重程度", "")
+    if "严重" in candidate or "重度" in candidate:
+        return "严重"
+    if "中等" in candidate or "中度" in candidate:
+        return "中等"
+    if "轻微" in candidate or "轻度" in candidate:
+        return "轻微"
+    if "无" in candidate or "健康" in candidate:
+        return "无"
+    return None
+
+
+def normalize_details(details: Dict, crop_type: Optional[str] = None) -> Dict:
+    """
+    就地归一检测结果中的病害名称，并补充 disease_id
+
+    Args:
+        details: 检测结果的 details 字典
+        crop_type: 作物类型
+
+    Returns:
+        Dict: 同一个 details 字典
+    """
+    disease_id, name = normalize_disease(details.get("disease"), crop_type)
+    details["disease_id"] = disease_id
+    if disease_id != UNKNOWN_ID:
+        details["disease"] = name
+    return details
@@ -0,0 +1,406 @@
+"""
+流式上传解析：分块解析 multipart 请求体，边接收边校验、计算哈希并写盘
+
+整个上传过程只在内存中保留当前数据块和少量头部字节，
+图片内容直接写入上传目录，检测器随后从磁盘读取一次。
+"""
+
+import hashlib
+import os
+import struct
+import uuid
+from typing import Dict, Optional
+
+from werkzeug.utils import secure_filename
+
+from ..config import Config
+from ..storage.sharding import ShardedDirectory
+
+
+# 图片格式魔数
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+# 判定格式所需的最少字节数
+SNIFF_BYTES = 8
+
+# 非文件表单字段的最大长度
+MAX_FIELD_SIZE = 1024
+
+
+class UploadError(Exception):
+    """上传校验失败，携带应返回的HTTP状态码"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """
+    根据文件头魔数判断图片格式
+
+    Args:
+        head: 文件开头的字节
+
+    Returns:
+        Optional[str]: "jpeg"/"png"/"gif"，无法识别返回None
+    """
+    for signature, image_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return image_type
+    return None
+
+
+def parse_boundary(content_type: str) -> str:
+    """
+    从 Content-Type 头中提取 multipart 分隔符
+
+    Args:
+        content_type: Content-Type 头
+
+    Returns:
+        str: 分隔符，非 multipart 请求返回空字符串
+    """
+    mimetype, _, params = (content_type or "").partition(";")
+    if mimetype.strip().lower() != "multipart/form-data":
+        return ""
+    for param in params.split(";"):
+        key, _, value = param.strip().partition("=")
+        if key.lower() == "boundary":
+            return value.strip('"')
+    return ""
+
+
+class ImageSizeProbe:
+    """增量解析图片尺寸，只缓存到尺寸信息出现为止"""
+
+    # JPEG 中携带尺寸的 SOF 段（排除 DHT/JPG/DAC）
+    SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+    # 超过此长度仍未找到尺寸则放弃（避免异常文件导致缓存无限增长）
+    MAX_PROBE_BYTES = 256 * 1024
+
+    def __init__(self, image_type: str):
+        self.image_type = image_type
+        self.width: Optional[int] = None
+        self.height: Optional[int] = None
+        self._buffer = bytearray()
+        self._offset = 2  # JPEG: 跳过 SOI
+        self._done = False
+
+    def feed(self, data: bytes):
+        """输入新的数据块"""
+        if self._done:
+            return
+        self._buffer.extend(data)
+
+        if self.image_type == "png" and len(self._buffer) >= 24:
+            self.width, self.height = struct.unpack(">II", self._buffer[16:24])
+            self._finish()
+        elif self.image_type == "gif" and len(self._buffer) >= 10:
+            self.width, self.height = struct.unpack("<HH", self._buffer[6:10])
+            self._finish()
+        elif self.image_type == "jpeg":
+            self._scan_jpeg()
+
+        if len(self._buffer) > self.MAX_PROBE_BYTES:
+            self._finish()
+
+    def _scan_jpeg(self):
+        """逐段扫描 JPEG 标记，直到遇到 SOF 段"""
+        buf = self._buffer
+        while self._offset + 4 <= len(buf):
+            if buf[self._offset] != 0xFF:
+                self._finish()
+                return
+            marker = buf[self._offset + 1]
+            if marker == 0xFF:
+                # 填充字节
+                self._offset += 1
+                continue
+            length = struct.unpack(">H", buf[self._offset + 2:self._offset + 4])[0]
+            if marker in self.SOF_MARKERS:
+                if self._offset + 9 > len(buf):
+                    return
+                self.height, self.width = struct.unpack(">HH", buf[self._offset + 5:self._offset + 9])
+                self._finish()
+                return
+            self._offset += 2 + length
+
+    def _finish(self):
+        self._done = True
+        self._buffer = bytearray()
+
+
+class StreamingUpload:
+    """
+    multipart/form-data 流式解析器
+
+    用法：依次调用 feed(chunk)，最后调用 close()；
+    解析完成后通过 filepath / sha256 / width / height / fields 获取结果。
+    """
+
+    def __init__(self, boundary: str, upload_dir: str = Config.UPLOAD_DIR,
+                 max_size: int = Config.MAX_CONTENT_LENGTH, file_field: str = "file"):
+        if not boundary:
+            # 非 multipart 请求等同于没有上传文件
+            raise UploadError(400, "没有上传图片")
+
+        self.upload_dir = upload_dir
+        # 首次上传可能早于检测器创建（目录初始化随之推迟），临时文件直接写在该目录下
+        os.makedirs(upload_dir, exist_ok=True)
+        self._shards = ShardedDirectory(upload_dir)
+        self.max_size = max_size
+        self.file_field = file_field
+
+        self._delimiter = b"--" + boundary.encode("latin-1")
+        self._body_delimiter = b"\r\n" + self._delimiter
+        self._buffer = bytearray()
+        self._state = "preamble"
+        self._received = 0
+
+        # 当前part
+        self._part_name: Optional[str] = None
+        self._part_is_file = False
+        self._part_ignored = False
+        self._field_value = bytearray()
+
+        # 文件part
+        self._file = None
+        self._temp_path: Optional[str] = None
+        self._head = bytearray()
+        self._hasher = hashlib.sha256()
+        self._probe: Optional[ImageSizeProbe] = None
+
+        # 解析结果
+        self.fields: Dict[str, str] = {}
+        self.original_filename: Optional[str] = None
+        self.filename: Optional[str] = None
+        self.filepath: Optional[str] = None
+        self.stored_name: Optional[str] = None
+        self.image_type: Optional[str] = None
+        self.sha256: Optional[str] = None
+        self.size = 0
+
+    @property
+    def width(self) -> Optional[int]:
+        return self._probe.width if self._probe else None
+
+    @property
+    def height(self) -> Optional[int]:
+        return self._probe.height if self._probe else None
+
+    def feed(self, chunk: bytes):
+        """
+        输入请求体的一个数据块
+
+        Args:
+            chunk: 数据块
+
+        Raises:
+            UploadError: 上传超限或内容不合法
+        """
+        self._received += len(chunk)
+        if self._received > self.max_size:
+            self.abort()
+            raise UploadError(413, f"文件过大，最大支持 {self.max_size // (1024*1024)}MB")
+
+        self._buffer.extend(chunk)
+        try:
+            self._parse()
+        except UploadError:
+            self.abort()
+            raise
+
+    def close(self):
+        """
+        结束解析并校验结果
+
+        Raises:
+            UploadError: 未上传文件或请求体不完整
+        """
+        if self._state != "done":
+            self.abort()
+            if self.filepath is None and self.original_filename is None:
+                raise UploadError(400, "没有上传图片")
+            raise UploadError(400, "上传数据不完整")
+
+        if self.original_filename is None:
+            raise UploadError(400, "没有上传图片")
+        if self.original_filename == "":
+            raise UploadError(400, "未选择文件")
+
+    def image_info(self) -> Dict:
+        """
+        获取上传图片的基本信息
+
+        Returns:
+            Dict: 内容哈希、保存的文件名、格式、尺寸与字节数
+        """
+        return {
+            "sha256": self.sha256,
+            "file": self.stored_name,
+            "type": self.image_type,
+            "width": self.width,
+            "height": self.height,
+            "size": self.size
+        }
+
+    def abort(self):
+        """放弃上传并清理临时文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._temp_path and os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+        self._temp_path = None
+
+    def _parse(self):
+        """按状态机处理缓冲区中的数据"""
+        while True:
+            if self._state == "preamble":
+                index = self._buffer.find(self._delimiter)
+                if index < 0:
+                    # 只保留可能构成分隔符前缀的尾部
+                    del self._buffer[:max(len(self._buffer) - len(self._delimiter), 0)]
+                    return
+                del self._buffer[:index + len(self._delimiter)]
+                self._state = "after_delimiter"
+
+            elif self._state == "after_delimiter":
+                if len(self._buffer) < 2:
+                    return
+                if self._buffer[:2] == b"--":
+                    self._state = "done"
+                    self._buffer.clear()
+                    return
+                del self._buffer[:2]  # CRLF
+                self._state = "headers"
+
+            elif self._state == "headers":
+                index = self._buffer.find(b"\r\n\r\n")
+                if index < 0:
+                    if len(self._buffer) > 16 * 1024:
+                        raise UploadError(400, "上传数据格式错误")
+                    return
+                headers = bytes(self._buffer[:index]).decode("utf-8", errors="replace")
+                del self._buffer[:index + 4]
+                self._start_part(headers)
+                self._state = "body"
+
+            elif self._state == "body":
+                index = self._buffer.find(self._body_delimiter)
+                if index < 0:
+                    keep = len(self._body_delimiter) - 1
+                    if len(self._buffer) > keep:
+                        self._part_data(bytes(self._buffer[:-keep]))
+                        del self._buffer[:-keep]
+                    return
+                self._part_data(bytes(self._buffer[:index]))
+                del self._buffer[:index + len(self._body_delimiter)]
+                self._end_part()
+                self._state = "after_delimiter"
+
+            else:
+                self._buffer.clear()
+                return
+
+    def _start_part(self, headers: str):
+        """解析part头部，文件part在此处校验扩展名并打开临时文件"""
+        name, filename = None, None
+        for line in headers.split("\r\n"):
+            key, _, value = line.partition(":")
+            if key.strip().lower() != "content-disposition":
+                continue
+            for param in value.split(";"):
+                param_key, _, param_value = param.strip().partition("=")
+                param_value = param_value.strip().strip('"')
+                if param_key == "name":
+                    name = param_value
+                elif param_key == "filename":
+                    filename = param_value
+
+        self._part_name = name
+        self._part_is_file = name == self.file_field and filename is not None
+        # 其他文件字段直接丢弃
+        self._part_ignored = filename is not None and not self._part_is_file
+        self._field_value = bytearray()
+
+        if not self._part_is_file:
+            return
+
+        self.original_filename = filename
+        if filename == "":
+            return
+        if not Config.allowed_file(filename):
+            raise UploadError(400, f'不支持的文件格式，仅支持: {", ".join(Config.ALLOWED_EXTENSIONS)}')
+
+        self.filename = secure_filename(filename)
+        self._temp_path = os.path.join(self.upload_dir, f".{uuid.uuid4().hex}.part")
+        self._file = open(self._temp_path, "wb")
+
+    def _part_data(self, data: bytes):
+        """处理part数据：文件直接写盘，普通字段累积到小缓冲"""
+        if not data or self._part_ignored:
+            return
+
+        if not self._part_is_file:
+            self._field_value.extend(data)
+            if len(self._field_value) > MAX_FIELD_SIZE:
+                raise UploadError(400, f"表单字段过长: {self._part_name}")
+            return
+
+        if self._file is None:
+            return
+
+        # 文件头字节到齐时立即检查魔数，非图片尽早拒绝
+        if self.image_type is None:
+            self._head.extend(data)
+            if len(self._head) >= SNIFF_BYTES:
+                self.image_type = sniff_image_type(bytes(self._head[:SNIFF_BYTES]))
+                if self.image_type is None:
+                    raise UploadError(400, "文件内容不是有效的图片")
+                self._probe = ImageSizeProbe(self.image_type)
+                self._probe.feed(bytes(self._head))
+                self._head = bytearray()
+        else:
+            self._probe.feed(data)
+
+        self._hasher.update(data)
+        self._file.write(data)
+        self.size += len(data)
+
+    def _end_part(self):
+        """结束当前part：文件按内容哈希命名落盘，字段存入fields"""
+        if self._part_ignored:
+            return
+
+        if not self._part_is_file:
+            if self._part_name:
+                self.fields[self._part_name] = self._field_value.decode("utf-8", errors="replace")
+            return
+
+        if self._file is None:
+            return
+
+        self._file.close()
+        self._file = None
+
+        if self.image_type is None:
+            # 文件内容不足以判断格式
+            self.image_type = sniff_image_type(bytes(self._head))
+            if self.image_type is None:
+                raise UploadError(400, "文件内容不是有效的图片")
+
+        self.sha256 = self._hasher.hexdigest()
+        # 按内容哈希命名并放入分片目录：相同图片只保存一份
+        self.stored_name = f"{self.sha256[:32]}_{self.filename}"
+        self.filepath = self._shards.path_for(self.stored_name, create=True)
+        os.replace(self._temp_path, self.filepath)
+        self._temp_path = None
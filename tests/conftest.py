@@ -0,0 +1,8 @@
+"""
+测试公共配置：把项目根目录加入导入路径，测试可直接 import src.*
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,199 @@
+"""
+病害爆发预警：滑动窗口计数、阈值/变化率规则、冷却与输出
+"""
+
+import asyncio
+import json
+import threading
+
+import pytest
+
+from src.alerts.engine import AlertEngine, SlidingWindowCounter
+from src.alerts.sinks import FileSink, SSEChannel
+from src.detectors.result import DetectionResult, DiseaseDetails
+
+HOUR = 3600
+
+
+def detection(disease="稻瘟病", **extra):
+    return DetectionResult("success", mode="qwen", details=DiseaseDetails(disease=disease), **extra)
+
+
+def make_engine(sinks=(), **overrides):
+    settings = dict(cell_deg=0.02, bucket_seconds=HOUR, window_buckets=24, count_threshold=10,
+                    growth_ratio=3.0, growth_min_count=5, cooldown=HOUR)
+    settings.update(overrides)
+    return AlertEngine(sinks, **settings)
+
+
+def test_window_slides_counts_into_previous_window():
+    window = SlidingWindowCounter(bucket_seconds=10, window_buckets=3)
+    for ts in (0, 5, 12, 25):
+        window.add(ts)
+    assert (window.current, window.previous) == (4, 0)
+
+    window.add(35)  # 桶 3：桶 0 的两次移入上一窗口
+    assert (window.current, window.previous) == (3, 2)
+
+    window.add(3)  # 迟到事件落入上一窗口
+    assert (window.current, window.previous) == (3, 3)
+
+    window.add(200)  # 超出两个窗口，全部重置
+    assert (window.current, window.previous) == (1, 0)
+    assert window.idle(200 + 60)
+
+
+def test_threshold_rule_fires_once_per_cooldown():
+    engine = make_engine(growth_min_count=100)
+    fired = []
+    for i in range(12):
+        fired += engine.observe(detection(), "水稻", lat=30.001, lon=120.001, ts=1000 + i * 60)
+
+    assert len(fired) == 1
+    assert fired[0]["rule"] == "threshold"
+    assert fired[0]["count"] == 10
+    assert engine.metrics()["alerts_fired"] == 1
+
+
+def test_growth_rule_compares_with_previous_window():
+    engine = make_engine(window_buckets=1, count_threshold=100)
+    engine.observe(detection(), "水稻", field_id="F1", ts=10 * HOUR)
+    fired = []
+    for i in range(5):
+        fired += engine.observe(detection(), "水稻", field_id="F1", ts=11 * HOUR + i)
+
+    assert [alert["rule"] for alert in fired] == ["growth"]
+    assert (fired[0]["count"], fired[0]["previous_count"]) == (5, 1)
+    assert fired[0]["region"] == "field:F1"
+
+
+@pytest.mark.parametrize("result", [
+    DetectionResult("success", mode="mock", details=DiseaseDetails(disease="稻瘟病")),
+    detection(provisional=True, queue_id=1),
+    detection("健康"),
+    DetectionResult("rejected", mode="quality_gate"),
+])
+def test_simulated_or_healthy_results_do_not_count(result):
+    engine = make_engine(count_threshold=1)
+
+    assert engine.observe(result, "水稻", lat=30, lon=120, ts=1000) == []
+    assert engine.metrics()["counted"] == 0
+
+
+def test_unlocated_detections_are_counted_separately():
+    engine = make_engine()
+    engine.observe(detection(), "水稻")
+    assert engine.metrics()["unlocated"] == 1
+
+
+def test_regions_crops_and_diseases_have_separate_windows():
+    engine = make_engine(count_threshold=2)
+    engine.observe(detection(), "水稻", lat=30.001, lon=120.001, ts=1000)
+    engine.observe(detection(), "水稻", lat=31.001, lon=120.001, ts=1001)
+    engine.observe(detection("纹枯病"), "水稻", lat=30.001, lon=120.001, ts=1002)
+
+    assert engine.recent_alerts() == []
+    assert engine.metrics()["active_windows"] == 3
+
+
+class BrokenSink:
+    def emit(self, alert):
+        raise RuntimeError("down")
+
+
+def test_sinks_receive_alerts_and_failures_are_isolated(tmp_path):
+    log = tmp_path / "alerts.jsonl"
+    channel = SSEChannel()
+    subscriber = channel.subscribe()
+    engine = make_engine([BrokenSink(), FileSink(str(log)), channel], count_threshold=1)
+
+    alert = engine.observe(detection(), "水稻", lat=30, lon=120, ts=1000)[0]
+
+    assert json.loads(log.read_text(encoding="utf-8"))["id"] == alert["id"]
+    assert not subscriber.empty()
+    assert engine.metrics()["sink_errors"] == 1
+
+
+def test_sink_errors_are_counted_across_threads():
+    engine = make_engine([BrokenSink(), BrokenSink()])
+    alert = {"message": "稻瘟病", "region": "r"}
+
+    def dispatch():
+        for _ in range(250):
+            engine._dispatch(alert)
+
+    threads = [threading.Thread(target=dispatch) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert engine.metrics()["sink_errors"] == 2000
+
+
+def test_async_subscribers_receive_alerts_from_other_threads():
+    channel = SSEChannel(max_pending=1)
+
+    async def main():
+        subscriber = channel.subscribe_async(asyncio.get_running_loop())
+        assert channel.subscriber_count == 1
+        thread = threading.Thread(target=lambda: [channel.emit({"id": i}) for i in range(3)])
+        thread.start()
+        first = await asyncio.wait_for(subscriber.get(), 5)
+        thread.join()
+        await asyncio.sleep(0)
+        channel.unsubscribe(subscriber)
+        return first, subscriber.qsize()
+
+    first, pending = asyncio.run(main())
+
+    assert first == {"id": 0}
+    # 队列已满时丢弃，不阻塞发送方
+    assert pending <= 1
+    assert channel.subscriber_count == 0
+    # 事件循环关闭后发送不抛出异常
+    loop = asyncio.new_event_loop()
+    channel.subscribe_async(loop)
+    loop.close()
+    channel.emit({"id": 9})
+
+
+def test_asgi_stream_waits_on_the_event_loop(monkeypatch):
+    pytest.importorskip("starlette")
+    import asgi
+    from src.server import alert_api
+
+    channel = SSEChannel()
+    monkeypatch.setattr(alert_api, "sse_channel", channel)
+    monkeypatch.setattr(alert_api, "SSE_KEEPALIVE_SECONDS", 0.01)
+
+    async def no_threads(*args, **kwargs):
+        raise AssertionError("SSE 不应占用线程池")
+
+    monkeypatch.setattr(asyncio, "to_thread", no_threads)
+
+    class FakeRequest:
+        disconnected = False
+
+        async def is_disconnected(self):
+            return self.disconnected
+
+    async def main():
+        request = FakeRequest()
+        response = await asgi.stream_alerts(request)
+        events = response.body_iterator
+        received = [await events.__anext__()]
+        threading.Thread(target=channel.emit, args=({"id": "a1"},)).start()
+        received.append(await events.__anext__())
+        received.append(await events.__anext__())
+        request.disconnected = True
+        with pytest.raises(StopAsyncIteration):
+            await events.__anext__()
+        return received
+
+    received = asyncio.run(main())
+
+    assert received[0] == ": connected\n\n"
+    assert received[1].startswith("id: a1\nevent: alert\n")
+    assert received[2] == ": keep-alive\n\n"
+    assert channel.subscriber_count == 0
@@ -0,0 +1,76 @@
+"""
+ASGI 服务：异步检测路径与请求头校验
+"""
+
+import asyncio
+
+import pytest
+
+from src.detectors.hybrid_detector import HybridDiseaseDetector
+from src.detectors.mock_detector import MockDiseaseDetector
+from src.detectors.result import DetectionResult, DiseaseDetails
+
+
+class FakeAsyncQwen:
+    def __init__(self, status="success"):
+        self.status = status
+        self.calls = 0
+
+    async def adetect(self, image_path, crop_type):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.status != "success":
+            return DetectionResult.failure("qwen", "API调用失败 (500)", retryable=True)
+        return DetectionResult("success", mode="qwen", result="病害识别：稻瘟病",
+                               details=DiseaseDetails(disease="稻瘟病", disease_id="rice_blast"))
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "leaf.jpg"
+    path.write_bytes(b"\xff\xd8fake-jpeg")
+    return str(path)
+
+
+def make_detector(status="success"):
+    detector = HybridDiseaseDetector(api_key="sk-test")
+    detector.qwen_detector = FakeAsyncQwen(status)
+    detector.mock_detector = MockDiseaseDetector(simulate_latency=False)
+    return detector
+
+
+def test_adetect_awaits_api(image):
+    detector = make_detector()
+
+    result = asyncio.run(detector.adetect(image))
+
+    assert result["mode"] == "qwen"
+    assert "api_ms" in result["timings"]
+    assert detector.stats["success_calls"] == 1
+
+
+def test_adetect_falls_back_to_mock_on_api_failure(image):
+    detector = make_detector("error")
+
+    result = asyncio.run(detector.adetect(image))
+
+    assert result["mode"] == "mock"
+    assert "500" in result["api_error"]
+    assert detector.stats["mock_calls"] == 1
+
+
+@pytest.mark.parametrize("content_length, status", [("abc", 400), ("999999999999", 413)])
+def test_detect_rejects_bad_content_length(content_length, status):
+    pytest.importorskip("starlette")
+    pytest.importorskip("httpx")
+    from starlette.testclient import TestClient
+
+    import asgi
+
+    client = TestClient(asgi.app)
+    response = client.post("/api/detect", content=b"", headers={
+        "Content-Type": "multipart/form-data; boundary=x", "Content-Length": content_length
+    })
+
+    assert response.status_code == status
+    assert response.json()["status"] == "error"
@@ -0,0 +1,122 @@
+"""
+级联检测：置信度不足或结论含糊时升级到更强模型
+"""
+
+import asyncio
+
+import pytest
+
+from src.detectors.cascade_detector import CascadeQwenDetector
+
+
+def answer(text, prompt_tokens=100, cached=0):
+    body = {
+        "choices": [{"message": {"content": text}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 20,
+                  "prompt_tokens_details": {"cached_tokens": cached}}
+    }
+    return 200, body, "", 0.1
+
+
+def make_cascade(responses):
+    """responses: 模型名 -> 传输层返回值（整数表示HTTP错误码）"""
+    cascade = CascadeQwenDetector("sk-test", models=["qwen-vl-plus", "qwen-vl-max"], confidence_threshold=0.7)
+    calls = []
+
+    def transport(payload, send):
+        calls.append(payload["model"])
+        response = responses[payload["model"]]
+        return (response, None, "error", 0.1) if isinstance(response, int) else response
+
+    for tier in cascade.tiers:
+        tier.transport = transport
+    return cascade, calls
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "leaf.jpg"
+    path.write_bytes(b"\xff\xd8fake-jpeg")
+    return str(path)
+
+
+def test_confident_answer_stays_on_first_tier(image):
+    cascade, calls = make_cascade({"qwen-vl-plus": answer("病害识别：稻瘟病\n置信度：92%")})
+
+    result = cascade.detect(image)
+
+    assert calls == ["qwen-vl-plus"]
+    assert result["tier"] == 1
+    assert result["escalated"] is False
+    assert result["details"]["disease_id"] == "rice_blast"
+
+
+def test_low_confidence_escalates_and_sums_usage(image):
+    cascade, calls = make_cascade({
+        "qwen-vl-plus": answer("病害识别：稻瘟病\n置信度：40%", prompt_tokens=100, cached=80),
+        "qwen-vl-max": answer("病害识别：纹枯病\n置信度：88%", prompt_tokens=120, cached=0)
+    })
+
+    result = cascade.detect(image)
+
+    assert calls == ["qwen-vl-plus", "qwen-vl-max"]
+    assert result["tier"] == 2
+    assert result["escalated"] is True
+    assert result["details"]["disease_id"] == "rice_sheath_blight"
+    assert result["escalations"][0]["from"] == "qwen-vl-plus"
+    assert result["usage"]["prompt_tokens"] == 220
+    assert result["usage"]["cached_tokens"] == 80
+
+
+def test_ambiguous_answer_escalates(image):
+    cascade, calls = make_cascade({
+        "qwen-vl-plus": answer("病害识别：稻瘟病或纹枯病\n置信度：90%"),
+        "qwen-vl-max": answer("病害识别：稻瘟病\n置信度：90%")
+    })
+
+    result = cascade.detect(image)
+
+    assert len(calls) == 2
+    assert "结论含糊" in result["escalations"][0]["reason"]
+
+
+@pytest.mark.parametrize("detect", ["sync", "async"])
+def test_crop_specific_alias_is_not_ambiguous(image, detect):
+    # 玉米图片中的"锈病"即玉米锈病，不应与小麦锈病一起视为含糊结论
+    cascade, calls = make_cascade({
+        "qwen-vl-plus": answer("病害识别：玉米锈病\n症状：叶片散生锈病孢子堆\n置信度：90%"),
+        "qwen-vl-max": answer("病害识别：玉米锈病\n置信度：90%")
+    })
+    if detect == "sync":
+        result = cascade.detect(image, "玉米")
+    else:
+        result = asyncio.run(cascade.adetect(image, "玉米"))
+
+    assert calls == ["qwen-vl-plus"]
+    assert result["escalated"] is False
+    assert result["details"]["disease_id"] == "corn_rust"
+    assert cascade.needs_escalation(result, "玉米") is None
+    assert cascade.needs_escalation(result).startswith("结论含糊")
+
+
+def test_failed_escalation_keeps_lower_tier_answer(image):
+    cascade, calls = make_cascade({
+        "qwen-vl-plus": answer("病害识别：稻瘟病\n置信度：50%"),
+        "qwen-vl-max": 503
+    })
+
+    result = cascade.detect(image)
+
+    assert result["status"] == "success"
+    assert result["tier"] == 1
+    assert "503" in result["escalation_error"]
+
+
+def test_first_tier_failure_is_returned_for_fallback(image):
+    cascade, calls = make_cascade({"qwen-vl-plus": 429})
+
+    result = cascade.detect(image)
+
+    assert calls == ["qwen-vl-plus"]
+    assert result["status"] == "error"
+    assert result["retryable"] is True
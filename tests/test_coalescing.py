@@ -0,0 +1,208 @@
+"""
+请求合并：相同的检测同时进行时只执行一次
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+
+from src.detectors import HybridDiseaseDetector
+from src.detectors.coalescing import SingleFlight, file_sha256, flight_key
+from src.detectors.prompts import PROMPT_VERSION
+from src.detectors.result import DetectionResult, DiseaseDetails
+
+
+class SlowCall:
+    """第一次调用阻塞到 release，记录实际执行次数"""
+
+    def __init__(self, result="结果", error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, *args):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def run_concurrently(flights, func, count=4):
+    outcomes = []
+
+    def call():
+        try:
+            outcomes.append(flights.do("k", func))
+        except Exception as e:
+            outcomes.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    func.started.wait(5)
+    waiters = [threading.Thread(target=call) for _ in range(count - 1)]
+    for thread in waiters:
+        thread.start()
+    # 等待者进入等待后再放行执行者
+    time.sleep(0.1)
+    func.release.set()
+    for thread in [leader, *waiters]:
+        thread.join(5)
+    return outcomes
+
+
+def test_concurrent_calls_execute_once():
+    flights = SingleFlight()
+    func = SlowCall()
+
+    outcomes = run_concurrently(flights, func)
+
+    assert func.calls == 1
+    assert sorted(leader for _, leader in outcomes) == [False, False, False, True]
+    assert {result for result, _ in outcomes} == {"结果"}
+    assert flights.in_flight() == 0
+
+
+def test_leader_exception_reaches_waiters():
+    flights = SingleFlight()
+    func = SlowCall(error=RuntimeError("API 超时"))
+
+    outcomes = run_concurrently(flights, func, count=3)
+
+    assert func.calls == 1
+    assert len(outcomes) == 3
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+    assert flights.in_flight() == 0
+
+
+def test_sequential_calls_are_not_cached():
+    flights = SingleFlight()
+    calls = []
+
+    for _ in range(2):
+        assert flights.do("k", lambda: calls.append(1) or len(calls)) == (len(calls), True)
+
+    assert len(calls) == 2
+
+
+def test_async_calls_execute_once():
+    flights = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "结果"
+
+    async def main():
+        return await asyncio.gather(*(flights.ado("k", work) for _ in range(3)))
+
+    outcomes = asyncio.run(main())
+
+    assert len(calls) == 1
+    assert sorted(leader for _, leader in outcomes) == [False, False, True]
+    assert flights.in_flight() == 0
+
+
+def test_async_waiter_retries_when_leader_is_cancelled():
+    flights = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def main():
+        leader = asyncio.ensure_future(flights.ado("k", work))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flights.ado("k", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await waiter
+
+    assert asyncio.run(main()) == (2, True)
+
+
+def test_keys_and_hashes(tmp_path):
+    path = tmp_path / "leaf.jpg"
+    path.write_bytes(b"\xff\xd8" * 1000)
+
+    assert file_sha256(str(path)) == hashlib.sha256(b"\xff\xd8" * 1000).hexdigest()
+    assert file_sha256(str(tmp_path / "missing.jpg")) is None
+    assert flight_key("abc", "水稻") == f"abc:水稻:{PROMPT_VERSION}"
+    assert flight_key("abc", "水稻") != flight_key("abc", "小麦")
+
+
+def test_detector_gives_waiters_independent_copies(tmp_path):
+    path = tmp_path / "leaf.jpg"
+    path.write_bytes(b"\xff\xd8fake-jpeg")
+    detector = HybridDiseaseDetector(api_key=None)
+    detector.flights = SingleFlight()
+    mock = SlowCall(DetectionResult("success", mode="mock", result="稻瘟病"))
+    detector.mock_detector.detect = mock
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(detector.detect(str(path))))
+               for _ in range(2)]
+    threads[0].start()
+    mock.started.wait(5)
+    threads[1].start()
+    time.sleep(0.1)
+    mock.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert mock.calls == 1
+    coalesced = [result for result in results if result.get("coalesced")]
+    assert len(coalesced) == 1
+    assert coalesced[0] is not mock.result
+    assert "coalesced" not in mock.result
+    assert detector.get_stats()["coalesced_calls"] == 1
+
+
+def test_waiters_do_not_share_nested_values_with_the_leader(tmp_path):
+    path = tmp_path / "leaf.jpg"
+    path.write_bytes(b"\xff\xd8fake-jpeg")
+    detector = HybridDiseaseDetector(api_key=None)
+    detector.flights = SingleFlight()
+    mock = SlowCall(DetectionResult("success", mode="mock", details=DiseaseDetails("稻瘟病", products=["三环唑"]),
+                                    regions=[{"box": [0, 0, 10, 10]}]))
+    detector.mock_detector.detect = mock
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(detector.detect(str(path))))
+               for _ in range(3)]
+    threads[0].start()
+    mock.started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.1)
+    mock.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    leader = next(result for result in results if not result.get("coalesced"))
+    waiters = [result for result in results if result.get("coalesced")]
+    assert len(waiters) == 2
+    # 执行者之后修改自己结果中的嵌套对象，不影响等待者
+    leader["regions"][0]["box"][0] = 99
+    leader["details"]["products"].append("改动")
+    waiters[0]["regions"].append({})
+    for waiter in waiters:
+        assert waiter["details"]["disease"] == "稻瘟病"
+        assert waiter["details"]["products"] == ["三环唑"]
+    assert waiters[0]["regions"][0]["box"] == [0, 0, 10, 10]
+    assert waiters[1]["regions"] == [{"box": [0, 0, 10, 10]}]
+
+
+def test_force_mock_is_not_coalesced(tmp_path):
+    detector = HybridDiseaseDetector(api_key=None)
+    detector.flights = SingleFlight()
+
+    assert detector._flight_key(str(tmp_path / "a.jpg"), "水稻", True, "abc") is None
+    assert detector._flight_key(str(tmp_path / "a.jpg"), "水稻", False, "abc") == flight_key("abc", "水稻")
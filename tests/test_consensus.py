@@ -0,0 +1,104 @@
+"""
+病害名称归一与跨帧贝叶斯共识
+"""
+
+import pytest
+
+from src.storage.consensus import DiagnosisConsensus
+from src.utils.taxonomy import find_disease, mentioned_diseases, normalize_disease, parse_severity
+
+
+@pytest.mark.parametrize("name, crop, expected", [
+    ("稻瘟", "水稻", "rice_blast"),
+    ("穗颈瘟", None, "rice_blast"),
+    ("大斑病", "玉米", "corn_northern_leaf_blight"),
+    ("锈病", "小麦", "wheat_rust"),
+    ("锈病", "玉米", "corn_rust"),
+    ("无病害", None, "healthy"),
+    ("叶片发黄", "水稻", "unknown"),
+    (None, "水稻", "unknown"),
+])
+def test_normalize_disease(name, crop, expected):
+    assert normalize_disease(name, crop)[0] == expected
+
+
+def test_find_disease_prefers_the_answer_line():
+    text = "症状描述：与纹枯病不同，病斑呈梭形\n病害识别：稻瘟病\n严重程度：中等"
+    assert find_disease(text, "水稻") == ("rice_blast", "稻瘟病")
+    assert mentioned_diseases(text, "水稻") == ["纹枯病", "稻瘟病"]
+    # 同一病害的不同叫法只算一次
+    assert mentioned_diseases("大斑病，即玉米大斑病", "玉米") == ["玉米大斑病"]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("严重程度：轻微", "轻微"),
+    ("严重程度: 中度", "中等"),
+    ("严重程度：无", "无"),
+    ("病害较严重", "严重"),
+    ("严重程度：待定", None),
+])
+def test_parse_severity_reads_the_value_not_the_label(text, expected):
+    assert parse_severity(text) == expected
+
+
+def test_majority_of_confident_frames_wins():
+    consensus = DiagnosisConsensus()
+    for _ in range(6):
+        consensus.update("rice_blast", 0.9, severity=2)
+    for _ in range(2):
+        consensus.update("rice_sheath_blight", 0.9, severity=3)
+
+    diagnosis = consensus.diagnosis()
+
+    assert diagnosis["disease_id"] == "rice_blast"
+    assert diagnosis["frames"] == 8
+    assert diagnosis["votes"] == 6
+    assert sum(consensus.posterior().values()) < 1.0
+    assert diagnosis["probability"] > diagnosis["distribution"]["纹枯病"]
+
+
+def test_low_confidence_votes_weigh_less():
+    consensus = DiagnosisConsensus()
+    for _ in range(3):
+        consensus.update("rice_sheath_blight", 0.2)
+    for _ in range(2):
+        consensus.update("rice_blast", 0.95)
+
+    assert consensus.diagnosis()["disease_id"] == "rice_blast"
+
+
+def test_leading_disease_is_reported_when_mostly_healthy():
+    consensus = DiagnosisConsensus()
+    for _ in range(9):
+        consensus.update("healthy", 0.9)
+    consensus.update("rice_blast", 0.8, severity=3)
+    consensus.update("unknown", 0.9)
+
+    diagnosis = consensus.diagnosis()
+
+    assert diagnosis["disease_id"] == "healthy"
+    assert diagnosis["frames"] == 10
+    assert diagnosis["leading_disease"]["disease_id"] == "rice_blast"
+    assert diagnosis["leading_disease"]["max_severity"] == 3
+
+
+def test_decay_forgets_old_evidence():
+    stale = DiagnosisConsensus(decay=0.5)
+    for _ in range(20):
+        stale.update("rice_blast", 0.9)
+    for _ in range(5):
+        stale.update("rice_bacterial_blight", 0.9)
+
+    assert stale.diagnosis()["disease_id"] == "rice_bacterial_blight"
+
+
+def test_state_round_trips_through_json():
+    consensus = DiagnosisConsensus()
+    consensus.update("wheat_scab", 0.7, severity=1)
+
+    restored = DiagnosisConsensus.from_json(consensus.to_json())
+    restored.update("wheat_scab", 0.7, severity=2)
+
+    assert restored.diagnosis()["votes"] == 2
+    assert restored.diagnosis()["max_severity"] == 2
+    assert DiagnosisConsensus().diagnosis() is None
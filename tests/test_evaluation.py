@@ -0,0 +1,183 @@
+"""
+离线评估：评分、分位数、响应缓存、成本统计与标注清单
+"""
+
+import pytest
+
+from src.config import Config
+from src.detectors.qwen_detector import request_fingerprint
+from src.evaluation import ResponseCache, evaluate, load_manifest, score, summary_table
+from src.evaluation.harness import ERROR_LABEL, percentile
+
+
+def answer(text, prompt_tokens=1000, cached=0, completion_tokens=100):
+    body = {
+        "choices": [{"message": {"content": text}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "prompt_tokens_details": {"cached_tokens": cached}}
+    }
+    return 200, body, "", 0.25
+
+
+class FakeAPI:
+    """按调用顺序返回预设响应的传输层（接口与 ResponseCache 一致）"""
+
+    offline = False
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.payloads = []
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, payload, send):
+        self.misses += 1
+        self.payloads.append(payload)
+        response = self.responses.pop(0)
+        return (response, None, "error", 0.1) if isinstance(response, int) else response
+
+
+@pytest.fixture
+def items(tmp_path):
+    manifest = tmp_path / "labels.jsonl"
+    for name in ("a", "b", "c"):
+        (tmp_path / f"{name}.jpg").write_bytes(b"\xff\xd8" + name.encode())
+    manifest.write_text(
+        '{"image": "a.jpg", "label": "稻瘟", "severity": "严重"}\n'
+        '\n'
+        '{"image": "b.jpg", "label": "rice_sheath_blight"}\n'
+        '{"image": "c.jpg", "label": "健康", "severity": "无"}\n',
+        encoding="utf-8"
+    )
+    return load_manifest(str(manifest))
+
+
+def test_load_manifest_resolves_paths_and_labels(tmp_path, items):
+    assert [item.disease_id for item in items] == ["rice_blast", "rice_sheath_blight", "healthy"]
+    assert items[0].image == str(tmp_path / "a.jpg")
+    assert items[0].crop_type == "水稻"
+    assert items[1].severity is None
+
+    csv_path = tmp_path / "labels.csv"
+    csv_path.write_text("\ufeffimage,label,crop_type\n/abs/x.jpg,赤霉病,小麦\n", encoding="utf-8")
+    assert load_manifest(str(csv_path))[0] == ("/abs/x.jpg", "wheat_scab", "小麦", None)
+
+    bad = tmp_path / "bad.jsonl"
+    bad.write_text('{"image": "a.jpg"}\n', encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_manifest(str(bad))
+
+
+def test_score_confusion_and_macro_f1():
+    report = score([("a", "a"), ("a", "b"), ("b", "b"), ("b", ERROR_LABEL)])
+
+    assert report["labels"] == ["a", "b", ERROR_LABEL]
+    assert report["confusion"]["a"] == {"a": 1, "b": 1, ERROR_LABEL: 0}
+    assert report["accuracy"] == 0.5
+    assert report["per_class"]["a"]["precision"] == 1.0
+    assert report["per_class"]["a"]["recall"] == 0.5
+    assert report["per_class"]["b"]["precision"] == 0.5
+    # 宏平均只对标注中出现的类别取平均，预测出的 error 列不计入
+    assert report["macro_f1"] == pytest.approx((2 / 3 + 1 / 2) / 2)
+    assert score([])["accuracy"] == 0.0
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+
+    assert percentile(values, 0.5) == 51
+    assert percentile(values, 0.99) == 100
+    assert percentile([3.0], 0.99) == 3.0
+    assert percentile([], 0.5) == 0.0
+
+
+def test_evaluate_counts_usage_cost_and_errors(items):
+    api = FakeAPI([
+        answer("病害识别：稻瘟病\n严重程度：严重\n置信度：90%", prompt_tokens=1000, cached=500),
+        500,
+        answer("病害识别：健康\n严重程度：无\n置信度：95%", prompt_tokens=1000, cached=0)
+    ])
+    config = {"name": "plus", "detector": "qwen", "model": "qwen-vl-plus"}
+
+    report = evaluate(items, config, api_key="sk-test", cache=api, concurrency=1)
+
+    assert report["samples"] == 3
+    assert report["accuracy"] == pytest.approx(2 / 3)
+    assert report["errors"] == 1
+    assert report["severity_accuracy"] == 1.0
+    assert report["api_calls"] == 3
+    assert report["live_calls"] == 3
+    assert report["usage"]["qwen-vl-plus"]["cached_tokens"] == 500
+    input_price, output_price = Config.MODEL_PRICES["qwen-vl-plus"]
+    expected = ((1500 + 500 * Config.CACHED_TOKEN_PRICE_RATIO) / 1000 * input_price
+                + 200 / 1000 * output_price)
+    assert report["cost"] == pytest.approx(expected)
+    assert report["unpriced_models"] == []
+    # 传输层报告的耗时计入延迟
+    assert report["latency_p50_ms"] >= 250
+    assert "plus" in summary_table([report])
+
+
+def test_unknown_detector_and_unpriced_model(items):
+    with pytest.raises(ValueError):
+        evaluate(items, {"detector": "gpt"}, api_key="sk-test")
+
+    api = FakeAPI([answer("病害识别：健康")] * 3)
+    report = evaluate(items, {"detector": "qwen", "model": "qwen-vl-new"}, api_key="sk-test", cache=api,
+                      concurrency=1)
+    assert report["unpriced_models"] == ["qwen-vl-new"]
+    assert report["cost"] == 0
+
+
+def test_response_cache_serves_recorded_responses(tmp_path):
+    cache = ResponseCache(str(tmp_path / "eval.db"))
+    payload = {"model": "qwen-vl-plus", "messages": [{"role": "user", "content": "图片"}]}
+    sent = []
+
+    def send(request):
+        sent.append(request)
+        return answer("病害识别：稻瘟病")
+
+    first = cache(payload, send)
+    second = cache(dict(payload), send)
+
+    assert len(sent) == 1
+    assert second[0] == 200
+    assert second[1] == first[1]
+    assert second[3] == first[3]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_response_cache_skips_failures_and_offline_misses(tmp_path):
+    cache = ResponseCache(str(tmp_path / "eval.db"))
+    payload = {"model": "qwen-vl-plus", "messages": []}
+    sent = []
+
+    def send(request):
+        sent.append(request)
+        return 500, None, "error", 0.1
+
+    cache(payload, send)
+    cache(payload, send)
+    assert len(sent) == 2
+
+    offline = ResponseCache(str(tmp_path / "eval.db"), offline=True)
+    status, body, text, _ = offline(payload, send)
+    assert status == 404 and body is None
+    assert len(sent) == 2
+
+
+def test_evaluate_offline_replays_cached_latency(items, tmp_path):
+    recorder = FakeAPI([answer("病害识别：稻瘟病")] * 3)
+    config = {"detector": "qwen", "model": "qwen-vl-plus"}
+    evaluate(items, config, api_key="sk-test", cache=recorder, concurrency=1)
+
+    cache = ResponseCache(str(tmp_path / "eval.db"), offline=True)
+    for payload in recorder.payloads:
+        cache.put(request_fingerprint(payload), payload["model"], answer("病害识别：稻瘟病")[1], 0.4)
+
+    report = evaluate(items, config, api_key="sk-test", cache=cache, concurrency=1)
+
+    assert report["cached_calls"] == 3
+    assert report["live_calls"] == 0
+    assert report["latency_p50_ms"] >= 400
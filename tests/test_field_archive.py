@@ -0,0 +1,106 @@
+"""
+数字孪生农田档案：增量汇总、按日历史与检测结果归档
+"""
+
+from datetime import datetime
+
+import pytest
+
+from src.detectors.result import DetectionResult, DiseaseDetails
+from src.server import field_api
+from src.storage.field_archive import FieldArchive
+
+DAY = 86400
+T0 = datetime(2026, 6, 1, 9).timestamp()
+
+
+def diagnosis(disease, severity="中等", confidence=0.9, **extra):
+    return DetectionResult("success", mode="qwen", result=f"病害识别：{disease}",
+                           details=DiseaseDetails(disease=disease, severity=severity, confidence=confidence), **extra)
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    archive = FieldArchive(str(tmp_path / "field_archive.db"))
+    monkeypatch.setattr(field_api, "_archive", archive)
+    return archive
+
+
+def test_rollups_and_daily_history(archive):
+    archive.record_frame("F1", diagnosis("稻瘟病", "轻微"), ts=T0, crop_type="水稻")
+    archive.record_frame("F1", diagnosis("稻瘟", "严重"), ts=T0 + 60, crop_type="水稻")
+    archive.record_frame("F1", diagnosis("健康", "无"), ts=T0 + DAY, crop_type="水稻")
+
+    summary = archive.get_summary("F1")
+    history = archive.get_season_history("F1")
+
+    assert summary["frames"] == 3
+    assert summary["diseased_frames"] == 2
+    # 别名归一后计入同一病害
+    assert summary["disease_counts"] == {"稻瘟病": 2}
+    assert summary["max_severity"] == "严重"
+    assert summary["field"]["crop_type"] == "水稻"
+    assert [(day["frames"], day["diseased_frames"]) for day in history] == [(2, 2), (1, 0)]
+    assert archive.get_season_history("F1", start_ts=T0 + DAY) == history[1:]
+
+
+def test_trend_rises_with_recent_severe_frames(archive):
+    for i in range(20):
+        archive.record_frame("F1", diagnosis("健康", "无"), ts=T0 + i)
+    for i in range(5):
+        archive.record_frame("F1", diagnosis("纹枯病", "严重"), ts=T0 + 100 + i)
+
+    assert archive.get_summary("F1")["trend"] == "上升"
+
+
+def test_frames_are_range_scanned_newest_first(archive):
+    for i in range(5):
+        archive.record_frame("F1", diagnosis("稻瘟病"), ts=T0 + i * 10, flight_id="FL1", result_file=f"r{i}.json")
+
+    frames = archive.get_frames("F1", start_ts=T0 + 10, end_ts=T0 + 30)
+
+    assert [frame["result_file"] for frame in frames] == ["r3.json", "r2.json", "r1.json"]
+    assert frames[0]["severity"] == "中等"
+
+
+def test_history_frames_limit_is_validated_and_clamped(archive, monkeypatch):
+    for i in range(5):
+        archive.record_frame("F1", diagnosis("稻瘟病"), ts=T0 + i * 10, result_file=f"r{i}.json")
+    monkeypatch.setattr(field_api, "MAX_FRAMES_LIMIT", 3)
+
+    payload, status = field_api.field_history("F1", {"frames": "1", "limit": "2"})
+    assert status == 200
+    assert [frame["result_file"] for frame in payload["data"]["frames"]] == ["r4.json", "r3.json"]
+    payload, status = field_api.field_history("F1", {"frames": "1", "limit": "100000"})
+    assert len(payload["data"]["frames"]) == 3
+
+    for limit in ("abc", "1.5", "0", "-1"):
+        assert field_api.field_history("F1", {"frames": "1", "limit": limit})[1] == 400, limit
+
+
+def test_upsert_field_keeps_existing_values(archive):
+    archive.upsert_field("F1", name="东一块", crop_type="水稻", area_mu=12.5)
+    field = archive.upsert_field("F1", owner="张")
+
+    assert (field["name"], field["area_mu"], field["owner"]) == ("东一块", 12.5, "张")
+
+
+@pytest.mark.parametrize("result", [
+    DetectionResult("success", mode="mock", details=DiseaseDetails(disease="稻瘟病", severity="严重")),
+    diagnosis("稻瘟病", provisional=True, queue_id=3),
+    DetectionResult("rejected", mode="quality_gate"),
+])
+def test_record_detection_skips_results_without_real_diagnosis(archive, result):
+    assert field_api.record_detection(result, {"field_id": "F1"}, "水稻", "r.json") is None
+    assert archive.get_summary("F1") is None
+    assert archive.get_diagnosis("field", "F1") is None
+
+
+def test_record_detection_archives_real_results(archive):
+    form = {"field_id": "F1", "flight_id": "FL1", "captured_at": str(T0), "lat": "30.1", "lon": "120.2"}
+
+    frame_id = field_api.record_detection(diagnosis("稻瘟病"), form, "水稻", "r.json")
+
+    assert frame_id == 1
+    assert archive.get_frames("F1")[0]["ts"] == T0
+    assert archive.get_diagnosis("flight", "FL1")["disease_id"] == "rice_blast"
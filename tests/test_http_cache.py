@@ -0,0 +1,202 @@
+"""
+HTTP 缓存：ETag 条件请求、压缩协商、immutable/no-cache 与热点文件缓存
+"""
+
+import gzip
+import hashlib
+import json
+import types
+
+import pytest
+
+from src.server import files, http_cache
+from src.server.http_cache import (
+    IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, HotFileCache, etag_matches, negotiate_encoding,
+    result_response, upload_cache_headers
+)
+from src.storage.sharding import ShardedDirectory
+
+
+@pytest.fixture
+def results(tmp_path, monkeypatch):
+    results = ShardedDirectory(str(tmp_path / "results"))
+    monkeypatch.setattr(files, "results", results)
+    monkeypatch.setattr(files, "read_archived_result", lambda filename: None)
+    monkeypatch.setattr(http_cache, "hot_files", HotFileCache(1024 * 1024, 256 * 1024))
+    return results
+
+
+def write_result(results, filename, result):
+    body = json.dumps(result, ensure_ascii=False, indent=2).encode("utf-8")
+    with open(results.path_for(filename, create=True), "wb") as f:
+        f.write(body)
+    return body
+
+
+def large_result(**extra):
+    # 超过压缩阈值的结果
+    return {"status": "success", "result": "稻瘟病" * 400, **extra}
+
+
+def test_etag_matching():
+    assert etag_matches('"abc"', "abc")
+    assert etag_matches('W/"abc"', "abc")
+    assert etag_matches('"x", "abc-gz"', "abc")
+    assert etag_matches('"abc-br"', "abc")
+    assert etag_matches("*", "abc")
+    assert not etag_matches('"abcd"', "abc")
+    assert not etag_matches('"abc-zz"', "abc")
+    assert not etag_matches(None, "abc")
+    assert not etag_matches("", "abc")
+
+
+def test_encoding_negotiation(monkeypatch):
+    monkeypatch.setattr(http_cache, "_brotli", False)
+    assert negotiate_encoding("gzip, deflate, br") == "gzip"
+    assert negotiate_encoding("*") == "gzip"
+    assert negotiate_encoding("gzip;q=0") is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding(None) is None
+
+    monkeypatch.setattr(http_cache, "_brotli", types.SimpleNamespace(compress=lambda body, quality: b"br:" + body))
+    assert negotiate_encoding("gzip, br") == "br"
+    assert negotiate_encoding("gzip, br;q=0") == "gzip"
+
+
+def test_final_result_is_immutable_and_gzipped(results, monkeypatch):
+    monkeypatch.setattr(http_cache, "_brotli", False)
+    body = write_result(results, "r1.json", large_result())
+    etag = hashlib.sha256(body).hexdigest()
+
+    status, data, headers = result_response("r1.json", {"Accept-Encoding": "gzip"})
+
+    assert status == 200
+    assert gzip.decompress(data) == body
+    assert headers["Content-Encoding"] == "gzip"
+    assert headers["ETag"] == f'"{etag}-gz"'
+    assert headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+    assert headers["Vary"] == "Accept-Encoding"
+
+    status, data, headers = result_response("r1.json", {})
+    assert (status, data) == (200, body)
+    assert headers["ETag"] == f'"{etag}"'
+    assert "Content-Encoding" not in headers
+
+
+def test_conditional_request_returns_304_for_any_encoding(results):
+    body = write_result(results, "r1.json", large_result())
+    etag = hashlib.sha256(body).hexdigest()
+
+    status, data, headers = result_response("r1.json", {"If-None-Match": f'"{etag}-gz"'})
+
+    assert (status, data) == (304, b"")
+    assert headers["ETag"] == f'"{etag}"'
+    assert "Content-Type" not in headers
+
+
+def test_small_results_are_not_compressed(results):
+    body = write_result(results, "r1.json", {"status": "success"})
+
+    status, data, headers = result_response("r1.json", {"Accept-Encoding": "gzip"})
+
+    assert data == body
+    assert "Content-Encoding" not in headers
+    assert not headers["ETag"].endswith('-gz"')
+
+
+def test_brotli_is_preferred_when_installed(results, monkeypatch):
+    monkeypatch.setattr(http_cache, "_brotli", types.SimpleNamespace(compress=lambda body, quality: b"br:" + body))
+    body = write_result(results, "r1.json", large_result())
+
+    status, data, headers = result_response("r1.json", {"Accept-Encoding": "gzip, br"})
+
+    assert data == b"br:" + body
+    assert headers["Content-Encoding"] == "br"
+    assert headers["ETag"].endswith('-br"')
+
+
+def test_provisional_result_must_revalidate(results):
+    body = write_result(results, "r1.json", {"status": "success", "provisional": True})
+
+    status, data, headers = result_response("r1.json", {})
+
+    assert data == body
+    assert headers["Cache-Control"] == REVALIDATE_CACHE_CONTROL
+
+    # 真实结果替换临时结果后 ETag 改变，旧 ETag 不再命中
+    old_etag = hashlib.sha256(body).hexdigest()
+    write_result(results, "r1.json", large_result())
+    status, _, headers = result_response("r1.json", {"If-None-Match": f'"{old_etag}"'})
+    assert status == 200
+    assert headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+
+
+def test_missing_result_returns_none(results):
+    assert result_response("missing.json", {}) is None
+
+
+def test_archived_result_is_served(results, monkeypatch):
+    body = json.dumps({"status": "success"}).encode()
+    monkeypatch.setattr(files, "read_archived_result", lambda filename: body if filename == "old.json" else None)
+
+    status, data, headers = result_response("old.json", {})
+
+    assert (status, data) == (200, body)
+    assert headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+
+
+def test_hot_cache_admits_on_second_access_and_evicts_lru():
+    cache = HotFileCache(max_bytes=10, max_entry_bytes=8)
+    loads = []
+
+    def loader(body):
+        return lambda: loads.append(body) or body
+
+    cache.get("a", loader(b"aaaa"))
+    cache.get("a", loader(b"aaaa"))
+    assert cache.stats()["entries"] == 1
+    cache.get("a", loader(b"aaaa"))
+    assert loads == [b"aaaa", b"aaaa"]
+    assert cache.stats()["hits"] == 1
+
+    # 超过单项上限的内容不缓存
+    cache.get("big", loader(b"x" * 9))
+    cache.get("big", loader(b"x" * 9))
+    assert cache.stats()["entries"] == 1
+
+    cache.get("b", loader(b"bbbbbb"))
+    cache.get("b", loader(b"bbbbbb"))
+    cache.get("c", loader(b"cccc"))
+    cache.get("c", loader(b"cccc"))
+    # 加入 c 后超出容量，最久未访问的 a 被淘汰
+    assert cache.stats()["bytes"] == 10
+    assert cache.stats()["entries"] == 2
+    loads.clear()
+    cache.get("b", loader(b"bbbbbb"))
+    cache.get("a", loader(b"aaaa"))
+    assert loads == [b"aaaa"]
+
+
+def test_upload_cache_headers():
+    name = "0123456789abcdef0123456789abcdef_leaf.jpg"
+
+    assert upload_cache_headers(name) == ("0123456789abcdef0123456789abcdef",
+                                          {"Cache-Control": IMMUTABLE_CACHE_CONTROL})
+    assert upload_cache_headers("20240101_leaf.jpg") == (None, {})
+
+
+def test_result_route_negotiates_over_http(results):
+    pytest.importorskip("flask")
+    import app as web
+
+    body = write_result(results, "r1.json", large_result())
+    client = web.app.test_client()
+
+    response = client.get("/results/r1.json", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert gzip.decompress(response.data) == body
+    etag = response.headers["ETag"]
+
+    response = client.get("/results/r1.json", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert client.get("/results/missing.json").status_code == 404
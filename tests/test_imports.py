@@ -0,0 +1,38 @@
+"""
+冷启动：入口模块只加载各自需要的依赖
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def loaded_modules(statement):
+    proc = subprocess.run(
+        [sys.executable, "-c", f"{statement}; import sys; print(' '.join(sys.modules))"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return set(proc.stdout.split())
+
+
+@pytest.mark.parametrize("module, forbidden", [
+    ("src.config", {"requests", "asyncio", "numpy"}),
+    ("src.detectors.mock_detector", {"requests", "asyncio", "numpy"}),
+    ("src.detectors.hybrid_detector", {"requests", "asyncio", "numpy", "sqlite3", "concurrent.futures"}),
+    ("src.detectors", {"requests", "asyncio"}),
+    ("src.storage", {"sqlite3", "requests"}),
+])
+def test_entry_points_defer_heavy_imports(module, forbidden):
+    assert not loaded_modules(f"import {module}") & forbidden
+
+
+def test_lazy_package_exports_resolve_on_access():
+    modules = loaded_modules("from src.storage import SQLiteStatsStore")
+
+    assert "sqlite3" in modules
+    assert "src.storage.stats_store" in modules
+    assert "src.storage.offline_queue" not in modules
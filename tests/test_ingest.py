@@ -0,0 +1,214 @@
+"""
+视频与帧流接入：自适应抽帧的关键帧判定、检查间隔调整与流水线统计
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("PIL")
+
+from PIL import Image  # noqa: E402
+
+from src.detectors.result import DetectionResult, DiseaseDetails  # noqa: E402
+from src.ingest import (AdaptiveSampler, Frame, FramePipeline, ImageSequenceSource, open_source,  # noqa: E402
+                        with_metadata)
+
+
+def make_sampler(**overrides):
+    options = {"novelty_threshold": 0.12, "scene_threshold": 0.35, "min_interval": 0.5,
+               "max_interval": 30, "max_stride": 8, "size": 16}
+    return AdaptiveSampler(**{**options, **overrides})
+
+
+def uniform(value, size=32):
+    return np.full((size, size, 3), value, dtype=np.uint8)
+
+
+def halves(flipped=False, size=32):
+    """左黑右白（flipped 时左白右黑）：两者灰度直方图相同、逐像素完全不同"""
+    image = np.zeros((size, size, 3), dtype=np.uint8)
+    if flipped:
+        image[:, :size // 2] = 255
+    else:
+        image[:, size // 2:] = 255
+    return image
+
+
+def frame(index, image, timestamp=None):
+    return Frame(index, float(index if timestamp is None else timestamp), image)
+
+
+def test_first_frame_is_kept():
+    decision = make_sampler().update(frame(0, uniform(100)))
+
+    assert decision.keep
+    assert decision.reason == "first"
+
+
+def test_static_frames_double_the_stride_up_to_the_limit():
+    sampler = make_sampler(max_stride=4)
+    sampler.update(frame(0, uniform(100)))
+    assert sampler.stride == 1
+
+    strides = []
+    for index in range(1, 5):
+        decision = sampler.update(frame(index, uniform(100)))
+        assert not decision.keep
+        strides.append(sampler.stride)
+
+    assert strides == [2, 4, 4, 4]
+
+    # 画面变化后恢复逐帧检查
+    sampler.update(frame(5, uniform(200)))
+    assert sampler.stride == 2
+
+
+def test_scene_change_and_novel_content():
+    sampler = make_sampler()
+    sampler.update(frame(0, uniform(100)))
+
+    scene = sampler.update(frame(1, uniform(200)))
+    assert scene.keep and scene.reason == "scene"
+
+    sampler = make_sampler()
+    sampler.update(frame(0, halves()))
+    # 直方图不变、内容变化：新内容而非场景切换
+    novel = sampler.update(frame(1, halves(flipped=True)))
+    assert novel.keep and novel.reason == "novel"
+    assert novel.scene == 0
+
+
+def test_changes_within_min_interval_are_not_kept():
+    sampler = make_sampler(min_interval=2)
+    sampler.update(frame(0, uniform(100)))
+
+    assert not sampler.update(frame(1, uniform(200))).keep
+    assert sampler.update(frame(2, uniform(200))).reason == "scene"
+
+
+def test_heartbeat_after_max_interval():
+    sampler = make_sampler(max_interval=10)
+    sampler.update(frame(0, uniform(100)))
+
+    assert not sampler.update(frame(1, uniform(100), timestamp=9)).keep
+    assert sampler.update(frame(2, uniform(100), timestamp=10)).reason == "heartbeat"
+
+    sampler = make_sampler(max_interval=0)
+    sampler.update(frame(0, uniform(100)))
+    assert not sampler.update(frame(1, uniform(100), timestamp=1000)).keep
+
+
+class FakeDetector:
+    def __init__(self):
+        self.paths = []
+
+    def detect(self, image_path, crop_type):
+        self.paths.append(image_path)
+        return DetectionResult("success", mode="mock", details=DiseaseDetails("健康", disease_id="healthy"))
+
+
+def write_images(directory, values):
+    os.makedirs(directory, exist_ok=True)
+    for index, value in enumerate(values):
+        Image.fromarray(uniform(value)).save(os.path.join(directory, f"{index:03d}.png"))
+    return str(directory)
+
+
+def test_static_sequence_reports_every_frame(tmp_path):
+    directory = write_images(tmp_path / "flight", [100] * 12)
+    detector = FakeDetector()
+    pipeline = FramePipeline(detector, sampler=make_sampler(), workers=2, frame_dir=str(tmp_path / "frames"))
+
+    detections = list(pipeline.run(open_source(directory)))
+    summary = pipeline.summary()
+
+    # 间隔拉大后最后一次跳过越过末尾：总帧数仍为序列长度
+    assert summary["frames"] == 12
+    assert summary["checked"] == 4
+    assert summary["keyframes"] == summary["keyframes_first"] == 1
+    assert summary["detected"] == 1
+    assert [item.frame_index for item in detections] == [0]
+    # 来自图片文件的帧直接送检原文件
+    assert detector.paths == [os.path.join(directory, "000.png")]
+    assert not os.path.exists(tmp_path / "frames")
+
+
+def test_changing_sequence_detects_keyframes_and_skips_unreadable(tmp_path):
+    directory = write_images(tmp_path / "flight", [20, 20, 120, 120, 220, 220])
+    # 第 1 帧静止，检查间隔变为 2：依次检查 0、1、3、5
+    with open(os.path.join(directory, "003.png"), "wb") as f:
+        f.write(b"not an image")
+    pipeline = FramePipeline(FakeDetector(), sampler=make_sampler(), workers=1)
+
+    detections = list(pipeline.run(ImageSequenceSource(directory)))
+    summary = pipeline.summary()
+
+    assert summary["frames"] == 6
+    assert summary["checked"] == 4
+    assert summary["unreadable"] == 1
+    assert sorted((item.frame_index, item.reason) for item in detections) == [(0, "first"), (5, "scene")]
+    assert all(item.result["status"] == "success" for item in detections)
+    assert summary["elapsed_ms"] >= 0
+
+
+def test_flight_keyframes_carry_photo_metadata(tmp_path):
+    directory = tmp_path / "flight"
+    directory.mkdir()
+    for index, value in enumerate([20, 220]):
+        exif = Image.Exif()
+        exif[0x010F] = "DJI"
+        exif[0x0132] = f"2026:06:18 10:30:0{index}"
+        Image.fromarray(uniform(value)).save(directory / f"{index:03d}.jpg", exif=exif)
+    pipeline = FramePipeline(FakeDetector(), sampler=make_sampler(min_interval=0), workers=2)
+
+    detections = with_metadata(pipeline.run(ImageSequenceSource(str(directory))))
+
+    detections.sort(key=lambda item: item["frame_index"])
+    assert [item["frame_index"] for item in detections] == [0, 1]
+    assert [item["metadata"]["make"] for item in detections] == ["DJI", "DJI"]
+    assert detections[1]["metadata"]["captured_at"] - detections[0]["metadata"]["captured_at"] == 1
+    assert detections[0]["result"]["status"] == "success"
+
+
+class ArraySource:
+    """内存中的视频帧源"""
+
+    name = "clip"
+
+    def __init__(self, images):
+        self.images = images
+        self.position = 0
+        self.closed = False
+
+    def read(self, skip=0):
+        self.position = min(self.position + skip, len(self.images))
+        if self.position >= len(self.images):
+            return None
+        result = frame(self.position, self.images[self.position])
+        self.position += 1
+        return result
+
+    def close(self):
+        self.closed = True
+
+
+def test_decoded_keyframes_are_saved_and_early_stop_closes_the_source(tmp_path):
+    source = ArraySource([uniform(20), uniform(220)] * 20)
+    detector = FakeDetector()
+    pipeline = FramePipeline(detector, sampler=make_sampler(), workers=1, queue_size=1,
+                             frame_dir=str(tmp_path / "frames"))
+
+    iterator = pipeline.run(source)
+    first = next(iterator)
+    iterator.close()
+
+    assert first.image_path == os.path.join(str(tmp_path / "frames"), f"clip_{first.frame_index:07d}.jpg")
+    with Image.open(first.image_path) as image:
+        assert image.format == "JPEG"
+    assert source.closed
+    # 解码保存的帧没有元数据
+    assert with_metadata([first])[0]["metadata"] == {}
+    # 提前停止：未读完帧源
+    assert pipeline.summary()["frames"] < 40
@@ -0,0 +1,108 @@
+"""
+生产服务模式：跨进程共享的统计计数与优雅退出
+"""
+
+import importlib.util
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+from src.server.lifecycle import InFlightTracker
+from src.storage.stats_store import SQLiteStatsStore
+
+
+def _worker_increments(db_path, count):
+    store = SQLiteStatsStore(db_path)
+    for _ in range(count):
+        store.increment({"total_calls": 1, "response_time_ms": 0.5})
+
+
+def test_counters_aggregate_across_processes(tmp_path):
+    db_path = str(tmp_path / "stats.db")
+    SQLiteStatsStore(db_path)
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_worker_increments, args=(db_path, 50)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+
+    totals = SQLiteStatsStore(db_path).totals()
+
+    assert totals["total_calls"] == 150
+    assert totals["response_time_ms"] == 75
+
+
+def test_increments_are_bucketed_by_minute(tmp_path):
+    store = SQLiteStatsStore(str(tmp_path / "stats.db"))
+    store.increment({"api_calls": 2}, ts=600)
+    store.increment({"api_calls": 3}, ts=659)
+    store.increment({"api_calls": 1}, ts=660)
+
+    series = store.series(["api_calls"], "minute", since=0, until=3600)
+
+    assert series["api_calls"] == [[600, 5], [660, 1]]
+    assert store.series(["api_calls"], "hour", since=0, until=3600)["api_calls"] == [[0, 6]]
+    with pytest.raises(ValueError):
+        store.series(["api_calls"], "day")
+
+
+def test_drain_waits_for_in_flight_requests():
+    tracker = InFlightTracker()
+    release = threading.Event()
+
+    def request():
+        with tracker:
+            release.wait(5)
+
+    thread = threading.Thread(target=request)
+    thread.start()
+    while tracker.count == 0:
+        time.sleep(0.001)
+
+    assert tracker.drain(0.05) is False
+    assert tracker.draining is True
+
+    release.set()
+    assert tracker.drain(5) is True
+    assert tracker.count == 0
+    thread.join()
+
+
+def test_start_draining_rejects_detections_before_worker_exit(monkeypatch):
+    pytest.importorskip("flask")
+    import app as web
+
+    tracker = InFlightTracker()
+    monkeypatch.setattr(web, "inflight", tracker)
+    tracker.start_draining()
+
+    response = web.app.test_client().post("/api/detect")
+
+    assert response.status_code == 503
+    assert "重启" in response.get_json()["message"]
+    # 只设置标志，不等待
+    assert tracker.count == 0
+
+
+def test_sigterm_enters_draining_then_runs_gunicorn_handler():
+    spec = importlib.util.spec_from_file_location(
+        "gunicorn_conf", os.path.join(os.path.dirname(os.path.dirname(__file__)), "gunicorn.conf.py")
+    )
+    conf = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(conf)
+    tracker = InFlightTracker()
+    handled = []
+    original = signal.signal(signal.SIGTERM, lambda signum, frame: handled.append(tracker.draining))
+    try:
+        conf._drain_on_sigterm(tracker)
+        signal.getsignal(signal.SIGTERM)(signal.SIGTERM, None)
+    finally:
+        signal.signal(signal.SIGTERM, original)
+
+    assert handled == [True]
@@ -0,0 +1,163 @@
+"""
+图片元数据：只读文件头的 EXIF/XMP 解析与表单位置补全
+"""
+
+import struct
+from datetime import datetime, timezone
+
+import pytest
+
+from src.utils.metadata import extract_batch, extract_metadata, merge_location_hints
+
+
+def ifd(order, entries, offset):
+    """构造 IFD，entries 为 (tag, type, count, bytes)，超过4字节的值放在条目之后"""
+    body = struct.pack(order + "H", len(entries))
+    extra = b""
+    extra_offset = offset + 2 + len(entries) * 12 + 4
+    for tag, kind, count, value in entries:
+        if len(value) <= 4:
+            body += struct.pack(order + "HHI", tag, kind, count) + value.ljust(4, b"\x00")
+        else:
+            body += struct.pack(order + "HHII", tag, kind, count, extra_offset + len(extra))
+            extra += value
+    return body + b"\x00\x00\x00\x00" + extra
+
+
+def rational(order, *values):
+    return b"".join(struct.pack(order + "II", round(v * 10000), 10000) for v in values)
+
+
+def tiff(order=">", lat_ref=b"N", lon_ref=b"E"):
+    gps_offset = 200
+    ifd0 = ifd(order, [
+        (0x010F, 2, 4, b"DJI\x00"),
+        (0x0132, 2, 20, b"2026:06:18 10:30:00\x00"),
+        (0x8825, 4, 1, struct.pack(order + "I", gps_offset)),
+    ], 8)
+    gps = ifd(order, [
+        (1, 2, 2, lat_ref + b"\x00"),
+        (2, 5, 3, rational(order, 30, 15, 36)),
+        (3, 2, 2, lon_ref + b"\x00"),
+        (4, 5, 3, rational(order, 120, 9, 0)),
+        (6, 5, 1, rational(order, 86.4)),
+    ], gps_offset)
+    head = (b"MM\x00\x2a" if order == ">" else b"II\x2a\x00") + struct.pack(order + "I", 8)
+    return (head + ifd0).ljust(gps_offset, b"\x00") + gps
+
+
+XMP = (b"http://ns.adobe.com/xap/1.0/\x00<x:xmpmeta><rdf:Description "
+       b'drone-dji:RelativeAltitude="+30.20" drone-dji:GimbalPitchDegree="-90.00">'
+       b"<drone-dji:FlightYawDegree>+11.80</drone-dji:FlightYawDegree></rdf:Description></x:xmpmeta>")
+
+
+def segment(marker, payload):
+    return b"\xff" + bytes([marker]) + struct.pack(">H", len(payload) + 2) + payload
+
+
+def jpeg(order=">", **kwargs):
+    return (b"\xff\xd8" + segment(0xE1, b"Exif\x00\x00" + tiff(order, **kwargs)) + segment(0xE1, XMP)
+            + segment(0xDB, b"\x00" * 64) + segment(0xDA, b"\x00" * 10) + b"\x00" * 4096 + b"\xff\xd9")
+
+
+def png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + b"\x00\x00\x00\x00"
+
+
+@pytest.mark.parametrize("order", [">", "<"])
+def test_reads_exif_gps_time_and_xmp_from_jpeg(tmp_path, order):
+    path = tmp_path / "dji.jpg"
+    path.write_bytes(jpeg(order))
+
+    metadata = extract_metadata(str(path))
+
+    assert metadata["make"] == "DJI"
+    assert metadata["lat"] == pytest.approx(30.26)
+    assert metadata["lon"] == pytest.approx(120.15)
+    assert metadata["altitude"] == pytest.approx(86.4)
+    assert metadata["captured_at"] == datetime(2026, 6, 18, 10, 30).timestamp()
+    assert metadata["relative_altitude"] == pytest.approx(30.2)
+    assert metadata["gimbal_pitch"] == -90.0
+    assert metadata["flight_yaw"] == pytest.approx(11.8)
+
+
+def test_southern_and_western_hemispheres_are_negative(tmp_path):
+    path = tmp_path / "sw.jpg"
+    path.write_bytes(jpeg(lat_ref=b"S", lon_ref=b"W"))
+
+    metadata = extract_metadata(str(path))
+
+    assert metadata["lat"] < 0 and metadata["lon"] < 0
+
+
+def test_reads_png_exif_chunk(tmp_path):
+    path = tmp_path / "frame.png"
+    path.write_bytes(b"\x89PNG\r\n\x1a\n" + png_chunk(b"IHDR", b"\x00" * 13)
+                     + png_chunk(b"eXIf", tiff("<")) + png_chunk(b"IDAT", b"\x00" * 64))
+
+    assert extract_metadata(str(path))["lat"] == pytest.approx(30.26)
+
+
+@pytest.mark.parametrize("content", [b"", b"GIF89a......", jpeg()[:60], b"\xff\xd8\xff\xe1\x00\x40Exif\x00\x00MM"])
+def test_unknown_or_corrupt_files_give_empty_metadata(tmp_path, content):
+    path = tmp_path / "bad.jpg"
+    path.write_bytes(content)
+    assert extract_metadata(str(path)) == {}
+
+
+def exif_times(original, offset=None):
+    """IFD0 只有 Exif 子IFD 指针，子IFD 写入原始拍摄时间与（可选的）时区偏移"""
+    entries = [(0x9003, 2, 20, original.encode() + b"\x00")]
+    if offset is not None:
+        entries.append((0x9011, 2, 7, offset.encode() + b"\x00"))
+    ifd0 = ifd(">", [(0x8769, 4, 1, struct.pack(">I", 100))], 8)
+    return (b"MM\x00\x2a" + struct.pack(">I", 8) + ifd0).ljust(100, b"\x00") + ifd(">", entries, 100)
+
+
+@pytest.mark.parametrize("offset, expected", [
+    ("+08:00", datetime(2026, 6, 18, 2, 30, tzinfo=timezone.utc).timestamp()),
+    ("-05:00", datetime(2026, 6, 18, 15, 30, tzinfo=timezone.utc).timestamp()),
+    # 无偏移或偏移无效：按服务器本地时区
+    (None, datetime(2026, 6, 18, 10, 30).timestamp()),
+    ("  :  ", datetime(2026, 6, 18, 10, 30).timestamp()),
+])
+def test_capture_time_uses_exif_utc_offset(tmp_path, offset, expected):
+    path = tmp_path / "offset.jpg"
+    path.write_bytes(b"\xff\xd8" + segment(0xE1, b"Exif\x00\x00" + exif_times("2026:06:18 10:30:00", offset))
+                     + segment(0xDA, b"\x00" * 10))
+
+    metadata = extract_metadata(str(path))
+
+    assert metadata["datetime"] == "2026:06:18 10:30:00"
+    assert metadata["captured_at"] == expected
+    assert "offset_time_original" not in metadata
+
+
+def test_batch_extraction_maps_each_path(tmp_path):
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"{i}.jpg"
+        path.write_bytes(jpeg())
+        paths.append(str(path))
+
+    results = extract_batch(paths + [str(tmp_path / "missing.jpg")], max_workers=3)
+
+    assert all(results[path]["make"] == "DJI" for path in paths)
+    assert results[str(tmp_path / "missing.jpg")] == {}
+
+
+def test_form_values_take_precedence_over_metadata():
+    metadata = {"lat": 30.26, "lon": 120.15, "captured_at": 1781750000.0}
+
+    assert merge_location_hints({}, metadata) == {"lat": "30.26", "lon": "120.15", "captured_at": "1781750000.0"}
+    explicit = merge_location_hints({"lat": "31", "lon": "121", "captured_at": "5"}, metadata)
+    assert explicit == {"lat": "31", "lon": "121", "captured_at": "5"}
+
+
+@pytest.mark.parametrize("metadata", [
+    {"lat": float("nan"), "lon": 120.15, "captured_at": -1.0},
+    {"lat": 95.0, "lon": 120.15, "captured_at": float("inf")},
+    {"lat": 30.26, "lon": 400.0, "captured_at": 5e12},
+])
+def test_invalid_metadata_hints_are_dropped(metadata):
+    assert merge_location_hints({"field_id": "F1"}, metadata) == {"field_id": "F1"}
@@ -0,0 +1,237 @@
+"""
+离线存储转发队列：分组提交、租约领取、退避重试、结果回填与上传保留
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from src.alerts import AlertEngine
+from src.config import Config
+from src.detectors.result import DetectionResult, DiseaseDetails
+from src.server import alert_api, field_api, files, offline, responses
+from src.storage.field_archive import FieldArchive
+from src.storage.offline_queue import OfflineQueue, OfflineSyncWorker
+from src.storage.retention import RetentionManager
+from src.storage.sharding import ShardedDirectory
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return OfflineQueue(str(tmp_path / "queue.db"))
+
+
+def test_concurrent_enqueue_returns_distinct_ids(queue):
+    ids = []
+    lock = threading.Lock()
+
+    def enqueue(i):
+        queue_id = queue.enqueue(f"/uploads/{i}.jpg", "水稻")
+        with lock:
+            ids.append(queue_id)
+
+    threads = [threading.Thread(target=enqueue, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(ids) == list(range(1, 21))
+    assert queue.counts() == {OfflineQueue.PENDING: 20}
+
+
+def test_claim_leases_items_until_expiry(queue):
+    queue.enqueue("/uploads/a.jpg", "水稻")
+    queue.enqueue("/uploads/b.jpg", "小麦")
+
+    first = queue.claim(10, lease=60)
+    assert [item["image_path"] for item in first] == ["/uploads/a.jpg", "/uploads/b.jpg"]
+    assert queue.claim(10, lease=60) == []
+    # 租约过期后可被重新领取
+    assert len(queue.claim(10, lease=-1)) == 2
+
+
+def test_fail_backs_off_then_gives_up(queue, monkeypatch):
+    monkeypatch.setattr(Config, "OFFLINE_MAX_ATTEMPTS", 2)
+    item_id = queue.enqueue("/uploads/a.jpg", "水稻")
+    queue.claim(1)
+
+    queue.fail(item_id, 0, "timeout")
+    assert queue.counts() == {OfflineQueue.PENDING: 1}
+    assert queue.claim(1) == []  # 尚未到下次重试时间
+
+    queue.fail(item_id, 1, "timeout")
+    assert queue.counts() == {OfflineQueue.FAILED: 1}
+
+
+def test_attach_after_sync_returns_real_result(queue):
+    item_id = queue.enqueue("/uploads/a.jpg", "水稻")
+    assert queue.complete(item_id, {"status": "success", "mode": "qwen"}) is None
+
+    synced = queue.attach_result(item_id, "result_1.json")
+
+    assert synced == {"status": "success", "mode": "qwen"}
+
+
+def test_attach_stores_hints_returned_on_complete(queue):
+    item_id = queue.enqueue("/uploads/a.jpg", "水稻")
+    queue.attach_result(item_id, "result_1.json", {"field_id": "F1", "lat": "30.1"})
+
+    assert queue.complete(item_id, {"status": "success"}) == {
+        "result_file": "result_1.json", "hints": {"field_id": "F1", "lat": "30.1"}
+    }
+
+
+def test_old_queue_schema_gains_hints_column(tmp_path):
+    path = str(tmp_path / "queue.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE queue (id INTEGER PRIMARY KEY AUTOINCREMENT, image_path TEXT NOT NULL, "
+            "crop_type TEXT NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "next_attempt_at REAL NOT NULL, claimed_at REAL, created_at REAL NOT NULL, result_file TEXT, "
+            "result_json TEXT, last_error TEXT)"
+        )
+
+    queue = OfflineQueue(path)
+    item_id = queue.enqueue("/uploads/a.jpg", "水稻")
+    queue.attach_result(item_id, "result_1.json", {"field_id": "F1"})
+    assert queue.complete(item_id, {"status": "success"})["hints"] == {"field_id": "F1"}
+
+
+class FlakyDetector:
+    def __init__(self, online):
+        self.online = online
+
+    def detect(self, image_path, crop_type):
+        if not self.online:
+            return DetectionResult.failure("qwen", "请求超时", retryable=True)
+        return DetectionResult("success", mode="qwen", result="病害识别：健康")
+
+
+def test_sync_worker_backs_off_offline_and_reconciles_online(queue, tmp_path):
+    image = tmp_path / "a.jpg"
+    image.write_bytes(b"\xff\xd8")
+    item_id = queue.enqueue(str(image), "水稻")
+    queue.attach_result(item_id, "result_1.json")
+    reconciled = []
+    worker = OfflineSyncWorker(queue, FlakyDetector(online=False),
+                               on_result=lambda item, result: reconciled.append((item, result)))
+
+    with ThreadPoolExecutor(2) as pool:
+        assert worker.drain_once(pool) == 1
+        assert queue.is_offline()
+        assert worker.stats["retried"] == 1
+
+        worker.detector.online = True
+        with queue._connection() as conn:
+            conn.execute("UPDATE queue SET next_attempt_at = 0")
+        assert worker.drain_once(pool) == 1
+
+    assert not queue.is_offline()
+    assert reconciled[0][0]["result_file"] == "result_1.json"
+    assert reconciled[0][1]["synced_from_queue"] == item_id
+    assert queue.counts() == {OfflineQueue.DONE: 1}
+
+
+def test_retention_keeps_uploads_waiting_for_sync(queue, tmp_path):
+    manager = RetentionManager(
+        upload_dir=str(tmp_path / "uploads"), results_dir=str(tmp_path / "results"),
+        archive_dir=str(tmp_path / "archive"), index_path=str(tmp_path / "retention.db"),
+        offline_queue=queue
+    )
+    manager.upload_max_age = 0
+    old = time.time() - 86400
+    paths = []
+    for name in ("queued.jpg", "synced.jpg", "plain.jpg"):
+        path = manager.uploads.path_for(name, create=True)
+        with open(path, "wb") as f:
+            f.write(b"x")
+        os.utime(path, (old, old))
+        paths.append(path)
+    queue.enqueue(paths[0], "水稻")
+    synced_id = queue.enqueue(paths[1], "水稻")
+    queue.complete(synced_id, {"status": "success"})
+
+    assert manager._expire_uploads(time.time()) == 2
+    assert [os.path.exists(path) for path in paths] == [True, False, False]
+
+
+class SyncedDetector:
+    def detect(self, image_path, crop_type):
+        return DetectionResult("success", mode="qwen", result="病害识别：稻瘟病",
+                               details=DiseaseDetails("稻瘟病", disease_id="rice_blast", severity="严重",
+                                                      confidence=0.9))
+
+
+@pytest.fixture
+def server(queue, tmp_path, monkeypatch):
+    """结果目录、田块档案与预警引擎指向临时目录"""
+    monkeypatch.setattr(files, "results", ShardedDirectory(str(tmp_path / "results")))
+    monkeypatch.setattr(Config, "FIELD_ARCHIVE_ENABLED", True)
+    monkeypatch.setattr(Config, "ALERTS_ENABLED", True)
+    archive = FieldArchive(str(tmp_path / "field_archive.db"))
+    monkeypatch.setattr(field_api, "_archive", archive)
+    engine = AlertEngine([])
+    monkeypatch.setattr(alert_api, "_engine", engine)
+    image = tmp_path / "leaf.jpg"
+    image.write_bytes(b"\xff\xd8")
+
+    def upload():
+        """模拟离线时的上传：入队、保存临时结果并关联表单提示"""
+        queue_id = queue.enqueue(str(image), "水稻")
+        provisional = {"status": "success", "mode": "mock", "provisional": True, "queue_id": queue_id,
+                       "details": {"disease": "纹枯病"}, "image": {"file": "leaf.jpg"}}
+        result_file = responses.save_result(provisional)
+        form = {"field_id": "F1", "flight_id": "FL-1", "lat": "30.01", "lon": "120.0",
+                "captured_at": "1780000000", "crop_type": "水稻"}
+        # 临时结果不写入档案
+        assert field_api.record_detection(provisional, form, "水稻", result_file) is None
+        offline.attach_provisional(SimpleNamespace(offline_queue=queue), provisional, result_file, form, "水稻")
+        return result_file
+
+    return SimpleNamespace(archive=archive, engine=engine, upload=upload)
+
+
+def assert_archived(server, result_file):
+    [frame] = server.archive.get_frames("F1")
+    assert frame["result_file"] == result_file
+    assert frame["flight_id"] == "FL-1"
+    assert frame["ts"] == 1780000000
+    assert frame["disease"] == "稻瘟病"
+    assert server.engine.metrics()["evaluations"] == 1
+    with open(files.results.locate(result_file), encoding="utf-8") as f:
+        saved = json.load(f)
+    assert saved["mode"] == "qwen"
+    assert saved["image"] == {"file": "leaf.jpg"}
+    assert saved["replaced_provisional"] is True
+
+
+def test_synced_offline_frame_reaches_field_archive_and_alerts(queue, server):
+    result_file = server.upload()
+    worker = OfflineSyncWorker(queue, SyncedDetector(), on_result=offline._reconcile)
+
+    with ThreadPoolExecutor(1) as pool:
+        assert worker.drain_once(pool) == 1
+
+    assert_archived(server, result_file)
+
+
+def test_frame_synced_before_attach_is_archived_on_attach(queue, server, monkeypatch):
+    # 同步先于结果文件关联完成：由 attach_provisional 回填并归档
+    attach = queue.attach_result
+
+    def sync_then_attach(item_id, result_file, hints=None):
+        worker = OfflineSyncWorker(queue, SyncedDetector(), on_result=offline._reconcile)
+        with ThreadPoolExecutor(1) as pool:
+            assert worker.drain_once(pool) == 1
+        return attach(item_id, result_file, hints)
+
+    monkeypatch.setattr(queue, "attach_result", sync_then_attach)
+
+    assert_archived(server, server.upload())
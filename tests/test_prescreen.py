@@ -0,0 +1,108 @@
+"""
+本地预筛：健康置信度评分与混合检测器的跳过/复核逻辑
+"""
+
+import pytest
+
+from src.config import Config
+from src.detectors.hybrid_detector import HybridDiseaseDetector
+from src.detectors.result import DetectionResult, DiseaseDetails
+
+
+class FakeQwen:
+    """记录调用次数的真实API检测器替身"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def detect(self, image_path, crop_type):
+        self.calls += 1
+        return DetectionResult("success", mode="qwen", result="病害识别：稻瘟病",
+                               details=DiseaseDetails(disease="稻瘟病", disease_id="rice_blast"))
+
+
+class FakePreScreen:
+    HEALTHY = "健康"
+    NEEDS_MODEL = "needs_model"
+
+    def __init__(self, label):
+        self.label = label
+
+    def classify(self, image_path):
+        return {"label": self.label, "confidence": 0.93, "features": {}}
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "frame.jpg"
+    path.write_bytes(b"\xff\xd8fake-jpeg")
+    return str(path)
+
+
+def make_detector(label):
+    detector = HybridDiseaseDetector(api_key="sk-test", prescreen=FakePreScreen(label))
+    detector.qwen_detector = FakeQwen()
+    return detector
+
+
+def test_healthy_frame_skips_api(image, monkeypatch):
+    monkeypatch.setattr(Config, "PRESCREEN_AUDIT_RATE", 0.0)
+    detector = make_detector(FakePreScreen.HEALTHY)
+
+    result = detector.detect(image)
+
+    assert detector.qwen_detector.calls == 0
+    assert result["mode"] == "prescreen"
+    assert result["details"]["disease_id"] == "healthy"
+    assert result["details"]["confidence"] == 0.93
+    assert "prescreen_ms" in result["timings"]
+    assert detector.stats["prescreen_skipped"] == 1
+
+
+def test_audited_healthy_frame_still_calls_api(image, monkeypatch):
+    monkeypatch.setattr(Config, "PRESCREEN_AUDIT_RATE", 1.0)
+    detector = make_detector(FakePreScreen.HEALTHY)
+
+    result = detector.detect(image)
+
+    assert detector.qwen_detector.calls == 1
+    assert result["mode"] == "qwen"
+    assert detector.stats["prescreen_audited"] == 1
+    # 预筛说健康而模型判为病害，计入分歧
+    assert detector.stats["prescreen_disagreements"] == 1
+
+
+def test_uncertain_frame_goes_to_model(image):
+    detector = make_detector(FakePreScreen.NEEDS_MODEL)
+
+    result = detector.detect(image)
+
+    assert detector.qwen_detector.calls == 1
+    assert result["prescreen"]["label"] == FakePreScreen.NEEDS_MODEL
+    assert detector.stats["prescreen_skipped"] == 0
+
+
+def test_score_weights_green_lesion_and_texture():
+    pytest.importorskip("numpy")
+    from src.detectors.prescreen import PreScreenClassifier
+
+    classifier = PreScreenClassifier(min_green_ratio=0.6, max_lesion_ratio=0.03, max_texture=25.0)
+    canopy = {"green_ratio": 0.9, "lesion_ratio": 0.0, "texture": 0.0}
+    spotted = {"green_ratio": 0.9, "lesion_ratio": 0.06, "texture": 30.0}
+
+    assert classifier.score(canopy) == pytest.approx(1.0)
+    assert classifier.score(spotted) == pytest.approx(0.5)
+
+
+def test_undecodable_image_needs_model(tmp_path):
+    pytest.importorskip("numpy")
+    pytest.importorskip("PIL")
+    from src.detectors.prescreen import PreScreenClassifier
+
+    path = tmp_path / "broken.jpg"
+    path.write_bytes(b"not an image")
+
+    screen = PreScreenClassifier().classify(str(path))
+
+    assert screen["label"] == PreScreenClassifier.NEEDS_MODEL
+    assert "error" in screen
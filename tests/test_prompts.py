@@ -0,0 +1,40 @@
+"""
+提示词模板：稳定前缀、按作物缓存与 token 用量统计
+"""
+
+import json
+
+from src.detectors import prompts
+from src.detectors.qwen_detector import QwenDiseaseDetector
+
+
+def test_system_prefix_is_identical_across_crops():
+    rice = prompts.build_messages("水稻", "data:image/jpeg;base64,AAA")
+    wheat = prompts.build_messages("小麦", "data:image/jpeg;base64,BBB")
+
+    assert json.dumps(rice[0], ensure_ascii=False) == json.dumps(wheat[0], ensure_ascii=False)
+    assert rice[0]["role"] == "system"
+    # 可变部分（图片、作物）都在系统消息之后
+    assert rice[1]["content"][0]["image_url"]["url"].endswith("AAA")
+    assert "水稻" in rice[1]["content"][1]["text"]
+    assert "水稻" not in rice[0]["content"][0]["text"]
+
+
+def test_crop_prompts_are_cached():
+    assert prompts.get_crop_prompt("水稻") is prompts.get_crop_prompt("水稻")
+    assert prompts.get_full_prompt("玉米").startswith(prompts.SYSTEM_PROMPT)
+
+
+def test_usage_records_cached_prompt_tokens():
+    detector = QwenDiseaseDetector("sk-test")
+
+    summary = detector._record_usage({
+        "prompt_tokens": 900, "completion_tokens": 60,
+        "prompt_tokens_details": {"cached_tokens": 768}
+    })
+    detector._record_usage({"prompt_tokens": 900, "completion_tokens": 40})
+
+    assert summary == {"prompt_version": prompts.PROMPT_VERSION, "prompt_tokens": 900,
+                       "cached_tokens": 768, "completion_tokens": 60}
+    assert detector.usage_stats == {"requests": 2, "prompt_tokens": 1800,
+                                    "cached_tokens": 768, "completion_tokens": 100}
@@ -0,0 +1,86 @@
+"""
+图像质量门控：模糊、过暗、过曝判定与检测器中的提前拒绝
+"""
+
+import pytest
+
+from src.detectors.hybrid_detector import HybridDiseaseDetector
+
+
+class FakeQwen:
+    def __init__(self):
+        self.calls = 0
+
+    def detect(self, image_path, crop_type):
+        self.calls += 1
+        raise AssertionError("质量不合格的帧不应调用API")
+
+
+class FakeGate:
+    def __init__(self, passed):
+        self.passed = passed
+
+    def assess(self, image_path):
+        if self.passed:
+            return {"passed": True, "scores": {"sharpness": 300.0}}
+        return {"passed": False, "reason": "blurry", "message": "图像模糊（运动模糊或失焦）",
+                "scores": {"sharpness": 3.0}}
+
+
+def test_rejected_frame_skips_api(tmp_path):
+    image = tmp_path / "blur.jpg"
+    image.write_bytes(b"\xff\xd8blurry")
+    detector = HybridDiseaseDetector(api_key="sk-test", quality_gate=FakeGate(passed=False))
+    detector.qwen_detector = FakeQwen()
+
+    result = detector.detect(str(image))
+
+    assert result["status"] == "rejected"
+    assert result["reason"] == "blurry"
+    assert "quality_gate_ms" in result["timings"]
+    assert detector.qwen_detector.calls == 0
+    assert detector.stats["quality_rejected"] == 1
+
+
+@pytest.fixture
+def gate():
+    pytest.importorskip("numpy")
+    pytest.importorskip("PIL")
+    from src.detectors.quality import QualityGate
+    return QualityGate(min_sharpness=50.0, max_dark_ratio=0.4, max_bright_ratio=0.25, size=128)
+
+
+def save(tmp_path, name, pixels):
+    from PIL import Image
+
+    path = tmp_path / name
+    Image.fromarray(pixels).save(path)
+    return str(path)
+
+
+def test_assess_classifies_frames(tmp_path, gate):
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    textured = rng.integers(40, 220, size=(128, 128), dtype=np.uint8)
+    frames = {
+        "sharp.png": (textured, None),
+        "flat.png": (np.full((128, 128), 120, np.uint8), gate.BLURRY),
+        "dark.png": (np.full((128, 128), 3, np.uint8), gate.UNDEREXPOSED),
+        "bright.png": (np.full((128, 128), 252, np.uint8), gate.OVEREXPOSED),
+    }
+
+    for name, (pixels, reason) in frames.items():
+        assessment = gate.assess(save(tmp_path, name, pixels))
+        assert assessment["passed"] is (reason is None), name
+        assert assessment.get("reason") == reason
+
+
+def test_undecodable_image_is_passed_through(tmp_path, gate):
+    path = tmp_path / "broken.jpg"
+    path.write_bytes(b"not an image")
+
+    assessment = gate.assess(str(path))
+
+    assert assessment["passed"] is True
+    assert "error" in assessment
@@ -0,0 +1,226 @@
+"""
+响应录制与回放：压缩档案、按录制顺序回放、超时回放与不完整档案修复
+"""
+
+import os
+import shutil
+
+import pytest
+
+from src.config import Config
+from src.detectors import replay
+from src.detectors.qwen_detector import QwenDiseaseDetector
+from src.detectors.replay import (
+    ResponseRecorder, ResponseReplayer, archive_files, process_archive_path, read_archive, read_archives
+)
+
+PAYLOAD = {"model": "qwen-vl-plus", "messages": [{"role": "user", "content": "叶片"}]}
+OTHER = {"model": "qwen-vl-max", "messages": [{"role": "user", "content": "叶片"}]}
+
+
+def answer(text):
+    return 200, {"choices": [{"message": {"content": text}}], "usage": {"prompt_tokens": 10}}, "", 0.5
+
+
+def sender(*responses):
+    """按顺序返回预设响应的 send；TimeoutError 实例表示超时"""
+    responses = list(responses)
+
+    def send(payload):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+    return send
+
+
+def record(path, payload, *responses):
+    recorder = ResponseRecorder(path)
+    send = sender(*responses)
+    for _ in responses:
+        try:
+            recorder(payload, send)
+        except TimeoutError:
+            pass
+    return recorder
+
+
+def test_replays_in_recorded_order_then_cycles(tmp_path):
+    path = str(tmp_path / "qwen.jsonl.gz")
+    record(path, PAYLOAD, (429, None, "限流", 0.1), answer("病害识别：稻瘟病")).close()
+
+    replayer = ResponseReplayer(path, time_scale=0)
+
+    assert len(replayer) == 2
+    assert replayer(PAYLOAD, None)[:3] == (429, None, "限流")
+    status, body, text, elapsed = replayer(PAYLOAD, None)
+    assert status == 200
+    assert body["choices"][0]["message"]["content"] == "病害识别：稻瘟病"
+    assert elapsed == 0
+    # 用完后循环
+    assert replayer(PAYLOAD, None)[0] == 429
+    # 每次返回独立的响应对象
+    assert replayer(PAYLOAD, None)[1] is not body
+
+
+def test_unknown_request_returns_404(tmp_path):
+    path = str(tmp_path / "qwen.jsonl.gz")
+    record(path, PAYLOAD, answer("病害识别：健康")).close()
+    replayer = ResponseReplayer(path, time_scale=0)
+
+    status, body, _, _ = replayer(OTHER, None)
+
+    assert (status, body) == (404, None)
+    assert (replayer.hits, replayer.misses) == (0, 1)
+
+
+def test_recorded_timeout_is_replayed_as_timeout(tmp_path):
+    path = str(tmp_path / "qwen.jsonl.gz")
+    recorder = ResponseRecorder(path)
+    with pytest.raises(TimeoutError):
+        recorder(PAYLOAD, sender(TimeoutError()))
+    recorder.close()
+
+    [entry] = read_archive(path)
+    assert entry["status"] == replay.TIMEOUT_STATUS
+
+    with pytest.raises(TimeoutError):
+        ResponseReplayer(path, time_scale=0)(PAYLOAD, None)
+
+
+def test_sessions_append_gzip_members(tmp_path):
+    path = str(tmp_path / "qwen.jsonl.gz")
+    record(path, PAYLOAD, answer("第一次")).close()
+    record(path, OTHER, answer("第二次")).close()
+
+    records = list(read_archive(path))
+
+    assert [r["model"] for r in records] == ["qwen-vl-plus", "qwen-vl-max"]
+    assert records[0]["text"] == ""
+    assert len(ResponseReplayer(path, time_scale=0)) == 2
+
+
+def test_archive_of_killed_recorder_is_readable_and_repaired(tmp_path):
+    path = str(tmp_path / "qwen.jsonl.gz")
+    killed = str(tmp_path / "killed.jsonl.gz")
+    record(path, PAYLOAD, answer("已完成")).close()
+    recorder = record(path, OTHER, answer("同步刷新"))
+    # 进程被杀：档案停在同步刷新点，没有 gzip 结尾
+    shutil.copy(path, killed)
+    recorder.close()
+    assert [r["model"] for r in read_archive(killed)] == ["qwen-vl-plus", "qwen-vl-max"]
+
+    # 被杀时正在写入的数据损坏，损坏之前的记录仍可读出
+    with open(killed, "ab") as f:
+        f.write(b"\x1f\x8b\x08 torn write")
+    assert [r["model"] for r in read_archive(killed)] == ["qwen-vl-plus", "qwen-vl-max"]
+
+    # 再次录制前先修复，之后追加的记录可以读出
+    record(killed, PAYLOAD, answer("新的录制")).close()
+    assert [r["model"] for r in read_archive(killed)] == ["qwen-vl-plus", "qwen-vl-max", "qwen-vl-plus"]
+    assert not os.path.exists(killed + ".tmp")
+
+
+def contents(path):
+    return [r["body"]["choices"][0]["message"]["content"] for r in read_archive(path)]
+
+
+def test_truncated_tail_keeps_complete_records(tmp_path):
+    path = str(tmp_path / "qwen.jsonl.gz")
+    record(path, PAYLOAD, answer("一"), answer("二")).close()
+    size = os.path.getsize(path)
+    with open(path, "r+b") as f:
+        # 截掉 gzip 结尾与最后一条记录的部分压缩数据
+        f.truncate(size - 20)
+
+    assert contents(path) == ["一"]
+    record(path, OTHER, answer("三")).close()
+    assert contents(path) == ["一", "三"]
+
+
+def test_detector_round_trip_through_archive(tmp_path):
+    path = str(tmp_path / "qwen.jsonl.gz")
+    image = tmp_path / "leaf.jpg"
+    image.write_bytes(b"\xff\xd8fake-jpeg")
+    detector = QwenDiseaseDetector("sk-test", model="qwen-vl-plus")
+    recorder = ResponseRecorder(path)
+    send = sender(answer("病害识别：纹枯病\n严重程度：中等\n置信度：85%"))
+    detector.transport = lambda payload, _: recorder(payload, send)
+
+    recorded = detector.detect(str(image), "水稻")
+    recorder.close()
+    detector.transport = ResponseReplayer(path, time_scale=0)
+    replayed = detector.detect(str(image), "水稻")
+
+    assert recorded["status"] == replayed["status"] == "success"
+    assert replayed["details"]["disease_id"] == recorded["details"]["disease_id"] == "rice_sheath_blight"
+
+
+def test_archive_transport_modes(tmp_path, monkeypatch):
+    monkeypatch.setattr(replay, "_archive_transport", None)
+    monkeypatch.setattr(Config, "QWEN_ARCHIVE_MODE", "")
+    assert replay.archive_transport() is None
+
+    monkeypatch.setattr(Config, "QWEN_ARCHIVE_MODE", "bogus")
+    with pytest.raises(ValueError):
+        replay.archive_transport()
+
+    path = str(tmp_path / "qwen.jsonl.gz")
+    record(path, PAYLOAD, answer("病害识别：健康")).close()
+    monkeypatch.setattr(Config, "QWEN_ARCHIVE_MODE", "replay")
+    monkeypatch.setattr(Config, "QWEN_ARCHIVE_PATH", path)
+    transport = replay.archive_transport()
+    assert isinstance(transport, ResponseReplayer)
+    assert replay.archive_transport() is transport
+
+
+def test_process_archive_paths():
+    assert process_archive_path("/data/qwen.jsonl.gz", 42) == "/data/qwen.42.jsonl.gz"
+    assert process_archive_path("qwen", 7) == "qwen.7"
+
+
+def test_concurrent_recorders_write_separate_shards_merged_on_replay(tmp_path):
+    path = str(tmp_path / "qwen.jsonl.gz")
+    record(path, PAYLOAD, answer("主档案")).close()
+    recorders = [ResponseRecorder(process_archive_path(path, pid)) for pid in (101, 202)]
+    (tmp_path / "qwen.backup.jsonl.gz").write_bytes(b"")  # 不是分片
+    for index in range(10):
+        recorders[index % 2](OTHER, sender(answer(f"第{index}次")))
+    for recorder in recorders:
+        recorder.close()
+
+    assert archive_files(path) == [path, process_archive_path(path, 101), process_archive_path(path, 202)]
+    records = read_archives(path)
+    assert [r["body"]["choices"][0]["message"]["content"] for r in records] == \
+        ["主档案"] + [f"第{index}次" for index in range(10)]
+
+    replayer = ResponseReplayer(path, time_scale=0)
+    assert len(replayer) == 11
+    assert replayer(OTHER, None)[1]["choices"][0]["message"]["content"] == "第0次"
+    assert replayer(OTHER, None)[1]["choices"][0]["message"]["content"] == "第1次"
+
+
+def test_forked_child_detaches_from_the_parent_archive(tmp_path, monkeypatch):
+    path = str(tmp_path / "qwen.jsonl.gz")
+    monkeypatch.setattr(Config, "QWEN_ARCHIVE_MODE", "record")
+    monkeypatch.setattr(Config, "QWEN_ARCHIVE_PATH", path)
+    monkeypatch.setattr(replay, "_archive_transport", None)
+    parent = replay.archive_transport()
+    assert parent.path == process_archive_path(path)
+    parent(PAYLOAD, sender(answer("父进程")))
+    size = os.path.getsize(parent.path)
+
+    # 模拟 fork 后的子进程：放弃继承的录制器，之后按自己的进程号重新创建
+    replay._reset_after_fork()
+    parent.close()
+    assert os.path.getsize(parent.path) == size
+    assert replay._archive_transport is None
+
+    monkeypatch.setattr(replay.os, "getpid", lambda: 99999)
+    child = replay.archive_transport()
+    assert child is not parent
+    assert child.path == process_archive_path(path, 99999)
+    child(OTHER, sender(answer("子进程")))
+    child.close()
+
+    assert [r["model"] for r in read_archives(path)] == ["qwen-vl-plus", "qwen-vl-max"]
@@ -0,0 +1,191 @@
+"""
+可视化报告：缓存键、缩略图/热力图/报告渲染、进程池缓存与接口状态码
+"""
+
+import json
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip("PIL")
+
+from PIL import Image  # noqa: E402
+
+from src.detectors.result import DetectionResult, DiseaseDetails  # noqa: E402
+from src.reports import ReportGenerator, artefact_key  # noqa: E402
+from src.reports import render  # noqa: E402
+from src.server import field_api, files, report_api  # noqa: E402
+from src.storage.field_archive import FieldArchive  # noqa: E402
+from src.storage.sharding import ShardedDirectory  # noqa: E402
+
+TEST_IMAGE = os.path.join(os.path.dirname(__file__), "test_rice.jpg")
+POLYGON = [[30.0, 120.0], [30.0, 120.002], [30.002, 120.002], [30.002, 120.0]]
+
+
+def test_artefact_key_depends_on_kind_and_inputs():
+    inputs = {"points": [[30, 120, 2, 0.9]], "size": 800}
+
+    assert artefact_key("heatmap", inputs) == artefact_key("heatmap", {"size": 800, "points": [[30, 120, 2, 0.9]]})
+    assert artefact_key("heatmap", inputs) != artefact_key("report", inputs)
+    assert artefact_key("heatmap", inputs) != artefact_key("heatmap", {**inputs, "size": 400})
+
+
+def test_render_thumbnail_fits_size_and_marks_severity(tmp_path):
+    target = str(tmp_path / "thumb.jpg")
+
+    render.render_thumbnail(TEST_IMAGE, {"disease": "稻瘟病", "disease_id": "rice_blast", "severity": "严重",
+                                         "confidence": 0.9}, 128, target)
+
+    with Image.open(target) as image:
+        assert image.format == "JPEG"
+        assert max(image.size) == 128
+        # 左上角为严重程度边框颜色（严重为红色）
+        red, green, blue = image.convert("RGB").getpixel((1, 1))
+        assert red > 150 and green < 100 and blue < 100
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_render_heatmap_with_points_and_without_data(tmp_path):
+    target = str(tmp_path / "heatmap.png")
+    points = [[30.001, 120.001, 3, 0.9], [30.0005, 120.0005, 0, 0.8]]
+
+    render.render_heatmap(points, POLYGON, 200, target)
+    with Image.open(target) as image:
+        assert image.format == "PNG"
+        assert max(image.size) == 200
+
+    render.render_heatmap([], None, 200, target)
+    with Image.open(target) as image:
+        assert image.size == (200, 100)
+
+
+def test_heat_color_gradient():
+    assert render._heat_color(0) == render.HEATMAP_COLORS[0]
+    assert render._heat_color(1) == render.HEATMAP_COLORS[-1]
+    assert render._heat_color(5) == render.HEATMAP_COLORS[-1]
+
+
+def test_render_report_escapes_user_text(tmp_path):
+    target = str(tmp_path / "report.html")
+    context = {
+        "field_id": "F1",
+        "summary": {"field": {"name": "<script>alert(1)</script>"}, "frames": 2, "disease_rate": 0.5,
+                    "disease_counts": {"稻瘟病": 1}},
+        "history": [{"day": "2026-06-01", "frames": 2, "diseased_frames": 1, "max_severity": "中等"}],
+        "frames": [{"result_file": "r1.json", "ts": 1780000000, "disease": "稻瘟病", "severity": "中等"}],
+        "heatmap_url": "/api/fields/F1/heatmap",
+        "thumbnail_url": report_api.THUMBNAIL_URL
+    }
+
+    render.render_report(context, target)
+
+    with open(target, encoding="utf-8") as f:
+        page = f.read()
+    assert "<script>alert" not in page
+    assert "&lt;script&gt;" in page
+    assert "/api/results/r1.json/thumbnail" in page
+    assert "50.0%" in page
+
+
+@pytest.fixture
+def generator(tmp_path):
+    generator = ReportGenerator(cache_dir=str(tmp_path / "reports"), workers=1)
+    yield generator
+    generator.shutdown()
+
+
+def test_generator_renders_in_pool_and_caches(generator, tmp_path):
+    points = [[30.001, 120.001, 2, 0.9]]
+    inputs = {"points": points, "polygon": None, "size": 120}
+
+    artefact = generator.render("heatmap", inputs, (points, None, 120), wait=60)
+
+    assert artefact.etag == artefact_key("heatmap", inputs)
+    assert artefact.media_type == "image/png"
+    assert os.path.exists(artefact.path)
+    assert generator.pending() == 0
+
+    # 已缓存：不再提交渲染，直接返回已完成的结果
+    cached = generator.submit("heatmap", inputs, ("不会被使用",))
+    assert cached.done()
+    assert cached.result() == artefact
+
+    label = {"disease": "稻瘟病", "severity": "轻微", "confidence": 0.7}
+    thumbnail = generator.render("thumbnail", {"image": "abc", "size": 96}, (TEST_IMAGE, label, 96), wait=60)
+    with Image.open(thumbnail.path) as image:
+        assert max(image.size) == 96
+
+
+def test_generator_propagates_render_errors(generator):
+    with pytest.raises(FileNotFoundError):
+        generator.render("thumbnail", {"image": "missing"}, ("/不存在.jpg", {}, 64), wait=60)
+    assert generator.pending() == 0
+
+
+class FakeGenerator:
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.calls = []
+
+    def render(self, kind, inputs, args):
+        self.calls.append((kind, inputs))
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+    def submit(self, kind, inputs, args):
+        self.calls.append((kind, inputs))
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    archive = FieldArchive(str(tmp_path / "field_archive.db"))
+    monkeypatch.setattr(field_api, "_archive", archive)
+    return archive
+
+
+def test_heatmap_endpoint_status_codes(archive, monkeypatch):
+    archive.upsert_field("F1", crop_type="水稻", polygon=POLYGON)
+    result = DetectionResult("success", mode="qwen", details=DiseaseDetails("稻瘟病", severity="严重", confidence=0.9))
+    archive.record_frame("F1", result, ts=1780000000, lat=30.001, lon=120.001)
+
+    monkeypatch.setattr(report_api, "_generator", FakeGenerator(None))
+    payload, status = report_api.heatmap("F1", {})
+    assert status == 202
+    assert payload["retry_after"] == report_api.PENDING_RETRY_AFTER
+
+    monkeypatch.setattr(report_api, "_generator", FakeGenerator("artefact"))
+    assert report_api.heatmap("F1", {}) == ("artefact", 200)
+
+    monkeypatch.setattr(report_api, "_generator", FakeGenerator(RuntimeError("内存不足")))
+    assert report_api.heatmap("F1", {})[1] == 500
+
+    assert report_api.heatmap("F404", {})[1] == 404
+    assert report_api.heatmap("F1", {"days": "abc"})[1] == 400
+    assert report_api.report("F404", {})[1] == 404
+
+
+def test_thumbnail_endpoint_keys_on_content_hash(tmp_path, monkeypatch):
+    uploads = ShardedDirectory(str(tmp_path / "uploads"))
+    results = ShardedDirectory(str(tmp_path / "results"))
+    monkeypatch.setattr(files, "uploads", uploads)
+    monkeypatch.setattr(files, "results", results)
+    monkeypatch.setattr(files, "read_archived_result", lambda filename: None)
+    shutil.copy(TEST_IMAGE, uploads.path_for("leaf.jpg", create=True))
+    result = {"status": "success", "image": {"file": "leaf.jpg", "sha256": "abc"},
+              "details": {"disease": "稻瘟病", "severity": "中等", "confidence": 0.8, "solution": "不参与缓存键"}}
+    with open(results.path_for("r1.json", create=True), "w", encoding="utf-8") as f:
+        json.dump(result, f)
+    fake = FakeGenerator("artefact")
+    monkeypatch.setattr(report_api, "_generator", fake)
+
+    assert report_api.thumbnail("r1.json", {"size": "5000"}) == ("artefact", 200)
+    kind, inputs = fake.calls[0]
+    assert kind == "thumbnail"
+    assert inputs["image"] == "abc"
+    assert inputs["size"] == report_api.MAX_THUMBNAIL_SIZE
+    assert "solution" not in inputs["details"]
+
+    assert report_api.thumbnail("r1.json", {"size": "big"})[1] == 400
+    assert report_api.thumbnail("missing.json", {})[1] == 404
@@ -0,0 +1,133 @@
+"""
+检测结果模型：字典兼容访问、序列化与复制，以及精简后的命令行入口
+"""
+
+import json
+import os
+
+import pytest
+
+import api
+from src.detectors import HybridDiseaseDetector, MockDiseaseDetector
+from src.detectors.result import DetectionResult, DiseaseDetails, as_dict, is_real_diagnosis, json_default
+
+TEST_IMAGE = os.path.join(os.path.dirname(__file__), "test_rice.jpg")
+
+
+def sample_result(**extra):
+    details = DiseaseDetails("稻瘟病", "rice_blast", "严重", 0.8, "使用三环唑防治", "叶片有梭形病斑")
+    return DetectionResult("success", mode="api", result="病害识别：稻瘟病", details=details,
+                           usage={"total_tokens": 10}, **extra)
+
+
+def test_none_fields_are_absent():
+    result = DetectionResult("error", mode="api", error="超时")
+
+    assert "details" not in result
+    assert result.get("details") is None
+    assert result.get("details", "缺省") == "缺省"
+    with pytest.raises(KeyError):
+        result["details"]
+    assert list(result) == ["status", "mode", "error"]
+    assert len(result) == 3
+
+
+def test_mapping_writes_fields_and_extra_keys():
+    result = sample_result()
+
+    result["timings"] = {"total_ms": 12}
+    result["tier"] = "fast"
+    del result["usage"]
+
+    assert result.timings == {"total_ms": 12}
+    assert result.extra == {"tier": "fast"}
+    assert "usage" not in result and result.usage is None
+    assert list(result)[-1] == "tier"
+    with pytest.raises(KeyError):
+        del result["usage"]
+    with pytest.raises(KeyError):
+        del result["missing"]
+
+
+def test_extra_keyword_arguments_are_kept():
+    result = DetectionResult.failure("api", "网络错误", retryable=True)
+
+    assert result["status"] == "error"
+    assert result["retryable"] is True
+    assert result.to_dict() == {"status": "error", "mode": "api", "error": "网络错误", "retryable": True}
+
+
+def test_to_dict_converts_nested_records():
+    result = sample_result(raw_response=DiseaseDetails("健康", "healthy"))
+
+    data = result.to_dict()
+
+    assert type(data["details"]) is dict
+    assert data["details"]["disease_id"] == "rice_blast"
+    assert data["raw_response"]["disease"] == "健康"
+    assert dict(result).keys() == data.keys()
+    assert as_dict(result) == data
+    assert as_dict({"a": 1}) == {"a": 1}
+
+
+def test_to_json_keeps_chinese_and_nested_records():
+    result = sample_result()
+
+    text = result.to_json()
+
+    assert "稻瘟病" in text
+    assert json.loads(text) == result.to_dict()
+    # 嵌在普通字典中的结果对象同样可以序列化
+    assert json.loads(json.dumps({"data": result}, default=json_default))["data"] == result.to_dict()
+
+
+def test_copy_is_independent():
+    result = sample_result(tier="fast")
+
+    clone = result.copy()
+    clone["details"]["severity"] = "轻微"
+    clone["tier"] = "accurate"
+    clone["status"] = "error"
+
+    assert result["details"]["severity"] == "严重"
+    assert result["tier"] == "fast"
+    assert result["status"] == "success"
+
+
+def test_records_have_no_instance_dict():
+    result = sample_result()
+
+    assert not hasattr(result, "__dict__")
+    with pytest.raises(AttributeError):
+        result.unknown_attribute = 1
+
+
+def test_is_real_diagnosis():
+    assert is_real_diagnosis(sample_result())
+    assert not is_real_diagnosis(DetectionResult("success", mode="mock"))
+    assert not is_real_diagnosis(sample_result(provisional=True))
+    assert not is_real_diagnosis(DetectionResult.failure("api", "超时"))
+
+
+@pytest.fixture
+def fast_mock(monkeypatch):
+    def build(*args, **kwargs):
+        detector = HybridDiseaseDetector(*args, **kwargs)
+        detector.mock_detector = MockDiseaseDetector(simulate_latency=False)
+        return detector
+    monkeypatch.setattr(api, "HybridDiseaseDetector", build)
+
+
+def test_cli_detect_prints_json(fast_mock, capsys):
+    assert api.main(["detect", TEST_IMAGE, "--mock", "--json"]) == 0
+
+    output = capsys.readouterr().out
+    data = json.loads(output[output.index("{"):])
+    assert data["status"] == "success"
+    assert data["mode"] == "mock"
+    assert "disease" in data["details"]
+
+
+def test_cli_detect_missing_image(capsys):
+    assert api.main(["detect", "不存在.jpg"]) == 1
+    assert "图片不存在" in capsys.readouterr().out
@@ -0,0 +1,145 @@
+"""
+分片目录与保留策略：上传过期/超量清理、冷结果按日归档
+"""
+
+import os
+import time
+import zipfile
+
+import pytest
+
+from src.storage.retention import RetentionManager
+from src.storage.sharding import ShardedDirectory
+
+DAY = 86400
+
+
+def write(path, data=b"x", mtime=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = RetentionManager(
+        upload_dir=str(tmp_path / "uploads"), results_dir=str(tmp_path / "results"),
+        archive_dir=str(tmp_path / "archive"), index_path=str(tmp_path / "retention.db")
+    )
+    manager.upload_max_age = 7 * DAY
+    manager.upload_max_bytes = 10 ** 9
+    manager.results_archive_after = 3 * DAY
+    manager.archive_max_age = 30 * DAY
+    return manager
+
+
+def test_sharded_paths_and_legacy_lookup(tmp_path):
+    shards = ShardedDirectory(str(tmp_path))
+    sharded = shards.path_for("result_a.json", create=True)
+    write(sharded)
+    legacy = write(str(tmp_path / "result_b.json"))
+    write(str(tmp_path / ".tmp.part"))
+
+    assert os.path.relpath(sharded, tmp_path).count(os.sep) == 2
+    assert shards.locate("result_a.json") == sharded
+    assert shards.locate("result_b.json") == legacy
+    assert shards.locate("../result_b.json") is None
+    assert shards.locate(".tmp.part") is None
+    assert sorted(entry.name for entry in shards.iter_files()) == ["result_a.json", "result_b.json"]
+
+
+def test_expires_old_uploads(manager):
+    now = time.time()
+    old = write(manager.uploads.path_for("old.jpg", create=True), mtime=now - 8 * DAY)
+    fresh = write(manager.uploads.path_for("fresh.jpg", create=True), mtime=now - DAY)
+
+    assert manager._expire_uploads(now) == 1
+    assert not os.path.exists(old)
+    assert os.path.exists(fresh)
+
+
+def test_trims_oldest_uploads_over_capacity(manager):
+    now = time.time()
+    manager.upload_max_bytes = 250
+    paths = [write(manager.uploads.path_for(f"{i}.jpg", create=True), b"x" * 100, mtime=now - 100 + i)
+             for i in range(4)]
+
+    assert manager._expire_uploads(now) == 2
+    assert [os.path.exists(path) for path in paths] == [False, False, True, True]
+
+
+def test_cold_results_are_archived_and_still_readable(manager):
+    now = time.time()
+    cold = write(manager.results.path_for("result_cold.json", create=True), b'{"a": 1}', mtime=now - 5 * DAY)
+    warm = write(manager.results.path_for("result_warm.json", create=True), b'{"b": 2}', mtime=now - DAY)
+
+    summary = manager.run_once(now)
+
+    assert summary["results_archived"] == 1
+    assert not os.path.exists(cold)
+    assert os.path.exists(warm)
+    assert manager.read_archived_result("result_cold.json") == b'{"a": 1}'
+    assert manager.read_archived_result("result_warm.json") is None
+
+
+def test_expired_archives_drop_their_index_rows(manager):
+    now = time.time()
+    write(manager.results.path_for("result_old.json", create=True), b"{}", mtime=now - 40 * DAY)
+    manager.run_once(now)
+    for entry in os.scandir(manager.archive_dir):
+        os.utime(entry.path, (now - 31 * DAY, now - 31 * DAY))
+
+    assert manager.run_once(now)["archives_expired"] == 1
+    assert manager.read_archived_result("result_old.json") is None
+
+
+def test_second_run_on_the_same_day_replaces_the_archive(manager):
+    now = time.time()
+    mtime = now - 5 * DAY
+    write(manager.results.path_for("result_1.json", create=True), b'{"n": 1}', mtime=mtime)
+    manager.run_once(now)
+    [archive] = os.listdir(manager.archive_dir)
+    archive_path = os.path.join(manager.archive_dir, archive)
+
+    # 压缩期间已打开旧归档的读取者仍能完整读取
+    with zipfile.ZipFile(archive_path) as reader:
+        write(manager.results.path_for("result_2.json", create=True), b'{"n": 2}', mtime=mtime)
+        assert manager.run_once(now)["results_archived"] == 1
+        assert reader.read("result_1.json") == b'{"n": 1}'
+
+    assert os.listdir(manager.archive_dir) == [archive]
+    assert manager.read_archived_result("result_1.json") == b'{"n": 1}'
+    assert manager.read_archived_result("result_2.json") == b'{"n": 2}'
+
+
+def test_failed_archive_write_keeps_previous_archive(manager, monkeypatch):
+    now = time.time()
+    mtime = now - 5 * DAY
+    write(manager.results.path_for("result_1.json", create=True), b'{"n": 1}', mtime=mtime)
+    manager.run_once(now)
+    pending = write(manager.results.path_for("result_2.json", create=True), b'{"n": 2}', mtime=mtime)
+
+    def crash(self, *args, **kwargs):
+        raise OSError("磁盘已满")
+
+    monkeypatch.setattr(zipfile.ZipFile, "write", crash)
+    with pytest.raises(OSError):
+        manager.run_once(now)
+
+    assert [name for name in os.listdir(manager.archive_dir) if name.endswith(".tmp")] == []
+    assert os.path.exists(pending)
+    assert manager.read_archived_result("result_1.json") == b'{"n": 1}'
+    assert manager.read_archived_result("result_2.json") is None
+
+
+def test_corrupt_archive_reads_as_missing(manager):
+    now = time.time()
+    write(manager.results.path_for("result_1.json", create=True), b"{}", mtime=now - 5 * DAY)
+    manager.run_once(now)
+    [archive] = os.listdir(manager.archive_dir)
+    write(os.path.join(manager.archive_dir, archive), b"not a zip")
+
+    assert manager.read_archived_result("result_1.json") is None
@@ -0,0 +1,181 @@
+"""
+检测调度：类别间严格优先、租户加权公平排队与准入控制
+"""
+
+import asyncio
+import functools
+import threading
+
+import pytest
+
+from src.server.scheduler import DetectionScheduler, SchedulerRejected, rejection_response, request_class
+
+DEADLINES = {"urgent": 100, "interactive": 100, "bulk": 100}
+
+
+def make_scheduler(deadlines=None, weights=None, service_time=0.01):
+    return DetectionScheduler(1, deadlines={**DEADLINES, **(deadlines or {})}, weights=weights or {},
+                              service_time=service_time)
+
+
+def enqueue(scheduler, order, priority, tenant, label):
+    """直接入队（不阻塞），获得槽位时把 label 记入 order"""
+    with scheduler._lock:
+        waiter = scheduler._admit(priority, tenant, lambda: order.append(label))
+    assert waiter is not None
+
+
+def drain(scheduler):
+    """依次归还槽位，让排队请求逐个获得槽位"""
+    while scheduler.running:
+        scheduler.release(0.01)
+
+
+def test_classes_are_strictly_prioritised():
+    scheduler = make_scheduler()
+    scheduler.acquire()
+    order = []
+    enqueue(scheduler, order, "bulk", "a", "bulk")
+    enqueue(scheduler, order, "interactive", "a", "interactive")
+    enqueue(scheduler, order, "urgent", "a", "urgent")
+
+    drain(scheduler)
+
+    assert order == ["urgent", "interactive", "bulk"]
+
+
+def test_small_tenant_is_not_starved_by_a_large_flight():
+    scheduler = make_scheduler()
+    scheduler.acquire()
+    order = []
+    for index in range(4):
+        enqueue(scheduler, order, "bulk", "big", f"big{index}")
+    enqueue(scheduler, order, "bulk", "small", "small")
+
+    drain(scheduler)
+
+    assert order == ["big0", "small", "big1", "big2", "big3"]
+
+
+def test_tenant_weights_scale_the_share():
+    scheduler = make_scheduler(weights={"big": 2})
+    scheduler.acquire()
+    order = []
+    for index in range(4):
+        enqueue(scheduler, order, "bulk", "big", f"big{index}")
+    enqueue(scheduler, order, "bulk", "small", "small")
+
+    drain(scheduler)
+
+    assert order == ["big0", "big1", "small", "big2", "big3"]
+
+
+def test_admission_rejects_when_the_estimate_exceeds_the_deadline():
+    scheduler = make_scheduler(deadlines={"bulk": 5}, service_time=10)
+    scheduler.acquire()
+
+    with pytest.raises(SchedulerRejected) as info:
+        scheduler.acquire("bulk", "a")
+
+    assert info.value.priority == "bulk"
+    assert info.value.retry_after == 5
+    metrics = scheduler.metrics()
+    assert metrics["classes"]["bulk"]["rejected"] == 1
+    assert metrics["classes"]["bulk"]["queued"] == 0
+
+
+def test_queued_request_expires_after_its_deadline():
+    scheduler = make_scheduler(deadlines={"interactive": 0.05}, service_time=0.001)
+    scheduler.acquire()
+
+    with pytest.raises(SchedulerRejected):
+        scheduler.acquire("interactive", "a")
+
+    classes = scheduler.metrics()["classes"]
+    assert classes["interactive"]["expired"] == 1
+    assert classes["interactive"]["queued"] == 0
+    # 过期项不会再获得槽位
+    scheduler.release()
+    assert scheduler.running == 0
+
+
+def test_waiting_thread_gets_the_released_slot():
+    scheduler = make_scheduler()
+    granted = threading.Event()
+
+    with scheduler.slot():
+        thread = threading.Thread(target=lambda: scheduler.acquire() or granted.set())
+        thread.start()
+        assert not granted.wait(0.05)
+    thread.join(5)
+
+    assert granted.is_set()
+    assert scheduler.running == 1
+    assert scheduler.metrics()["classes"]["interactive"]["admitted"] == 2
+
+
+def test_async_slots_queue_and_cancel():
+    scheduler = make_scheduler()
+
+    async def main():
+        order = []
+
+        async def job(label, delay):
+            async with scheduler.aslot():
+                order.append(label)
+                await asyncio.sleep(delay)
+
+        first = asyncio.ensure_future(job("first", 0.05))
+        await asyncio.sleep(0)
+        cancelled = asyncio.ensure_future(job("cancelled", 0))
+        second = asyncio.ensure_future(job("second", 0))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        await asyncio.gather(first, second)
+        return order
+
+    assert asyncio.run(main()) == ["first", "second"]
+    assert scheduler.running == 0
+    assert scheduler.metrics()["classes"]["interactive"]["expired"] == 1
+
+
+def test_request_class_defaults():
+    assert request_class({}) == ("interactive", "")
+    assert request_class({"flight_id": "FL-1", "field_id": "F-1"}) == ("bulk", "F-1")
+    assert request_class({"priority": " URGENT ", "flight_id": "FL-1", "farm_id": "farm"}) == ("urgent", "farm")
+    assert request_class({"priority": "vip", "tenant": "t", "farm_id": "farm"}) == ("interactive", "t")
+
+
+def test_rejection_response_sets_retry_after():
+    payload, status, headers = rejection_response(SchedulerRejected("bulk", "排队已满", 2.2))
+
+    assert status == 429
+    assert headers == {"Retry-After": "3"}
+    assert payload["retry_after"] == 3
+    assert payload["status"] == "error"
+
+
+def test_detect_endpoint_returns_429_with_retry_after(tmp_path, monkeypatch):
+    pytest.importorskip("flask")
+    import app as web
+    from src.server import scheduler as scheduler_module
+    from src.utils.upload import StreamingUpload
+
+    busy = make_scheduler(deadlines={"bulk": 5}, service_time=10)
+    busy.acquire()
+    monkeypatch.setattr(web.Config, "SCHEDULER_ENABLED", True)
+    monkeypatch.setattr(scheduler_module, "_scheduler", busy)
+    monkeypatch.setattr(web, "StreamingUpload", functools.partial(StreamingUpload, upload_dir=str(tmp_path)))
+    monkeypatch.setattr(web, "get_detector", lambda: pytest.fail("被拒绝的请求不应调用检测器"))
+    boundary = "b0undary"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"flight_id\"\r\n\r\nFL-1\r\n"
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.png\"\r\n\r\n").encode()
+    body += b"\x89PNG\r\n\x1a\n" + b"\x00" * 16 + f"\r\n--{boundary}--\r\n".encode()
+
+    response = web.app.test_client().post(
+        "/api/detect", data=body, content_type=f"multipart/form-data; boundary={boundary}"
+    )
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "5"
+    assert response.get_json()["retry_after"] == 5
@@ -0,0 +1,154 @@
+"""
+空间索引：R-tree 范围/半径/近邻查询，以及检测前的位置与时间校验
+"""
+
+import functools
+import os
+
+import pytest
+
+from src.detectors.result import DetectionResult, DiseaseDetails
+from src.server import field_api, query_api
+from src.storage.field_archive import FieldArchive
+from src.storage.spatial_index import bbox_around, haversine_km
+
+CENTER = (30.0, 120.0)
+
+
+def frame(disease="稻瘟病", severity="中等"):
+    return DetectionResult("success", mode="qwen",
+                           details=DiseaseDetails(disease=disease, severity=severity, confidence=0.9))
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    archive = FieldArchive(str(tmp_path / "field_archive.db"))
+    monkeypatch.setattr(field_api, "_archive", archive)
+    # 沿经线每隔约 1.1 公里一个检测点
+    for i in range(10):
+        archive.record_frame("F1", frame(severity="严重" if i % 2 else "轻微"), ts=1000 + i,
+                             lat=CENTER[0] + i * 0.01, lon=CENTER[1])
+    archive.upsert_field("F1", polygon=[[30.0, 120.0], [30.0, 120.01], [30.01, 120.01], [30.01, 120.0]])
+    archive.upsert_field("F2", polygon=[[31.0, 121.0], [31.0, 121.01], [31.01, 121.01]])
+    return archive
+
+
+def test_geometry_helpers():
+    assert haversine_km(30, 120, 31, 120) == pytest.approx(111.2, abs=0.1)
+    min_lat, min_lon, max_lat, max_lon = bbox_around(30, 120, 10)
+    assert haversine_km(30, 120, max_lat, 120) == pytest.approx(10, rel=1e-3)
+    assert haversine_km(30, 120, 30, max_lon) == pytest.approx(10, rel=1e-3)
+
+
+def test_detection_queries(archive):
+    spatial = archive.spatial
+
+    within = spatial.detections_within(*CENTER, 3.5)
+    nearest = spatial.nearest_detections(CENTER[0] + 0.05, CENTER[1], 3)
+    severe = spatial.detections_in_bbox(29.9, 119.9, 30.2, 120.1, min_severity=3)
+
+    assert [round(item["lat"], 2) for item in within] == [30.0, 30.01, 30.02, 30.03]
+    assert [item["distance_km"] for item in within] == sorted(item["distance_km"] for item in within)
+    assert sorted(round(item["lat"], 2) for item in nearest) == [30.04, 30.05, 30.06]
+    assert len(severe) == 5
+
+
+def test_field_queries(archive):
+    spatial = archive.spatial
+
+    assert spatial.field_center("F1") == pytest.approx((30.005, 120.005))
+    assert [item["field_id"] for item in spatial.fields_in_bbox(30.004, 120.004, 30.006, 120.006)] == ["F1"]
+    assert [item["field_id"] for item in spatial.nearest_fields(*CENTER, 2)] == ["F1", "F2"]
+
+
+def test_query_api_validates_center(archive):
+    payload, status = query_api.spatial_query({"lat": "30", "lon": "120", "radius_km": "2.5"})
+    assert status == 200
+    assert payload["data"]["count"] == 3
+
+    for args in ({"lat": "nan", "lon": "120"}, {"lat": "95", "lon": "120"}, {"lat": "x", "lon": "120"}):
+        assert query_api.spatial_query(args)[1] == 400
+
+
+@pytest.mark.parametrize("form", [
+    {"lat": "abc", "lon": "120"},
+    {"lat": "nan", "lon": "120"},
+    {"lat": "30", "lon": "inf"},
+    {"lat": "91", "lon": "120"},
+    {"lat": "30", "lon": "-181"},
+    {"captured_at": "yesterday"},
+    {"captured_at": "1e20"},
+    {"captured_at": "-1"},
+])
+def test_validate_form_rejects_bad_location_or_time(form):
+    payload, status = field_api.validate_form(form)
+    assert status == 400
+    assert payload["status"] == "error"
+
+
+def test_validate_form_accepts_valid_or_missing_values():
+    assert field_api.validate_form({}) is None
+    assert field_api.validate_form({"lat": "30.5", "lon": "-120", "captured_at": "1780000000"}) is None
+    # 只给出一半坐标视为未提供位置
+    assert field_api.parse_location({"lat": "30"}) == (None, None)
+    assert field_api.parse_captured_at({"captured_at": "1780000000.5"}) == 1780000000.5
+
+
+def test_detect_rejects_bad_location_before_calling_api(tmp_path, monkeypatch):
+    pytest.importorskip("flask")
+    import app as web
+    from src.utils.upload import StreamingUpload
+
+    monkeypatch.setattr(web, "StreamingUpload", functools.partial(StreamingUpload, upload_dir=str(tmp_path)))
+    monkeypatch.setattr(web, "get_detector", lambda: pytest.fail("检测前应先拒绝非法位置"))
+    boundary = "b0undary"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"lat\"\r\n\r\nnan\r\n"
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"lon\"\r\n\r\n120\r\n"
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.png\"\r\n\r\n").encode()
+    body += b"\x89PNG\r\n\x1a\n" + b"\x00" * 16 + f"\r\n--{boundary}--\r\n".encode()
+
+    response = web.app.test_client().post(
+        "/api/detect", data=body, content_type=f"multipart/form-data; boundary={boundary}"
+    )
+
+    assert response.status_code == 400
+    assert "lat" in response.get_json()["message"]
+    # 被拒绝的上传不留在磁盘上
+    assert [names for _, _, names in os.walk(tmp_path) if names] == []
+
+
+def test_bogus_exif_location_is_ignored_after_detection(archive, tmp_path, monkeypatch):
+    pytest.importorskip("flask")
+    import app as web
+    from src.config import Config
+    from src.server import alert_api, files, report_api
+    from src.storage.sharding import ShardedDirectory
+    from src.utils.upload import StreamingUpload
+
+    class FakeDetector:
+        offline_queue = None
+
+        def detect(self, image_path, crop_type, content_hash=None):
+            return frame()
+
+    monkeypatch.setattr(web, "StreamingUpload", functools.partial(StreamingUpload, upload_dir=str(tmp_path)))
+    monkeypatch.setattr(web, "get_detector", lambda: FakeDetector())
+    monkeypatch.setattr(web, "extract_metadata", lambda path: {"lat": float("nan"), "lon": 500.0,
+                                                                "captured_at": -5.0})
+    monkeypatch.setattr(files, "results", ShardedDirectory(str(tmp_path / "results")))
+    monkeypatch.setattr(report_api, "prerender_thumbnail", lambda result, filename: None)
+    monkeypatch.setattr(alert_api, "observe_detection", lambda result, form, crop_type: None)
+    monkeypatch.setattr(Config, "FIELD_ARCHIVE_ENABLED", True)
+    monkeypatch.setattr(Config, "SCHEDULER_ENABLED", False)
+    boundary = "b0undary"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"field_id\"\r\n\r\nF9\r\n"
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.png\"\r\n\r\n").encode()
+    body += b"\x89PNG\r\n\x1a\n" + b"\x00" * 16 + f"\r\n--{boundary}--\r\n".encode()
+
+    response = web.app.test_client().post(
+        "/api/detect", data=body, content_type=f"multipart/form-data; boundary={boundary}"
+    )
+
+    assert response.status_code == 200
+    [recorded] = archive.get_frames("F9")
+    assert recorded["disease"] == "稻瘟病"
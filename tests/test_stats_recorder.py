@@ -0,0 +1,165 @@
+"""
+线程本地统计计数：增量写入共享存储与时间序列接口
+"""
+
+import gc
+import threading
+import time
+import weakref
+
+from src.server import responses
+from src.storage import stats_recorder
+from src.storage.stats_recorder import StatsRecorder
+from src.storage.stats_store import SQLiteStatsStore
+
+
+def _recorder(tmp_path, **kwargs):
+    # flush_interval=0 不启动后台线程，由测试显式 flush
+    store = SQLiteStatsStore(str(tmp_path / "stats.db"))
+    return StatsRecorder(store, flush_interval=0, **kwargs), store
+
+
+def test_counts_from_many_threads_are_summed():
+    recorder = StatsRecorder(flush_interval=0)
+
+    def work():
+        for _ in range(1000):
+            recorder.incr("total_calls")
+            recorder.incr("response_time_ms", 0.5)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    totals = recorder.local_totals()
+    assert totals["total_calls"] == 8000
+    assert totals["response_time_ms"] == 4000
+    # 已退出线程的计数并入 retired，再次汇总不会重复计入
+    assert recorder.local_totals() == totals
+
+
+def test_without_store_totals_are_local():
+    recorder = StatsRecorder(flush_interval=0)
+    recorder.incr("api_calls", 3)
+
+    assert recorder.flush() == {}
+    assert recorder.totals() == {"api_calls": 3}
+    assert recorder.series(["api_calls"]) == {"api_calls": []}
+
+
+def test_flush_writes_only_deltas(tmp_path):
+    recorder, store = _recorder(tmp_path)
+    recorder.incr("api_calls", 2)
+
+    assert recorder.flush() == {"api_calls": 2}
+    assert recorder.flush() == {}
+
+    recorder.incr("api_calls")
+    recorder.incr("mock_calls")
+    assert recorder.flush() == {"api_calls": 1, "mock_calls": 1}
+    assert store.totals() == {"api_calls": 3, "mock_calls": 1}
+
+
+def test_totals_include_unflushed_counts(tmp_path):
+    recorder, store = _recorder(tmp_path)
+    store.increment({"api_calls": 10})  # 其他进程已写入
+    recorder.incr("api_calls", 2)
+    recorder.flush()
+    recorder.incr("api_calls")
+
+    assert recorder.totals() == {"api_calls": 13}
+
+
+def test_failed_flush_is_retried(tmp_path):
+    recorder, store = _recorder(tmp_path)
+    recorder.incr("api_calls", 2)
+
+    def fail(deltas):
+        raise OSError("disk full")
+
+    increment, store.increment = store.increment, fail
+    assert recorder.flush() == {}
+
+    store.increment = increment
+    assert recorder.flush() == {"api_calls": 2}
+    assert store.totals() == {"api_calls": 2}
+
+
+def test_background_thread_flushes_periodically(tmp_path):
+    store = SQLiteStatsStore(str(tmp_path / "stats.db"))
+    recorder = StatsRecorder(store, flush_interval=0.05)
+    recorder.incr("api_calls")
+    try:
+        for _ in range(100):
+            if store.totals().get("api_calls") == 1:
+                break
+            time.sleep(0.05)
+        assert store.totals() == {"api_calls": 1}
+    finally:
+        recorder.stop()
+
+
+def test_series_flushes_before_reading(tmp_path):
+    recorder, store = _recorder(tmp_path)
+    recorder.incr("api_calls", 4)
+
+    series = recorder.series(["api_calls", "mock_calls"], "minute")
+
+    assert [value for _, value in series["api_calls"]] == [4]
+    assert series["mock_calls"] == []
+
+
+def test_exit_and_fork_hooks_do_not_keep_recorders_alive(tmp_path):
+    gc.collect()
+    registered = len(stats_recorder._recorders)
+    recorder, store = _recorder(tmp_path)
+    assert len(stats_recorder._recorders) == registered + 1
+    recorder.incr("api_calls", 2)
+
+    # 模块级钩子：退出时写入、fork 后重置全部存活的记录器
+    stats_recorder._flush_all()
+    assert store.totals() == {"api_calls": 2}
+    stats_recorder._reset_all_after_fork()
+    assert recorder.local_totals() == {}
+
+    ref = weakref.ref(recorder)
+    del recorder
+    gc.collect()
+    assert ref() is None
+    assert len(stats_recorder._recorders) == registered
+
+
+class _SeriesDetector:
+    def __init__(self):
+        self.calls = []
+
+    def get_stats_series(self, names, resolution, since, until):
+        self.calls.append((names, resolution, since, until))
+        return {}
+
+
+def test_series_payload_parses_query():
+    detector = _SeriesDetector()
+
+    payload, status = responses.stats_series_payload(
+        detector, {"names": "api_calls,,mock_calls", "resolution": "hour", "since": "100", "until": "200"}
+    )
+
+    assert status == 200
+    assert payload["data"]["resolution"] == "hour"
+    assert detector.calls == [(["api_calls", "mock_calls"], "hour", 100.0, 200.0)]
+
+
+def test_series_payload_defaults_and_errors():
+    detector = _SeriesDetector()
+
+    payload, status = responses.stats_series_payload(detector, {})
+    names, resolution, since, until = detector.calls[0]
+    assert status == 200
+    assert names is None and resolution == "minute"
+    assert until - since == 3600
+
+    assert responses.stats_series_payload(detector, {"resolution": "day"})[1] == 400
+    assert responses.stats_series_payload(detector, {"hours": "abc"})[1] == 400
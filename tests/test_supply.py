@@ -0,0 +1,189 @@
+"""
+农资推荐：倒排索引、供应商网格与服务半径、按严重程度的用量与批量去重，以及接口的输入校验
+"""
+
+import math
+
+import pytest
+
+from src.detectors.result import DetectionResult, DiseaseDetails
+from src.server import field_api, supply_api
+from src.storage.field_archive import FieldArchive
+from src.supply import SupplyMatcher, load_catalog
+
+# 杭州附近的田块
+LAT, LON = 30.01, 120.0
+
+
+@pytest.fixture
+def matcher():
+    catalog = load_catalog(None)
+    catalog["suppliers"] = [
+        {"supplier_id": "s1", "name": "近处农资店", "lat": 30.0, "lon": 120.0, "service_radius_km": 10,
+         "stock": {"tricyclazole-75wp": 8.5, "下架商品": 1.0}},
+        # 列表形式的库存按目录价
+        {"supplier_id": "s2", "name": "县城农资站", "lat": 30.05, "lon": 120.0, "service_radius_km": 30,
+         "stock": ["thifluzamide-24sc"]},
+        {"supplier_id": "s3", "name": "外地农资店", "lat": 31.0, "lon": 121.0, "service_radius_km": 5,
+         "stock": {"tricyclazole-75wp": 7.0}}
+    ]
+    return SupplyMatcher(catalog, grid_degrees=0.1, max_suppliers=3, max_products=3)
+
+
+def test_disease_ingredient_and_product_indexes(matcher):
+    assert matcher.ingredients_by_disease["rice_blast"] == ["tricyclazole", "isoprothiolane", "kasugamycin"]
+    assert matcher.products_by_ingredient["tricyclazole"] == ["tricyclazole-75wp"]
+    # 目录中不存在的商品不进入库存
+    assert matcher.suppliers[0]["stock"] == {"tricyclazole-75wp": 8.5}
+    assert matcher.suppliers[1]["stock"] == {"thifluzamide-24sc": 18.0}
+    assert matcher.suppliers_by_disease["rice_blast"] == {0, 2}
+    assert matcher.suppliers_by_disease["rice_sheath_blight"] == {1}
+
+
+def test_suppliers_near_uses_grid_and_service_radius(matcher):
+    nearby = matcher.suppliers_near(LAT, LON)
+    assert [index for _, index in nearby] == [0, 1]
+    assert nearby[0][0] == pytest.approx(1.11, abs=0.01)
+
+    assert [index for _, index in matcher.suppliers_near(LAT, LON, "rice_blast")] == [0]
+    # 超出近处农资店 10 公里的服务半径
+    assert [index for _, index in matcher.suppliers_near(30.2, LON)] == [1]
+    assert matcher.suppliers_near(None, LON) == []
+    assert matcher.suppliers_near(math.nan, LON) == []
+
+
+def test_dose_packages_and_cost_follow_severity(matcher):
+    plan = matcher.recommend("稻瘟病", "严重", 10, LAT, LON, "水稻")
+
+    assert (plan["disease_id"], plan["severity"], plan["suppliers_nearby"]) == ("rice_blast", "严重", 1)
+    product = plan["products"][0]
+    assert product["product_id"] == "tricyclazole-75wp"
+    assert (product["dose_per_mu"], product["applications"], product["total_amount"]) == (30, 2, 600)
+    assert (product["packages"], product["cost"]) == (6, 54.0)
+    assert product["suppliers"] == [{"supplier_id": "s1", "name": "近处农资店", "phone": None,
+                                     "distance_km": 1.1, "price": 8.5, "cost": 51.0}]
+    # 附近无货的商品排在后面
+    assert [p["suppliers"] for p in plan["products"][1:]] == [[], []]
+
+    assert matcher.recommend("rice_blast", "轻微", 10)["products"][0]["dose_per_mu"] == 20
+    medium = matcher.recommend("rice_blast", "未知")
+    assert medium["severity"] == "中等"
+    assert medium["products"][0]["dose_per_mu"] == 25
+    assert medium["products"][0]["total_amount"] is None
+    assert medium["products"][0]["packages"] is None
+
+
+def test_healthy_unknown_and_uncatalogued_diseases(matcher):
+    healthy = matcher.recommend("healthy", "中等", 10, LAT, LON)
+    assert healthy["severity"] == "无"
+    assert healthy["products"] == []
+    assert "无需用药" in healthy["note"]
+
+    assert matcher.recommend("rice_blast", "无")["note"] == healthy["note"]
+    assert "人工复核" in matcher.recommend("从没见过的病")["note"]
+
+
+def test_batch_computes_each_distinct_diagnosis_once(matcher):
+    diagnoses = [
+        {"details": {"disease_id": "rice_blast", "severity": "中等"}},
+        {"disease_id": "rice_blast", "severity": "中等"},
+        {"disease": "稻瘟病", "severity": "中等", "area_mu": 5},
+        {"disease_id": "rice_blast", "severity": "中等", "area_mu": "10"},
+        {"status": "error"}
+    ]
+
+    plans = matcher.recommend_batch(diagnoses, area_mu=10, lat=LAT, lon=LON, crop_type="水稻")
+
+    assert plans[0] is plans[1]
+    # 数字字符串与数字视为同一面积
+    assert plans[3] is plans[0]
+    assert plans[2] is not plans[0]
+    assert plans[2]["area_mu"] == 5
+    assert plans[0]["products"][0]["suppliers"][0]["supplier_id"] == "s1"
+    assert plans[4]["disease_id"] == "unknown"
+
+
+@pytest.mark.parametrize("item, message", [
+    ({"disease_id": "rice_blast", "area_mu": math.nan}, "area_mu"),
+    ({"disease_id": "rice_blast", "area_mu": -1}, "area_mu"),
+    ({"disease_id": "rice_blast", "lat": math.inf}, "lat"),
+    ({"disease_id": "rice_blast", "lon": "东经"}, "lon"),
+    ({"disease_id": "rice_blast", "area_mu": True}, "area_mu"),
+    ({"disease": ["rice_blast"]}, "disease"),
+    ({"disease_id": "rice_blast", "severity": {"level": 3}}, "severity"),
+    ({"details": "rice_blast"}, "details")
+])
+def test_batch_rejects_invalid_items(matcher, item, message):
+    with pytest.raises(ValueError) as info:
+        matcher.recommend_batch([{"disease_id": "rice_blast"}, item], area_mu=10)
+
+    assert str(info.value).startswith("diagnoses[1]")
+    assert message in str(info.value)
+
+
+@pytest.fixture
+def api(matcher, monkeypatch):
+    monkeypatch.setattr(supply_api, "_matcher", matcher)
+    return supply_api
+
+
+def test_recommend_endpoint_validates_query(api):
+    payload, status = api.recommend({"disease": "稻瘟病", "area_mu": "10", "lat": str(LAT), "lon": str(LON)})
+    assert status == 200
+    assert payload["data"]["products"][0]["packages"] == 3
+
+    assert api.recommend({})[1] == 400
+    for args in ({"area_mu": "nan"}, {"area_mu": "inf"}, {"area_mu": "-1"}, {"area_mu": "十亩"},
+                 {"lat": "nan", "lon": "120"}, {"lat": "91", "lon": "120"}):
+        assert api.recommend({"disease": "稻瘟病", **args})[1] == 400, args
+
+
+def test_batch_endpoint_validates_payload_and_items(api):
+    diagnoses = [{"disease_id": "rice_blast", "severity": "严重"}]
+    payload, status = api.recommend_batch({"diagnoses": diagnoses, "area_mu": 10, "lat": LAT, "lon": LON})
+    assert status == 200
+    assert payload["data"]["recommendations"][0]["products"][0]["packages"] == 6
+
+    for bad in (None, [], {"diagnoses": "x"}, {"diagnoses": [1]},
+                {"diagnoses": diagnoses, "area_mu": math.nan},
+                {"diagnoses": diagnoses, "area_mu": math.inf},
+                {"diagnoses": diagnoses, "lat": math.nan, "lon": LON},
+                {"diagnoses": diagnoses, "lat": "北纬", "lon": LON},
+                {"diagnoses": diagnoses, "lat": [LAT], "lon": LON},
+                {"diagnoses": diagnoses, "crop_type": ["水稻"]}):
+        assert api.recommend_batch(bad)[1] == 400, bad
+
+    payload, status = api.recommend_batch({"diagnoses": diagnoses + [{"disease": ["稻瘟病"]}]})
+    assert status == 400
+    assert payload["message"].startswith("diagnoses[1]")
+    assert api.recommend_batch({"diagnoses": [{"disease_id": "rice_blast", "area_mu": "abc"}]})[1] == 400
+
+
+def test_field_recommendation_validates_fallback_parameters(api, tmp_path, monkeypatch):
+    archive = FieldArchive(str(tmp_path / "field_archive.db"))
+    monkeypatch.setattr(field_api, "_archive", archive)
+    archive.upsert_field("F1", crop_type="水稻")
+    result = DetectionResult("success", mode="qwen", details=DiseaseDetails("稻瘟病", severity="严重", confidence=0.9))
+    archive.record_frame("F1", result, ts=1780000000, lat=LAT, lon=LON)
+
+    payload, status = api.field_recommendation("F1", {"area_mu": "10", "lat": str(LAT), "lon": str(LON)})
+    assert status == 200
+    assert payload["data"]["disease_id"] == "rice_blast"
+    assert payload["data"]["products"][0]["suppliers"][0]["supplier_id"] == "s1"
+
+    assert api.field_recommendation("F1", {"area_mu": "nan"})[1] == 400
+    assert api.field_recommendation("F1", {"lat": "nan", "lon": "120"})[1] == 400
+    assert api.field_recommendation("F404", {})[1] == 404
+
+
+def test_batch_route_rejects_json_nan(api):
+    pytest.importorskip("flask")
+    import app as web
+
+    response = web.app.test_client().post(
+        "/api/recommendations", data='{"diagnoses": [{"disease_id": "rice_blast", "area_mu": NaN}]}',
+        content_type="application/json"
+    )
+
+    assert response.status_code == 400
+    assert "diagnoses[0]" in response.get_json()["message"]
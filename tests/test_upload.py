@@ -0,0 +1,125 @@
+"""
+流式 multipart 解析：任意分块边界、早期校验、内容哈希与尺寸探测
+"""
+
+import hashlib
+import os
+import struct
+
+import pytest
+
+pytest.importorskip("werkzeug")
+
+from src.utils.upload import ImageSizeProbe, StreamingUpload, UploadError, parse_boundary, sniff_image_type  # noqa: E402
+
+BOUNDARY = "----farm7MA4YWxk"
+
+# 带 APP0 段与 SOF0 段（高 480、宽 640）的最小 JPEG 头
+JPEG = (b"\xff\xd8" + b"\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+        + b"\xff\xc0\x00\x11\x08" + struct.pack(">HH", 480, 640) + b"\x03" + b"\x00" * 9 + b"\xff\xd9")
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00\x00\x00\rIHDR" + struct.pack(">II", 320, 200) + b"\x08\x02\x00\x00\x00"
+
+
+def multipart(parts):
+    """parts: [(name, value, filename或None)]"""
+    body = b""
+    for name, value, filename in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename is not None else "")
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + value + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def upload_body(body, tmp_path, chunk_size=None, max_size=10 * 1024 * 1024):
+    upload = StreamingUpload(BOUNDARY, upload_dir=str(tmp_path), max_size=max_size)
+    chunk_size = chunk_size or len(body)
+    for start in range(0, len(body), chunk_size):
+        upload.feed(body[start:start + chunk_size])
+    upload.close()
+    return upload
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, None])
+def test_parses_regardless_of_chunk_boundaries(tmp_path, chunk_size):
+    body = multipart([("crop_type", "小麦".encode(), None), ("file", JPEG, "leaf.jpg"), ("field_id", b"F-1", None)])
+
+    upload = upload_body(body, tmp_path, chunk_size)
+
+    assert upload.fields == {"crop_type": "小麦", "field_id": "F-1"}
+    assert upload.sha256 == hashlib.sha256(JPEG).hexdigest()
+    assert (upload.image_type, upload.width, upload.height, upload.size) == ("jpeg", 640, 480, len(JPEG))
+    with open(upload.filepath, "rb") as f:
+        assert f.read() == JPEG
+    # 临时文件已改名，没有残留的 .part
+    assert not [name for _, _, names in os.walk(tmp_path) for name in names if name.endswith(".part")]
+
+
+def test_same_content_gets_same_stored_name(tmp_path):
+    first = upload_body(multipart([("file", PNG, "a.png")]), tmp_path)
+    second = upload_body(multipart([("file", PNG, "a.png")]), tmp_path, chunk_size=5)
+
+    assert first.stored_name == second.stored_name
+    assert (first.width, first.height) == (320, 200)
+
+
+def test_rejects_non_image_content_early(tmp_path):
+    upload = StreamingUpload(BOUNDARY, upload_dir=str(tmp_path))
+    head = multipart([("file", b"MZ\x90\x00 not an image at all", "evil.jpg")])[:120]
+
+    with pytest.raises(UploadError) as excinfo:
+        upload.feed(head)
+
+    assert excinfo.value.status_code == 400
+    assert os.listdir(tmp_path) == [] or all(not name.endswith(".part") for name in os.listdir(tmp_path))
+
+
+def test_rejects_disallowed_extension(tmp_path):
+    with pytest.raises(UploadError) as excinfo:
+        upload_body(multipart([("file", JPEG, "leaf.exe")]), tmp_path)
+    assert excinfo.value.status_code == 400
+
+
+def test_oversized_body_is_rejected_and_cleaned_up(tmp_path):
+    body = multipart([("file", JPEG + b"\x00" * 4096, "leaf.jpg")])
+
+    with pytest.raises(UploadError) as excinfo:
+        upload_body(body, tmp_path, chunk_size=512, max_size=2048)
+
+    assert excinfo.value.status_code == 413
+    assert not [name for _, _, names in os.walk(tmp_path) for name in names]
+
+
+@pytest.mark.parametrize("body, message", [
+    (multipart([("crop_type", b"x", None)]), "没有上传图片"),
+    (multipart([("file", b"", "")]), "未选择文件"),
+    (multipart([("file", JPEG, "leaf.jpg")])[:-20], "上传数据不完整"),
+])
+def test_close_reports_missing_or_truncated_file(tmp_path, body, message):
+    with pytest.raises(UploadError) as excinfo:
+        upload_body(body, tmp_path)
+    assert excinfo.value.message == message
+
+
+def test_missing_boundary_means_no_file():
+    with pytest.raises(UploadError):
+        StreamingUpload("")
+
+
+def test_header_helpers():
+    assert parse_boundary(f'multipart/form-data; boundary="{BOUNDARY}"') == BOUNDARY
+    assert parse_boundary("application/json") == ""
+    assert sniff_image_type(b"GIF89a\x01\x00") == "gif"
+    assert sniff_image_type(b"RIFF....") is None
+
+    probe = ImageSizeProbe("gif")
+    probe.feed(b"GIF89a" + struct.pack("<HH", 12, 34))
+    assert (probe.width, probe.height) == (12, 34)
+
+
+def test_creates_missing_upload_dir(tmp_path):
+    # 首次上传时检测器尚未创建，上传目录可能还不存在
+    upload_dir = tmp_path / "uploads"
+
+    upload = upload_body(multipart([("file", PNG, "a.png")]), upload_dir)
+
+    assert upload.filepath.startswith(str(upload_dir))
+    assert os.path.isfile(upload.filepath)
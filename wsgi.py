@@ -0,0 +1,15 @@
+"""
+慧眼巡田 - 生产环境 WSGI 入口
+
+启动方式：
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, get_detector, inflight  # noqa: E402
+
+__all__ = ['app', 'get_detector', 'inflight']